@@ -0,0 +1,57 @@
+import functools
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+# Each service image is built from its own directory, so this module is kept
+# in step with microservices/payment_service/payments/idempotency.py rather than shared.
+# The window setting has the same name as the monolith's (store.services.idempotency_service).
+DEFAULT_WINDOW = 60 * 60 * 24
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 5
+
+
+def idempotent(scope):
+    """
+    Replay the first response of a view for requests retried with the same
+    Idempotency-Key header. Concurrent duplicates wait on a short lock and
+    get 409 if the first request is still running. Server errors are not stored.
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = request.META.get('HTTP_IDEMPOTENCY_KEY', '').strip()
+            if not key:
+                return view_func(request, *args, **kwargs)
+
+            digest = hashlib.sha256(f"{request.user.pk}:{key}".encode('utf-8')).hexdigest()
+            record_key = f"idempotency_{scope}_{digest}"
+            lock_key = f"{record_key}_lock"
+
+            deadline = time.monotonic() + LOCK_WAIT
+            while True:
+                record = cache.get(record_key)
+                if record is not None:
+                    return Response(record['data'], status=record['status'])
+                if cache.add(lock_key, 1, LOCK_TIMEOUT):
+                    break
+                if time.monotonic() >= deadline:
+                    return Response(
+                        {'error': 'A request with this idempotency key is still in progress'},
+                        status=status.HTTP_409_CONFLICT
+                    )
+                time.sleep(0.05)
+
+            try:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code < 500:
+                    window = getattr(settings, 'STORE_IDEMPOTENCY_WINDOW', DEFAULT_WINDOW)
+                    cache.set(record_key, {'data': response.data, 'status': response.status_code}, window)
+                return response
+            finally:
+                cache.delete(lock_key)
+        return wrapper
+    return decorator
@@ -6,6 +6,7 @@ from django.shortcuts import get_object_or_404
 from django.db.models import Q
 from .models import Order, OrderItem, ShippingAddress, Payment, OrderTracking
 from .serializers import OrderSerializer, OrderCreateSerializer, ShippingAddressSerializer, PaymentSerializer
+from .idempotency import idempotent
 
 class OrderListView(generics.ListAPIView):
     serializer_class = OrderSerializer
@@ -135,6 +136,7 @@ def set_default_shipping_address(request, address_id):
 # Payment Views
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent('process_payment')
 def process_payment(request, order_id):
     """Process payment for an order"""
     order = get_object_or_404(Order, id=order_id)
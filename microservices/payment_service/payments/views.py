@@ -7,6 +7,7 @@ from django.db.models import Q
 from django.utils import timezone
 from .models import PaymentMethod, Transaction, Refund, Payout
 from .serializers import PaymentMethodSerializer, TransactionSerializer, RefundSerializer, PayoutSerializer
+from .idempotency import idempotent
 
 class PaymentMethodListView(generics.ListCreateAPIView):
     serializer_class = PaymentMethodSerializer
@@ -37,6 +38,7 @@ class PaymentMethodDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent('process_payment')
 def process_payment(request):
     """
     Process a payment for an order
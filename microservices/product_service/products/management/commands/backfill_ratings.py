@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Avg, Count
+from products.models import Product, ProductReview
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored rating summary of every product from its reviews'
+
+    def handle(self, *args, **options):
+        summaries = {
+            row['product']: row
+            for row in ProductReview.objects.values('product').annotate(
+                average=Avg('rating'), count=Count('id')
+            ).order_by()
+        }
+        with transaction.atomic():
+            Product.objects.exclude(pk__in=list(summaries)).update(average_rating=0, review_count=0)
+            for product_id, row in summaries.items():
+                Product.objects.filter(pk=product_id).update(
+                    average_rating=row['average'] or 0,
+                    review_count=row['count']
+                )
+        self.stdout.write(self.style.SUCCESS(f'Updated ratings for {len(summaries)} products'))
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Avg, Count
 from django.contrib.auth.models import User
 
 class Category(models.Model):
@@ -50,8 +51,25 @@ class Product(models.Model):
     seo_description = models.TextField(blank=True, verbose_name='SEO Description')
     seo_keywords = models.TextField(blank=True, verbose_name='SEO Keywords')
     
+    # Rating summary kept in step with ProductReview writes
+    average_rating = models.FloatField(default=0, db_index=True)
+    review_count = models.PositiveIntegerField(default=0)
+    
     def __str__(self):
         return self.name
+    
+    def refresh_rating_summary(self):
+        """Recompute average_rating and review_count from this product's reviews"""
+        with transaction.atomic():
+            # Lock the product row so concurrent review writes apply one at a time
+            Product.objects.select_for_update().filter(pk=self.pk).exists()
+            summary = self.reviews.aggregate(average=Avg('rating'), count=Count('id'))
+            self.average_rating = summary['average'] or 0
+            self.review_count = summary['count']
+            Product.objects.filter(pk=self.pk).update(
+                average_rating=self.average_rating,
+                review_count=self.review_count
+            )
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, related_name='images', on_delete=models.CASCADE)
@@ -77,6 +95,17 @@ class ProductReview(models.Model):
     
     def __str__(self):
         return f"{self.product.name} - {self.user.username}"
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.product.refresh_rating_summary()
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.product.refresh_rating_summary()
+        return result
 
 class ProductSpecification(models.Model):
     product = models.ForeignKey(Product, related_name='specifications', on_delete=models.CASCADE)
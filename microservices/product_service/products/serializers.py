@@ -31,8 +31,8 @@ class ProductSerializer(serializers.ModelSerializer):
     brand_info = BrandSerializer(source='brand', read_only=True)
     specifications = ProductSpecificationSerializer(many=True, read_only=True)
     reviews = ProductReviewSerializer(many=True, read_only=True)
-    average_rating = serializers.SerializerMethodField()
-    review_count = serializers.SerializerMethodField()
+    average_rating = serializers.FloatField(read_only=True)
+    review_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Product
@@ -42,22 +42,13 @@ class ProductSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at', 'seo_description', 'seo_keywords',
             'specifications', 'reviews', 'average_rating', 'review_count'
         ]
-    
-    def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if reviews:
-            return sum(review.rating for review in reviews) / len(reviews)
-        return 0
-    
-    def get_review_count(self, obj):
-        return obj.reviews.count()
 
 class ProductListSerializer(serializers.ModelSerializer):
     """Simplified serializer for product listings"""
     category_display = serializers.CharField(source='get_category_display', read_only=True)
     brand_name = serializers.CharField(source='brand.name', read_only=True)
-    average_rating = serializers.SerializerMethodField()
-    review_count = serializers.SerializerMethodField()
+    average_rating = serializers.FloatField(read_only=True)
+    review_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Product
@@ -65,13 +56,4 @@ class ProductListSerializer(serializers.ModelSerializer):
             'id', 'name', 'description', 'price', 'category', 'category_display',
             'brand_name', 'image', 'stock_quantity', 'is_active',
             'created_at', 'average_rating', 'review_count'
-        ]
-    
-    def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if reviews:
-            return sum(review.rating for review in reviews) / len(reviews)
-        return 0
-    
-    def get_review_count(self, obj):
-        return obj.reviews.count()
\ No newline at end of file
+        ]
\ No newline at end of file
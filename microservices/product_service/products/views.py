@@ -1,10 +1,12 @@
+import json
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Avg
+from django.db.models import Q
 from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
 from .models import Product, Category, Brand, ProductReview
 from .serializers import ProductSerializer, ProductListSerializer, CategorySerializer, BrandSerializer, ProductReviewSerializer
 
@@ -62,31 +64,34 @@ class ProductListView(generics.ListAPIView):
         elif sort_by == 'name':
             queryset = queryset.order_by('name')
         elif sort_by == 'rating':
-            queryset = queryset.annotate(
-                avg_rating=Avg('reviews__rating')
-            ).order_by('-avg_rating')
+            queryset = queryset.order_by('-average_rating')
         else:
             queryset = queryset.order_by('-created_at')
         
         return queryset
 
+# Bump when ProductSerializer's output changes so older cached entries are ignored
+PRODUCT_DETAIL_DTO_VERSION = 1
+
 class ProductDetailView(generics.RetrieveAPIView):
     queryset = Product.objects.filter(is_active=True)
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]
     
-    def get_object(self):
-        # Try to get from cache first
+    def retrieve(self, request, *args, **kwargs):
+        # Cache the serialized response, a flat dict of plain values, rather
+        # than the pickled model instance
         product_id = self.kwargs['pk']
-        cache_key = f'product_detail_{product_id}'
-        product = cache.get(cache_key)
+        cache_key = f'product_detail_v{PRODUCT_DETAIL_DTO_VERSION}_{product_id}'
+        data = cache.get(cache_key)
         
-        if product is None:
+        if data is None:
             product = get_object_or_404(Product, pk=product_id, is_active=True)
+            data = json.loads(json.dumps(self.get_serializer(product).data, cls=DjangoJSONEncoder))
             # Cache for 30 minutes
-            cache.set(cache_key, product, 60 * 30)
+            cache.set(cache_key, data, 60 * 30)
         
-        return product
+        return Response(data)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -132,9 +137,7 @@ def product_search(request):
     elif sort_by == 'name':
         products = products.order_by('name')
     elif sort_by == 'rating':
-        products = products.annotate(
-            avg_rating=Avg('reviews__rating')
-        ).order_by('-avg_rating')
+        products = products.order_by('-average_rating')
     else:
         # Default sorting by relevance (created_at for now)
         products = products.order_by('-created_at')
@@ -186,9 +189,7 @@ def featured_products(request):
     """Get featured products"""
     # For now, we'll return products with highest ratings
     # In a real implementation, you might have a featured flag
-    products = Product.objects.filter(is_active=True).annotate(
-        avg_rating=Avg('reviews__rating')
-    ).order_by('-avg_rating')[:10]
+    products = Product.objects.filter(is_active=True).order_by('-average_rating')[:10]
     
     serializer = ProductListSerializer(products, many=True)
     return Response(serializer.data)
\ No newline at end of file
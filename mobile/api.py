@@ -9,9 +9,10 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.apps import apps
 from django.core.paginator import Paginator
-from django.db.models import Q, Sum, Count, Avg
-from django.utils import timezone
-from datetime import timedelta
+from django.db.models import Sum, Avg, F
+from store.services.currency_service import currency_service
+from store.services.search_service import search_service
+from store.utils.pagination import InvalidCursor, KeysetPaginator, get_keyset_ordering
 from .serializers import (
     MobileProductSerializer,
     MobileCategorySerializer,
@@ -29,9 +30,9 @@ def mobile_home_data(request):
     Category = apps.get_model('store', 'Category')  # If you have a Category model
     
     # Get featured products with optimized queries
-    featured_products = Product.objects.select_related(
-        'seller'
-    ).filter(is_featured=True)[:10]
+    featured_products = list(Product.objects.select_related(
+        'seller', 'rating_summary'
+    ).filter(is_featured=True)[:10])
     
     # Get categories
     categories = Product.objects.values('category').distinct()[:8]
@@ -39,15 +40,15 @@ def mobile_home_data(request):
     # Get banners/offers (you might want to create a Banner model)
     banners = []
     
-    # Get trending products based on recent orders
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    trending_products = Product.objects.select_related(
-        'seller'
+    # Get trending products by their time-decayed sales score
+    trending_products = list(Product.objects.select_related(
+        'seller', 'rating_summary'
     ).filter(
-        orderitem__order__created_at__gte=thirty_days_ago
-    ).annotate(
-        order_count=Count('orderitem')
-    ).order_by('-order_count')[:10]
+        trending_score__gt=0
+    ).order_by('-trending_score')[:10])
+    
+    display_currency = currency_service.get_display_currency(request)
+    currency_service.annotate_prices(featured_products + trending_products, display_currency)
     
     data = {
         'banners': banners,
@@ -68,21 +69,17 @@ def mobile_product_list(request):
     # Get query parameters
     page = int(request.GET.get('page', 1))
     category = request.GET.get('category', '')
-    sort_by = request.GET.get('sort_by', 'name')
     search_query = request.GET.get('search', '')
+    sort_by = request.GET.get('sort_by') or ('relevance' if search_query else 'name')
     min_price = request.GET.get('min_price')
     max_price = request.GET.get('max_price')
     
     # Filter products with optimized queries
-    products = Product.objects.select_related('seller')
+    products = Product.objects.select_related('seller', 'rating_summary')
     
-    # Apply search query
+    # Apply search query through the full-text index
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) | 
-            Q(description__icontains=search_query) |
-            Q(category__icontains=search_query)
-        )
+        products = search_service.filter_queryset(products, search_query)
     
     if category:
         products = products.filter(category=category)
@@ -101,16 +98,38 @@ def mobile_product_list(request):
     elif sort_by == 'name':
         products = products.order_by('name')
     elif sort_by == 'popularity':
-        products = products.annotate(
-            order_count=Count('orderitem')
-        ).order_by('-order_count')
-    elif sort_by == 'rating':
-        # This would require a review system
+        products = products.order_by('-order_count')
+    elif sort_by == 'newest':
         products = products.order_by('-created_at')
+    elif sort_by == 'rating':
+        products = products.order_by(F('rating_summary__average').desc(nulls_last=True), '-id')
+    elif sort_by == 'relevance' and search_query:
+        products = search_service.rank(products, search_query)
+    
+    # Infinite scroll opts into keyset pagination with ?cursor= so deep pages
+    # cost the same as the first; relevance ordering keeps page numbers
+    if 'cursor' in request.GET and get_keyset_ordering(products) is not None:
+        try:
+            keyset_page = KeysetPaginator(products, 20).page(request.GET.get('cursor') or None)
+        except InvalidCursor:
+            return Response(
+                {'error': 'Invalid cursor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        currency_service.annotate_prices(keyset_page.object_list, currency_service.get_display_currency(request))
+        serializer = MobileProductSerializer(keyset_page.object_list, many=True)
+        return Response({
+            'products': serializer.data,
+            'has_next': keyset_page.has_next(),
+            'has_previous': keyset_page.has_previous(),
+            'next_cursor': keyset_page.next_cursor,
+            'previous_cursor': keyset_page.previous_cursor
+        })
     
     # Paginate results
     paginator = Paginator(products, 20)  # 20 products per page
     page_obj = paginator.get_page(page)
+    currency_service.annotate_prices(page_obj, currency_service.get_display_currency(request))
     
     serializer = MobileProductSerializer(page_obj, many=True)
     
@@ -131,14 +150,14 @@ def mobile_product_detail(request, product_id):
     
     try:
         product = Product.objects.select_related(
-            'seller'
+            'seller', 'rating_summary'
         ).prefetch_related(
             'orderitem_set'
         ).get(id=product_id)
         
         # Get related products
         related_products = Product.objects.select_related(
-            'seller'
+            'seller', 'rating_summary'
         ).filter(
             category=product.category
         ).exclude(
@@ -242,7 +261,7 @@ def mobile_user_dashboard(request):
     
     # Get user's favorite products (simulated)
     favorite_products = Product.objects.select_related(
-        'seller'
+        'seller', 'rating_summary'
     ).filter(is_featured=True)[:5]
     
     data = {
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.apps import apps
+from store.services.rating_service import rating_service
 
 class MobileProductSerializer(serializers.Serializer):
     """Serializer for product data in mobile API"""
@@ -13,17 +14,26 @@ class MobileProductSerializer(serializers.Serializer):
     seller_name = serializers.SerializerMethodField()
     rating = serializers.SerializerMethodField()
     review_count = serializers.SerializerMethodField()
+    currency = serializers.CharField(max_length=3)
+    display_price = serializers.SerializerMethodField()
+    display_currency = serializers.SerializerMethodField()
     
     def get_seller_name(self, obj):
         return obj.seller.username if obj.seller else "Unknown"
     
     def get_rating(self, obj):
-        # Return average rating if you have a review system
-        return 4.5  # Placeholder
+        # Read from the maintained summary; load products with select_related('rating_summary')
+        return round(rating_service.get_summary(obj)['average_rating'], 1)
     
     def get_review_count(self, obj):
-        # Return number of reviews if you have a review system
-        return 12  # Placeholder
+        return rating_service.get_summary(obj)['review_count']
+    
+    def get_display_price(self, obj):
+        # Set by CurrencyService.annotate_prices; own price otherwise
+        return str(getattr(obj, 'display_price', obj.price))
+    
+    def get_display_currency(self, obj):
+        return getattr(obj, 'display_currency', obj.currency)
 
 class MobileCategorySerializer(serializers.Serializer):
     """Serializer for category data in mobile API"""
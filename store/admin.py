@@ -10,6 +10,7 @@ from .models import (
     MFADevice, SecurityLog, SensitiveData
 )
 from .admin_mixins import VisualizationAdmin
+from .services.popularity_service import popularity_service
 
 # Register your models here.
 
@@ -81,6 +82,9 @@ class OrderAdmin(VisualizationAdmin):
     
     @admin.action(description="标记为已取消")
     def mark_as_cancelled(self, request, queryset):
+        # Bulk updates skip signals, so release the sales counters here
+        for order in queryset.exclude(status='cancelled'):
+            popularity_service.record_cancellation(order)
         updated = queryset.update(status='cancelled')
         self.message_user(request, f'تم تحديث {updated} طلب إلى ملغى.')
 
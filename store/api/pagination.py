@@ -0,0 +1,59 @@
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from ..utils.pagination import InvalidCursor, KeysetPaginator, get_keyset_ordering
+
+
+class StorePagination(PageNumberPagination):
+    """
+    Page-number pagination that switches to keyset pagination on request
+
+    Clients opt in by sending ``?cursor=`` (empty for the first page) and then
+    following the ``next``/``previous`` links. Keyset responses omit ``count``
+    so no COUNT(*) is run. Orderings that cannot be keyed, such as search
+    relevance, keep page-number pagination.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_page = None
+        if self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+        ordering = get_keyset_ordering(queryset)
+        if ordering is None:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        paginator = KeysetPaginator(queryset, self.get_page_size(request), ordering)
+        try:
+            self.keyset_page = paginator.page(request.query_params.get(self.cursor_query_param) or None)
+        except InvalidCursor:
+            raise NotFound(self.invalid_cursor_message)
+        return list(self.keyset_page)
+
+    def get_next_link(self):
+        if self.keyset_page is None:
+            return super().get_next_link()
+        return self._get_cursor_link(self.keyset_page.next_cursor)
+
+    def get_previous_link(self):
+        if self.keyset_page is None:
+            return super().get_previous_link()
+        return self._get_cursor_link(self.keyset_page.previous_cursor)
+
+    def _get_cursor_link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        if self.keyset_page is None:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
@@ -12,6 +12,21 @@ class ProductSerializer(serializers.Serializer):
     seller = serializers.StringRelatedField()
     created_at = serializers.DateTimeField()
     updated_at = serializers.DateTimeField()
+    available_quantity = serializers.SerializerMethodField()
+    currency = serializers.CharField(max_length=3)
+    display_price = serializers.SerializerMethodField()
+    display_currency = serializers.SerializerMethodField()
+
+    def get_available_quantity(self, obj):
+        # Set by ReservationService.annotate_availability; raw stock otherwise
+        return getattr(obj, 'available_quantity', obj.stock_quantity)
+
+    def get_display_price(self, obj):
+        # Set by CurrencyService.annotate_prices; own price otherwise
+        return str(getattr(obj, 'display_price', obj.price))
+
+    def get_display_currency(self, obj):
+        return getattr(obj, 'display_currency', obj.currency)
 
 class CategorySerializer(serializers.Serializer):
     category = serializers.CharField(max_length=100)
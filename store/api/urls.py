@@ -7,6 +7,7 @@ app_name = 'store_api'
 # API URLs
 urlpatterns = [
     path('products/', views.ProductListView.as_view(), name='product_list'),
+    path('products/autocomplete/', views.ProductAutocompleteView.as_view(), name='product_autocomplete'),
     path('products/<int:pk>/', views.ProductDetailView.as_view(), name='product_detail'),
     path('categories/', views.CategoryListView.as_view(), name='category_list'),
     path('cart/', views.CartView.as_view(), name='cart'),
@@ -14,5 +15,7 @@ urlpatterns = [
     path('orders/<int:pk>/', views.OrderDetailView.as_view(), name='order_detail'),
     path('user/profile/', views.UserProfileView.as_view(), name='user_profile'),
     path('dashboard/statistics/', views.DashboardStatisticsView.as_view(), name='dashboard_statistics'),
+    path('dashboard/realtime/', views.RealTimeDashboardView.as_view(), name='realtime_dashboard'),
+    path('cache/metrics/', views.CacheMetricsView.as_view(), name='cache_metrics'),
     path('users/search/', views.UserSearchView.as_view(), name='user_search'),
 ]
\ No newline at end of file
@@ -3,7 +3,17 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.apps import apps
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Count, Sum, Prefetch
+from django.db.models import Q, Prefetch
+from django.conf import settings
+from ..services.analytics_service import analytics_service
+from ..services.autocomplete_service import autocomplete_service
+from ..services.cache_metrics_service import cache_metrics_service
+from ..services.cache_service import cache_service
+from ..services.currency_service import currency_service
+from ..services.reservation_service import reservation_service
+from ..services.product_service import DASHBOARD_STATISTICS
+from ..services.search_service import search_service
+from ..utils import statistics
 from .serializers import (
     ProductSerializer, 
     CategorySerializer, 
@@ -12,6 +22,11 @@ from .serializers import (
     UserProfileSerializer
 )
 
+USER_ORDER_STATISTICS = statistics.Statistics({
+    'total_orders': statistics.count('store.Order'),
+    'pending_orders': statistics.count('store.Order', Q(status='pending')),
+})
+
 class ProductListView(generics.ListAPIView):
     """List all products with optimized queries and filtering"""
     serializer_class = ProductSerializer
@@ -29,11 +44,9 @@ class ProductListView(generics.ListAPIView):
             queryset = queryset.filter(category=category)
         
         search = self.request.query_params.get('search', None)
+        sort_by = self.request.query_params.get('sort_by') or ('relevance' if search else 'name')
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(description__icontains=search)
-            )
+            queryset = search_service.filter_queryset(queryset, search)
         
         min_price = self.request.query_params.get('min_price', None)
         if min_price:
@@ -44,19 +57,30 @@ class ProductListView(generics.ListAPIView):
             queryset = queryset.filter(price__lte=max_price)
         
         # Apply sorting
-        sort_by = self.request.query_params.get('sort_by', 'name')
-        if sort_by == 'price_asc':
+        if sort_by == 'relevance' and search:
+            # Ranked in Python; pagination loads only the page's rows
+            queryset = search_service.rank(queryset, search)
+        elif sort_by == 'price_asc':
             queryset = queryset.order_by('price')
         elif sort_by == 'price_desc':
             queryset = queryset.order_by('-price')
         elif sort_by == 'popularity':
-            queryset = queryset.annotate(
-                order_count=Count('orderitem')
-            ).order_by('-order_count')
+            queryset = queryset.order_by('-order_count')
+        elif sort_by == 'newest':
+            queryset = queryset.order_by('-created_at')
         else:
             queryset = queryset.order_by('name')
         
         return queryset
+    
+    def get_serializer(self, *args, **kwargs):
+        # Report stock minus active checkout holds for the page being rendered
+        if kwargs.get('many') and args:
+            products = list(args[0])
+            reservation_service.annotate_availability(products)
+            currency_service.annotate_prices(products, currency_service.get_display_currency(self.request))
+            args = (products,) + args[1:]
+        return super().get_serializer(*args, **kwargs)
 
 class ProductDetailView(generics.RetrieveAPIView):
     """Retrieve a specific product with optimized queries"""
@@ -75,6 +99,19 @@ class ProductDetailView(generics.RetrieveAPIView):
             )
         )
 
+class ProductAutocompleteView(APIView):
+    """Search-box suggestions served from the in-memory prefix index"""
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', 0)) or None
+        except ValueError:
+            limit = None
+        return Response({
+            'query': query,
+            'suggestions': autocomplete_service.suggest(query, limit),
+        })
+
 class CategoryListView(generics.ListAPIView):
     """List all categories"""
     serializer_class = CategorySerializer
@@ -164,57 +201,47 @@ class DashboardStatisticsView(APIView):
         if not request.user.is_authenticated:
             return Response({'error': 'Not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        # Import models
-        Product = apps.get_model('store', 'Product')
-        Order = apps.get_model('store', 'Order')
-        UserProfile = apps.get_model('store', 'UserProfile')
-        Commission = apps.get_model('store', 'Commission')
-        OrderItem = apps.get_model('store', 'OrderItem')
-        
-        # Get statistics with optimized queries
+        # Get statistics with one query per table
         if request.user.is_staff:
             # Admin statistics
-            total_products = Product.objects.count()
-            total_orders = Order.objects.count()
-            pending_orders = Order.objects.filter(status='pending').count()
-            total_sellers = UserProfile.objects.filter(role='seller').count()
-            total_profits = Commission.objects.aggregate(total=Sum('amount'))['total'] or 0
-            pending_products = Product.objects.filter(verification_status='pending').count()
-            rejected_products = Product.objects.filter(verification_status='rejected').count()
-            
-            # Recent orders
-            recent_orders = Order.objects.select_related(
-                'user'
-            ).prefetch_related(
-                Prefetch(
-                    'items',
-                    queryset=OrderItem.objects.select_related('product', 'product__seller')
-                )
-            ).order_by('-created_at')[:10]
-            
-            data = {
-                'total_products': total_products,
-                'total_orders': total_orders,
-                'pending_orders': pending_orders,
-                'total_sellers': total_sellers,
-                'total_profits': float(total_profits),
-                'pending_products': pending_products,
-                'rejected_products': rejected_products,
-                'recent_orders_count': recent_orders.count(),
-            }
+            data = DASHBOARD_STATISTICS.evaluate()
+            data['total_profits'] = float(data['total_profits'])
+            data['recent_orders_count'] = min(data['total_orders'], 10)
         else:
             # Regular user statistics
-            user_orders = Order.objects.filter(user=request.user)
-            total_orders = user_orders.count()
-            pending_orders = user_orders.filter(status='pending').count()
-            
-            data = {
-                'total_orders': total_orders,
-                'pending_orders': pending_orders,
-            }
+            Order = apps.get_model('store', 'Order')
+            data = USER_ORDER_STATISTICS.evaluate({'store.Order': Order.objects.filter(user=request.user)})
         
         return Response(data)
 
+class RealTimeDashboardView(APIView):
+    """Live dashboard counters for staff, cheap enough to poll every few seconds"""
+    def get(self, request):
+        if not request.user.is_authenticated or not request.user.is_staff:
+            return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+        
+        result = analytics_service.get_advanced_real_time_data()
+        if not result.get('success'):
+            return Response({'error': result.get('error')}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(result['data'])
+
+class CacheMetricsView(APIView):
+    """Per-prefix cache metrics, for staff and monitoring agents on the same host"""
+    LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+    
+    def get(self, request):
+        remote_addr = request.META.get('REMOTE_ADDR')
+        is_local = remote_addr in self.LOCAL_ADDRESSES or remote_addr in getattr(settings, 'INTERNAL_IPS', ())
+        if not is_local and not (request.user.is_authenticated and request.user.is_staff):
+            return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+        
+        cache_metrics_service.flush()
+        return Response({
+            'process': cache_metrics_service.get_process_metrics(),
+            'shared': cache_metrics_service.get_shared_metrics(),
+            'tiers': cache_service.get_tier_stats(),
+        })
+
 class UserSearchView(APIView):
     """Search users (admin only)"""
     def get(self, request):
@@ -1,5 +1,6 @@
 from django.apps import apps
 from typing import Any, Dict
+from .utils import Cart
 
 
 def notifications_processor(request: Any) -> Dict[str, int]:
@@ -24,10 +25,7 @@ def cart_processor(request: Any) -> Dict[str, int]:
     """
     Context processor to add cart count to all templates
     """
-    cart = request.session.get('cart', {})
-    # Convert string values to integers before summing
-    try:
-        cart_count = sum(int(quantity) for quantity in cart.values())
-    except (ValueError, TypeError):
-        cart_count = 0
-    return {'cart_count': cart_count}
\ No newline at end of file
+    if not hasattr(request, 'session'):
+        return {'cart_count': 0}
+    # Reuse the request's cart so a cart already priced by the view is not resolved again
+    return {'cart_count': Cart.for_request(request).get_total_quantity()}
@@ -3,6 +3,10 @@ from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import redirect
 from django.contrib import messages
+from functools import wraps
+import inspect
+from .services.page_cache_service import page_cache_service
+from .services.warmup_service import warmup_service
 
 def check_user_role(role):
     """
@@ -35,4 +39,38 @@ def buyer_required(view_func):
     """
     Decorator to require buyer role
     """
-    return check_user_role('buyer')(view_func)
\ No newline at end of file
+    return check_user_role('buyer')(view_func)
+
+def cache_anonymous_page(tags=(), timeout=None):
+    """
+    Decorator to serve anonymous visitors a cached copy of the rendered page
+
+    Tags may name URL keyword arguments, e.g. 'product:{pk}'.
+    """
+    def decorator(view_func):
+        signature = inspect.signature(view_func)
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            arguments = signature.bind(request, *args, **kwargs).arguments
+            return page_cache_service.serve(
+                request,
+                lambda: view_func(request, *args, **kwargs),
+                [tag.format(**arguments) for tag in tags],
+                timeout
+            )
+        return _wrapped_view
+    return decorator
+
+
+def record_cache_warmup(view_func):
+    """
+    Decorator to count successful visits of a page so warmup can replay the busiest ones
+    """
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        response = view_func(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            warmup_service.record_access(request)
+        return response
+    return _wrapped_view
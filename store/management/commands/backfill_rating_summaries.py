@@ -0,0 +1,32 @@
+"""
+Management command to rebuild product rating summaries from the review tables
+"""
+
+from django.core.management.base import BaseCommand
+from store.services.rating_service import rating_service
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Rebuild per-product rating summaries from Review and EnhancedReview'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, action='append', dest='products', help='Only rebuild this product ID (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Summaries written per bulk insert')
+
+    def handle(self, *args, **options):
+        """
+        Handle the command execution
+        """
+        self.stdout.write('Rebuilding rating summaries...')
+        start_time = time.perf_counter()
+        try:
+            count = rating_service.rebuild(product_ids=options['products'], batch_size=options['batch_size'])
+        except Exception as e:
+            logger.error(f"Error rebuilding rating summaries: {str(e)}")
+            self.stdout.write(self.style.ERROR(f'Error rebuilding rating summaries: {str(e)}'))
+            return
+        elapsed = time.perf_counter() - start_time
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} rating summaries in {elapsed:.2f}s'))
@@ -0,0 +1,82 @@
+"""
+Management command to compare cached page payloads stored as pickles and as DTOs
+"""
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.apps import apps
+from django.db import transaction
+from decimal import Decimal
+from store.services.rating_service import rating_service
+from store.views import HOME_CODEC, PRODUCT_PAGE_CODEC, PRODUCT_DETAIL_CODEC
+import pickle
+import time
+
+
+class Command(BaseCommand):
+    help = 'Benchmark payload size and decode time of cached pages as pickles versus packed DTOs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100, help='Minimum catalog size to benchmark with')
+        parser.add_argument('--iterations', type=int, default=2000, help='Decodes timed per payload')
+
+    def handle(self, *args, **options):
+        # The temporary products are rolled back rather than deleted, so no
+        # delete signals fire and an interrupted run leaves nothing behind
+        with transaction.atomic():
+            try:
+                self.benchmark(options)
+            finally:
+                transaction.set_rollback(True)
+
+    def benchmark(self, options):
+        Product = apps.get_model('store', 'Product')
+        EnhancedReview = apps.get_model('store', 'EnhancedReview')
+
+        # Top up the catalog with temporary products so the pages are full
+        missing = max(options['products'] - Product.objects.count(), 0)
+        Product.objects.bulk_create([
+            Product(
+                name=f'منتج تجريبي {number}',
+                name_en=f'Benchmark product {number}',
+                description='وصف المنتج ' * 20,
+                price=Decimal('99.95'),
+                stock_quantity=10,
+            )
+            for number in range(missing)
+        ])
+
+        products = Product.objects.select_related('rating_summary')
+        product = products.first()
+        # The page is cached the way product_list builds it; pickling a
+        # Page also pickles its paginator's queryset
+        page = Paginator(products, 12).page(1)
+        page.object_list = list(page.object_list)
+        detail = {
+            'product': product,
+            'top_reviews': list(EnhancedReview.objects.filter(product=product)[:3]),
+        }
+        detail.update(rating_service.get_summary(product))
+
+        payloads = [
+            ('home', {'featured_products': list(Product.objects.all()[:4])}, HOME_CODEC),
+            ('product_list', page, PRODUCT_PAGE_CODEC),
+            ('product_detail', detail, PRODUCT_DETAIL_CODEC),
+        ]
+        self.stdout.write(f'Catalog: {Product.objects.count()} products, {options["iterations"]} decodes per payload')
+        self.stdout.write(f'{"payload":<16}{"pickle bytes":>14}{"dto bytes":>12}{"pickle us":>12}{"dto us":>10}')
+        for name, value, codec in payloads:
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            packed = codec.encode(value)
+            pickle_time = self.time_decode(pickle.loads, pickled, options['iterations'])
+            dto_time = self.time_decode(codec.decode, packed, options['iterations'])
+            self.stdout.write(
+                f'{name:<16}{len(pickled):>14}{len(packed):>12}{pickle_time:>12.1f}{dto_time:>10.1f}'
+            )
+
+    def time_decode(self, decode, payload, iterations: int) -> float:
+        """Get the mean decode time in microseconds"""
+        started = time.perf_counter()
+        for _ in range(iterations):
+            decode(payload)
+        return (time.perf_counter() - started) / max(iterations, 1) * 1e6
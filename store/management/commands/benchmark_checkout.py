@@ -0,0 +1,107 @@
+"""
+Management command to benchmark concurrent checkouts against one product
+"""
+
+from django.core.management.base import BaseCommand
+from django.apps import apps
+from django.db import connection, OperationalError
+from django.db.models import Sum
+from decimal import Decimal
+from store.services.order_service import OrderService, InsufficientStockError
+import threading
+import time
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent order placement and verify that no stock updates are lost'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Number of concurrent checkout workers')
+        parser.add_argument('--stock', type=int, default=200, help='Initial stock of the benchmark product')
+        parser.add_argument('--quantity', type=int, default=1, help='Quantity bought per order')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark product and orders')
+
+    def handle(self, *args, **options):
+        Product = apps.get_model('store', 'Product')
+        Order = apps.get_model('store', 'Order')
+        OrderItem = apps.get_model('store', 'OrderItem')
+
+        workers = options['workers']
+        initial_stock = options['stock']
+        quantity = options['quantity']
+
+        product = Product.objects.create(
+            name='Checkout benchmark product',
+            price=Decimal('10.00'),
+            stock_quantity=initial_stock
+        )
+        self.stdout.write(
+            f'Benchmarking {workers} workers buying {quantity} unit(s) per order from a stock of {initial_stock}'
+        )
+
+        lock = threading.Lock()
+        stats = {'orders': 0, 'rejected': 0, 'retries': 0, 'errors': 0}
+        order_ids = []
+
+        def worker():
+            try:
+                while True:
+                    line = {'product': Product.objects.get(pk=product.pk), 'quantity': quantity}
+                    try:
+                        order = OrderService.place_order(
+                            None,
+                            [line],
+                            total_amount=product.price * quantity,
+                            shipping_address='benchmark',
+                            phone_number='0000000000',
+                            status='pending'
+                        )
+                    except InsufficientStockError:
+                        with lock:
+                            stats['rejected'] += 1
+                        return
+                    except OperationalError:
+                        # Database busy (e.g. SQLite write lock): retry the checkout
+                        with lock:
+                            stats['retries'] += 1
+                        time.sleep(0.005)
+                        continue
+                    except Exception:
+                        with lock:
+                            stats['errors'] += 1
+                        return
+                    with lock:
+                        stats['orders'] += 1
+                        order_ids.append(order.pk)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        start_time = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start_time
+
+        product.refresh_from_db()
+        units_sold = OrderItem.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'] or 0
+        lost_updates = (initial_stock - product.stock_quantity) - units_sold
+        orders_per_second = stats['orders'] / elapsed if elapsed else 0
+
+        self.stdout.write(f"Orders placed: {stats['orders']}")
+        self.stdout.write(f"Oversell rejections: {stats['rejected']}")
+        self.stdout.write(f"Lock retries: {stats['retries']}")
+        self.stdout.write(f"Errors: {stats['errors']}")
+        self.stdout.write(f'Elapsed: {elapsed:.3f}s')
+        self.stdout.write(f'Orders per second: {orders_per_second:.1f}')
+        self.stdout.write(f'Final stock: {product.stock_quantity} (units sold: {units_sold})')
+
+        if lost_updates == 0 and product.stock_quantity >= 0:
+            self.stdout.write(self.style.SUCCESS('Lost updates: 0'))
+        else:
+            self.stdout.write(self.style.ERROR(f'Lost updates: {lost_updates}'))
+
+        if not options['keep']:
+            Order.objects.filter(pk__in=order_ids).delete()
+            product.delete()
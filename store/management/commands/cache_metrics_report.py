@@ -0,0 +1,51 @@
+"""
+Management command to report cache hit rates, payload sizes and recompute times per key prefix
+"""
+
+from django.core.management.base import BaseCommand
+from store.services.cache_metrics_service import cache_metrics_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Report cache hit rates, payload sizes and recompute times per key prefix'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the shared totals after reporting')
+
+    def handle(self, *args, **options):
+        """
+        Handle the command execution
+        """
+        try:
+            cache_metrics_service.flush()
+            report = cache_metrics_service.get_shared_metrics()
+            if not report:
+                self.stdout.write('No cache metrics recorded yet')
+            else:
+                self.stdout.write(
+                    f"{'prefix':<32} {'hits':>8} {'stale':>7} {'misses':>8} {'hit rate':>9} "
+                    f"{'sets':>7} {'avg size':>10} {'p95 size':>10} {'avg ms':>9} {'p95 ms':>8}"
+                )
+                for prefix, metrics in report.items():
+                    self.stdout.write(
+                        f"{prefix:<32} {metrics['hits']:>8} {metrics['stale_hits']:>7} {metrics['misses']:>8} "
+                        f"{metrics['hit_rate']:>9.1%} {metrics['sets']:>7} {metrics['avg_size']:>10.0f} "
+                        f"{self.format_bound(metrics['p95_size']):>10} {metrics['avg_compute_ms']:>9.1f} "
+                        f"{self.format_bound(metrics['p95_compute_ms']):>8}"
+                    )
+
+            if options['reset']:
+                cache_metrics_service.reset(shared=True)
+                self.stdout.write(self.style.SUCCESS('Cache metrics reset'))
+        except Exception as e:
+            logger.error(f"Error reporting cache metrics: {str(e)}")
+            self.stdout.write(
+                self.style.ERROR(f'Error reporting cache metrics: {str(e)}')
+            )
+
+    @staticmethod
+    def format_bound(bound):
+        """Format a histogram bucket bound; None is past the largest one"""
+        return 'more' if bound is None else f'<={bound}'
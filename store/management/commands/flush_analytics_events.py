@@ -0,0 +1,32 @@
+"""
+Management command to write spilled analytics events to the database
+"""
+
+from django.core.management.base import BaseCommand
+from store.services.event_ingestion_service import event_ingestion_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Write analytics events spilled to disk while the database was slow or unavailable'
+
+    def handle(self, *args, **options):
+        """
+        Handle the command execution
+        """
+        try:
+            files = event_ingestion_service.get_spill_files()
+            if not files:
+                self.stdout.write('No spilled analytics events')
+                return
+            written = event_ingestion_service.replay_spill()
+            self.stdout.write(self.style.SUCCESS(f'Wrote {written} spilled analytics events from {len(files)} files'))
+            remaining = event_ingestion_service.get_spill_files()
+            if remaining:
+                self.stdout.write(self.style.WARNING(f'{len(remaining)} spill files could not be written yet'))
+        except Exception as e:
+            logger.error(f"Error writing spilled analytics events: {str(e)}")
+            self.stdout.write(
+                self.style.ERROR(f'Error writing spilled analytics events: {str(e)}')
+            )
@@ -0,0 +1,37 @@
+"""
+Management command to recompute the hourly and daily analytics rollups from raw rows
+"""
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from store.services.cardinality_service import cardinality_service
+from store.services.rollup_service import rollup_service
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Backfill the order, sales and event rollups and unique-count sketches, or correct recent days after changes made without signals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Only rebuild this many recent days (default: everything)')
+
+    def handle(self, *args, **options):
+        """
+        Handle the command execution
+        """
+        since = timezone.now() - timedelta(days=options['days']) if options['days'] else None
+        self.stdout.write('Rebuilding analytics rollups...')
+        start_time = time.perf_counter()
+        try:
+            written = rollup_service.rebuild(since)
+            written.update(cardinality_service.rebuild(since))
+        except Exception as e:
+            logger.error(f"Error rebuilding analytics rollups: {str(e)}")
+            self.stdout.write(self.style.ERROR(f'Error rebuilding analytics rollups: {str(e)}'))
+            return
+        elapsed = time.perf_counter() - start_time
+        summary = ', '.join(f'{count} {name}' for name, count in written.items())
+        self.stdout.write(self.style.SUCCESS(f'Wrote {summary} rows in {elapsed:.2f}s'))
@@ -0,0 +1,31 @@
+"""
+Management command to recompute product popularity counters from order history
+"""
+
+from django.core.management.base import BaseCommand
+from store.services.popularity_service import popularity_service
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Recompute units sold, order counts and trending scores for every product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows read and written per batch')
+
+    def handle(self, *args, **options):
+        """
+        Handle the command execution
+        """
+        self.stdout.write('Rebuilding popularity counters...')
+        start_time = time.perf_counter()
+        try:
+            count = popularity_service.rebuild(batch_size=options['batch_size'])
+        except Exception as e:
+            logger.error(f"Error rebuilding popularity counters: {str(e)}")
+            self.stdout.write(self.style.ERROR(f'Error rebuilding popularity counters: {str(e)}'))
+            return
+        elapsed = time.perf_counter() - start_time
+        self.stdout.write(self.style.SUCCESS(f'Updated {count} products in {elapsed:.2f}s'))
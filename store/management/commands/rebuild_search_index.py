@@ -0,0 +1,32 @@
+"""
+Management command to rebuild the product search index
+"""
+
+from django.core.management.base import BaseCommand
+from store.services.search_service import search_service
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text product search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Products loaded per query')
+
+    def handle(self, *args, **options):
+        """
+        Handle the command execution
+        """
+        backend = type(search_service.get_backend()).__name__
+        self.stdout.write(f'Rebuilding search index with {backend}...')
+        start_time = time.perf_counter()
+        try:
+            count = search_service.rebuild_index(batch_size=options['batch_size'])
+        except Exception as e:
+            logger.error(f"Error rebuilding search index: {str(e)}")
+            self.stdout.write(self.style.ERROR(f'Error rebuilding search index: {str(e)}'))
+            return
+        elapsed = time.perf_counter() - start_time
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} products in {elapsed:.2f}s'))
@@ -0,0 +1,38 @@
+"""
+Management command to release expired checkout stock reservations
+"""
+
+from django.core.management.base import BaseCommand
+from store.services.reservation_service import reservation_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Release expired checkout stock reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Maximum holds released per batch')
+        parser.add_argument('--resync', action='store_true', help='Rebuild hold counters from the reservation ledger')
+
+    def handle(self, *args, **options):
+        """
+        Handle the command execution
+        """
+        try:
+            total = 0
+            while True:
+                released = reservation_service.sweep_expired(batch_size=options['batch_size'])
+                total += released
+                if released < options['batch_size']:
+                    break
+            self.stdout.write(self.style.SUCCESS(f'Released {total} expired reservations'))
+
+            if options['resync']:
+                count = reservation_service.resync_counters()
+                self.stdout.write(self.style.SUCCESS(f'Resynced {count} hold counters'))
+        except Exception as e:
+            logger.error(f"Error sweeping reservations: {str(e)}")
+            self.stdout.write(
+                self.style.ERROR(f'Error sweeping reservations: {str(e)}')
+            )
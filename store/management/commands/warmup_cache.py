@@ -4,12 +4,20 @@ Management command to warm up the application cache
 
 from django.core.management.base import BaseCommand
 from store.services.cache_service import cache_service
+from store.services.warmup_service import warmup_service
 import logging
 
 logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
-    help = 'Warm up the application cache with frequently accessed data'
+    help = 'Warm up the application cache with frequently accessed data and the busiest recent pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=warmup_service.DEFAULT_LIMIT, help='Number of busiest pages to replay')
+        parser.add_argument('--workers', type=int, default=None, help='Pages replayed concurrently')
+        parser.add_argument('--window-days', type=int, default=None, help='Only replay pages visited within this many days')
+        parser.add_argument('--skip-pages', action='store_true', help='Only warm the global statistics')
+        parser.add_argument('--prune', action='store_true', help='Forget pages not visited within the window')
 
     def handle(self, *args, **options):
         """
@@ -34,6 +42,9 @@ class Command(BaseCommand):
                         self.style.ERROR(f'Failed to warm up {key}')
                     )
             
+            if not options['skip_pages']:
+                self.warm_pages(options)
+            
             self.stdout.write(
                 self.style.SUCCESS('Cache warming process completed successfully!')
             )
@@ -42,4 +53,20 @@ class Command(BaseCommand):
             logger.error(f"Error during cache warming: {str(e)}")
             self.stdout.write(
                 self.style.ERROR(f'Cache warming failed: {str(e)}')
-            )
\ No newline at end of file
+            )
+
+    def warm_pages(self, options):
+        """Replay the busiest recent pages and report coverage"""
+        if options['prune']:
+            pruned = warmup_service.prune(options['window_days'])
+            self.stdout.write(f'Forgot {pruned} pages not visited recently')
+
+        report = warmup_service.replay(options['limit'], options['workers'], options['window_days'])
+        for path, error in report['failures']:
+            self.stdout.write(self.style.WARNING(f'Failed to warm {path}: {error}'))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Warmed {report['warmed']} of {report['targets']} pages in {report['elapsed']:.2f}s "
+                f"covering {report['coverage']:.1%} of recent visits"
+            )
+        )
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0021_alter_externalinventory_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(max_length=40, verbose_name='مفتاح الجلسة')),
+                ('quantity', models.PositiveIntegerField(verbose_name='الكمية المحجوزة')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='تاريخ انتهاء الحجز')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='store.product', verbose_name='المنتج')),
+            ],
+            options={
+                'verbose_name': 'حجز مخزون',
+                'verbose_name_plural': 'حجوزات المخزون',
+                'unique_together': {('session_key', 'product')},
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:13
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_search_vector_index(apps, schema_editor):
+    # The tsvector GIN index only exists on PostgreSQL
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS store_productsearchdocument_vector_gin '
+            'ON store_productsearchdocument USING gin (search_vector)'
+        )
+
+
+def drop_search_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS store_productsearchdocument_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0023_cartline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='store.product', verbose_name='المنتج')),
+                ('length', models.PositiveIntegerField(default=0, verbose_name='طول المستند')),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+            ],
+            options={
+                'verbose_name': 'مستند البحث',
+                'verbose_name_plural': 'مستندات البحث',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100, verbose_name='المصطلح')),
+                ('frequency', models.PositiveIntegerField(verbose_name='التكرار')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='store.product', verbose_name='المنتج')),
+            ],
+            options={
+                'verbose_name': 'مصطلح البحث',
+                'verbose_name_plural': 'مصطلحات البحث',
+                'unique_together': {('term', 'product')},
+            },
+        ),
+        migrations.RunPython(create_search_vector_index, drop_search_vector_index),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0025_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='order_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='عدد الطلبات'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='trending_score',
+            field=models.FloatField(default=0, verbose_name='مؤشر الرواج'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='units_sold',
+            field=models.PositiveIntegerField(default=0, verbose_name='الوحدات المباعة'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['order_count', 'id'], name='store_produ_order_c_16748b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['trending_score', 'id'], name='store_produ_trendin_14a6b5_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0026_product_popularity_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRatingSummary',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to='store.product', verbose_name='المنتج')),
+                ('review_count', models.PositiveIntegerField(default=0, verbose_name='عدد التقييمات')),
+                ('rating_total', models.PositiveIntegerField(default=0, verbose_name='مجموع التقييمات')),
+                ('average', models.FloatField(db_index=True, default=0, verbose_name='متوسط التقييم')),
+                ('verified_count', models.PositiveIntegerField(default=0, verbose_name='عدد التقييمات المؤكدة')),
+                ('rating_1_count', models.PositiveIntegerField(default=0, verbose_name='تقييمات نجمة واحدة')),
+                ('rating_2_count', models.PositiveIntegerField(default=0, verbose_name='تقييمات نجمتين')),
+                ('rating_3_count', models.PositiveIntegerField(default=0, verbose_name='تقييمات ثلاث نجوم')),
+                ('rating_4_count', models.PositiveIntegerField(default=0, verbose_name='تقييمات أربع نجوم')),
+                ('rating_5_count', models.PositiveIntegerField(default=0, verbose_name='تقييمات خمس نجوم')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+            ],
+            options={
+                'verbose_name': 'ملخص التقييم',
+                'verbose_name_plural': 'ملخصات التقييم',
+            },
+        ),
+    ]
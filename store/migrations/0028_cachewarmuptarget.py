@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('store', '0027_productratingsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheWarmupTarget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, verbose_name='المسار')),
+                ('query', models.CharField(blank=True, default='', max_length=255, verbose_name='معاملات الاستعلام')),
+                ('hits', models.PositiveIntegerField(default=0, verbose_name='عدد الزيارات')),
+                ('last_seen', models.DateTimeField(db_index=True, verbose_name='آخر زيارة')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cache_warmup_targets', to=settings.AUTH_USER_MODEL, verbose_name='المستخدم')),
+            ],
+            options={
+                'verbose_name': 'صفحة تسخين الذاكرة المؤقتة',
+                'verbose_name_plural': 'صفحات تسخين الذاكرة المؤقتة',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cachewarmuptarget',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('path', 'query'), name='unique_anonymous_warmup_target'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='cachewarmuptarget',
+            unique_together={('path', 'query', 'user')},
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:11
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0028_cachewarmuptarget'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analyticsintegration',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='الطابع الزمني'),
+        ),
+    ]
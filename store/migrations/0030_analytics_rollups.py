@@ -0,0 +1,73 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('store', '0029_analytics_event_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'ساعة'), ('day', 'يوم')], max_length=4, verbose_name='الفترة')),
+                ('bucket', models.DateTimeField(verbose_name='بداية الفترة')),
+                ('status', models.CharField(max_length=20, verbose_name='حالة الطلب')),
+                ('category', models.CharField(max_length=20, verbose_name='الفئة')),
+                ('quantity', models.IntegerField(default=0, verbose_name='الكمية')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='الإيرادات')),
+                ('seller', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to=settings.AUTH_USER_MODEL, verbose_name='البائع')),
+            ],
+            options={
+                'verbose_name': 'ملخص المبيعات',
+                'verbose_name_plural': 'ملخصات المبيعات',
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'ساعة'), ('day', 'يوم')], max_length=4, verbose_name='الفترة')),
+                ('bucket', models.DateTimeField(verbose_name='بداية الفترة')),
+                ('status', models.CharField(max_length=20, verbose_name='الحالة')),
+                ('orders', models.IntegerField(default=0, verbose_name='عدد الطلبات')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='الإيرادات')),
+            ],
+            options={
+                'verbose_name': 'ملخص الطلبات',
+                'verbose_name_plural': 'ملخصات الطلبات',
+                'unique_together': {('period', 'bucket', 'status')},
+            },
+        ),
+        migrations.CreateModel(
+            name='EventRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'ساعة'), ('day', 'يوم')], max_length=4, verbose_name='الفترة')),
+                ('bucket', models.DateTimeField(verbose_name='بداية الفترة')),
+                ('event_type', models.CharField(max_length=255, verbose_name='نوع الحدث')),
+                ('category', models.CharField(blank=True, default='', max_length=20, verbose_name='الفئة')),
+                ('events', models.IntegerField(default=0, verbose_name='عدد الأحداث')),
+            ],
+            options={
+                'verbose_name': 'ملخص الأحداث',
+                'verbose_name_plural': 'ملخصات الأحداث',
+                'unique_together': {('period', 'bucket', 'event_type', 'category')},
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('seller__isnull', True)), fields=('period', 'bucket', 'status', 'category'), name='unique_sales_rollup_without_seller'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='salesrollup',
+            unique_together={('period', 'bucket', 'status', 'category', 'seller')},
+        ),
+    ]
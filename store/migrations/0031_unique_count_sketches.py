@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0030_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UniqueCountSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'ساعة'), ('day', 'يوم')], max_length=4, verbose_name='الفترة')),
+                ('bucket', models.DateTimeField(verbose_name='بداية الفترة')),
+                ('metric', models.CharField(max_length=30, verbose_name='المقياس')),
+                ('key', models.CharField(blank=True, default='', max_length=30, verbose_name='المفتاح')),
+                ('sketch', models.BinaryField(verbose_name='المخطط')),
+            ],
+            options={
+                'verbose_name': 'مخطط العد الفريد',
+                'verbose_name_plural': 'مخططات العد الفريد',
+                'unique_together': {('period', 'bucket', 'metric', 'key')},
+            },
+        ),
+    ]
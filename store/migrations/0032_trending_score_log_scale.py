@@ -0,0 +1,34 @@
+import math
+
+from django.db import migrations
+
+
+def to_log_scale(apps, schema_editor):
+    # Trending scores are now stored as log2 of the forward-decayed sales
+    Product = apps.get_model('store', 'Product')
+    products = list(Product.objects.filter(trending_score__gt=0).only('id', 'trending_score'))
+    for product in products:
+        product.trending_score = math.log2(product.trending_score)
+    Product.objects.bulk_update(products, ['trending_score'], batch_size=500)
+
+
+def from_log_scale(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    products = list(Product.objects.filter(trending_score__gt=0).only('id', 'trending_score'))
+    for product in products:
+        try:
+            product.trending_score = math.pow(2.0, product.trending_score)
+        except OverflowError:
+            product.trending_score = 0
+    Product.objects.bulk_update(products, ['trending_score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0031_unique_count_sketches'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_log_scale, from_log_scale),
+    ]
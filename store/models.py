@@ -1,10 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
 from decimal import Decimal
 from typing import Any
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.db.models import BooleanField
+from django.utils import timezone
 from django.utils.text import slugify
 import uuid
 
@@ -253,6 +255,23 @@ class Product(models.Model):
     seo_description_en = models.CharField(max_length=160, blank=True, null=True, verbose_name="SEO Description (English)")
     seo_keywords_en = models.CharField(max_length=255, blank=True, null=True, verbose_name="SEO Keywords (English)")
 
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')
+
+    # Sales counters maintained by PopularityService
+    units_sold = models.PositiveIntegerField(default=0, verbose_name='الوحدات المباعة')
+    order_count = models.PositiveIntegerField(default=0, verbose_name='عدد الطلبات')
+    trending_score = models.FloatField(default=0, verbose_name='مؤشر الرواج')
+
+    class Meta:
+        indexes = [
+            # Keyset pagination seeks on (sort key, id)
+            models.Index(fields=['price', 'id']),
+            models.Index(fields=['name', 'id']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['order_count', 'id']),
+            models.Index(fields=['trending_score', 'id']),
+        ]
+
     def __str__(self) -> str:
         return str(self.name)
     
@@ -391,6 +410,198 @@ class OrderItem(models.Model):
         return Decimal(str(self.quantity)) * Decimal(str(self.price))
 
 
+class ProductSearchDocument(models.Model):
+    """Search index entry of a product: BM25 document length and Postgres tsvector"""
+    product = models.OneToOneField(Product, related_name='search_document', on_delete=models.CASCADE, primary_key=True, verbose_name='المنتج')
+    length = models.PositiveIntegerField(default=0, verbose_name='طول المستند')
+    # Only populated by the Postgres search backend
+    search_vector = SearchVectorField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')
+
+    class Meta:
+        verbose_name = 'مستند البحث'
+        verbose_name_plural = 'مستندات البحث'
+
+    def __str__(self) -> str:
+        return f"{self.product_id} ({self.length})"
+
+
+class ProductSearchTerm(models.Model):
+    """Inverted index posting: weighted frequency of a normalized term in a product"""
+    term = models.CharField(max_length=100, verbose_name='المصطلح')
+    product = models.ForeignKey(Product, related_name='search_terms', on_delete=models.CASCADE, verbose_name='المنتج')
+    frequency = models.PositiveIntegerField(verbose_name='التكرار')
+
+    class Meta:
+        verbose_name = 'مصطلح البحث'
+        verbose_name_plural = 'مصطلحات البحث'
+        # Leading 'term' column serves posting-list lookups
+        unique_together = ('term', 'product')
+
+    def __str__(self) -> str:
+        return f"{self.term} -> {self.product_id} ({self.frequency})"
+
+
+class CartLine(models.Model):
+    """Server-side cart line of a logged-in shopper"""
+    user = models.ForeignKey(User, related_name='cart_lines', on_delete=models.CASCADE, verbose_name='المستخدم')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name='المنتج')
+    quantity = models.PositiveIntegerField(verbose_name='الكمية')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')
+
+    class Meta:
+        verbose_name = 'عنصر السلة'
+        verbose_name_plural = 'عناصر السلة'
+        unique_together = ('user', 'product')
+
+    def __str__(self) -> str:
+        username = getattr(self.user, 'username', 'Unknown')
+        return f"{username} - {self.quantity} x {self.product_id}"
+
+
+class ProductRatingSummary(models.Model):
+    """Review aggregates of a product, maintained by RatingService on every review change"""
+    product = models.OneToOneField(Product, related_name='rating_summary', on_delete=models.CASCADE, primary_key=True, verbose_name='المنتج')
+    review_count = models.PositiveIntegerField(default=0, verbose_name='عدد التقييمات')
+    rating_total = models.PositiveIntegerField(default=0, verbose_name='مجموع التقييمات')
+    average = models.FloatField(default=0, db_index=True, verbose_name='متوسط التقييم')
+    verified_count = models.PositiveIntegerField(default=0, verbose_name='عدد التقييمات المؤكدة')
+    rating_1_count = models.PositiveIntegerField(default=0, verbose_name='تقييمات نجمة واحدة')
+    rating_2_count = models.PositiveIntegerField(default=0, verbose_name='تقييمات نجمتين')
+    rating_3_count = models.PositiveIntegerField(default=0, verbose_name='تقييمات ثلاث نجوم')
+    rating_4_count = models.PositiveIntegerField(default=0, verbose_name='تقييمات أربع نجوم')
+    rating_5_count = models.PositiveIntegerField(default=0, verbose_name='تقييمات خمس نجوم')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')
+
+    class Meta:
+        verbose_name = 'ملخص التقييم'
+        verbose_name_plural = 'ملخصات التقييم'
+
+    def __str__(self) -> str:
+        return f"{self.product_id}: {self.average:.2f} ({self.review_count})"
+
+    @property
+    def distribution(self) -> dict:
+        return {rating: getattr(self, f'rating_{rating}_count') for rating in range(1, 6)}
+
+
+class StockReservation(models.Model):
+    """Time-limited hold on product stock placed when a shopper enters checkout"""
+    session_key = models.CharField(max_length=40, verbose_name='مفتاح الجلسة')
+    product = models.ForeignKey(Product, related_name='reservations', on_delete=models.CASCADE, verbose_name='المنتج')
+    quantity = models.PositiveIntegerField(verbose_name='الكمية المحجوزة')
+    expires_at = models.DateTimeField(db_index=True, verbose_name='تاريخ انتهاء الحجز')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')
+
+    class Meta:
+        verbose_name = 'حجز مخزون'
+        verbose_name_plural = 'حجوزات المخزون'
+        unique_together = ('session_key', 'product')
+
+    def __str__(self) -> str:
+        return f"{self.quantity} x {self.product_id} ({self.session_key})"
+
+
+class CacheWarmupTarget(models.Model):
+    """A page whose caches are rebuilt after a restart, ranked by recent traffic"""
+    path = models.CharField(max_length=255, verbose_name='المسار')
+    query = models.CharField(max_length=255, blank=True, default='', verbose_name='معاملات الاستعلام')
+    user = models.ForeignKey(User, null=True, blank=True, related_name='cache_warmup_targets', on_delete=models.CASCADE, verbose_name='المستخدم')
+    hits = models.PositiveIntegerField(default=0, verbose_name='عدد الزيارات')
+    last_seen = models.DateTimeField(db_index=True, verbose_name='آخر زيارة')
+
+    class Meta:
+        verbose_name = 'صفحة تسخين الذاكرة المؤقتة'
+        verbose_name_plural = 'صفحات تسخين الذاكرة المؤقتة'
+        unique_together = ('path', 'query', 'user')
+        constraints = [
+            # NULLs never clash in unique_together, so anonymous pages need their own constraint
+            models.UniqueConstraint(fields=['path', 'query'], condition=models.Q(user__isnull=True), name='unique_anonymous_warmup_target'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.path}?{self.query} ({self.hits})"
+
+
+ROLLUP_PERIOD_CHOICES = [
+    ('hour', 'ساعة'),
+    ('day', 'يوم'),
+]
+
+
+class OrderRollup(models.Model):
+    """Orders and revenue per hour or day and status, maintained by RollupService on every order change"""
+    period = models.CharField(max_length=4, choices=ROLLUP_PERIOD_CHOICES, verbose_name='الفترة')
+    bucket = models.DateTimeField(verbose_name='بداية الفترة')
+    status = models.CharField(max_length=20, verbose_name='الحالة')
+    orders = models.IntegerField(default=0, verbose_name='عدد الطلبات')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='الإيرادات')
+
+    class Meta:
+        verbose_name = 'ملخص الطلبات'
+        verbose_name_plural = 'ملخصات الطلبات'
+        unique_together = ('period', 'bucket', 'status')
+
+    def __str__(self) -> str:
+        return f"{self.period} {self.bucket:%Y-%m-%d %H:%M} {self.status}: {self.orders}"
+
+
+class SalesRollup(models.Model):
+    """Units and revenue of order items per hour or day, order status, category and seller"""
+    period = models.CharField(max_length=4, choices=ROLLUP_PERIOD_CHOICES, verbose_name='الفترة')
+    bucket = models.DateTimeField(verbose_name='بداية الفترة')
+    status = models.CharField(max_length=20, verbose_name='حالة الطلب')
+    category = models.CharField(max_length=20, verbose_name='الفئة')
+    seller = models.ForeignKey(User, null=True, blank=True, related_name='sales_rollups', on_delete=models.CASCADE, verbose_name='البائع')
+    quantity = models.IntegerField(default=0, verbose_name='الكمية')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='الإيرادات')
+
+    class Meta:
+        verbose_name = 'ملخص المبيعات'
+        verbose_name_plural = 'ملخصات المبيعات'
+        unique_together = ('period', 'bucket', 'status', 'category', 'seller')
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'bucket', 'status', 'category'], condition=models.Q(seller__isnull=True), name='unique_sales_rollup_without_seller'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.period} {self.bucket:%Y-%m-%d %H:%M} {self.category}: {self.quantity}"
+
+
+class EventRollup(models.Model):
+    """Analytics events per hour or day, event type and product category ('' for events without a product)"""
+    period = models.CharField(max_length=4, choices=ROLLUP_PERIOD_CHOICES, verbose_name='الفترة')
+    bucket = models.DateTimeField(verbose_name='بداية الفترة')
+    event_type = models.CharField(max_length=255, verbose_name='نوع الحدث')
+    category = models.CharField(max_length=20, blank=True, default='', verbose_name='الفئة')
+    events = models.IntegerField(default=0, verbose_name='عدد الأحداث')
+
+    class Meta:
+        verbose_name = 'ملخص الأحداث'
+        verbose_name_plural = 'ملخصات الأحداث'
+        unique_together = ('period', 'bucket', 'event_type', 'category')
+
+    def __str__(self) -> str:
+        return f"{self.period} {self.bucket:%Y-%m-%d %H:%M} {self.event_type}: {self.events}"
+
+
+class UniqueCountSketch(models.Model):
+    """HyperLogLog sketch of the distinct users, sessions, visitors or product viewers of an hour or day"""
+    period = models.CharField(max_length=4, choices=ROLLUP_PERIOD_CHOICES, verbose_name='الفترة')
+    bucket = models.DateTimeField(verbose_name='بداية الفترة')
+    metric = models.CharField(max_length=30, verbose_name='المقياس')
+    key = models.CharField(max_length=30, blank=True, default='', verbose_name='المفتاح')
+    sketch = models.BinaryField(verbose_name='المخطط')
+
+    class Meta:
+        verbose_name = 'مخطط العد الفريد'
+        verbose_name_plural = 'مخططات العد الفريد'
+        unique_together = ('period', 'bucket', 'metric', 'key')
+
+    def __str__(self) -> str:
+        return f"{self.period} {self.bucket:%Y-%m-%d %H:%M} {self.metric} {self.key}".rstrip()
+
+
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
         ('order_created', 'تم إنشاء الطلب'),
@@ -2150,7 +2361,8 @@ class AnalyticsIntegration(models.Model):
     referrer = models.URLField(blank=True, null=True, verbose_name='المرجع')
     user_agent = models.TextField(blank=True, null=True, verbose_name='وكيل المستخدم')
     ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name='عنوان IP')
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name='الطابع الزمني')
+    # Buffered events are written in batches, so the time is set when the event happens
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, verbose_name='الطابع الزمني')
     metadata = models.TextField(blank=True, null=True, verbose_name='بيانات إضافية')
     
     class Meta:
@@ -8,7 +8,13 @@ from typing import Dict, Any, List
 from django.conf import settings
 from django.db.models import Count, Sum, Avg, Q
 from datetime import datetime, timedelta
-from store.models import AnalyticsIntegration, Product, Order, OrderItem, User
+from decimal import Decimal
+from django.utils import timezone
+from store.models import AnalyticsIntegration, Product, Order, OrderItem, User, UserProfile
+from store.services.cache_service import cache_service
+from store.services.cardinality_service import CardinalityService
+from store.services.realtime_metrics_service import RealtimeMetricsService
+from store.services.rollup_service import RollupService
 
 logger = logging.getLogger(__name__)
 
@@ -50,10 +56,11 @@ class AnalyticsService:
                 view_count=Count('analyticsintegration')
             ).filter(view_count__gt=0).order_by('-view_count')[:10]
             
-            # Get user engagement data
-            active_users = User.objects.filter(
-                analyticsintegration__timestamp__gte=thirty_days_ago
-            ).distinct().count()
+            # Distinct users and visitors from the hourly and daily sketches
+            active_users = CardinalityService.count('users', start=thirty_days_ago)
+            unique_visitors = CardinalityService.count('visitors', start=thirty_days_ago)
+            top_products = list(top_products)
+            unique_viewers = CardinalityService.count_by_key('product_viewers', [product.id for product in top_products])
             
             return {
                 'success': True,
@@ -70,10 +77,12 @@ class AnalyticsService:
                         {
                             'id': product.id,
                             'name': product.name,
-                            'view_count': product.view_count
+                            'view_count': product.view_count,
+                            'unique_viewers': unique_viewers[str(product.id)]
                         } for product in top_products
                     ],
-                    'active_users': active_users
+                    'active_users': active_users,
+                    'unique_visitors': unique_visitors
                 }
             }
             
@@ -92,21 +101,15 @@ class AnalyticsService:
             Dictionary with sales analytics data
         """
         try:
-            # Get sales data by category
+            # Get sales data by category from the daily rollups
+            rollup_sales = RollupService.get_category_sales(status='delivered')
             category_sales = {}
-            for category, _ in Product.CATEGORY_CHOICES:
-                category_orders = OrderItem.objects.filter(
-                    product__category=category,
-                    order__status='delivered'
-                )
-                
-                quantity = category_orders.aggregate(total=Sum('quantity'))['total'] or 0
-                amount = category_orders.aggregate(total=Sum('price'))['total'] or 0
-                
+            for category, display_name in Product.CATEGORY_CHOICES:
+                sales = rollup_sales.get(category, {'quantity': 0, 'amount': 0})
                 category_sales[category] = {
-                    'quantity': quantity,
-                    'amount': float(amount),
-                    'display_name': dict(Product.CATEGORY_CHOICES)[category]
+                    'quantity': sales['quantity'],
+                    'amount': float(sales['amount']),
+                    'display_name': display_name
                 }
             
             # Get top selling products
@@ -118,30 +121,27 @@ class AnalyticsService:
             ).order_by('-quantity')[:10]
             
             # Get order status distribution
-            order_status_data = Order.objects.values('status').annotate(
-                count=Count('id')
-            ).order_by('status')
+            order_status_data = [
+                {'status': status, 'count': totals['orders']}
+                for status, totals in RollupService.get_order_totals().items()
+                if totals['orders']
+            ]
             
-            # Get sales trends (monthly)
-            monthly_sales = []
+            # Get sales trends (monthly), newest first, from one read of the daily rollups
+            month_starts = []
+            month_start = timezone.localtime().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
             for i in range(12):
-                month_start = datetime.now().replace(day=1) - timedelta(days=30*i)
-                month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-                
-                month_orders = Order.objects.filter(
-                    created_at__gte=month_start,
-                    created_at__lte=month_end,
-                    status='delivered'
-                )
-                
-                monthly_total = month_orders.aggregate(
-                    total=Sum('total_amount')
-                )['total'] or 0
-                
-                monthly_sales.append({
-                    'month': month_start.strftime('%Y-%m'),
-                    'total': float(monthly_total)
-                })
+                month_starts.append(month_start)
+                month_start = (month_start - timedelta(days=1)).replace(day=1)
+            monthly_totals = dict.fromkeys((start.strftime('%Y-%m') for start in month_starts), 0)
+            for day, revenue in RollupService.get_daily_revenue(month_starts[-1]).items():
+                month = day.strftime('%Y-%m')
+                if month in monthly_totals:
+                    monthly_totals[month] += revenue
+            monthly_sales = [
+                {'month': month, 'total': float(total)}
+                for month, total in monthly_totals.items()
+            ]
             
             # Reverse to show oldest first
             monthly_sales.reverse()
@@ -178,8 +178,8 @@ class AnalyticsService:
             
             # Get user engagement by role
             user_engagement = {}
-            for role, _ in User.objects.filter(userprofile__isnull=False).values_list(
-                'userprofile__role'
+            for role in User.objects.filter(userprofile__isnull=False).values_list(
+                'userprofile__role', flat=True
             ).distinct():
                 role_users = User.objects.filter(userprofile__role=role)
                 engaged_users = role_users.filter(
@@ -215,6 +215,18 @@ class AnalyticsService:
             # Reverse to show oldest first
             user_acquisition.reverse()
             
+            # Unique visitors per day and for this month, merged from sketches
+            now = timezone.now()
+            daily_visitors = CardinalityService.get_daily_counts('visitors', now - timedelta(days=29))
+            unique_visitors = {
+                'daily': [
+                    {'date': day.date().isoformat(), 'visitors': count} for day, count in daily_visitors.items()
+                ],
+                'last_30_days': CardinalityService.count('visitors', start=now - timedelta(days=30)),
+                'this_month': CardinalityService.get_monthly_count('visitors', now),
+                'sessions_this_month': CardinalityService.get_monthly_count('sessions', now),
+            }
+            
             return {
                 'success': True,
                 'data': {
@@ -224,7 +236,8 @@ class AnalyticsService:
                         'managers': managers_count
                     },
                     'user_engagement': user_engagement,
-                    'user_acquisition': user_acquisition
+                    'user_acquisition': user_acquisition,
+                    'unique_visitors': unique_visitors
                 }
             }
             
@@ -296,10 +309,9 @@ class AnalyticsService:
                 if len(top_products) >= 5:
                     # Identify slow-moving products (assuming we have inventory data)
                     slow_products = Product.objects.filter(
-                        stock_quantity__gt=50
-                    ).annotate(
-                        order_count=Count('orderitem')
-                    ).filter(order_count=0)[:5]
+                        stock_quantity__gt=50,
+                        order_count=0
+                    )[:5]
                     
                     if slow_products:
                         insights.append({
@@ -336,38 +348,15 @@ class AnalyticsService:
             Dictionary with real-time dashboard data
         """
         try:
-            # Get real-time data for the last hour
-            one_hour_ago = datetime.now() - timedelta(hours=1)
-            
-            # Active users in the last hour
-            active_users = User.objects.filter(
-                analyticsintegration__timestamp__gte=one_hour_ago
-            ).distinct().count()
+            # Active users in the last hour, from the live counters
+            active_users = RealtimeMetricsService.get_distinct_counts(['users'], {'1hr': 3600})['users']['1hr']
             
-            # Recent orders
-            recent_orders = Order.objects.filter(
-                created_at__gte=one_hour_ago
-            ).count()
-            
-            # Recent page views
-            recent_page_views = AnalyticsIntegration.objects.filter(
-                timestamp__gte=one_hour_ago,
-                event_type='page_view'
-            ).count()
-            
-            # Conversion events
-            recent_conversions = AnalyticsIntegration.objects.filter(
-                timestamp__gte=one_hour_ago,
-                event_type='purchase'
-            ).count()
-            
-            # Sales in the last hour
-            recent_sales = Order.objects.filter(
-                created_at__gte=one_hour_ago,
-                status='delivered'
-            ).aggregate(
-                total=Sum('total_amount')
-            )['total'] or 0
+            # Orders, page views, conversions and sales in the last hour from the hourly rollups
+            recent = RollupService.get_recent_totals(timedelta(hours=1))
+            recent_orders = round(sum(recent['orders'].values()))
+            recent_page_views = round(recent['events']['page_view'])
+            recent_conversions = round(recent['events']['purchase'])
+            recent_sales = recent['revenue']['delivered']
             
             return {
                 'success': True,
@@ -396,74 +385,39 @@ class AnalyticsService:
             Dictionary with advanced real-time dashboard data
         """
         try:
-            # Get real-time data for the last 15 minutes (more granular)
-            fifteen_minutes_ago = datetime.now() - timedelta(minutes=15)
-            one_hour_ago = datetime.now() - timedelta(hours=1)
-            
-            # Active users in the last 15 minutes and last hour
-            active_users_15min = User.objects.filter(
-                analyticsintegration__timestamp__gte=fifteen_minutes_ago
-            ).distinct().count()
-            
-            active_users_1hr = User.objects.filter(
-                analyticsintegration__timestamp__gte=one_hour_ago
-            ).distinct().count()
-            
-            # Recent orders (last 15 minutes and last hour)
-            recent_orders_15min = Order.objects.filter(
-                created_at__gte=fifteen_minutes_ago
-            ).count()
-            
-            recent_orders_1hr = Order.objects.filter(
-                created_at__gte=one_hour_ago
-            ).count()
-            
-            # Page views trend (last 15 minutes vs last hour)
-            page_views_15min = AnalyticsIntegration.objects.filter(
-                timestamp__gte=fifteen_minutes_ago,
-                event_type='page_view'
-            ).count()
-            
-            page_views_1hr = AnalyticsIntegration.objects.filter(
-                timestamp__gte=one_hour_ago,
-                event_type='page_view'
-            ).count()
-            
-            # Conversion rate calculation
-            conversions_15min = AnalyticsIntegration.objects.filter(
-                timestamp__gte=fifteen_minutes_ago,
-                event_type='purchase'
-            ).count()
-            
-            conversions_1hr = AnalyticsIntegration.objects.filter(
-                timestamp__gte=one_hour_ago,
-                event_type='purchase'
-            ).count()
-            
-            # Sales data
-            recent_sales_15min = Order.objects.filter(
-                created_at__gte=fifteen_minutes_ago,
-                status='delivered'
-            ).aggregate(
-                total=Sum('total_amount')
-            )['total'] or 0
-            
-            recent_sales_1hr = Order.objects.filter(
-                created_at__gte=one_hour_ago,
-                status='delivered'
-            ).aggregate(
-                total=Sum('total_amount')
-            )['total'] or 0
-            
-            # Top performing products in real-time
-            top_products = OrderItem.objects.filter(
-                order__created_at__gte=one_hour_ago
-            ).values(
-                'product_id', 'product__name'
-            ).annotate(
-                quantity=Sum('quantity'),
-                revenue=Sum('price')
-            ).order_by('-revenue')[:5]
+            # Live counters are kept in ring buffers updated on write, so
+            # polling this never counts rows
+            totals = RealtimeMetricsService.get_totals(
+                ['events', 'events:page_view', 'events:purchase', 'orders', 'revenue']
+            )
+            active = RealtimeMetricsService.get_distinct_counts(['users', 'sessions'])
+            
+            active_users_15min = active['users']['15min']
+            active_users_1hr = active['users']['1hr']
+            recent_orders_15min = totals['orders']['15min']
+            recent_orders_1hr = totals['orders']['1hr']
+            page_views_15min = totals['events:page_view']['15min']
+            page_views_1hr = totals['events:page_view']['1hr']
+            conversions_15min = totals['events:purchase']['15min']
+            conversions_1hr = totals['events:purchase']['1hr']
+            # Revenue of orders delivered in the window, counted in cents
+            recent_sales_15min = Decimal(totals['revenue']['15min']) / 100
+            recent_sales_1hr = Decimal(totals['revenue']['1hr']) / 100
+            
+            # Top performing products change slowly; recount them once a minute
+            def get_top_products():
+                one_hour_ago = timezone.now() - timedelta(hours=1)
+                return list(OrderItem.objects.filter(
+                    order__created_at__gte=one_hour_ago
+                ).values(
+                    'product_id', 'product__name'
+                ).annotate(
+                    quantity=Sum('quantity'),
+                    revenue=Sum('price')
+                ).order_by('-revenue')[:5])
+            top_products = cache_service.get_or_set(
+                'realtime_top_products', get_top_products, RealtimeMetricsService.TOP_PRODUCTS_TIMEOUT
+            )
             
             # Geographic distribution (simulated)
             geographic_data = [
@@ -511,7 +465,14 @@ class AnalyticsService:
                         'sales_1hr': float(recent_sales_1hr),
                         'trend': 'up' if recent_sales_15min > recent_sales_1hr/4 else 'down'
                     },
-                    'top_products': list(top_products),
+                    'live': {
+                        'events_1min': totals['events']['1min'],
+                        'page_views_1min': totals['events:page_view']['1min'],
+                        'orders_1min': totals['orders']['1min'],
+                        'active_sessions_15min': active['sessions']['15min'],
+                        'active_sessions_1hr': active['sessions']['1hr'],
+                    },
+                    'top_products': top_products,
                     'geographic_distribution': geographic_data,
                     'device_distribution': device_data,
                     'last_updated': datetime.now().isoformat()
@@ -0,0 +1,293 @@
+"""
+Autocomplete Service Module
+In-memory prefix index for bilingual search-box suggestions
+"""
+
+import bisect
+import heapq
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from .search_service import normalize_text, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Product fields whose words can complete a query
+INDEXED_FIELDS = ('name', 'name_en', 'seo_keywords')
+
+# Sorts after every character a normalized term can contain
+PREFIX_END = '\U0010ffff'
+
+
+class PrefixIndex:
+    """
+    Sorted array of (term, product_id) pairs searched with bisect
+
+    A prefix maps to one contiguous slice of the array, so a lookup costs
+    O(log n) plus the matches it returns and never touches the database.
+    """
+
+    def __init__(self, version: Optional[int] = None):
+        self.keys: List[Tuple[str, int]] = []
+        self.products: Dict[int, Dict[str, Any]] = {}
+        self.version = version
+        self.built_at = time.monotonic()
+        self.checked_at = self.built_at
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def analyze(row: Dict[str, Any]) -> Tuple[set, Tuple[str, ...]]:
+        """Get the terms of a product and its normalized names for phrase matching"""
+        terms = set()
+        for field in INDEXED_FIELDS:
+            terms.update(tokenize(row.get(field)))
+        names = tuple(normalize_text(row.get(field)) for field in ('name', 'name_en') if row.get(field))
+        return terms, names
+
+    def load(self, rows) -> None:
+        """Fill an empty index from product rows, sorting once"""
+        keys = []
+        for row in rows:
+            terms, names = self.analyze(row)
+            self.products[row['id']] = dict(row, terms=terms, names=names)
+            keys.extend((term, row['id']) for term in terms)
+        keys.sort()
+        self.keys = keys
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """Add or refresh one product"""
+        with self.lock:
+            self.remove(row['id'])
+            terms, names = self.analyze(row)
+            self.products[row['id']] = dict(row, terms=terms, names=names)
+            for term in terms:
+                bisect.insort(self.keys, (term, row['id']))
+
+    def remove(self, product_id: int) -> None:
+        """Drop one product"""
+        with self.lock:
+            entry = self.products.pop(product_id, None)
+            if entry is None:
+                return
+            for term in entry['terms']:
+                position = bisect.bisect_left(self.keys, (term, product_id))
+                if position < len(self.keys) and self.keys[position] == (term, product_id):
+                    del self.keys[position]
+
+    def match_prefix(self, prefix: str) -> set:
+        """Get the ids of products with a term starting with ``prefix``"""
+        start = bisect.bisect_left(self.keys, (prefix,))
+        end = bisect.bisect_left(self.keys, (prefix + PREFIX_END,), start)
+        return {product_id for _, product_id in self.keys[start:end]}
+
+    def complete(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        Get the best products for a partially typed query
+
+        Every query word must start a word of the product. Products whose
+        name starts with the whole query come first, then the best sellers.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        phrase = normalize_text(query).strip()
+        with self.lock:
+            # Narrow with the longest (most selective) prefix first
+            matches = None
+            for term in sorted(set(terms), key=len, reverse=True):
+                term_matches = self.match_prefix(term)
+                matches = term_matches if matches is None else matches & term_matches
+                if not matches:
+                    return []
+            entries = [self.products[product_id] for product_id in matches]
+
+        best = heapq.nsmallest(limit, entries, key=lambda entry: (
+            not any(name.startswith(phrase) for name in entry['names']),
+            -entry['order_count'],
+            len(entry['name'] or ''),
+            entry['id'],
+        ))
+        return [
+            {'id': entry['id'], 'name': entry['name'], 'name_en': entry['name_en'] or ''}
+            for entry in best
+        ]
+
+
+class AutocompleteService:
+    """Service class for search-box suggestions"""
+
+    DEFAULT_LIMIT = 8
+    MAX_LIMIT = 20
+
+    # Shared across processes; bumped whenever indexed product text changes
+    VERSION_KEY = 'autocomplete_version'
+
+    # Each bump logs the changed product under its version, so other processes
+    # apply the products that changed instead of reloading every product
+    CHANGE_KEY_PREFIX = 'autocomplete_change'
+    CHANGE_LOG_TIMEOUT = 60 * 60
+    # Further behind than this, a process reloads rather than replays
+    MAX_REPLAYED_CHANGES = 500
+
+    # How often a process checks the shared version, and how old an index may
+    # get before it is reloaded to pick up new sales counters
+    DEFAULT_REFRESH_SECONDS = 30
+    DEFAULT_MAX_AGE_SECONDS = 60 * 15
+
+    _index: Optional[PrefixIndex] = None
+    _build_lock = threading.Lock()
+
+    @staticmethod
+    def get_product_rows(queryset) -> List[Dict[str, Any]]:
+        return list(queryset.values('id', 'order_count', *INDEXED_FIELDS))
+
+    @staticmethod
+    def get_version() -> int:
+        try:
+            version = cache.get(AutocompleteService.VERSION_KEY)
+            if version is None:
+                # Restarting from the time keeps an evicted counter from reusing versions
+                initial = time.time_ns() // 1000
+                cache.add(AutocompleteService.VERSION_KEY, initial, None)
+                version = cache.get(AutocompleteService.VERSION_KEY, initial)
+            return version
+        except Exception as e:
+            logger.warning(f"Error reading autocomplete version: {str(e)}")
+            return 0
+
+    @staticmethod
+    def get_change_key(version: int) -> str:
+        return f"{AutocompleteService.CHANGE_KEY_PREFIX}:{version}"
+
+    @staticmethod
+    def apply_products(index: PrefixIndex, product_ids) -> None:
+        """Refresh products in an index from the database, dropping deleted ones"""
+        Product = apps.get_model('store', 'Product')
+        product_ids = set(product_ids)
+        rows = AutocompleteService.get_product_rows(Product.objects.filter(pk__in=product_ids)) if product_ids else []
+        with index.lock:
+            for row in rows:
+                index.add(row)
+            for product_id in product_ids - {row['id'] for row in rows}:
+                index.remove(product_id)
+
+    @staticmethod
+    def catch_up(index: PrefixIndex, version: int) -> bool:
+        """
+        Apply the product changes logged between the index's version and ``version``
+
+        Returns:
+            False if a change is missing from the log and the index must be rebuilt
+        """
+        if index.version is None or not 0 < version - index.version <= AutocompleteService.MAX_REPLAYED_CHANGES:
+            return False
+        keys = [AutocompleteService.get_change_key(number) for number in range(index.version + 1, version + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            return False
+        AutocompleteService.apply_products(index, changes.values())
+        index.version = version
+        return True
+
+    @staticmethod
+    def build_index() -> PrefixIndex:
+        """
+        Load every product into a new prefix index
+
+        Returns:
+            The new index, which also replaces the process-wide one
+        """
+        Product = apps.get_model('store', 'Product')
+        index = PrefixIndex(version=AutocompleteService.get_version())
+        index.load(AutocompleteService.get_product_rows(Product.objects.all()))
+        AutocompleteService._index = index
+        logger.info(f"Built autocomplete index with {len(index.products)} products")
+        return index
+
+    @staticmethod
+    def get_index() -> PrefixIndex:
+        """Get the process-wide index, applying the products other processes changed"""
+        index = AutocompleteService._index
+        now = time.monotonic()
+        refresh = getattr(settings, 'STORE_AUTOCOMPLETE_REFRESH_SECONDS', AutocompleteService.DEFAULT_REFRESH_SECONDS)
+        if index is not None and now - index.checked_at < refresh:
+            return index
+
+        with AutocompleteService._build_lock:
+            # Another thread may have rebuilt it while we waited
+            if AutocompleteService._index is not index:
+                return AutocompleteService._index
+            max_age = getattr(settings, 'STORE_AUTOCOMPLETE_MAX_AGE_SECONDS', AutocompleteService.DEFAULT_MAX_AGE_SECONDS)
+            if index is None or now - index.built_at >= max_age:
+                return AutocompleteService.build_index()
+            version = AutocompleteService.get_version()
+            if index.version != version and not AutocompleteService.catch_up(index, version):
+                return AutocompleteService.build_index()
+            index.checked_at = now
+            return index
+
+    @staticmethod
+    def reset() -> None:
+        """Drop the process-wide index; the next lookup rebuilds it"""
+        AutocompleteService._index = None
+
+    @staticmethod
+    def product_changed(product_id: int, deleted: bool = False) -> None:
+        """
+        Apply one product change to the loaded index and announce it to other processes
+
+        Args:
+            product_id: ID of the saved or deleted product
+            deleted: Whether the product was deleted
+        """
+        try:
+            try:
+                cache.add(AutocompleteService.VERSION_KEY, time.time_ns() // 1000, None)
+                version = cache.incr(AutocompleteService.VERSION_KEY)
+                cache.set(
+                    AutocompleteService.get_change_key(version), product_id, AutocompleteService.CHANGE_LOG_TIMEOUT
+                )
+            except Exception as e:
+                logger.warning(f"Error bumping autocomplete version: {str(e)}")
+                version = None
+
+            index = AutocompleteService._index
+            if index is None:
+                return
+            if deleted:
+                index.remove(product_id)
+            else:
+                AutocompleteService.apply_products(index, [product_id])
+            with index.lock:
+                # Stay current only if no other process changed products meanwhile;
+                # otherwise the next refresh replays the gap
+                if version is not None and index.version == version - 1:
+                    index.version = version
+        except Exception as e:
+            logger.error(f"Error updating autocomplete index for product {product_id}: {str(e)}")
+
+    @staticmethod
+    def suggest(query: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get product suggestions for a partially typed query
+
+        Args:
+            query: Text typed so far, in Arabic or English
+            limit: Maximum number of suggestions
+
+        Returns:
+            List of dictionaries with id, name and name_en
+        """
+        limit = min(limit or AutocompleteService.DEFAULT_LIMIT, AutocompleteService.MAX_LIMIT)
+        try:
+            return AutocompleteService.get_index().complete(query, limit)
+        except Exception as e:
+            logger.error(f"Error getting autocomplete suggestions: {str(e)}")
+            return []
+
+# Singleton instance
+autocomplete_service = AutocompleteService()
@@ -0,0 +1,242 @@
+"""
+Cache Metrics Service Module
+Per key-prefix hit, miss and set counters with payload-size and recompute-time histograms
+"""
+
+import bisect
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional, Sequence
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets; the last bucket is unbounded
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+TIME_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+COUNTERS = ('hits', 'stale_hits', 'misses', 'sets')
+
+# Parts of a key that identify one entry rather than the kind of entry
+IDENTIFIER_PART = re.compile(r'\d')
+
+
+def _new_metrics() -> Dict[str, Any]:
+    metrics = {counter: 0 for counter in COUNTERS}
+    metrics.update({
+        'size_total': 0,
+        'size_buckets': [0] * (len(SIZE_BUCKETS) + 1),
+        'compute_ms_total': 0.0,
+        'compute_count': 0,
+        'compute_buckets': [0] * (len(TIME_BUCKETS_MS) + 1),
+    })
+    return metrics
+
+
+def _percentile(buckets: Sequence[int], bounds: Sequence[float], fraction: float) -> Optional[float]:
+    """Get the upper bound of the bucket holding the given fraction of samples, None past the last bound"""
+    total = sum(buckets)
+    if not total:
+        return 0
+    seen = 0
+    for bound, count in zip(list(bounds) + [None], buckets):
+        seen += count
+        if seen >= total * fraction:
+            return bound
+    return None
+
+
+class CacheMetricsService:
+    """Service class for cache observability"""
+
+    # Parts of a key kept in its prefix, stopping early at the first part with a digit
+    PREFIX_DEPTH = 2
+
+    # Process counters are added to the shared totals this often
+    FLUSH_INTERVAL = 60
+
+    SHARED_PREFIX = 'cache_metrics'
+    SHARED_REGISTRY_KEY = 'cache_metrics_prefixes'
+
+    _metrics: Dict[str, Dict[str, Any]] = defaultdict(_new_metrics)
+    _unflushed: Dict[str, Dict[str, Any]] = defaultdict(_new_metrics)
+    _lock = threading.Lock()
+    _flushed_at = time.monotonic()
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return getattr(settings, 'STORE_CACHE_METRICS_ENABLED', True)
+
+    @staticmethod
+    def get_prefix(key: str) -> str:
+        """
+        Get the prefix a key is reported under
+
+        Args:
+            key: Cache key (e.g. 'product_detail_42', 'page_cache_3f9a...')
+
+        Returns:
+            Leading parts naming the kind of entry (e.g. 'product_detail', 'page_cache')
+        """
+        parts = []
+        for part in key.split('_')[:CacheMetricsService.PREFIX_DEPTH]:
+            if IDENTIFIER_PART.search(part):
+                break
+            parts.append(part)
+        return '_'.join(parts) or key.split('_', 1)[0]
+
+    @staticmethod
+    def _update(key: str, update) -> None:
+        if not CacheMetricsService.is_enabled():
+            return
+        prefix = CacheMetricsService.get_prefix(key)
+        with CacheMetricsService._lock:
+            update(CacheMetricsService._metrics[prefix])
+            update(CacheMetricsService._unflushed[prefix])
+            due = time.monotonic() - CacheMetricsService._flushed_at >= getattr(
+                settings, 'STORE_CACHE_METRICS_FLUSH_INTERVAL', CacheMetricsService.FLUSH_INTERVAL
+            )
+        if due:
+            CacheMetricsService.flush()
+
+    @staticmethod
+    def record_hit(key: str, stale: bool = False) -> None:
+        def update(metrics):
+            metrics['stale_hits' if stale else 'hits'] += 1
+        CacheMetricsService._update(key, update)
+
+    @staticmethod
+    def record_miss(key: str) -> None:
+        def update(metrics):
+            metrics['misses'] += 1
+        CacheMetricsService._update(key, update)
+
+    @staticmethod
+    def record_set(key: str, size: int) -> None:
+        """Count a write of ``size`` serialized bytes"""
+        bucket = bisect.bisect_left(SIZE_BUCKETS, size)
+
+        def update(metrics):
+            metrics['sets'] += 1
+            metrics['size_total'] += size
+            metrics['size_buckets'][bucket] += 1
+        CacheMetricsService._update(key, update)
+
+    @staticmethod
+    def record_compute(key: str, seconds: float) -> None:
+        """Count one recomputation of a missing or expiring entry"""
+        milliseconds = seconds * 1000
+        bucket = bisect.bisect_left(TIME_BUCKETS_MS, milliseconds)
+
+        def update(metrics):
+            metrics['compute_count'] += 1
+            metrics['compute_ms_total'] += milliseconds
+            metrics['compute_buckets'][bucket] += 1
+        CacheMetricsService._update(key, update)
+
+    @staticmethod
+    def summarize(raw: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Add rates, means and percentiles to raw counters
+
+        Args:
+            raw: Raw counters by prefix
+
+        Returns:
+            Dictionary by prefix, busiest first, with the raw counters plus
+            hit_rate, avg_size, p95_size, avg_compute_ms and p95_compute_ms
+            (p95 values are bucket upper bounds, None past the last bucket)
+        """
+        report = {}
+        for prefix, metrics in sorted(raw.items(), key=lambda item: -(item[1]['hits'] + item[1]['misses'])):
+            lookups = metrics['hits'] + metrics['stale_hits'] + metrics['misses']
+            summary = dict(metrics)
+            summary['hit_rate'] = (metrics['hits'] + metrics['stale_hits']) / lookups if lookups else 0.0
+            summary['avg_size'] = metrics['size_total'] / metrics['sets'] if metrics['sets'] else 0
+            summary['p95_size'] = _percentile(metrics['size_buckets'], SIZE_BUCKETS, 0.95)
+            summary['avg_compute_ms'] = (
+                metrics['compute_ms_total'] / metrics['compute_count'] if metrics['compute_count'] else 0.0
+            )
+            summary['p95_compute_ms'] = _percentile(metrics['compute_buckets'], TIME_BUCKETS_MS, 0.95)
+            report[prefix] = summary
+        return report
+
+    @staticmethod
+    def get_process_metrics() -> Dict[str, Dict[str, Any]]:
+        """Get the metrics recorded by this process since it started"""
+        with CacheMetricsService._lock:
+            raw = {
+                prefix: {name: list(value) if isinstance(value, list) else value for name, value in metrics.items()}
+                for prefix, metrics in CacheMetricsService._metrics.items()
+            }
+        return CacheMetricsService.summarize(raw)
+
+    @staticmethod
+    def get_shared_keys(prefix: str) -> Dict[str, str]:
+        """Get the shared counter keys of one prefix, by metric name"""
+        base = f"{CacheMetricsService.SHARED_PREFIX}:{prefix}"
+        keys = {counter: f"{base}:{counter}" for counter in COUNTERS + ('size_total', 'compute_count')}
+        keys['compute_us_total'] = f"{base}:compute_us_total"
+        keys.update({f"size_bucket_{index}": f"{base}:size_bucket_{index}" for index in range(len(SIZE_BUCKETS) + 1)})
+        keys.update({f"compute_bucket_{index}": f"{base}:compute_bucket_{index}" for index in range(len(TIME_BUCKETS_MS) + 1)})
+        return keys
+
+    @staticmethod
+    def flush() -> None:
+        """Add this process's counters since the last flush to the shared totals"""
+        with CacheMetricsService._lock:
+            unflushed = CacheMetricsService._unflushed
+            CacheMetricsService._unflushed = defaultdict(_new_metrics)
+            CacheMetricsService._flushed_at = time.monotonic()
+        if not unflushed:
+            return
+        try:
+            registry = set(cache.get(CacheMetricsService.SHARED_REGISTRY_KEY) or ())
+            if not set(unflushed) <= registry:
+                cache.set(CacheMetricsService.SHARED_REGISTRY_KEY, sorted(registry | set(unflushed)), None)
+            for prefix, metrics in unflushed.items():
+                deltas = {counter: metrics[counter] for counter in COUNTERS + ('size_total', 'compute_count')}
+                deltas['compute_us_total'] = int(metrics['compute_ms_total'] * 1000)
+                deltas.update({f"size_bucket_{index}": count for index, count in enumerate(metrics['size_buckets'])})
+                deltas.update({f"compute_bucket_{index}": count for index, count in enumerate(metrics['compute_buckets'])})
+                keys = CacheMetricsService.get_shared_keys(prefix)
+                for name, delta in deltas.items():
+                    if delta:
+                        cache.add(keys[name], 0, None)
+                        cache.incr(keys[name], delta)
+        except Exception as e:
+            logger.warning(f"Error flushing cache metrics: {str(e)}")
+
+    @staticmethod
+    def get_shared_metrics() -> Dict[str, Dict[str, Any]]:
+        """Get the totals flushed by every process"""
+        raw = {}
+        for prefix in cache.get(CacheMetricsService.SHARED_REGISTRY_KEY) or ():
+            keys = CacheMetricsService.get_shared_keys(prefix)
+            found = cache.get_many(list(keys.values()))
+            values = {name: found.get(key, 0) for name, key in keys.items()}
+            metrics = {counter: values[counter] for counter in COUNTERS + ('size_total', 'compute_count')}
+            metrics['compute_ms_total'] = values['compute_us_total'] / 1000
+            metrics['size_buckets'] = [values[f"size_bucket_{index}"] for index in range(len(SIZE_BUCKETS) + 1)]
+            metrics['compute_buckets'] = [values[f"compute_bucket_{index}"] for index in range(len(TIME_BUCKETS_MS) + 1)]
+            raw[prefix] = metrics
+        return CacheMetricsService.summarize(raw)
+
+    @staticmethod
+    def reset(shared: bool = False) -> None:
+        """Zero this process's metrics, and the shared totals too if asked"""
+        with CacheMetricsService._lock:
+            CacheMetricsService._metrics = defaultdict(_new_metrics)
+            CacheMetricsService._unflushed = defaultdict(_new_metrics)
+        if shared:
+            prefixes = cache.get(CacheMetricsService.SHARED_REGISTRY_KEY) or ()
+            cache.delete_many([
+                key for prefix in prefixes for key in CacheMetricsService.get_shared_keys(prefix).values()
+            ] + [CacheMetricsService.SHARED_REGISTRY_KEY])
+
+# Singleton instance
+cache_metrics_service = CacheMetricsService()
@@ -4,14 +4,69 @@ Contains caching strategies and utilities for the application
 """
 
 import logging
-from typing import Any, Optional, Dict
+import math
+import pickle
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+from django.conf import settings
 from django.core.cache import cache
 from django.apps import apps
 from django.db.models import Sum, Count
 from decimal import Decimal
+from store.services.cache_metrics_service import CacheMetricsService
+from store.utils.cache_codec import CodecError, DTOCodec
 
 logger = logging.getLogger(__name__)
 
+# Shared backends that already live in the process gain nothing from a local tier
+IN_PROCESS_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache with per-entry expiry
+
+    Values are stored as-is, not pickled, so callers must treat what they
+    get back as read-only: the same objects are handed to every request.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, timeout: float, max_entries: int) -> None:
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
 class CacheService:
     """Service class for caching operations"""
     
@@ -21,6 +76,40 @@ class CacheService:
     LONG_TIMEOUT = 60 * 60 * 2  # 2 hours
     VERY_LONG_TIMEOUT = 60 * 60 * 24  # 24 hours
     
+    # Bumped on every product change
+    CATALOG_VERSION_KEY = 'catalog_version'
+    
+    # Version counters of invalidation tags and key namespaces
+    TAG_VERSION_PREFIX = 'cache_tag_version'
+    NAMESPACE_VERSION_PREFIX = 'cache_namespace_version'
+    
+    # Keys belong to the namespaces formed by their first underscore-separated parts
+    MAX_NAMESPACE_DEPTH = 3
+    
+    # In-process tier in front of the shared cache. Entries live briefly and
+    # are revalidated against version counters, which are themselves trusted
+    # locally for LOCAL_VERSION_TIMEOUT; that bounds cross-process staleness.
+    LOCAL_TIMEOUT = 30
+    LOCAL_VERSION_TIMEOUT = 1
+    LOCAL_MAX_ENTRIES = 1000
+    
+    # Entries outlive their timeout by this long so a stale value can be
+    # served while one worker recomputes it
+    STALE_GRACE = 60 * 5
+    
+    # Single-flight recomputation lock, in the style of IdempotencyService
+    LOCK_TIMEOUT = 30
+    LOCK_WAIT = 5
+    POLL_INTERVAL = 0.05
+    
+    # XFetch probabilistic early expiry; 0 disables it
+    EARLY_EXPIRY_BETA = 1.0
+    
+    _local = LocalCache()
+    _local_versions = LocalCache()
+    _tier_stats = {'local': {'hits': 0, 'misses': 0}, 'remote': {'hits': 0, 'misses': 0}}
+    _stats_lock = threading.Lock()
+    
     @staticmethod
     def get_cache_key(prefix: str, identifier: str = '', user_id: Optional[int] = None) -> str:
         """
@@ -45,47 +134,454 @@ class CacheService:
         return "_".join(key_parts)
     
     @staticmethod
-    def get_or_set(key: str, callable_func, timeout: int = MEDIUM_TIMEOUT) -> Any:
+    def get_or_set(key: str, callable_func, timeout: int = MEDIUM_TIMEOUT,
+                   tags: Optional[Iterable[str]] = None, codec: Optional[DTOCodec] = None) -> Any:
         """
         Get data from cache or set it using the provided function
         
+        Only one worker recomputes a missing or expiring entry, holding a short
+        lock. While it does, others get the stale value if there is one or
+        wait briefly for the new one. Entries are refreshed a little before
+        they expire, with a probability that grows with how long they took to
+        compute (XFetch), so hot keys rarely expire under load at all.
+        Entries invalidated through their tags are never served stale.
+        
+        With a codec the data is stored as a packed DTO instead of a pickle,
+        and every hit decodes new objects that callers may modify.
+        
         Args:
             key: Cache key
             callable_func: Function to call if cache miss
             timeout: Cache timeout in seconds
+            tags: Invalidation tags the data depends on
+            codec: Codec converting the data to and from a DTO
             
         Returns:
             Cached or newly computed data
         """
         try:
-            data = cache.get(key)
-            if data is None:
-                data = callable_func()
-                cache.set(key, data, timeout)
-                logger.info(f"Cache miss for key: {key}, data computed and cached")
-            else:
+            entry = CacheService.get_entry(key, tags, codec)
+            if entry is not None and not CacheService.should_refresh(entry):
                 logger.info(f"Cache hit for key: {key}")
-            return data
+                CacheMetricsService.record_hit(key)
+                return entry['value']
+            lock_key = f"{key}_lock"
+            acquired = cache.add(lock_key, 1, CacheService.LOCK_TIMEOUT)
         except Exception as e:
             logger.error(f"Error in cache get_or_set for key {key}: {str(e)}")
             # Return fresh data if cache fails
             return callable_func()
+        
+        if not acquired:
+            if entry is not None:
+                logger.info(f"Serving stale value for key: {key} while it is refreshed")
+                CacheMetricsService.record_hit(key, stale=True)
+                return entry['value']
+            CacheMetricsService.record_miss(key)
+            return CacheService.wait_for_entry(key, tags, callable_func, codec)
+        
+        CacheMetricsService.record_miss(key)
+        
+        try:
+            started = time.monotonic()
+            data = callable_func()
+            compute_time = time.monotonic() - started
+            CacheMetricsService.record_compute(key, compute_time)
+            try:
+                CacheService.set_tagged(
+                    key, codec.encode(data) if codec else data, timeout, tags,
+                    compute_time=compute_time
+                )
+                logger.info(f"Cache miss for key: {key}, data computed and cached")
+            except Exception as e:
+                logger.error(f"Error caching key {key}: {str(e)}")
+            return data
+        finally:
+            try:
+                cache.delete(lock_key)
+            except Exception as e:
+                logger.warning(f"Error releasing cache lock for key {key}: {str(e)}")
+    
+    @staticmethod
+    def wait_for_entry(key: str, tags: Optional[Iterable[str]], callable_func,
+                       codec: Optional[DTOCodec] = None) -> Any:
+        """Wait for the worker holding the lock to store a value, computing it ourselves after LOCK_WAIT"""
+        deadline = time.monotonic() + getattr(settings, 'STORE_CACHE_LOCK_WAIT', CacheService.LOCK_WAIT)
+        try:
+            while time.monotonic() < deadline:
+                time.sleep(CacheService.POLL_INTERVAL)
+                entry = CacheService.get_entry(key, tags, codec)
+                if entry is not None:
+                    return entry['value']
+            logger.warning(f"Timed out waiting for key: {key} to be computed")
+        except Exception as e:
+            logger.error(f"Error waiting for cache key {key}: {str(e)}")
+        return callable_func()
+    
+    @staticmethod
+    def should_refresh(entry: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """
+        Decide whether an entry is due for recomputation
+        
+        Args:
+            entry: Stored entry
+            now: Current Unix time, defaults to now
+            
+        Returns:
+            True once the entry expired, and with rising probability shortly before
+        """
+        expires_at = entry.get('expires_at')
+        if expires_at is None:
+            return False
+        now = time.time() if now is None else now
+        beta = getattr(settings, 'STORE_CACHE_EARLY_EXPIRY_BETA', CacheService.EARLY_EXPIRY_BETA)
+        # -log(U) is exponentially distributed, so the head start is usually a
+        # small multiple of the compute time
+        head_start = entry.get('compute_time', 0) * beta * -math.log(1.0 - random.random())
+        return now + head_start >= expires_at
+    
+    @staticmethod
+    def get_namespaces(key: str) -> List[str]:
+        """Get the namespaces a key belongs to, from the widest ('') down"""
+        parts = key.split('_')[:CacheService.MAX_NAMESPACE_DEPTH]
+        return [''] + ['_'.join(parts[:depth]) for depth in range(1, len(parts) + 1)]
+    
+    @staticmethod
+    def get_version_keys(key: str, tags: Optional[Iterable[str]] = None) -> List[str]:
+        """Get the version counters an entry stored under ``key`` is checked against"""
+        version_keys = [
+            f"{CacheService.NAMESPACE_VERSION_PREFIX}:{namespace}"
+            for namespace in CacheService.get_namespaces(key)
+        ]
+        version_keys.extend(f"{CacheService.TAG_VERSION_PREFIX}:{tag}" for tag in sorted(set(tags or ())))
+        return version_keys
+    
+    @staticmethod
+    def is_local_enabled() -> bool:
+        """Whether the in-process tier is used, by default only in front of a remote cache"""
+        enabled = getattr(settings, 'STORE_LOCAL_CACHE_ENABLED', None)
+        if enabled is None:
+            enabled = settings.CACHES.get('default', {}).get('BACKEND') not in IN_PROCESS_BACKENDS
+        return enabled
+    
+    @staticmethod
+    def record_tier(tier: str, hit: bool) -> None:
+        with CacheService._stats_lock:
+            CacheService._tier_stats[tier]['hits' if hit else 'misses'] += 1
+    
+    @staticmethod
+    def get_tier_stats() -> Dict[str, Dict[str, Any]]:
+        """
+        Get the hit and miss counters of each cache tier in this process
+        
+        Returns:
+            Dictionary with 'local' and 'remote' counters, hit rates and the local entry count
+        """
+        with CacheService._stats_lock:
+            stats = {tier: dict(counters) for tier, counters in CacheService._tier_stats.items()}
+        for counters in stats.values():
+            lookups = counters['hits'] + counters['misses']
+            counters['hit_rate'] = counters['hits'] / lookups if lookups else 0.0
+        stats['local']['entries'] = len(CacheService._local)
+        return stats
+    
+    @staticmethod
+    def reset_tier_stats() -> None:
+        with CacheService._stats_lock:
+            for counters in CacheService._tier_stats.values():
+                counters['hits'] = counters['misses'] = 0
+    
+    @staticmethod
+    def clear_local() -> None:
+        """Drop every entry of this process's local tier"""
+        CacheService._local.clear()
+        CacheService._local_versions.clear()
+    
+    @staticmethod
+    def remember_versions(versions: Dict[str, Any]) -> None:
+        """Trust version counters locally for LOCAL_VERSION_TIMEOUT"""
+        timeout = getattr(settings, 'STORE_LOCAL_CACHE_VERSION_TIMEOUT', CacheService.LOCAL_VERSION_TIMEOUT)
+        if timeout <= 0 or not CacheService.is_local_enabled():
+            return
+        max_entries = getattr(settings, 'STORE_LOCAL_CACHE_MAX_ENTRIES', CacheService.LOCAL_MAX_ENTRIES)
+        for version_key, version in versions.items():
+            if version is not None:
+                CacheService._local_versions.set(version_key, version, timeout, max_entries)
+    
+    @staticmethod
+    def set_local(key: str, entry: Dict[str, Any], timeout: Optional[int] = None) -> None:
+        local_timeout = getattr(settings, 'STORE_LOCAL_CACHE_TIMEOUT', CacheService.LOCAL_TIMEOUT)
+        if timeout:
+            local_timeout = min(local_timeout, timeout)
+        max_entries = getattr(settings, 'STORE_LOCAL_CACHE_MAX_ENTRIES', CacheService.LOCAL_MAX_ENTRIES)
+        CacheService._local.set(key, entry, local_timeout, max_entries)
+    
+    @staticmethod
+    def get_versions(version_keys: List[str], found: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+        """
+        Get version counters, starting missing ones fresh
+        
+        Args:
+            version_keys: Counter keys
+            found: Counters already read with the entry, to save a round trip
+            
+        Returns:
+            Dictionary mapping counter key to version
+        """
+        if found is None:
+            found = cache.get_many(version_keys)
+        versions = {}
+        for version_key in version_keys:
+            version = found.get(version_key)
+            if version is None:
+                # Restart an evicted counter from the clock so entries recorded
+                # against its old values can never match again
+                cache.add(version_key, time.time_ns() // 1000, None)
+                version = cache.get(version_key)
+            versions[version_key] = version
+        CacheService.remember_versions(versions)
+        return versions
+    
+    @staticmethod
+    def get_tagged(key: str, tags: Optional[Iterable[str]] = None) -> Any:
+        """
+        Get data stored with ``set_tagged`` if it is current and not expired
+        
+        Args:
+            key: Cache key
+            tags: Invalidation tags the entry depends on
+            
+        Returns:
+            Cached data, or None on a miss, a stale entry or an expired one
+        """
+        entry = CacheService.get_entry(key, tags)
+        if entry is None or time.time() >= (entry.get('expires_at') or math.inf):
+            CacheMetricsService.record_miss(key)
+            return None
+        CacheMetricsService.record_hit(key)
+        return entry['value']
+    
+    @staticmethod
+    def get(key: str, default: Any = None) -> Any:
+        """
+        Get a plain cache value, counting the lookup in the cache metrics
+        
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+            
+        Returns:
+            Cached value or ``default``
+        """
+        value = cache.get(key)
+        if value is None:
+            CacheMetricsService.record_miss(key)
+            return default
+        CacheMetricsService.record_hit(key)
+        return value
+    
+    @staticmethod
+    def set(key: str, value: Any, timeout: int = MEDIUM_TIMEOUT, compute_time: Optional[float] = None) -> None:
+        """
+        Set a plain cache value, counting its size in the cache metrics
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+            timeout: Cache timeout in seconds
+            compute_time: Seconds it took to compute the value, if it was just computed
+        """
+        cache.set(key, value, timeout)
+        CacheService.record_set(key, value)
+        if compute_time is not None:
+            CacheMetricsService.record_compute(key, compute_time)
+    
+    @staticmethod
+    def record_set(key: str, value: Any) -> None:
+        """Count a write in the cache metrics, measuring the value as the cache backend stores it"""
+        if not CacheMetricsService.is_enabled():
+            return
+        if isinstance(value, (bytes, bytearray)):
+            size = len(value)
+        else:
+            try:
+                size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+            except Exception:
+                size = 0
+        CacheMetricsService.record_set(key, size)
+    
+    @staticmethod
+    def get_entry(key: str, tags: Optional[Iterable[str]] = None,
+                  codec: Optional[DTOCodec] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a stored entry if none of its tags or namespaces changed
+        
+        The local tier is tried first; a local entry is served while its
+        version counters still match. Otherwise the entry and its counters are
+        read from the shared cache in one round trip. The entry may be past
+        its ``expires_at`` while within the stale grace period.
+        
+        Args:
+            key: Cache key
+            tags: Invalidation tags the entry depends on
+            codec: Codec the value was stored with; entries it cannot decode are misses
+            
+        Returns:
+            Entry dictionary with 'value', or None on a miss or a stale entry
+        """
+        entry = CacheService.get_current_entry(key, tags)
+        if entry is None or codec is None:
+            return entry
+        try:
+            return dict(entry, value=codec.decode(entry['value']))
+        except CodecError as e:
+            # Written by another release or schema version; recompute it
+            logger.warning(f"Discarding cache key {key}: {str(e)}")
+            return None
+    
+    @staticmethod
+    def get_current_entry(key: str, tags: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        """Get a stored entry, still encoded, if none of its tags or namespaces changed"""
+        version_keys = CacheService.get_version_keys(key, tags)
+        local = CacheService.is_local_enabled()
+        
+        if local:
+            entry = CacheService._local.get(key)
+            if entry is not None:
+                versions = {version_key: CacheService._local_versions.get(version_key) for version_key in version_keys}
+                unknown = [version_key for version_key, version in versions.items() if version is None]
+                if unknown:
+                    fetched = cache.get_many(unknown)
+                    CacheService.remember_versions(fetched)
+                    versions.update(fetched)
+                if entry['versions'] == {version_key: versions.get(version_key) for version_key in version_keys}:
+                    CacheService.record_tier('local', True)
+                    return entry
+            CacheService.record_tier('local', False)
+        
+        found = cache.get_many([key] + version_keys)
+        versions = {version_key: found.get(version_key) for version_key in version_keys}
+        entry = found.get(key)
+        if not isinstance(entry, dict) or entry.get('versions') != versions:
+            CacheService.record_tier('remote', False)
+            return None
+        CacheService.record_tier('remote', True)
+        if local:
+            CacheService.remember_versions(versions)
+            CacheService.set_local(key, entry)
+        return entry
+    
+    @staticmethod
+    def set_tagged(key: str, data: Any, timeout: int = MEDIUM_TIMEOUT,
+                   tags: Optional[Iterable[str]] = None, compute_time: float = 0.0) -> None:
+        """
+        Store data together with the current versions of its tags and namespaces
+        
+        Args:
+            key: Cache key
+            data: Data to cache
+            timeout: Cache timeout in seconds
+            tags: Invalidation tags the data depends on
+            compute_time: Seconds it took to compute the data, for early expiry
+        """
+        versions = CacheService.get_versions(CacheService.get_version_keys(key, tags))
+        entry = {'versions': versions, 'value': data}
+        if timeout:
+            entry['expires_at'] = time.time() + timeout
+            entry['compute_time'] = compute_time
+            timeout += getattr(settings, 'STORE_CACHE_STALE_GRACE', CacheService.STALE_GRACE)
+        cache.set(key, entry, timeout)
+        CacheService.record_set(key, entry)
+        if CacheService.is_local_enabled():
+            CacheService.set_local(key, entry, timeout)
+    
+    @staticmethod
+    def invalidate_tags(*tags: str) -> None:
+        """
+        Invalidate every entry that depends on any of the tags
+        
+        Args:
+            tags: Invalidation tags (e.g. 'product', 'product:42')
+        """
+        for tag in tags:
+            CacheService.bump_version(f"{CacheService.TAG_VERSION_PREFIX}:{tag}")
     
     @staticmethod
     def invalidate_pattern(pattern: str) -> None:
         """
         Invalidate all cache keys matching a pattern
-        Note: This is a simplified implementation. In production, you might want
-        to use Redis-specific commands for better performance.
+        
+        Entries stored with ``set_tagged`` are versioned by their namespaces, so
+        the namespace of the pattern's literal prefix is bumped instead of
+        scanning keys. Prefixes deeper than MAX_NAMESPACE_DEPTH invalidate
+        their enclosing namespace.
         
         Args:
             pattern: Pattern to match cache keys (e.g., 'product_*')
         """
-        # In a real implementation with Redis, you would use:
-        # cache.delete_many(cache.keys(pattern))
-        # But Django's cache backend doesn't support keys() method
-        logger.info(f"Cache invalidation requested for pattern: {pattern}")
+        prefix = pattern.split('*', 1)[0].rstrip('_')
+        namespace = CacheService.get_namespaces(prefix)[-1] if prefix else ''
+        CacheService.bump_version(f"{CacheService.NAMESPACE_VERSION_PREFIX}:{namespace}")
+        logger.info(f"Cache namespace '{namespace}' invalidated for pattern: {pattern}")
+    
+    @staticmethod
+    def bump_version(version_key: str) -> None:
+        try:
+            cache.add(version_key, time.time_ns() // 1000, None)
+            CacheService.remember_versions({version_key: cache.incr(version_key)})
+        except Exception as e:
+            logger.warning(f"Error bumping cache version {version_key}: {str(e)}")
+    
+    @staticmethod
+    def get_instance_tags(instance) -> List[str]:
+        """
+        Get the tags a saved or deleted model instance invalidates
+        
+        Args:
+            instance: Model instance
+            
+        Returns:
+            The model tag, the instance tag and the tag of its product, if any
+        """
+        model = instance._meta.model_name
+        tags = [model, f"{model}:{instance.pk}"]
+        product_id = getattr(instance, 'product_id', None)
+        if product_id:
+            tags.append(f"product:{product_id}")
+        return tags
     
+    @staticmethod
+    def get_catalog_version() -> int:
+        """
+        Get the current catalog version
+
+        Keys that embed the version are invalidated at once by bumping it.
+        Like the tag versions, a counter lost to eviction restarts from the
+        current time so it never repeats a version keys were stored under.
+
+        Returns:
+            Catalog version number, 0 if the cache is unavailable
+        """
+        try:
+            version = cache.get(CacheService.CATALOG_VERSION_KEY)
+            if version is None:
+                initial = time.time_ns() // 1000
+                cache.add(CacheService.CATALOG_VERSION_KEY, initial, None)
+                version = cache.get(CacheService.CATALOG_VERSION_KEY, initial)
+            return version
+        except Exception as e:
+            logger.warning(f"Error reading catalog version: {str(e)}")
+            return 0
+
+    @staticmethod
+    def bump_catalog_version() -> None:
+        """Invalidate every cache entry keyed by the catalog version"""
+        try:
+            cache.add(CacheService.CATALOG_VERSION_KEY, time.time_ns() // 1000, None)
+            cache.incr(CacheService.CATALOG_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Error bumping catalog version: {str(e)}")
+
     @staticmethod
     def get_product_list_cache_key(page: int = 1, category: str = '', sort_by: str = 'name') -> str:
         """
@@ -0,0 +1,198 @@
+"""
+Currency Service Module
+Converts product prices into the shopper's display currency
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Dict, Iterable, Optional
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATES_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'exchange_rates.json')
+
+DEFAULT_DECIMALS = 2
+
+
+class RateTable:
+    """
+    One version of the exchange-rate table
+
+    Rates are units of each currency per one unit of the base currency, so
+    any pair converts through the base without storing cross rates.
+    """
+
+    def __init__(self, version: str, base: str, rates: Dict[str, Decimal], decimals: Optional[Dict[str, int]] = None):
+        self.version = version
+        self.base = base
+        self.rates = rates
+        self.decimals = decimals or {}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RateTable':
+        base = data['base'].upper()
+        rates = {code.upper(): Decimal(str(rate)) for code, rate in data['rates'].items()}
+        rates[base] = Decimal('1')
+        if any(rate <= 0 for rate in rates.values()):
+            raise ValueError("Exchange rates must be positive")
+        decimals = {code.upper(): int(places) for code, places in data.get('decimals', {}).items()}
+        return cls(str(data['version']), base, rates, decimals)
+
+    def get_rate(self, from_currency: str, to_currency: str) -> Optional[Decimal]:
+        """Get the multiplier from one currency to another, None when either is unknown"""
+        if from_currency == to_currency:
+            return Decimal('1')
+        try:
+            return self.rates[to_currency] / self.rates[from_currency]
+        except KeyError:
+            return None
+
+    def get_quantum(self, currency: str) -> Decimal:
+        """Get the smallest displayed unit of a currency"""
+        return Decimal(1).scaleb(-self.decimals.get(currency, DEFAULT_DECIMALS))
+
+
+class CurrencyService:
+    """Service class for currency conversion"""
+
+    SESSION_KEY = 'display_currency'
+
+    # How often the rate file is checked for a newer version
+    DEFAULT_REFRESH_SECONDS = 60
+
+    _table: Optional[RateTable] = None
+    _source: Optional[tuple] = None
+    _checked_at = 0.0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_rates_file() -> str:
+        return getattr(settings, 'STORE_EXCHANGE_RATES_FILE', DEFAULT_RATES_FILE)
+
+    @staticmethod
+    def load_rates(path: Optional[str] = None) -> RateTable:
+        """
+        Read a rate table from a JSON file
+
+        Args:
+            path: File with version, base, rates and optional decimals
+
+        Returns:
+            RateTable object
+        """
+        with open(path or CurrencyService.get_rates_file(), encoding='utf-8') as rates_file:
+            return RateTable.from_dict(json.load(rates_file))
+
+    @staticmethod
+    def get_rate_table() -> Optional[RateTable]:
+        """
+        Get the in-process rate table, reloading it when the file changes
+
+        Returns:
+            RateTable object, or None if no table could be loaded
+        """
+        now = time.monotonic()
+        refresh = getattr(settings, 'STORE_EXCHANGE_RATES_REFRESH_SECONDS', CurrencyService.DEFAULT_REFRESH_SECONDS)
+        if CurrencyService._table is not None and now - CurrencyService._checked_at < refresh:
+            return CurrencyService._table
+
+        with CurrencyService._lock:
+            path = CurrencyService.get_rates_file()
+            try:
+                source = (path, os.stat(path).st_mtime_ns)
+                if source != CurrencyService._source:
+                    CurrencyService._table = CurrencyService.load_rates(path)
+                    CurrencyService._source = source
+                    logger.info(f"Loaded exchange rates version {CurrencyService._table.version}")
+            except (OSError, ValueError, KeyError, InvalidOperation) as e:
+                # Keep serving the last good table
+                logger.error(f"Error loading exchange rates from {path}: {str(e)}")
+            CurrencyService._checked_at = now
+            return CurrencyService._table
+
+    @staticmethod
+    def reset() -> None:
+        """Drop the in-process rate table; the next lookup reloads it"""
+        CurrencyService._table = None
+        CurrencyService._source = None
+        CurrencyService._checked_at = 0.0
+
+    @staticmethod
+    def get_display_currency(request) -> Optional[str]:
+        """
+        Get the currency a shopper asked to see prices in
+
+        A ``?currency=`` choice is remembered in the session.
+
+        Args:
+            request: HTTP request
+
+        Returns:
+            Currency code, or None to show each product's own currency
+        """
+        table = CurrencyService.get_rate_table()
+        currency = (request.GET.get('currency') or '').upper()
+        session = getattr(request, 'session', None)
+        if table is not None and currency in table.rates:
+            if session is not None and session.get(CurrencyService.SESSION_KEY) != currency:
+                session[CurrencyService.SESSION_KEY] = currency
+            return currency
+        if session is not None and session.get(CurrencyService.SESSION_KEY):
+            return session[CurrencyService.SESSION_KEY]
+        return getattr(settings, 'STORE_DISPLAY_CURRENCY', None)
+
+    @staticmethod
+    def convert(amount: Decimal, from_currency: str, to_currency: str) -> Optional[Decimal]:
+        """
+        Convert one amount
+
+        Args:
+            amount: Amount in ``from_currency``
+            from_currency: Source currency code
+            to_currency: Target currency code
+
+        Returns:
+            Amount rounded to the target currency's unit, or None if a rate is missing
+        """
+        table = CurrencyService.get_rate_table()
+        rate = table.get_rate(from_currency, to_currency) if table is not None else None
+        if rate is None:
+            return None
+        return (amount * rate).quantize(table.get_quantum(to_currency), rounding=ROUND_HALF_UP)
+
+    @staticmethod
+    def annotate_prices(products: Iterable, currency: Optional[str]) -> None:
+        """
+        Set ``display_price`` and ``display_currency`` on a page of products
+
+        Rates are resolved once per distinct source currency, then applied to
+        every product in a single pass with no queries.
+
+        Args:
+            products: Product objects
+            currency: Target currency code, None to keep each product's own
+        """
+        products = list(products)
+        table = CurrencyService.get_rate_table() if currency else None
+        quantum = table.get_quantum(currency) if table is not None else None
+        rates = {}
+        for product in products:
+            rate = None
+            if table is not None:
+                if product.currency not in rates:
+                    rates[product.currency] = table.get_rate(product.currency, currency)
+                rate = rates[product.currency]
+            if rate is None:
+                product.display_price = product.price
+                product.display_currency = product.currency
+            else:
+                product.display_price = (product.price * rate).quantize(quantum, rounding=ROUND_HALF_UP)
+                product.display_currency = currency
+
+# Singleton instance
+currency_service = CurrencyService()
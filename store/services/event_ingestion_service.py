@@ -0,0 +1,505 @@
+"""
+Event Ingestion Service Module
+Buffers analytics events in memory and writes them to AnalyticsIntegration in batches
+"""
+
+import atexit
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Dict, List, Optional
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, DataError, IntegrityError, close_old_connections, transaction
+from store.services.cardinality_service import CardinalityService
+from store.services.realtime_metrics_service import RealtimeMetricsService
+from store.services.rollup_service import RollupService
+
+logger = logging.getLogger(__name__)
+
+# Fields of a buffered event, in the order they are kept and spilled
+EVENT_FIELDS = (
+    'event_type', 'user_id', 'session_key', 'product_id', 'order_id',
+    'url', 'referrer', 'user_agent', 'ip_address', 'timestamp', 'metadata',
+)
+
+
+class EventIngestionService:
+    """Service class for buffered analytics event ingestion"""
+
+    # Events held in memory at most; later ones are dropped until a flush
+    MAX_BUFFER = 10000
+
+    # A flush starts once this many events are buffered, or after FLUSH_INTERVAL
+    BATCH_SIZE = 500
+    FLUSH_INTERVAL = 5
+
+    # Above this share of MAX_BUFFER, droppable events are sampled
+    SAMPLING_THRESHOLD = 0.5
+
+    # Events that are never sampled away, only dropped once the buffer is full
+    PRIORITY_EVENTS = frozenset({
+        'add_to_cart', 'checkout', 'purchase', 'return_initiate', 'return_complete',
+        'gift_card_purchase', 'subscription_start', 'subscription_cancel',
+    })
+
+    # Writes slower than this send the next batches to the spill file for DEGRADED_COOLDOWN
+    SLOW_FLUSH_SECONDS = 1.0
+    DEGRADED_COOLDOWN = 30
+
+    MAX_TEXT_LENGTH = 2000
+
+    # Largest id a bigint column holds
+    MAX_ID = 2 ** 63 - 1
+
+    SPILL_SUFFIX = '.jsonl'
+    # Left by a replay until it has written every event of a spill file
+    REPLAYING_SUFFIX = '.replaying'
+    # Events the database rejected on their own, kept for inspection, never replayed
+    QUARANTINE_SUFFIX = '.rejected'
+
+    _buffer: deque = deque()
+    _stats: Counter = Counter()
+    _lock = threading.Lock()
+    _wakeup = threading.Event()
+    _worker: Optional[threading.Thread] = None
+    _worker_pid: Optional[int] = None
+    _degraded_until = 0.0
+
+    @staticmethod
+    def get_setting(name: str, default: Any) -> Any:
+        return getattr(settings, f'STORE_ANALYTICS_{name}', default)
+
+    @staticmethod
+    def is_async() -> bool:
+        """Whether flushes run in a background thread rather than when ``flush`` is called"""
+        return EventIngestionService.get_setting('ASYNC_FLUSH', True)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def get_event_types() -> frozenset:
+        AnalyticsIntegration = apps.get_model('store', 'AnalyticsIntegration')
+        return frozenset(value for value, label in AnalyticsIntegration.EVENT_TYPE_CHOICES)
+
+    @staticmethod
+    def get_sample_rate(fill: float) -> float:
+        """
+        Get the share of droppable events kept at a buffer fill level
+
+        Args:
+            fill: Buffered events as a share of MAX_BUFFER
+
+        Returns:
+            1.0 up to SAMPLING_THRESHOLD, falling linearly to 0.0 when full
+        """
+        threshold = EventIngestionService.get_setting('SAMPLING_THRESHOLD', EventIngestionService.SAMPLING_THRESHOLD)
+        if fill <= threshold:
+            return 1.0
+        return max(0.0, (1.0 - fill) / (1.0 - threshold))
+
+    @staticmethod
+    def is_valid_id(value: Optional[int]) -> bool:
+        """Whether an id fits the positive range of a bigint primary key"""
+        return value is None or 0 < value <= EventIngestionService.MAX_ID
+
+    @staticmethod
+    def track(event_type: str, user_id: Optional[int] = None, session_key: Optional[str] = None,
+              product_id: Optional[int] = None, order_id: Optional[int] = None,
+              url: Optional[str] = None, referrer: Optional[str] = None,
+              user_agent: Optional[str] = None, ip_address: Optional[str] = None,
+              metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Buffer an analytics event; never touches the database
+
+        Args:
+            event_type: One of AnalyticsIntegration.EVENT_TYPE_CHOICES
+            user_id: Authenticated user
+            session_key: Visitor session
+            product_id: Product the event is about
+            order_id: Order the event is about
+            url: Page the event happened on
+            referrer: Page that linked to it
+            user_agent: Browser user agent
+            ip_address: Client IP
+            metadata: Extra JSON-serializable details
+
+        Returns:
+            True if the event was buffered, False if it was sampled away or dropped
+        """
+        # Live counters see every event, including those shed below
+        RealtimeMetricsService.record_event(event_type, user_id, session_key)
+        max_buffer = EventIngestionService.get_setting('MAX_BUFFER', EventIngestionService.MAX_BUFFER)
+        size = len(EventIngestionService._buffer)
+        if size >= max_buffer:
+            EventIngestionService._stats['dropped'] += 1
+            return False
+        sample_rate = 1.0
+        if event_type not in EventIngestionService.PRIORITY_EVENTS:
+            sample_rate = EventIngestionService.get_sample_rate(size / max_buffer)
+            if sample_rate < 1.0:
+                if random.random() >= sample_rate:
+                    EventIngestionService._stats['sampled_out'] += 1
+                    return False
+                # Each kept event stands for 1 / sample_rate events
+                metadata = dict(metadata or {}, sample_rate=round(sample_rate, 4))
+
+        EventIngestionService._buffer.append((
+            event_type, user_id, session_key, product_id, order_id,
+            url, referrer, user_agent, ip_address, time.time(), metadata,
+        ))
+        EventIngestionService._stats['accepted'] += 1
+
+        if EventIngestionService.is_async():
+            EventIngestionService.ensure_worker()
+            if size + 1 >= EventIngestionService.get_setting('BATCH_SIZE', EventIngestionService.BATCH_SIZE):
+                EventIngestionService._wakeup.set()
+        return True
+
+    @staticmethod
+    def track_request(request, event_type: str, product_id: Optional[int] = None,
+                      order_id: Optional[int] = None, url: Optional[str] = None,
+                      metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """Buffer an event with the user, session and client details of a request"""
+        user = getattr(request, 'user', None)
+        session = getattr(request, 'session', None)
+        return EventIngestionService.track(
+            event_type,
+            user_id=user.pk if user is not None and user.is_authenticated else None,
+            session_key=session.session_key if session is not None else None,
+            product_id=product_id,
+            order_id=order_id,
+            url=url or request.build_absolute_uri(),
+            referrer=request.META.get('HTTP_REFERER'),
+            user_agent=request.META.get('HTTP_USER_AGENT'),
+            ip_address=request.META.get('REMOTE_ADDR'),
+            metadata=metadata,
+        )
+
+    @staticmethod
+    def ensure_worker() -> None:
+        """Start this process's flush thread, again after a fork"""
+        pid = os.getpid()
+        if EventIngestionService._worker_pid == pid and EventIngestionService._worker.is_alive():
+            return
+        with EventIngestionService._lock:
+            if EventIngestionService._worker_pid == pid and EventIngestionService._worker.is_alive():
+                return
+            worker = threading.Thread(target=EventIngestionService.run_worker, name='analytics-ingestion', daemon=True)
+            EventIngestionService._worker = worker
+            EventIngestionService._worker_pid = pid
+            worker.start()
+
+    @staticmethod
+    def run_worker() -> None:
+        """Flush by size or time until the process exits"""
+        interval = EventIngestionService.get_setting('FLUSH_INTERVAL', EventIngestionService.FLUSH_INTERVAL)
+        while True:
+            EventIngestionService._wakeup.wait(interval)
+            EventIngestionService._wakeup.clear()
+            close_old_connections()
+            try:
+                EventIngestionService.flush()
+            except Exception as e:
+                logger.error(f"Error in analytics ingestion worker: {str(e)}")
+
+    @staticmethod
+    def drain(limit: int) -> List[tuple]:
+        """Take up to ``limit`` events from the buffer"""
+        events = []
+        buffer = EventIngestionService._buffer
+        try:
+            for _ in range(limit):
+                events.append(buffer.popleft())
+        except IndexError:
+            pass
+        return events
+
+    @staticmethod
+    def flush() -> Dict[str, int]:
+        """
+        Write every buffered event, batch by batch
+
+        Batches go to the database while it keeps up. After a failed or slow
+        write they are appended to the spill file until DEGRADED_COOLDOWN has
+        passed; the spill file is replayed once writes are fast again.
+
+        Returns:
+            Dictionary with the number of events 'written' and 'spilled'
+        """
+        result = {'written': 0, 'spilled': 0}
+        batch_size = EventIngestionService.get_setting('BATCH_SIZE', EventIngestionService.BATCH_SIZE)
+        while True:
+            events = EventIngestionService.drain(batch_size)
+            if not events:
+                break
+            if EventIngestionService.is_degraded() or not EventIngestionService.write(events):
+                EventIngestionService.spill(events)
+                result['spilled'] += len(events)
+            else:
+                result['written'] += len(events)
+        if not EventIngestionService.is_degraded() and EventIngestionService.get_spill_files():
+            result['written'] += EventIngestionService.replay_spill()
+        return result
+
+    @staticmethod
+    def is_degraded() -> bool:
+        return time.monotonic() < EventIngestionService._degraded_until
+
+    @staticmethod
+    def mark_degraded() -> None:
+        cooldown = EventIngestionService.get_setting('DEGRADED_COOLDOWN', EventIngestionService.DEGRADED_COOLDOWN)
+        EventIngestionService._degraded_until = time.monotonic() + cooldown
+        EventIngestionService._stats['degraded_periods'] += 1
+
+    @staticmethod
+    def build_instances(events: List[tuple]) -> List[Any]:
+        """Build AnalyticsIntegration objects from buffered or spilled events"""
+        AnalyticsIntegration = apps.get_model('store', 'AnalyticsIntegration')
+        max_length = EventIngestionService.MAX_TEXT_LENGTH
+        instances = []
+        for event in events:
+            values = dict(zip(EVENT_FIELDS, event))
+            for field in ('url', 'referrer', 'user_agent'):
+                if values[field]:
+                    values[field] = values[field][:max_length]
+            values['session_key'] = (values['session_key'] or None) and values['session_key'][:40]
+            values['timestamp'] = datetime.fromtimestamp(values['timestamp'], tz=dt_timezone.utc)
+            values['metadata'] = json.dumps(values['metadata'], default=str) if values['metadata'] else None
+            instances.append(AnalyticsIntegration(**values))
+        return instances
+
+    @staticmethod
+    def is_unavailable(error: Exception) -> bool:
+        """Whether an error means the database failed rather than the events it was given"""
+        return isinstance(error, DatabaseError) and not isinstance(error, (DataError, IntegrityError))
+
+    @staticmethod
+    def insert(events: List[tuple]) -> None:
+        """Insert events with one bulk INSERT, after checking what they refer to"""
+        AnalyticsIntegration = apps.get_model('store', 'AnalyticsIntegration')
+        # Foreign keys are only checked at commit, too late to keep the rest of a batch
+        instances = EventIngestionService.drop_dangling_references(EventIngestionService.build_instances(events))
+        with transaction.atomic():
+            AnalyticsIntegration.objects.bulk_create(instances)
+            # bulk_create sends no signals
+            RollupService.record_events(instances)
+            CardinalityService.record_events(instances)
+
+    @staticmethod
+    def write(events: List[tuple], replaying: bool = False) -> bool:
+        """
+        Insert a batch of events
+
+        When the batch is rejected for its contents rather than because the
+        database failed, its events are written one at a time so a bad event
+        is quarantined instead of holding back the rest.
+
+        Args:
+            events: Buffered or spilled events
+            replaying: The events come from a spill file; a failure then does
+                not mark the database degraded, since live writes may be fine
+
+        Returns:
+            True if every event was written or quarantined; False marks the
+            database degraded unless replaying
+        """
+        started = time.monotonic()
+        try:
+            EventIngestionService.insert(events)
+        except Exception as e:
+            if EventIngestionService.is_unavailable(e):
+                logger.error(f"Error writing {len(events)} analytics events: {str(e)}")
+                if not replaying:
+                    EventIngestionService.mark_degraded()
+                return False
+            logger.warning(f"Error writing {len(events)} analytics events, writing them one at a time: {str(e)}")
+            return EventIngestionService.write_each(events, replaying)
+        elapsed = time.monotonic() - started
+        if elapsed >= EventIngestionService.get_setting('SLOW_FLUSH_SECONDS', EventIngestionService.SLOW_FLUSH_SECONDS):
+            logger.warning(f"Writing {len(events)} analytics events took {elapsed:.2f}s, spilling to disk for a while")
+            EventIngestionService.mark_degraded()
+        EventIngestionService._stats['written'] += len(events)
+        return True
+
+    @staticmethod
+    def write_each(events: List[tuple], replaying: bool = False) -> bool:
+        """
+        Insert events one at a time, quarantining those the database rejects
+
+        Returns:
+            False if the database failed before any event was written; events
+            after a later failure are spilled here
+        """
+        for index, event in enumerate(events):
+            try:
+                EventIngestionService.insert([event])
+            except Exception as e:
+                if not EventIngestionService.is_unavailable(e):
+                    logger.error(f"Quarantining rejected analytics event {event[0]}: {str(e)}")
+                    EventIngestionService.quarantine([event])
+                    continue
+                logger.error(f"Error writing analytics event {event[0]}: {str(e)}")
+                if not replaying:
+                    EventIngestionService.mark_degraded()
+                if not index:
+                    return False
+                EventIngestionService.spill(events[index:])
+                return True
+            EventIngestionService._stats['written'] += 1
+        return True
+
+    @staticmethod
+    def drop_dangling_references(instances: List[Any]) -> List[Any]:
+        """Clear foreign keys to users, products or orders that were deleted or never existed, with one query per model"""
+        AnalyticsIntegration = apps.get_model('store', 'AnalyticsIntegration')
+        for name in ('user', 'product', 'order'):
+            field = AnalyticsIntegration._meta.get_field(name)
+            attname = field.attname
+            ids = {getattr(instance, attname) for instance in instances} - {None}
+            if not ids:
+                continue
+            existing = set(field.related_model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+            for instance in instances:
+                if getattr(instance, attname) not in existing:
+                    setattr(instance, attname, None)
+        return instances
+
+    @staticmethod
+    def get_spill_dir() -> str:
+        return str(EventIngestionService.get_setting('SPILL_DIR', os.path.join(settings.BASE_DIR, 'var', 'analytics_spill')))
+
+    @staticmethod
+    def is_abandoned(path: str) -> bool:
+        """Whether a file being replayed belongs to a process that no longer exists"""
+        pid = path[:-len(EventIngestionService.REPLAYING_SUFFIX)].rsplit('.', 1)[-1]
+        try:
+            os.kill(int(pid), 0)
+        except (ValueError, ProcessLookupError):
+            return True
+        except OSError:
+            # Running under another user
+            return False
+        return False
+
+    @staticmethod
+    def get_spill_files() -> List[str]:
+        """Get the spill files of every process, oldest first, with those a crashed replay left behind"""
+        spill_dir = EventIngestionService.get_spill_dir()
+        try:
+            names = os.listdir(spill_dir)
+        except FileNotFoundError:
+            return []
+        paths = []
+        for name in names:
+            path = os.path.join(spill_dir, name)
+            if name.endswith(EventIngestionService.SPILL_SUFFIX):
+                paths.append(path)
+            elif name.endswith(EventIngestionService.REPLAYING_SUFFIX) and EventIngestionService.is_abandoned(path):
+                paths.append(path)
+        try:
+            return sorted(paths, key=os.path.getmtime)
+        except OSError:
+            # Renamed by a replay meanwhile
+            return sorted(path for path in paths if os.path.exists(path))
+
+    @staticmethod
+    def append(events: List[tuple], suffix: str) -> bool:
+        """Append events to one of this process's files in the spill directory, one JSON array per line"""
+        spill_dir = EventIngestionService.get_spill_dir()
+        path = os.path.join(spill_dir, f"events-{os.getpid()}{suffix}")
+        try:
+            os.makedirs(spill_dir, exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as spill_file:
+                spill_file.write(''.join(json.dumps(event, default=str) + '\n' for event in events))
+        except OSError as e:
+            logger.error(f"Error writing {len(events)} analytics events to {path}: {str(e)}")
+            EventIngestionService._stats['dropped'] += len(events)
+            return False
+        return True
+
+    @staticmethod
+    def spill(events: List[tuple]) -> None:
+        """Append events to this process's spill file for a later replay"""
+        if EventIngestionService.append(events, EventIngestionService.SPILL_SUFFIX):
+            EventIngestionService._stats['spilled'] += len(events)
+
+    @staticmethod
+    def quarantine(events: List[tuple]) -> None:
+        """Set aside events the database rejects on their own; they are never replayed"""
+        if EventIngestionService.append(events, EventIngestionService.QUARANTINE_SUFFIX):
+            EventIngestionService._stats['quarantined'] += len(events)
+
+    @staticmethod
+    def replay_spill() -> int:
+        """
+        Write spilled events to the database and remove the files they came from
+
+        A file is renamed before it is read so that events spilled meanwhile
+        go to a new file. A file whose batches cannot all be written is kept
+        for the next replay; batches already written from it are not repeated.
+        Files a crashed replay left renamed are claimed the same way.
+
+        Returns:
+            Number of events written
+        """
+        written = 0
+        batch_size = EventIngestionService.get_setting('BATCH_SIZE', EventIngestionService.BATCH_SIZE)
+        for path in EventIngestionService.get_spill_files():
+            source = path
+            if path.endswith(EventIngestionService.REPLAYING_SUFFIX):
+                source = path[:-len(EventIngestionService.REPLAYING_SUFFIX)].rsplit('.', 1)[0]
+            replaying = f"{source}.{os.getpid()}{EventIngestionService.REPLAYING_SUFFIX}"
+            try:
+                os.rename(path, replaying)
+                with open(replaying, encoding='utf-8') as spill_file:
+                    lines = spill_file.readlines()
+            except OSError:
+                # Another process is replaying it
+                continue
+            events = []
+            for line in lines:
+                try:
+                    events.append(tuple(json.loads(line)))
+                except ValueError:
+                    logger.warning(f"Skipping unreadable analytics event in {path}")
+            for start in range(0, len(events), batch_size):
+                batch = events[start:start + batch_size]
+                if not EventIngestionService.write(batch, replaying=True):
+                    EventIngestionService.spill(events[start:])
+                    break
+                written += len(batch)
+            os.remove(replaying)
+        return written
+
+    @staticmethod
+    def get_stats() -> Dict[str, int]:
+        """Get this process's counters and current buffer size"""
+        stats = dict(EventIngestionService._stats)
+        stats['buffered'] = len(EventIngestionService._buffer)
+        stats['degraded'] = EventIngestionService.is_degraded()
+        return stats
+
+    @staticmethod
+    def reset() -> None:
+        """Drop buffered events and counters without writing them"""
+        EventIngestionService._buffer.clear()
+        EventIngestionService._stats.clear()
+        EventIngestionService._degraded_until = 0.0
+
+
+@atexit.register
+def _flush_on_exit() -> None:
+    if EventIngestionService._buffer:
+        try:
+            EventIngestionService.flush()
+        except Exception as e:
+            logger.error(f"Error flushing analytics events on exit: {str(e)}")
+
+# Singleton instance
+event_ingestion_service = EventIngestionService()
@@ -0,0 +1,138 @@
+"""
+Facet Service Module
+Single-pass facet counts and price histogram for product search
+"""
+
+import logging
+import time
+from decimal import Decimal
+from typing import Any, Dict, List
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Max, Min, Value, When
+from store.services.cache_service import CacheService
+
+logger = logging.getLogger(__name__)
+
+
+class FacetService:
+    """Service class for faceted search aggregation"""
+
+    # Lower edges of the price histogram buckets; the last bucket is open-ended
+    DEFAULT_PRICE_BUCKETS = (0, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    @staticmethod
+    def get_price_buckets() -> List[Decimal]:
+        edges = getattr(settings, 'STORE_PRICE_HISTOGRAM_BUCKETS', FacetService.DEFAULT_PRICE_BUCKETS)
+        return [Decimal(str(edge)) for edge in edges]
+
+    @staticmethod
+    def get_catalog_cache_key() -> str:
+        version = CacheService.get_catalog_version()
+        return CacheService.get_cache_key('search_facets', f'v{version}')
+
+    @staticmethod
+    def compute_rows(queryset) -> List[Dict[str, Any]]:
+        """
+        Group a product queryset by (category, price bucket) in one query
+
+        Args:
+            queryset: Product queryset with every filter except category applied
+
+        Returns:
+            List of rows with category, price_bucket, count, min_price and max_price
+        """
+        edges = FacetService.get_price_buckets()
+        bucket = Case(
+            *[When(price__lt=edges[index + 1], then=Value(index)) for index in range(len(edges) - 1)],
+            default=Value(len(edges) - 1),
+            output_field=IntegerField()
+        )
+        return list(
+            queryset.order_by()
+            .annotate(price_bucket=bucket)
+            .values('category', 'price_bucket')
+            .annotate(count=Count('pk'), min_price=Min('price'), max_price=Max('price'))
+        )
+
+    @staticmethod
+    def summarize(rows: List[Dict[str, Any]], category: str = '') -> Dict[str, Any]:
+        """
+        Derive all facets from the grouped rows
+
+        Category counts always span every category so shoppers can switch
+        category; totals, price range and histogram follow the selected one.
+
+        Args:
+            rows: Rows returned by ``compute_rows``
+            category: Selected category or '' for all
+
+        Returns:
+            Dictionary with total, categories, price_range and price_histogram
+        """
+        edges = FacetService.get_price_buckets()
+        category_counts = {}
+        histogram = [0] * len(edges)
+        total = 0
+        min_price = max_price = None
+        for row in rows:
+            category_counts[row['category']] = category_counts.get(row['category'], 0) + row['count']
+            if category and row['category'] != category:
+                continue
+            total += row['count']
+            histogram[row['price_bucket']] += row['count']
+            if min_price is None or row['min_price'] < min_price:
+                min_price = row['min_price']
+            if max_price is None or row['max_price'] > max_price:
+                max_price = row['max_price']
+
+        return {
+            'total': total,
+            'categories': [
+                {'category': name, 'count': count}
+                for name, count in sorted(category_counts.items(), key=lambda item: item[0] or '')
+            ],
+            'price_range': {'min_price': min_price, 'max_price': max_price},
+            'price_histogram': [
+                {
+                    'min_price': edges[index],
+                    'max_price': edges[index + 1] if index + 1 < len(edges) else None,
+                    'count': count,
+                }
+                for index, count in enumerate(histogram)
+            ],
+        }
+
+    @staticmethod
+    def get_facets(queryset, category: str = '', cacheable: bool = False) -> Dict[str, Any]:
+        """
+        Get facets for a product result set
+
+        Args:
+            queryset: Product queryset with every filter except category applied
+            category: Selected category or ''
+            cacheable: True when the queryset is the whole catalog, so the rows
+                can be shared by every category page until the catalog changes
+
+        Returns:
+            Facet dictionary from ``summarize``
+        """
+        rows = None
+        key = None
+        if cacheable:
+            key = FacetService.get_catalog_cache_key()
+            try:
+                rows = CacheService.get(key)
+            except Exception as e:
+                logger.warning(f"Error reading cached facets: {str(e)}")
+        if rows is None:
+            started = time.monotonic()
+            rows = FacetService.compute_rows(queryset)
+            if key is not None:
+                try:
+                    CacheService.set(key, rows, CacheService.LONG_TIMEOUT, compute_time=time.monotonic() - started)
+                except Exception as e:
+                    logger.warning(f"Error caching facets: {str(e)}")
+        return FacetService.summarize(rows, category)
+
+# Singleton instance
+facet_service = FacetService()
@@ -0,0 +1,110 @@
+"""
+Idempotency Service Module
+Replays the first result of a request retried with the same idempotency key
+"""
+
+import hashlib
+import logging
+import time
+from typing import Any, Callable, Optional
+from django.conf import settings
+from django.core.cache import cache
+from store.services.cache_service import CacheService
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyConflictError(Exception):
+    """Raised when a request with the same key is still being processed"""
+
+
+class IdempotencyService:
+    """Service class for idempotent order and payment operations"""
+
+    DEFAULT_WINDOW = 60 * 60 * 24  # Stored results are replayed for 24 hours
+    LOCK_TIMEOUT = 30              # Upper bound on one in-flight operation
+    LOCK_WAIT = 5                  # How long a duplicate waits for the first result
+    POLL_INTERVAL = 0.05
+
+    @staticmethod
+    def get_key_from_request(request) -> Optional[str]:
+        """Read the key from the Idempotency-Key header or the idempotency_key form field"""
+        key = request.META.get('HTTP_IDEMPOTENCY_KEY') or request.POST.get('idempotency_key') or ''
+        return key.strip() or None
+
+    @staticmethod
+    def get_record_key(scope: str, idempotency_key: str, owner: Any = '') -> str:
+        # Client keys are hashed so arbitrary input cannot produce oversized cache keys
+        digest = hashlib.sha256(f"{owner}:{idempotency_key}".encode('utf-8')).hexdigest()
+        return CacheService.get_cache_key(f'idempotency_{scope}', digest)
+
+    @staticmethod
+    def execute(scope: str, idempotency_key: Optional[str], operation: Callable[[], Any],
+                owner: Any = '', window: Optional[int] = None) -> Any:
+        """
+        Run an operation at most once per idempotency key
+
+        The first result is stored for the replay window and returned to every
+        retry. Concurrent duplicates wait on a short lock for that result.
+        Exceptions are not stored, so a failed operation can be retried.
+
+        Args:
+            scope: Operation name, e.g. 'create_order'
+            idempotency_key: Client supplied key; None runs the operation directly
+            operation: Zero-argument callable performing the operation
+            owner: User id or session key the key belongs to
+            window: Replay window in seconds, defaults to STORE_IDEMPOTENCY_WINDOW
+
+        Returns:
+            Result of the first execution of the operation
+
+        Raises:
+            IdempotencyConflictError: If the first request is still running after LOCK_WAIT
+        """
+        if not idempotency_key:
+            return operation()
+
+        record_key = IdempotencyService.get_record_key(scope, idempotency_key, owner)
+        lock_key = f"{record_key}_lock"
+        window = window or getattr(settings, 'STORE_IDEMPOTENCY_WINDOW', IdempotencyService.DEFAULT_WINDOW)
+
+        try:
+            record = cache.get(record_key)
+            if record is not None:
+                logger.info(f"Replaying stored result for {scope} idempotency key")
+                return record['result']
+
+            deadline = time.monotonic() + IdempotencyService.LOCK_WAIT
+            while not cache.add(lock_key, 1, IdempotencyService.LOCK_TIMEOUT):
+                if time.monotonic() >= deadline:
+                    raise IdempotencyConflictError(f"{scope} request with this key is still in progress")
+                time.sleep(IdempotencyService.POLL_INTERVAL)
+                record = cache.get(record_key)
+                if record is not None:
+                    return record['result']
+        except IdempotencyConflictError:
+            raise
+        except Exception as e:
+            # Without the cache we cannot deduplicate, but the operation must still run
+            logger.warning(f"Idempotency cache unavailable for {scope}: {str(e)}")
+            return operation()
+
+        try:
+            # The first request may have finished between our read and taking the lock
+            record = cache.get(record_key)
+            if record is not None:
+                return record['result']
+            result = operation()
+            try:
+                cache.set(record_key, {'result': result}, window)
+            except Exception as e:
+                logger.warning(f"Error storing idempotent result for {scope}: {str(e)}")
+            return result
+        finally:
+            try:
+                cache.delete(lock_key)
+            except Exception as e:
+                logger.warning(f"Error releasing idempotency lock for {scope}: {str(e)}")
+
+# Singleton instance
+idempotency_service = IdempotencyService()
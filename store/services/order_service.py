@@ -5,17 +5,133 @@ Contains business logic for order management
 
 from django.apps import apps
 from django.db import transaction
+from django.db.models import F, Q
 from decimal import Decimal
+from store.services.idempotency_service import idempotency_service
+from store.services.popularity_service import PopularityService
+from store.services.rollup_service import RollupService
+from store.utils import statistics
 import logging
 
 logger = logging.getLogger(__name__)
 
+ORDER_STATISTICS = statistics.Statistics({
+    'total_orders': statistics.count('store.Order'),
+    'pending_orders': statistics.count('store.Order', Q(status='pending')),
+    'processing_orders': statistics.count('store.Order', Q(status='processing')),
+    'shipped_orders': statistics.count('store.Order', Q(status='shipped')),
+    'delivered_orders': statistics.count('store.Order', Q(status='delivered')),
+    'cancelled_orders': statistics.count('store.Order', Q(status='cancelled')),
+    'returned_orders': statistics.count('store.Order', Q(status='returned')),
+    'total_revenue': statistics.total(
+        'store.Order', 'total_amount', Q(status='delivered'), default=Decimal('0.00')
+    ),
+})
+
+class InsufficientStockError(ValueError):
+    """Raised when an order line asks for more stock than is available"""
+    
+    def __init__(self, product_id, requested):
+        self.product_id = product_id
+        self.requested = requested
+        super().__init__(f"Insufficient stock for product {product_id}: requested {requested}")
+
+
 class OrderService:
     """Service class for order-related operations"""
     
     @staticmethod
-    @transaction.atomic
-    def create_order(user, cart_items, shipping_address, payment_method='cash_on_delivery'):
+    def decrement_stock(quantities, record_sale=False):
+        """
+        Decrement stock for several products with conditional updates
+        
+        Each product is updated with a single
+        ``UPDATE ... SET stock_quantity = stock_quantity - qty WHERE stock_quantity >= qty``
+        so concurrent checkouts can never oversell or lose an update. Products
+        are updated in primary key order to keep lock ordering consistent.
+        Must be called inside a transaction so a failure rolls back earlier lines.
+        
+        Args:
+            quantities: Dictionary mapping product ID to quantity to remove
+            record_sale: Also add the quantities to the products' sales
+                counters in the same UPDATE
+            
+        Raises:
+            InsufficientStockError: If any product does not have enough stock
+        """
+        Product = apps.get_model('store', 'Product')
+        exponent = PopularityService.get_decay_exponent() if record_sale else None
+        
+        for product_id in sorted(quantities):
+            quantity = quantities[product_id]
+            changes = {'stock_quantity': F('stock_quantity') - quantity}
+            if record_sale:
+                changes.update(PopularityService.get_counter_changes(quantity, exponent))
+            updated = Product.objects.filter(
+                pk=product_id,
+                stock_quantity__gte=quantity
+            ).update(**changes)
+            if not updated:
+                raise InsufficientStockError(product_id, quantity)
+    
+    @staticmethod
+    def place_order(user, cart_items, **order_fields):
+        """
+        Create an order, its items and the stock decrements in one transaction
+        
+        Stock is decremented first so an oversell fails fast before any
+        order rows are written; items are inserted with a single bulk_create.
+        The same UPDATE that decrements stock also bumps the sales counters,
+        and the items are added to the sales rollups in the same transaction.
+        
+        Args:
+            user: Django User object or None for guest checkout
+            cart_items: List of cart items with 'product' and 'quantity'
+            **order_fields: Extra Order fields (total_amount, shipping_address, ...)
+            
+        Returns:
+            Order object
+            
+        Raises:
+            ValueError: If the cart is empty
+            InsufficientStockError: If any product does not have enough stock
+        """
+        Order = apps.get_model('store', 'Order')
+        OrderItem = apps.get_model('store', 'OrderItem')
+        
+        if not cart_items:
+            raise ValueError("Cannot create an order without items")
+        
+        # Merge lines for the same product into a single decrement
+        quantities = {}
+        for item in cart_items:
+            product_id = item['product'].pk
+            quantities[product_id] = quantities.get(product_id, 0) + int(item['quantity'])
+        
+        with transaction.atomic():
+            OrderService.decrement_stock(quantities, record_sale=True)
+            
+            order = Order.objects.create(user=user, **order_fields)
+            items = OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=item['product'],
+                    quantity=item['quantity'],
+                    price=item['product'].price
+                )
+                for item in cart_items
+            ])
+            # bulk_create sends no signals
+            RollupService.record_order_items(order, items)
+        
+        # Keep the in-memory products in line with the database
+        for item in cart_items:
+            item['product'].stock_quantity -= int(item['quantity'])
+        
+        return order
+    
+    @staticmethod
+    def create_order(user, cart_items, shipping_address, payment_method='cash_on_delivery', idempotency_key=None):
         """
         Create an order from cart items
         
@@ -24,48 +140,39 @@ class OrderService:
             cart_items: List of cart items
             shipping_address: Dictionary with address details
             payment_method: String representing payment method
+            idempotency_key: Optional client key; retries with the same key
+                return the order created by the first call
             
         Returns:
             Order object
         """
         Order = apps.get_model('store', 'Order')
-        OrderItem = apps.get_model('store', 'OrderItem')
-        Product = apps.get_model('store', 'Product')
-        
+        created = {}
         try:
-            # Calculate total amount
-            total_amount = sum(item['total_price'] for item in cart_items)
-            
-            # Create order
-            order = Order.objects.create(
-                user=user,
-                total_amount=total_amount,
-                shipping_address=f"{shipping_address.get('address', '')}, "
-                               f"{shipping_address.get('city', '')}, "
-                               f"{shipping_address.get('state', '')}",
-                phone_number=shipping_address.get('phone', ''),
-                status='pending',
-                payment_method=payment_method
-            )
-            
-            # Create order items and update stock
-            for item in cart_items:
-                product = item['product']
+            def place():
+                # Calculate total amount
+                total_amount = sum(item['total_price'] for item in cart_items)
                 
-                # Create order item
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=item['quantity'],
-                    price=product.price
+                order = OrderService.place_order(
+                    user,
+                    cart_items,
+                    total_amount=total_amount,
+                    shipping_address=f"{shipping_address.get('address', '')}, "
+                                   f"{shipping_address.get('city', '')}, "
+                                   f"{shipping_address.get('state', '')}",
+                    phone_number=shipping_address.get('phone', ''),
+                    status='pending'
                 )
                 
-                # Update product stock
-                product.stock_quantity -= item['quantity']
-                product.save()
+                logger.info(f"Order {order.id} created successfully for user {getattr(user, 'username', None)}")
+                created['order'] = order
+                return order.id
             
-            logger.info(f"Order {order.id} created successfully for user {user.username}")
-            return order
+            # Only the order id is stored, so a replay reloads the current order
+            order_id = idempotency_service.execute(
+                'order_service_create_order', idempotency_key, place, owner=getattr(user, 'id', '')
+            )
+            return created.get('order') or Order.objects.get(pk=order_id)
             
         except Exception as e:
             logger.error(f"Error creating order: {str(e)}")
@@ -154,31 +261,7 @@ class OrderService:
         Returns:
             Dictionary with order statistics
         """
-        Order = apps.get_model('store', 'Order')
-        
-        total_orders = Order.objects.count()
-        pending_orders = Order.objects.filter(status='pending').count()
-        processing_orders = Order.objects.filter(status='processing').count()
-        shipped_orders = Order.objects.filter(status='shipped').count()
-        delivered_orders = Order.objects.filter(status='delivered').count()
-        cancelled_orders = Order.objects.filter(status='cancelled').count()
-        returned_orders = Order.objects.filter(status='returned').count()
-        
-        # Calculate revenue
-        total_revenue = Order.objects.filter(status='delivered').aggregate(
-            total=models.Sum('total_amount')
-        )['total'] or Decimal('0.00')
-        
-        return {
-            'total_orders': total_orders,
-            'pending_orders': pending_orders,
-            'processing_orders': processing_orders,
-            'shipped_orders': shipped_orders,
-            'delivered_orders': delivered_orders,
-            'cancelled_orders': cancelled_orders,
-            'returned_orders': returned_orders,
-            'total_revenue': total_revenue
-        }
+        return ORDER_STATISTICS.evaluate()
 
 # Singleton instance
 order_service = OrderService()
\ No newline at end of file
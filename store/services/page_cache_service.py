@@ -0,0 +1,176 @@
+"""
+Page Cache Service Module
+Full-page response cache for anonymous catalog traffic
+"""
+
+import hashlib
+import logging
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import translation
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from .cache_service import CacheService
+from .currency_service import CurrencyService
+
+logger = logging.getLogger(__name__)
+
+
+class PageCacheService:
+    """Service class for caching rendered pages of anonymous visitors"""
+
+    KEY_PREFIX = 'page_cache'
+
+    DEFAULT_TIMEOUT = CacheService.SHORT_TIMEOUT
+
+    # Rendered pages hold the visitor's CSRF token; it is swapped for this
+    # placeholder when stored and for the current visitor's token when served
+    CSRF_PLACEHOLDER = b'__page_cache_csrf_token__'
+    CSRF_TOKEN_PATTERN = re.compile(rb'name="csrfmiddlewaretoken" value="([A-Za-z0-9]+)"')
+
+    STATUS_HEADER = 'X-Page-Cache'
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return getattr(settings, 'STORE_PAGE_CACHE_ENABLED', True)
+
+    @staticmethod
+    def is_cacheable_request(request) -> bool:
+        """
+        Whether a request may be answered with a shared page
+
+        Only anonymous GET and HEAD requests of visitors without per-visitor
+        page state (a cart or pending flash messages) share pages.
+        """
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return False
+        session = getattr(request, 'session', None)
+        if session is not None and session.get('cart'):
+            return False
+        return not len(get_messages(request))
+
+    @staticmethod
+    def is_cacheable_response(response) -> bool:
+        if response.status_code != 200 or response.streaming or response.cookies:
+            return False
+        cache_control = response.get('Cache-Control', '')
+        return 'private' not in cache_control and 'no-store' not in cache_control
+
+    @staticmethod
+    def get_cache_key(request) -> str:
+        """
+        Generate the cache key of a page
+
+        Args:
+            request: HTTP request
+
+        Returns:
+            Key varying with path, query, language, display currency and catalog version
+        """
+        query = '&'.join(sorted(request.GET.urlencode().split('&')))
+        variant = '|'.join((
+            request.path,
+            query,
+            translation.get_language() or '',
+            CurrencyService.get_display_currency(request) or '',
+            str(CacheService.get_catalog_version()),
+        ))
+        digest = hashlib.sha256(variant.encode('utf-8')).hexdigest()[:32]
+        return CacheService.get_cache_key(PageCacheService.KEY_PREFIX, digest)
+
+    @staticmethod
+    def make_entry(response) -> Dict[str, Any]:
+        """Turn a rendered response into a storable entry with the CSRF token taken out"""
+        content = response.content
+        match = PageCacheService.CSRF_TOKEN_PATTERN.search(content)
+        if match:
+            content = content.replace(match.group(1), PageCacheService.CSRF_PLACEHOLDER)
+        return {
+            'content': content,
+            'content_type': response['Content-Type'],
+            'last_modified': int(time.time()),
+            'digest': hashlib.sha256(content).hexdigest(),
+        }
+
+    @staticmethod
+    def build_response(request, entry: Dict[str, Any], status: str) -> HttpResponse:
+        """
+        Build the response for a stored page, or 304 if the visitor's copy is current
+
+        The ETag covers the stored bytes and the visitor's CSRF secret, so it
+        changes whenever either would change the page this visitor gets.
+
+        Args:
+            request: HTTP request
+            entry: Entry from ``make_entry``
+            status: HIT or MISS, reported in the X-Page-Cache header
+
+        Returns:
+            HttpResponse
+        """
+        token = get_token(request).encode('ascii')
+        secret = request.META.get('CSRF_COOKIE', '')
+        etag = '"%s"' % hashlib.sha256(f"{entry['digest']}:{secret}".encode('utf-8')).hexdigest()[:32]
+
+        response = HttpResponse(
+            entry['content'].replace(PageCacheService.CSRF_PLACEHOLDER, token),
+            content_type=entry['content_type'],
+        )
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        response[PageCacheService.STATUS_HEADER] = status
+        # Pages carry a per-visitor token, so only the visitor may keep a
+        # copy, and must revalidate it
+        patch_cache_control(response, private=True, no_cache=True)
+        return get_conditional_response(
+            request, etag=etag, last_modified=entry['last_modified'], response=response
+        )
+
+    @staticmethod
+    def serve(request, render: Callable[[], Any], tags: Optional[Iterable[str]] = None,
+              timeout: Optional[int] = None) -> Any:
+        """
+        Answer a request from the page cache, rendering and storing the page on a miss
+
+        Args:
+            request: HTTP request
+            render: Function rendering the page
+            tags: Invalidation tags the page depends on
+            timeout: Seconds the page is kept
+
+        Returns:
+            Cached or rendered response
+        """
+        if not PageCacheService.is_enabled() or not PageCacheService.is_cacheable_request(request):
+            return render()
+        try:
+            key = PageCacheService.get_cache_key(request)
+            entry = CacheService.get_tagged(key, tags)
+        except Exception as e:
+            logger.error(f"Error reading page cache for {request.path}: {str(e)}")
+            return render()
+        if entry is not None:
+            return PageCacheService.build_response(request, entry, 'HIT')
+
+        response = render()
+        if not PageCacheService.is_cacheable_response(response):
+            return response
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        entry = PageCacheService.make_entry(response)
+        try:
+            CacheService.set_tagged(key, entry, timeout or PageCacheService.DEFAULT_TIMEOUT, tags)
+        except Exception as e:
+            logger.error(f"Error storing page cache for {request.path}: {str(e)}")
+        return PageCacheService.build_response(request, entry, 'MISS')
+
+# Singleton instance
+page_cache_service = PageCacheService()
@@ -0,0 +1,232 @@
+"""
+Popularity Service Module
+Maintains the denormalized sales counters stored on Product
+"""
+
+import logging
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, Optional
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, Sum, Value, When
+from django.db.models.functions import Abs, Greatest, Log, Power
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class PopularityService:
+    """Service class for product popularity counters"""
+
+    DEFAULT_HALF_LIFE_HOURS = 72
+
+    # Trending scores use forward decay: a sale at time t adds
+    # quantity * 2 ** ((t - epoch) / half_life). Every score shares the same
+    # decay factor, so ordering by the stored value ranks by decayed sales
+    # without rewriting rows as time passes. The factor itself grows without
+    # bound (past float range within years for short half-lives), so the
+    # stored value is log2 of the sum, which only grows linearly with time.
+    # 0 means no trending sales: every real score is positive after the epoch.
+    TRENDING_EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+    # A cancellation leaving less than this (in log2 units, about 7e-7 of the
+    # score) is a full cancellation, not rounding noise to keep
+    CANCEL_TOLERANCE = 1e-6
+
+    # Sales older than this many half-lives weigh under one millionth of a new one
+    TRENDING_HORIZON_HALF_LIVES = 20
+
+    @staticmethod
+    def get_half_life() -> timedelta:
+        hours = getattr(settings, 'STORE_TRENDING_HALF_LIFE_HOURS', PopularityService.DEFAULT_HALF_LIFE_HOURS)
+        return timedelta(hours=hours)
+
+    @staticmethod
+    def get_decay_exponent(when: Optional[datetime] = None) -> float:
+        """
+        Get the log2 of the forward-decay weight of a sale
+
+        Args:
+            when: Time of the sale, defaults to now
+
+        Returns:
+            Half-lives elapsed since TRENDING_EPOCH
+        """
+        when = when or timezone.now()
+        return (when - PopularityService.TRENDING_EPOCH) / PopularityService.get_half_life()
+
+    @staticmethod
+    def add_log2(first: float, second: float) -> float:
+        """Get log2(2 ** first + 2 ** second) without leaving float range"""
+        high, low = max(first, second), min(first, second)
+        return high + math.log2(1.0 + math.pow(2.0, low - high))
+
+    @staticmethod
+    def get_trending_score(product, now: Optional[datetime] = None) -> float:
+        """
+        Express a stored trending score as decayed units sold at ``now``
+
+        Args:
+            product: Product object
+            now: Reference time, defaults to now
+
+        Returns:
+            Units sold with each sale halved per elapsed half-life
+        """
+        if product.trending_score <= 0:
+            return 0.0
+        return math.pow(2.0, product.trending_score - PopularityService.get_decay_exponent(now))
+
+    @staticmethod
+    def get_counter_changes(quantity, exponent: float, sign: int = 1) -> Dict[str, Any]:
+        """
+        Build UPDATE expressions that add one order line to the counters
+
+        Counters never drop below zero so a cancellation of an order placed
+        before the last rebuild cannot corrupt them.
+
+        Args:
+            quantity: Units in the order, or a per-row expression
+            exponent: Decay exponent from ``get_decay_exponent``
+            sign: 1 for a placed order, -1 for a cancelled one
+
+        Returns:
+            Dictionary of field updates for ``QuerySet.update``
+        """
+        score = F('trending_score')
+        if isinstance(quantity, int):
+            line = Value(math.log2(quantity) + exponent, output_field=FloatField())
+        else:
+            line = Log(Value(2.0), quantity) + Value(exponent, output_field=FloatField())
+        if sign > 0:
+            # log2(2 ** score + 2 ** line)
+            trending = Greatest(score, line) + Log(Value(2.0), Value(1.0) + Power(Value(2.0), -Abs(score - line)))
+        else:
+            # log2(2 ** score - 2 ** line), or nothing once the line is all that is left
+            trending = Case(
+                When(
+                    trending_score__gt=line + Value(PopularityService.CANCEL_TOLERANCE),
+                    then=score + Log(Value(2.0), Value(1.0) - Power(Value(2.0), line - score)),
+                ),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+        return {
+            'units_sold': Greatest(F('units_sold') + quantity * sign, Value(0)),
+            'order_count': Greatest(F('order_count') + sign, Value(0)),
+            'trending_score': Greatest(trending, Value(0.0)),
+        }
+
+    @staticmethod
+    def record_sale(quantities: Dict[int, int], when: Optional[datetime] = None, sign: int = 1) -> int:
+        """
+        Add (or with ``sign=-1`` remove) one order's lines to the counters
+
+        All products are updated with a single UPDATE.
+
+        Args:
+            quantities: Dictionary mapping product ID to units in the order
+            when: Time the order was placed, defaults to now
+            sign: 1 for a placed order, -1 for a cancelled one
+
+        Returns:
+            Number of products updated
+        """
+        if not quantities:
+            return 0
+        Product = apps.get_model('store', 'Product')
+        exponent = PopularityService.get_decay_exponent(when)
+
+        quantity = Case(
+            *[When(pk=pk, then=Value(int(units))) for pk, units in quantities.items()],
+            output_field=IntegerField()
+        )
+        return Product.objects.filter(pk__in=list(quantities)).update(
+            **PopularityService.get_counter_changes(quantity, exponent, sign)
+        )
+
+    @staticmethod
+    def get_order_quantities(order) -> Dict[int, int]:
+        """
+        Get the units per product in an order
+
+        Args:
+            order: Order object
+
+        Returns:
+            Dictionary mapping product ID to quantity
+        """
+        OrderItem = apps.get_model('store', 'OrderItem')
+        return dict(
+            OrderItem.objects.filter(order=order, product__isnull=False)
+            .values_list('product')
+            .annotate(quantity=Sum('quantity'))
+            .order_by()
+        )
+
+    @staticmethod
+    def record_cancellation(order) -> int:
+        """
+        Remove a cancelled order's contribution from the counters
+
+        Args:
+            order: Order object
+
+        Returns:
+            Number of products updated
+        """
+        quantities = PopularityService.get_order_quantities(order)
+        return PopularityService.record_sale(quantities, when=order.created_at, sign=-1)
+
+    @staticmethod
+    def rebuild(batch_size: int = 1000) -> int:
+        """
+        Recompute every product's counters from order history
+
+        Args:
+            batch_size: Rows written per bulk update
+
+        Returns:
+            Number of products with sales
+        """
+        Product = apps.get_model('store', 'Product')
+        OrderItem = apps.get_model('store', 'OrderItem')
+
+        items = OrderItem.objects.exclude(order__status='cancelled').exclude(product__isnull=True)
+        counters = {}
+        for row in items.values('product').annotate(units=Sum('quantity')).order_by():
+            counters[row['product']] = {'units_sold': row['units'] or 0, 'order_count': 0, 'trending_score': 0.0}
+        for product_id, order_count in (
+            items.values_list('product').annotate(orders=Count('order', distinct=True)).order_by()
+        ):
+            counters[product_id]['order_count'] = order_count
+
+        horizon = timezone.now() - PopularityService.get_half_life() * PopularityService.TRENDING_HORIZON_HALF_LIVES
+        recent = items.filter(order__created_at__gte=horizon).values_list('product', 'quantity', 'order__created_at')
+        for product_id, quantity, created_at in recent.iterator(chunk_size=batch_size):
+            if quantity <= 0:
+                continue
+            line = math.log2(quantity) + PopularityService.get_decay_exponent(created_at)
+            score = counters[product_id]['trending_score']
+            counters[product_id]['trending_score'] = PopularityService.add_log2(score, line) if score else line
+
+        with transaction.atomic():
+            Product.objects.exclude(pk__in=list(counters)).exclude(
+                units_sold=0, order_count=0, trending_score=0
+            ).update(units_sold=0, order_count=0, trending_score=0)
+            products = []
+            for product in Product.objects.filter(pk__in=list(counters)).only('pk'):
+                for field, value in counters[product.pk].items():
+                    setattr(product, field, value)
+                products.append(product)
+            Product.objects.bulk_update(
+                products, ['units_sold', 'order_count', 'trending_score'], batch_size=batch_size
+            )
+
+        logger.info(f"Rebuilt popularity counters for {len(products)} products")
+        return len(products)
+
+# Singleton instance
+popularity_service = PopularityService()
@@ -0,0 +1,238 @@
+"""
+Pricing Service Module
+Single-pass pricing pipeline for cart and checkout
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+from decimal import Decimal, ROUND_HALF_UP
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+from store.services.cache_service import CacheService
+from store.utils.coupon_utils import LOYALTY_DISCOUNT_PERCENTAGES
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+
+
+def _money(value) -> Decimal:
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def calculate_pricing(subtotal: Decimal, coupon: Optional[Dict[str, Any]] = None,
+                      loyalty_level: Optional[str] = None,
+                      reward_percentages: Iterable = (),
+                      tax_rate: Decimal = ZERO, shipping_cost: Decimal = ZERO,
+                      free_shipping_threshold: Optional[Decimal] = None,
+                      now=None) -> Dict[str, Any]:
+    """
+    Compute the full price breakdown for a cart in one pass.
+
+    This is a pure function: it performs no queries and only works on the
+    snapshots passed in, so it can be benchmarked and tested on its own.
+
+    Args:
+        subtotal: Sum of the cart line totals
+        coupon: Coupon snapshot from ``PricingService.get_coupon`` or None
+        loyalty_level: Loyalty level of the shopper or None
+        reward_percentages: Discount percentages of redeemed rewards
+        tax_rate: Tax rate in percent applied after discounts
+        shipping_cost: Flat shipping cost
+        free_shipping_threshold: Discounted subtotal above which shipping is free
+        now: Timestamp used to validate the coupon window
+
+    Returns:
+        Dictionary with subtotal, each discount, tax, shipping and total
+    """
+    subtotal = _money(subtotal)
+    now = now or timezone.now()
+
+    # Coupon discount
+    coupon_valid = False
+    coupon_discount = ZERO
+    if coupon:
+        coupon_valid = (
+            coupon['valid_from'] <= now <= coupon['valid_to']
+            and not (coupon['usage_limit'] and coupon['times_used'] >= coupon['usage_limit'])
+        )
+        if coupon_valid and subtotal >= coupon['minimum_amount']:
+            if coupon['discount_type'] == 'percentage':
+                coupon_discount = _money(subtotal * coupon['discount_value'] / 100)
+            else:  # fixed amount
+                coupon_discount = min(_money(coupon['discount_value']), subtotal)
+
+    # Loyalty discount
+    loyalty_discount = ZERO
+    loyalty_percentage = LOYALTY_DISCOUNT_PERCENTAGES.get(loyalty_level, 0)
+    if loyalty_percentage:
+        loyalty_discount = _money(subtotal * loyalty_percentage / 100)
+
+    # Redeemed rewards discount
+    rewards_discount = ZERO
+    for percentage in reward_percentages:
+        rewards_discount += _money(subtotal * Decimal(percentage) / 100)
+
+    total_discount = min(coupon_discount + loyalty_discount + rewards_discount, subtotal)
+    discounted_subtotal = subtotal - total_discount
+
+    # Tax and shipping apply to the discounted subtotal
+    tax_amount = _money(discounted_subtotal * Decimal(tax_rate) / 100)
+    shipping = _money(shipping_cost) if subtotal > ZERO else ZERO
+    if free_shipping_threshold is not None and discounted_subtotal >= Decimal(free_shipping_threshold):
+        shipping = ZERO
+
+    return {
+        'subtotal': subtotal,
+        'coupon': coupon if coupon_valid else None,
+        'coupon_discount': coupon_discount,
+        'loyalty_discount': loyalty_discount,
+        'rewards_discount': rewards_discount,
+        'total_discount': total_discount,
+        'tax_amount': tax_amount,
+        'shipping_cost': shipping,
+        'total': discounted_subtotal + tax_amount + shipping,
+    }
+
+
+class PricingService:
+    """Service class for cart and checkout pricing"""
+
+    # Coupons and loyalty levels change rarely but are read on every cart call
+    SNAPSHOT_TIMEOUT = 60
+    REQUEST_ATTR = '_store_pricing'
+
+    @staticmethod
+    def get_coupon_cache_key(coupon_id) -> str:
+        return CacheService.get_cache_key('pricing_coupon', str(coupon_id))
+
+    @staticmethod
+    def get_loyalty_cache_key(user_id: int) -> str:
+        return CacheService.get_cache_key('pricing_loyalty_level', user_id=user_id)
+
+    @staticmethod
+    def get_coupon(coupon_id) -> Optional[Dict[str, Any]]:
+        """
+        Get an active coupon snapshot from the short-lived cache
+
+        Args:
+            coupon_id: ID of the coupon stored in the session
+
+        Returns:
+            Coupon snapshot dictionary or None if it does not exist or is inactive
+        """
+        key = PricingService.get_coupon_cache_key(coupon_id)
+        tags = [f'coupon:{coupon_id}']
+        snapshot = PricingService._cache_get(key, tags)
+        if snapshot is None:
+            Coupon = apps.get_model('store', 'Coupon')
+            coupon = Coupon.objects.filter(id=coupon_id, active=True).first()
+            # Cache misses as an empty dict so invalid ids are not re-queried
+            snapshot = {}
+            if coupon is not None:
+                snapshot = {
+                    'id': coupon.id,
+                    'code': coupon.code,
+                    'discount_type': coupon.discount_type,
+                    'discount_value': coupon.discount_value,
+                    'minimum_amount': coupon.minimum_amount,
+                    'usage_limit': coupon.usage_limit,
+                    'times_used': coupon.times_used,
+                    'valid_from': coupon.valid_from,
+                    'valid_to': coupon.valid_to,
+                }
+            PricingService._cache_set(key, snapshot, tags)
+        return snapshot or None
+
+    @staticmethod
+    def get_loyalty_level(user) -> Optional[str]:
+        """
+        Get the loyalty level of a user from the short-lived cache
+
+        Args:
+            user: Django User object
+
+        Returns:
+            Loyalty level string or None for anonymous users or non-members
+        """
+        if user is None or not user.is_authenticated:
+            return None
+        key = PricingService.get_loyalty_cache_key(user.id)
+        tags = [f'loyalty:{user.id}']
+        level = PricingService._cache_get(key, tags)
+        if level is None:
+            LoyaltyProgram = apps.get_model('store', 'LoyaltyProgram')
+            level = LoyaltyProgram.objects.filter(user=user).values_list('level', flat=True).first() or ''
+            PricingService._cache_set(key, level, tags)
+        return level or None
+
+    @staticmethod
+    def _cache_get(key: str, tags: List[str]) -> Any:
+        try:
+            # Served from the in-process tier when hot; tags expire it everywhere
+            return CacheService.get_tagged(key, tags)
+        except Exception as e:
+            # Pricing must keep working when the cache is unavailable
+            logger.warning(f"Pricing cache read failed for key {key}: {str(e)}")
+            return None
+
+    @staticmethod
+    def _cache_set(key: str, value: Any, tags: List[str]) -> None:
+        try:
+            CacheService.set_tagged(key, value, PricingService.SNAPSHOT_TIMEOUT, tags)
+        except Exception as e:
+            logger.warning(f"Pricing cache write failed for key {key}: {str(e)}")
+
+    @staticmethod
+    def invalidate_coupon(coupon_id) -> None:
+        CacheService.invalidate_tags(f'coupon:{coupon_id}')
+
+    @staticmethod
+    def invalidate_loyalty(user_id: int) -> None:
+        CacheService.invalidate_tags(f'loyalty:{user_id}')
+
+    @staticmethod
+    def get_reward_percentages(session) -> list:
+        """Get discount percentages of the rewards redeemed in this session"""
+        percentages = []
+        for reward_data in session.get('rewards', []):
+            if reward_data.get('type') == 'discount' and reward_data.get('discount_percentage'):
+                percentages.append(Decimal(reward_data['discount_percentage']))
+        return percentages
+
+    @staticmethod
+    def price_request(request, priced_cart) -> Dict[str, Any]:
+        """
+        Price the request's cart once, reusing the result for the rest of the request
+
+        Args:
+            request: Django request carrying the session coupon, rewards and user
+            priced_cart: PricedCart returned by ``Cart.priced()``
+
+        Returns:
+            Price breakdown from ``calculate_pricing``
+        """
+        coupon_id = request.session.get('coupon_id')
+        memo = getattr(request, PricingService.REQUEST_ATTR, None)
+        if memo is not None and memo[0] is priced_cart and memo[1] == coupon_id:
+            return memo[2]
+
+        coupon = PricingService.get_coupon(coupon_id) if coupon_id is not None else None
+        loyalty_level = PricingService.get_loyalty_level(getattr(request, 'user', None))
+
+        pricing = calculate_pricing(
+            priced_cart.subtotal,
+            coupon=coupon,
+            loyalty_level=loyalty_level,
+            reward_percentages=PricingService.get_reward_percentages(request.session),
+            tax_rate=Decimal(str(getattr(settings, 'STORE_TAX_RATE', '0'))),
+            shipping_cost=Decimal(str(getattr(settings, 'STORE_SHIPPING_COST', '0'))),
+            free_shipping_threshold=getattr(settings, 'STORE_FREE_SHIPPING_THRESHOLD', None),
+        )
+        setattr(request, PricingService.REQUEST_ATTR, (priced_cart, coupon_id, pricing))
+        return pricing
+
+# Singleton instance
+pricing_service = PricingService()
@@ -7,12 +7,25 @@ import logging
 from typing import Dict, Any, List, Optional
 from django.apps import apps
 from django.db import transaction
-from django.db.models import Count, Sum, Avg, Q, F
+from django.db.models import Sum, Avg, Q, F
 from decimal import Decimal
 from datetime import datetime, timedelta
+from store.services.search_service import search_service
+from store.utils import statistics
 
 logger = logging.getLogger(__name__)
 
+DASHBOARD_STATISTICS = statistics.Statistics({
+    'total_products': statistics.count('store.Product'),
+    # Products have no review state of their own; they follow their seller's verification
+    'pending_products': statistics.count('store.Product', Q(seller__userprofile__verification_status='pending')),
+    'rejected_products': statistics.count('store.Product', Q(seller__userprofile__verification_status='rejected')),
+    'total_orders': statistics.count('store.Order'),
+    'pending_orders': statistics.count('store.Order', Q(status='pending')),
+    'total_sellers': statistics.count('store.UserProfile', Q(role='seller')),
+    'total_profits': statistics.total('store.Commission', 'amount'),
+})
+
 class ProductService:
     """Service class for product-related operations"""
     
@@ -77,7 +90,7 @@ class ProductService:
     
     @staticmethod
     def search_products(query: str = '', category: str = '', min_price: Optional[Decimal] = None, 
-                       max_price: Optional[Decimal] = None, sort_by: str = 'name') -> List:
+                       max_price: Optional[Decimal] = None, sort_by: Optional[str] = None) -> List:
         """
         Search products with filters and optimized queries
         
@@ -86,7 +99,7 @@ class ProductService:
             category: Product category
             min_price: Minimum price filter
             max_price: Maximum price filter
-            sort_by: Sorting criteria
+            sort_by: Sorting criteria, defaults to relevance for queries and name otherwise
             
         Returns:
             List of products matching criteria
@@ -98,13 +111,12 @@ class ProductService:
             # Start with all products with optimized queries
             products = Product.objects.select_related('seller')
             
-            # Apply search query
+            if not sort_by:
+                sort_by = 'relevance' if query else 'name'
+            
+            # Apply search query through the full-text index
             if query:
-                products = products.filter(
-                    Q(name__icontains=query) | 
-                    Q(description__icontains=query) |
-                    Q(seo_keywords__icontains=query)
-                )
+                products = search_service.filter_queryset(products, query)
             
             # Apply category filter
             if category:
@@ -124,9 +136,9 @@ class ProductService:
             elif sort_by == 'name':
                 products = products.order_by('name')
             elif sort_by == 'popularity':
-                products = products.annotate(
-                    order_count=Count('orderitem')
-                ).order_by('-order_count')
+                products = products.order_by('-order_count')
+            elif sort_by == 'relevance' and query:
+                products = search_service.rank(products, query)
             
             return products
             
@@ -208,22 +220,9 @@ class ProductService:
         try:
             Product = apps.get_model('store', 'Product')
             Order = apps.get_model('store', 'Order')
-            UserProfile = apps.get_model('store', 'UserProfile')
-            Commission = apps.get_model('store', 'Commission')
-            OrderItem = apps.get_model('store', 'OrderItem')
             
-            # Get counts with optimized queries
-            total_products = Product.objects.count()
-            total_orders = Order.objects.count()
-            pending_orders = Order.objects.filter(status='pending').count()
-            total_sellers = UserProfile.objects.filter(role='seller').count()
-            
-            # Calculate total profits from commissions
-            total_profits = Commission.objects.aggregate(total=Sum('amount'))['total'] or 0
-            
-            # Get pending/rejected products
-            pending_products = Product.objects.filter(verification_status='pending').count()
-            rejected_products = Product.objects.filter(verification_status='rejected').count()
+            # One query per table for all counts and totals
+            counts = DASHBOARD_STATISTICS.evaluate()
             
             # Get recent orders with optimized queries
             recent_orders = Order.objects.select_related(
@@ -242,13 +241,13 @@ class ProductService:
             return {
                 'success': True,
                 'data': {
-                    'total_products': total_products,
-                    'total_orders': total_orders,
-                    'pending_orders': pending_orders,
-                    'total_sellers': total_sellers,
-                    'total_profits': total_profits,
-                    'pending_products': pending_products,
-                    'rejected_products': rejected_products,
+                    'total_products': counts['total_products'],
+                    'total_orders': counts['total_orders'],
+                    'pending_orders': counts['pending_orders'],
+                    'total_sellers': counts['total_sellers'],
+                    'total_profits': counts['total_profits'],
+                    'pending_products': counts['pending_products'],
+                    'rejected_products': counts['rejected_products'],
                     'recent_orders': [
                         {
                             'id': order.id,
@@ -0,0 +1,179 @@
+"""
+Rating Service Module
+Maintains per-product rating summaries so pages read ratings without aggregating reviews
+"""
+
+import logging
+from typing import Any, Dict, Iterable, Optional, Tuple
+from django.apps import apps
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Greatest
+
+logger = logging.getLogger(__name__)
+
+# Both review systems feed the same summary
+REVIEW_MODELS = ('Review', 'EnhancedReview')
+
+RATING_VALUES = range(1, 6)
+
+# (product_id, rating, is_verified_purchase) of one review
+ReviewState = Tuple[int, int, bool]
+
+
+class RatingService:
+    """Service class for product rating summaries"""
+
+    @staticmethod
+    def get_review_state(review) -> Optional[ReviewState]:
+        """
+        Get the part of a review that the summary depends on
+
+        Args:
+            review: Review or EnhancedReview object
+
+        Returns:
+            Tuple of (product_id, rating, is_verified_purchase), or None for
+            a review without a product or with an out-of-range rating
+        """
+        try:
+            rating = int(review.rating)
+        except (TypeError, ValueError):
+            return None
+        if review.product_id is None or rating not in RATING_VALUES:
+            return None
+        return review.product_id, rating, bool(review.is_verified_purchase)
+
+    @staticmethod
+    def apply_change(old_state: Optional[ReviewState], new_state: Optional[ReviewState]) -> None:
+        """
+        Move one review between summary buckets with relative UPDATEs
+
+        Args:
+            old_state: State before the change, None for a new review
+            new_state: State after the change, None for a deleted review
+        """
+        if old_state == new_state:
+            return
+        ProductRatingSummary = apps.get_model('store', 'ProductRatingSummary')
+
+        deltas = {}
+        for state, sign in ((old_state, -1), (new_state, 1)):
+            if state is None:
+                continue
+            product_id, rating, verified = state
+            fields = deltas.setdefault(product_id, {})
+            for field, value in (
+                ('review_count', 1),
+                ('rating_total', rating),
+                (f'rating_{rating}_count', 1),
+                ('verified_count', int(verified)),
+            ):
+                fields[field] = fields.get(field, 0) + sign * value
+
+        with transaction.atomic():
+            for product_id, fields in deltas.items():
+                changes = {
+                    field: Greatest(F(field) + delta, Value(0))
+                    for field, delta in fields.items() if delta
+                }
+                if not changes:
+                    continue
+                summaries = ProductRatingSummary.objects.filter(product_id=product_id)
+                if not summaries.update(**changes):
+                    # Nothing to remove from a missing summary (e.g. its product is being deleted)
+                    if fields['review_count'] <= 0:
+                        continue
+                    ProductRatingSummary.objects.get_or_create(product_id=product_id)
+                    summaries.update(**changes)
+                # Separate statement so the average sees the updated totals on every backend
+                summaries.update(average=Case(
+                    When(review_count=0, then=Value(0.0)),
+                    default=Cast('rating_total', FloatField()) / Cast('review_count', FloatField()),
+                    output_field=FloatField()
+                ))
+
+    @staticmethod
+    def get_summary(product) -> Dict[str, Any]:
+        """
+        Get the rating summary of a product
+
+        Args:
+            product: Product object, ideally loaded with select_related('rating_summary')
+
+        Returns:
+            Dictionary with average_rating, review_count, verified_count and rating_distribution
+        """
+        try:
+            summary = product.rating_summary
+        except ObjectDoesNotExist:
+            summary = None
+        if summary is None:
+            return {
+                'average_rating': 0,
+                'review_count': 0,
+                'verified_count': 0,
+                'rating_distribution': {rating: 0 for rating in RATING_VALUES},
+            }
+        return {
+            'average_rating': summary.average,
+            'review_count': summary.review_count,
+            'verified_count': summary.verified_count,
+            'rating_distribution': summary.distribution,
+        }
+
+    @staticmethod
+    def rebuild(product_ids: Optional[Iterable[int]] = None, batch_size: int = 1000) -> int:
+        """
+        Recompute rating summaries from the review tables
+
+        Args:
+            product_ids: Products to rebuild, or None for the whole catalog
+            batch_size: Rows written per bulk insert
+
+        Returns:
+            Number of summaries written
+        """
+        ProductRatingSummary = apps.get_model('store', 'ProductRatingSummary')
+        if product_ids is not None:
+            product_ids = list(product_ids)
+
+        aggregates = {
+            'review_count': Count('pk'),
+            'rating_total': Sum('rating'),
+            'verified_count': Count('pk', filter=Q(is_verified_purchase=True)),
+        }
+        for rating in RATING_VALUES:
+            aggregates[f'rating_{rating}_count'] = Count('pk', filter=Q(rating=rating))
+
+        totals = {}
+        for model_name in REVIEW_MODELS:
+            reviews = apps.get_model('store', model_name).objects.filter(rating__in=RATING_VALUES)
+            if product_ids is not None:
+                reviews = reviews.filter(product_id__in=product_ids)
+            for row in reviews.values('product').annotate(**aggregates).order_by():
+                fields = totals.setdefault(row.pop('product'), {})
+                for field, value in row.items():
+                    fields[field] = fields.get(field, 0) + (value or 0)
+
+        summaries = [
+            ProductRatingSummary(
+                product_id=product_id,
+                average=fields['rating_total'] / fields['review_count'],
+                **fields
+            )
+            for product_id, fields in totals.items()
+        ]
+        with transaction.atomic():
+            existing = ProductRatingSummary.objects.all()
+            if product_ids is not None:
+                existing = existing.filter(product_id__in=product_ids)
+            existing.delete()
+            ProductRatingSummary.objects.bulk_create(summaries, batch_size=batch_size)
+
+        logger.info(f"Rebuilt {len(summaries)} product rating summaries")
+        return len(summaries)
+
+# Singleton instance
+rating_service = RatingService()
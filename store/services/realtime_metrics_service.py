@@ -0,0 +1,420 @@
+"""
+Realtime Metrics Service Module
+Sliding-window counters for the live dashboard, kept in fixed-size ring buffers
+"""
+
+import functools
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from django.conf import settings
+from django.core.cache import cache
+from store.utils.hyperloglog import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+
+class RingBuffer:
+    """
+    A fixed number of time buckets, each reused once the time it covered has passed
+
+    Buckets are numbered by epoch (``int(timestamp // resolution)``) so that
+    every process agrees on them and a bucket left over from an earlier lap
+    of the ring is recognised and reset rather than counted.
+    """
+
+    __slots__ = ('resolution', 'size', 'factory', 'epochs', 'values')
+
+    def __init__(self, resolution: int, size: int, factory=int):
+        """
+        Args:
+            resolution: Seconds covered by one bucket
+            size: Number of buckets kept
+            factory: Empty bucket value; int for counters, a sketch for distinct members
+        """
+        self.resolution = resolution
+        self.size = size
+        self.factory = factory
+        self.epochs = [-1] * size
+        self.values: List[Any] = [None] * size
+
+    def get_epochs(self, seconds: int, now: float) -> range:
+        """Get the buckets covering the last ``seconds``, the current partial bucket included"""
+        last = int(now // self.resolution)
+        count = min(self.size, max(1, math.ceil(seconds / self.resolution)))
+        return range(last - count + 1, last + 1)
+
+    def add(self, value, now: float) -> int:
+        """
+        Add to the bucket holding ``now``
+
+        Returns:
+            The bucket's epoch
+        """
+        epoch = int(now // self.resolution)
+        position = epoch % self.size
+        if self.epochs[position] != epoch:
+            self.epochs[position] = epoch
+            self.values[position] = self.factory()
+        if self.factory is int:
+            self.values[position] += value
+        else:
+            self.values[position].add(value)
+        return epoch
+
+    def get(self, epoch: int):
+        position = epoch % self.size
+        if self.epochs[position] != epoch:
+            return self.factory()
+        return self.values[position]
+
+
+class RealtimeMetricsService:
+    """Service class for live dashboard counters, updated on write and read without the database"""
+
+    # Per-second buckets answer the last few minutes exactly
+    SECOND_BUCKETS = 300
+    # Per-minute buckets answer the last hour; one extra for the current partial minute
+    MINUTE_BUCKETS = 61
+
+    # A background thread adds process deltas to the shared buckets this often
+    FLUSH_INTERVAL = 5
+
+    # Active members are counted with one 1 KiB HyperLogLog sketch per minute
+    # (about 3% error), so reads merge sketches instead of member sets
+    MEMBER_PRECISION = 10
+
+    SHARED_PREFIX = 'realtime'
+
+    # Seconds the live dashboard's top products are reused before being recounted
+    TOP_PRODUCTS_TIMEOUT = 60
+
+    # Dashboard windows in seconds
+    WINDOWS = {'1min': 60, '15min': 15 * 60, '1hr': 60 * 60}
+
+    _counters: Dict[str, Dict[int, RingBuffer]] = {}
+    _members: Dict[str, RingBuffer] = {}
+    _unflushed_counts: Dict[tuple, int] = defaultdict(int)
+    # Member buckets changed since the last flush, as (name, epoch)
+    _unflushed_members: set = set()
+    # This process's slot among the writers of each shared member bucket
+    _member_slots: Dict[tuple, int] = {}
+    _lock = threading.Lock()
+    _flusher: Optional[threading.Thread] = None
+    _flusher_pid: Optional[int] = None
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return getattr(settings, 'STORE_REALTIME_METRICS_ENABLED', True)
+
+    @staticmethod
+    def is_shared() -> bool:
+        return getattr(settings, 'STORE_REALTIME_METRICS_SHARED', True)
+
+    @staticmethod
+    def is_async() -> bool:
+        """Whether a background thread flushes, rather than only reads calling ``flush``"""
+        return getattr(settings, 'STORE_REALTIME_METRICS_ASYNC_FLUSH', True)
+
+    @staticmethod
+    def get_resolution(seconds: int) -> int:
+        """Get the finest bucket size whose ring covers a window"""
+        return 1 if seconds <= RealtimeMetricsService.SECOND_BUCKETS else 60
+
+    @staticmethod
+    def get_shared_key(name: str, resolution: int, epoch: int) -> str:
+        return f"{RealtimeMetricsService.SHARED_PREFIX}:{name}:{resolution}:{epoch}"
+
+    @staticmethod
+    def get_writers_key(name: str, epoch: int) -> str:
+        """Key counting the processes that wrote members to a shared minute bucket"""
+        return f"{RealtimeMetricsService.get_shared_key(name, 60, epoch)}:writers"
+
+    @staticmethod
+    def get_member_timeout() -> int:
+        return 60 * (RealtimeMetricsService.MINUTE_BUCKETS + 1)
+
+    @staticmethod
+    def _get_counter(name: str) -> Dict[int, RingBuffer]:
+        rings = RealtimeMetricsService._counters.get(name)
+        if rings is None:
+            rings = RealtimeMetricsService._counters[name] = {
+                1: RingBuffer(1, RealtimeMetricsService.SECOND_BUCKETS),
+                60: RingBuffer(60, RealtimeMetricsService.MINUTE_BUCKETS),
+            }
+        return rings
+
+    @staticmethod
+    def _get_members(name: str) -> RingBuffer:
+        ring = RealtimeMetricsService._members.get(name)
+        if ring is None:
+            ring = RealtimeMetricsService._members[name] = RingBuffer(
+                60, RealtimeMetricsService.MINUTE_BUCKETS,
+                functools.partial(HyperLogLog, RealtimeMetricsService.MEMBER_PRECISION)
+            )
+        return ring
+
+    @staticmethod
+    def ensure_flusher() -> None:
+        """Start this process's flush thread, again after a fork, so recording never waits on the cache"""
+        pid = os.getpid()
+        if RealtimeMetricsService._flusher_pid == pid:
+            return
+        if not (RealtimeMetricsService.is_shared() and RealtimeMetricsService.is_async()):
+            return
+        with RealtimeMetricsService._lock:
+            if RealtimeMetricsService._flusher_pid == pid:
+                return
+            flusher = threading.Thread(target=RealtimeMetricsService.run_flusher, name='realtime-metrics', daemon=True)
+            RealtimeMetricsService._flusher = flusher
+            RealtimeMetricsService._flusher_pid = pid
+            flusher.start()
+
+    @staticmethod
+    def run_flusher() -> None:
+        """Flush every FLUSH_INTERVAL until the process exits"""
+        while True:
+            time.sleep(getattr(settings, 'STORE_REALTIME_METRICS_FLUSH_INTERVAL', RealtimeMetricsService.FLUSH_INTERVAL))
+            try:
+                RealtimeMetricsService.flush()
+            except Exception as e:
+                logger.error(f"Error in realtime metrics flush thread: {str(e)}")
+
+    @staticmethod
+    def record(name: str, value: int = 1, now: Optional[float] = None) -> None:
+        """
+        Add to a counter
+
+        Args:
+            name: Counter name (e.g. 'orders', 'events:page_view')
+            value: Amount added; integers only so shared buckets can be incremented
+            now: Time of the change, defaults to the current time
+        """
+        if not RealtimeMetricsService.is_enabled():
+            return
+        now = time.time() if now is None else now
+        with RealtimeMetricsService._lock:
+            for resolution, ring in RealtimeMetricsService._get_counter(name).items():
+                epoch = ring.add(value, now)
+                RealtimeMetricsService._unflushed_counts[(name, resolution, epoch)] += value
+        RealtimeMetricsService.ensure_flusher()
+
+    @staticmethod
+    def record_member(name: str, member, now: Optional[float] = None) -> None:
+        """
+        Note one member (a user or session) as active
+
+        Args:
+            name: Member kind (e.g. 'users', 'sessions')
+            member: User id or session key
+            now: Time of the activity, defaults to the current time
+        """
+        if not RealtimeMetricsService.is_enabled() or member is None:
+            return
+        now = time.time() if now is None else now
+        with RealtimeMetricsService._lock:
+            epoch = RealtimeMetricsService._get_members(name).add(member, now)
+            RealtimeMetricsService._unflushed_members.add((name, epoch))
+        RealtimeMetricsService.ensure_flusher()
+
+    @staticmethod
+    def record_event(event_type: str, user_id: Optional[int] = None, session_key: Optional[str] = None,
+                     now: Optional[float] = None) -> None:
+        """Count an analytics event and the user and session behind it"""
+        now = time.time() if now is None else now
+        RealtimeMetricsService.record('events', 1, now)
+        RealtimeMetricsService.record(f'events:{event_type}', 1, now)
+        RealtimeMetricsService.record_member('users', user_id, now)
+        RealtimeMetricsService.record_member('sessions', session_key, now)
+
+    @staticmethod
+    def record_order(now: Optional[float] = None) -> None:
+        """Count a placed order"""
+        RealtimeMetricsService.record('orders', 1, now)
+
+    @staticmethod
+    def record_revenue(amount: Decimal, now: Optional[float] = None) -> None:
+        """Add the amount of a delivered order, kept in cents"""
+        RealtimeMetricsService.record('revenue', int(Decimal(amount) * 100), now)
+
+    @staticmethod
+    def _get_member_key(name: str, epoch: int) -> str:
+        """
+        Get this process's key for a shared member bucket
+
+        Each process writes its sketch to its own key, numbered by an atomic
+        counter, so no process ever reads and rewrites another's sketch.
+        """
+        slot = RealtimeMetricsService._member_slots.get((name, epoch))
+        if slot is None:
+            writers_key = RealtimeMetricsService.get_writers_key(name, epoch)
+            cache.add(writers_key, 0, RealtimeMetricsService.get_member_timeout())
+            slot = RealtimeMetricsService._member_slots[(name, epoch)] = cache.incr(writers_key)
+        return f"{RealtimeMetricsService.get_shared_key(name, 60, epoch)}:{slot}"
+
+    @staticmethod
+    def flush() -> None:
+        """Add this process's bucket deltas since the last flush to the shared buckets"""
+        with RealtimeMetricsService._lock:
+            counts = RealtimeMetricsService._unflushed_counts
+            members = {
+                (name, epoch): RealtimeMetricsService._get_members(name).get(epoch).to_bytes()
+                for name, epoch in RealtimeMetricsService._unflushed_members
+            }
+            RealtimeMetricsService._unflushed_counts = defaultdict(int)
+            RealtimeMetricsService._unflushed_members = set()
+        if not RealtimeMetricsService.is_shared() or not (counts or members):
+            return
+        try:
+            for (name, resolution, epoch), delta in counts.items():
+                key = RealtimeMetricsService.get_shared_key(name, resolution, epoch)
+                ring_seconds = resolution * (
+                    RealtimeMetricsService.SECOND_BUCKETS if resolution == 1 else RealtimeMetricsService.MINUTE_BUCKETS
+                )
+                cache.add(key, 0, ring_seconds + resolution)
+                cache.incr(key, delta)
+            # The process's whole sketch is written, so a lost flush is repaired by the next one
+            cache.set_many({
+                RealtimeMetricsService._get_member_key(name, epoch): sketch
+                for (name, epoch), sketch in members.items()
+            }, RealtimeMetricsService.get_member_timeout())
+        except Exception as e:
+            logger.warning(f"Error flushing realtime metrics: {str(e)}")
+        if members:
+            oldest = min(epoch for _, epoch in members) - RealtimeMetricsService.MINUTE_BUCKETS
+            with RealtimeMetricsService._lock:
+                RealtimeMetricsService._member_slots = {
+                    key: slot for key, slot in RealtimeMetricsService._member_slots.items() if key[1] >= oldest
+                }
+
+    @staticmethod
+    def _get_shared(keys: Iterable[str]) -> Dict[str, Any]:
+        if not RealtimeMetricsService.is_shared():
+            return {}
+        try:
+            return cache.get_many(list(keys))
+        except Exception as e:
+            logger.warning(f"Error reading realtime metrics: {str(e)}")
+            return {}
+
+    @staticmethod
+    def get_totals(names: Sequence[str], windows: Optional[Dict[str, int]] = None,
+                   now: Optional[float] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Sum counters over sliding windows, one shared-cache read for all of them
+
+        Windows are rounded up to whole buckets: per-second ones up to the
+        second ring's span and per-minute ones beyond it.
+
+        Args:
+            names: Counter names
+            windows: Window lengths in seconds by label, defaults to WINDOWS
+            now: End of the windows, defaults to the current time
+
+        Returns:
+            Dictionary mapping counter name to its total by window label
+        """
+        windows = windows or RealtimeMetricsService.WINDOWS
+        now = time.time() if now is None else now
+        RealtimeMetricsService.flush()
+        with RealtimeMetricsService._lock:
+            rings = {name: RealtimeMetricsService._get_counter(name) for name in names}
+        epochs = {}
+        for label, seconds in windows.items():
+            resolution = RealtimeMetricsService.get_resolution(seconds)
+            epochs[label] = (resolution, rings[names[0]][resolution].get_epochs(seconds, now) if names else range(0))
+        keys = {
+            (name, resolution, epoch): RealtimeMetricsService.get_shared_key(name, resolution, epoch)
+            for name in names for resolution, window_epochs in epochs.values() for epoch in window_epochs
+        }
+        shared = RealtimeMetricsService._get_shared(keys.values())
+        totals = {}
+        for name in names:
+            totals[name] = {}
+            for label, (resolution, window_epochs) in epochs.items():
+                ring = rings[name][resolution]
+                # The shared bucket includes this process's flushed deltas unless the cache lost it
+                totals[name][label] = sum(
+                    max(ring.get(epoch), shared.get(keys[(name, resolution, epoch)], 0))
+                    for epoch in window_epochs
+                )
+        return totals
+
+    @staticmethod
+    def get_distinct_counts(names: Sequence[str], windows: Optional[Dict[str, int]] = None,
+                            now: Optional[float] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Count distinct active members over sliding windows of whole minutes
+
+        Each minute's sketches are merged once, and each window adds its extra
+        minutes to the next shorter window's sketch, so a read costs the same
+        however many members were active.
+
+        Args:
+            names: Member kinds
+            windows: Window lengths in seconds by label, defaults to WINDOWS
+            now: End of the windows, defaults to the current time
+
+        Returns:
+            Dictionary mapping member kind to its distinct count by window label
+        """
+        windows = windows or RealtimeMetricsService.WINDOWS
+        now = time.time() if now is None else now
+        RealtimeMetricsService.flush()
+        with RealtimeMetricsService._lock:
+            rings = {name: RealtimeMetricsService._get_members(name) for name in names}
+        epochs = {
+            label: rings[name].get_epochs(seconds, now) for name in names[:1] for label, seconds in windows.items()
+        }
+        buckets = {(name, epoch) for name in names for window_epochs in epochs.values() for epoch in window_epochs}
+        # One read for how many processes wrote each bucket, one for their sketches
+        writers_keys = {bucket: RealtimeMetricsService.get_writers_key(*bucket) for bucket in buckets}
+        writers = RealtimeMetricsService._get_shared(writers_keys.values())
+        member_keys = {
+            bucket: [
+                f"{RealtimeMetricsService.get_shared_key(bucket[0], 60, bucket[1])}:{slot}"
+                for slot in range(1, writers.get(writers_key, 0) + 1)
+            ]
+            for bucket, writers_key in writers_keys.items()
+        }
+        shared = RealtimeMetricsService._get_shared(key for keys in member_keys.values() for key in keys)
+        with RealtimeMetricsService._lock:
+            sketches = {
+                bucket: HyperLogLog(RealtimeMetricsService.MEMBER_PRECISION, rings[bucket[0]].get(bucket[1]).registers)
+                for bucket in buckets
+            }
+        for bucket, keys in member_keys.items():
+            for key in keys:
+                if key in shared:
+                    sketches[bucket].merge(HyperLogLog.from_bytes(shared[key]))
+        counts = {}
+        for name in names:
+            window_counts = {}
+            merged = HyperLogLog(RealtimeMetricsService.MEMBER_PRECISION)
+            merged_epochs = set()
+            # Every window ends at the current minute, so shorter ones are contained in longer ones
+            for label, window_epochs in sorted(epochs.items(), key=lambda item: len(item[1])):
+                for epoch in set(window_epochs) - merged_epochs:
+                    merged.merge(sketches[(name, epoch)])
+                merged_epochs.update(window_epochs)
+                window_counts[label] = merged.count()
+            counts[name] = {label: window_counts[label] for label in epochs}
+        return counts
+
+    @staticmethod
+    def reset() -> None:
+        """Empty this process's buffers; shared buckets expire on their own"""
+        with RealtimeMetricsService._lock:
+            RealtimeMetricsService._counters = {}
+            RealtimeMetricsService._members = {}
+            RealtimeMetricsService._unflushed_counts = defaultdict(int)
+            RealtimeMetricsService._unflushed_members = set()
+            RealtimeMetricsService._member_slots = {}
+
+# Singleton instance
+realtime_metrics_service = RealtimeMetricsService()
@@ -118,16 +118,11 @@ class RecommendationService:
     def _get_popular_products(self, num_recommendations=5):
         """Get popular products based on purchase count"""
         Product = apps.get_model('store', 'Product')
-        OrderItem = apps.get_model('store', 'OrderItem')
-        
-        # Get products with highest purchase counts
-        popular_products = OrderItem.objects.values('product').annotate(
-            purchase_count=Count('product')
-        ).order_by('-purchase_count')[:num_recommendations]
         
-        # Get product objects
-        product_ids = [item['product'] for item in popular_products]
-        products = Product.objects.filter(id__in=product_ids)
+        # Read the maintained order counter instead of grouping order history
+        products = Product.objects.filter(
+            order_count__gt=0
+        ).order_by('-order_count')[:num_recommendations]
         
         return list(products)
     
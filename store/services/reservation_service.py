@@ -0,0 +1,374 @@
+"""
+Reservation Service Module
+Time-limited inventory holds placed at checkout
+"""
+
+import logging
+import threading
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+from store.services.cache_service import CacheService
+from store.services.order_service import OrderService, InsufficientStockError
+
+logger = logging.getLogger(__name__)
+
+
+class CacheCounterStore:
+    """Active hold counters kept in the shared Django cache (Redis in production)"""
+
+    def incr(self, key: str, delta: int) -> int:
+        # add() is a no-op when the counter exists, so incr() never races a reset
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key, delta)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, int]:
+        return cache.get_many(list(keys))
+
+    def set_many(self, values: Dict[str, int]) -> None:
+        cache.set_many(values, timeout=None)
+
+
+class LocalCounterStore:
+    """In-process counter store used by tests and single-process development"""
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, delta: int) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + delta
+            return self._counters[key]
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, int]:
+        with self._lock:
+            return {key: self._counters[key] for key in keys if key in self._counters}
+
+    def set_many(self, values: Dict[str, int]) -> None:
+        with self._lock:
+            self._counters.update(values)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+
+COUNTER_STORES = {
+    'cache': CacheCounterStore(),
+    'local': LocalCounterStore(),
+}
+
+
+class ReservationService:
+    """Service class for checkout stock reservations"""
+
+    # Holds expire after 10 minutes unless the shopper re-enters checkout
+    DEFAULT_HOLD_TIMEOUT = 600
+
+    # Session entry remembering the session key holds were placed under;
+    # login rotates the key, so the holds are moved to the new one
+    SESSION_HOLDS_KEY = 'reservation_session_key'
+
+    @staticmethod
+    def get_counter_store():
+        """Get the counter store selected by STORE_RESERVATION_COUNTER_STORE"""
+        return COUNTER_STORES[getattr(settings, 'STORE_RESERVATION_COUNTER_STORE', 'cache')]
+
+    @staticmethod
+    def get_hold_timeout() -> int:
+        return getattr(settings, 'STORE_RESERVATION_TIMEOUT', ReservationService.DEFAULT_HOLD_TIMEOUT)
+
+    @staticmethod
+    def get_counter_key(product_id: int) -> str:
+        return CacheService.get_cache_key('reservation_holds', str(product_id))
+
+    @staticmethod
+    def _adjust_counter(product_id: int, delta: int) -> Optional[int]:
+        """Atomically adjust the active hold counter of a product"""
+        if not delta:
+            return None
+        try:
+            return ReservationService.get_counter_store().incr(ReservationService.get_counter_key(product_id), delta)
+        except Exception as e:
+            # The ledger stays authoritative; resync_counters() repairs the drift
+            logger.warning(f"Reservation counter update failed for product {product_id}: {str(e)}")
+            return None
+
+    @staticmethod
+    def get_active_holds(product_ids: Iterable[int]) -> Dict[int, int]:
+        """
+        Get the number of held units per product
+
+        Reads the counter store and falls back to the reservation ledger when
+        the store is unavailable.
+
+        Args:
+            product_ids: IDs of the products to look up
+
+        Returns:
+            Dictionary mapping product id to held quantity
+        """
+        product_ids = list(product_ids)
+        if not product_ids:
+            return {}
+        keys = {ReservationService.get_counter_key(product_id): product_id for product_id in product_ids}
+        try:
+            counters = ReservationService.get_counter_store().get_many(keys)
+            return {keys[key]: max(int(value), 0) for key, value in counters.items()}
+        except Exception as e:
+            logger.warning(f"Reservation counter read failed, using ledger: {str(e)}")
+        return ReservationService.get_ledger_holds(product_ids)
+
+    @staticmethod
+    def get_ledger_holds(product_ids: Iterable[int], exclude_session: Optional[str] = None) -> Dict[int, int]:
+        """
+        Get the number of held units per product from the reservation ledger
+
+        Args:
+            product_ids: IDs of the products to look up
+            exclude_session: Leave out the holds of this session
+
+        Returns:
+            Dictionary mapping product id to held quantity
+        """
+        StockReservation = apps.get_model('store', 'StockReservation')
+        rows = StockReservation.objects.filter(product_id__in=list(product_ids), expires_at__gt=timezone.now())
+        if exclude_session:
+            rows = rows.exclude(session_key=exclude_session)
+        rows = rows.values('product_id').annotate(held=Sum('quantity'))
+        return {row['product_id']: row['held'] for row in rows}
+
+    @staticmethod
+    def get_available_quantities(products) -> Dict[int, int]:
+        """
+        Get sellable stock (stock_quantity - active holds) for products
+
+        Args:
+            products: Iterable of Product objects
+
+        Returns:
+            Dictionary mapping product id to available quantity
+        """
+        products = list(products)
+        holds = ReservationService.get_active_holds(product.id for product in products)
+        return {
+            product.id: max(product.stock_quantity - holds.get(product.id, 0), 0)
+            for product in products
+        }
+
+    @staticmethod
+    def annotate_availability(products) -> None:
+        """Set ``available_quantity`` on each product with a single counter read"""
+        products = list(products)
+        available = ReservationService.get_available_quantities(products)
+        for product in products:
+            product.available_quantity = available[product.id]
+
+    @staticmethod
+    def place_holds(session_key: str, cart_items: List[Dict]) -> List[int]:
+        """
+        Place or refresh expiring holds on the cart quantities of a session
+
+        Each line is admitted by atomically bumping the product's hold counter
+        and backing out if holds would exceed stock, so no Product row is locked.
+        When the counter store is unavailable the line is checked against the
+        holds of other sessions in the ledger instead.
+
+        Args:
+            session_key: Session key of the shopper
+            cart_items: Cart lines with 'product' and 'quantity'
+
+        Returns:
+            IDs of products whose requested quantity could not be held
+        """
+        StockReservation = apps.get_model('store', 'StockReservation')
+        expires_at = timezone.now() + timedelta(seconds=ReservationService.get_hold_timeout())
+
+        existing = {
+            reservation.product_id: reservation
+            for reservation in StockReservation.objects.filter(session_key=session_key)
+        }
+        shortfall = []
+        to_create = []
+        ledger_holds = None
+        for item in cart_items:
+            product = item['product']
+            quantity = item['quantity']
+            reservation = existing.pop(product.id, None)
+            held = reservation.quantity if reservation else 0
+            delta = quantity - held
+
+            if delta > 0:
+                total_held = ReservationService._adjust_counter(product.id, delta)
+                if total_held is None:
+                    # Read once for the whole cart, only if the store fails
+                    if ledger_holds is None:
+                        ledger_holds = ReservationService.get_ledger_holds(
+                            (line['product'].id for line in cart_items), exclude_session=session_key
+                        )
+                    total_held = ledger_holds.get(product.id, 0) + quantity
+                    if total_held > product.stock_quantity:
+                        shortfall.append(product.id)
+                        quantity = held
+                elif total_held > product.stock_quantity:
+                    ReservationService._adjust_counter(product.id, -delta)
+                    shortfall.append(product.id)
+                    quantity = held
+            elif delta < 0:
+                ReservationService._adjust_counter(product.id, delta)
+
+            if reservation is None:
+                if quantity:
+                    to_create.append(StockReservation(
+                        session_key=session_key, product=product, quantity=quantity, expires_at=expires_at
+                    ))
+            else:
+                StockReservation.objects.filter(pk=reservation.pk).update(quantity=quantity, expires_at=expires_at)
+
+        if to_create:
+            StockReservation.objects.bulk_create(to_create)
+
+        # Lines removed from the cart since the last checkout visit
+        for reservation in existing.values():
+            ReservationService._release(reservation)
+
+        return shortfall
+
+    @staticmethod
+    def remember_session(session) -> None:
+        """Note the key a session's holds are placed under, for ``transfer_holds``"""
+        if session.get(ReservationService.SESSION_HOLDS_KEY) != session.session_key:
+            session[ReservationService.SESSION_HOLDS_KEY] = session.session_key
+
+    @staticmethod
+    def transfer_holds(session) -> int:
+        """
+        Move the holds placed under a session's previous key to its current key
+
+        Args:
+            session: Session whose key was rotated, as login does
+
+        Returns:
+            Number of holds moved
+        """
+        StockReservation = apps.get_model('store', 'StockReservation')
+        previous_key = session.get(ReservationService.SESSION_HOLDS_KEY)
+        current_key = session.session_key
+        if not previous_key or not current_key or previous_key == current_key:
+            return 0
+        moved = StockReservation.objects.filter(session_key=previous_key).update(session_key=current_key)
+        session[ReservationService.SESSION_HOLDS_KEY] = current_key
+        return moved
+
+    @staticmethod
+    def _release(reservation) -> bool:
+        """Delete one hold and decrement its counter if it was still present"""
+        StockReservation = apps.get_model('store', 'StockReservation')
+        deleted, _ = StockReservation.objects.filter(pk=reservation.pk).delete()
+        if deleted:
+            ReservationService._adjust_counter(reservation.product_id, -reservation.quantity)
+        return bool(deleted)
+
+    @staticmethod
+    def release_holds(session_key: str) -> int:
+        """
+        Release all holds of a session
+
+        Args:
+            session_key: Session key of the shopper
+
+        Returns:
+            Number of holds released
+        """
+        StockReservation = apps.get_model('store', 'StockReservation')
+        released = 0
+        for reservation in StockReservation.objects.filter(session_key=session_key):
+            released += ReservationService._release(reservation)
+        return released
+
+    @staticmethod
+    def convert_holds(session_key: Optional[str], user, cart_items: List[Dict], **order_fields):
+        """
+        Turn a session's holds into a placed order with permanent stock decrements
+
+        Units held by other shoppers are not sold; the session's own holds are.
+
+        Args:
+            session_key: Session key of the shopper or None
+            user: User placing the order or None for guests
+            cart_items: Cart lines with 'product' and 'quantity'
+            **order_fields: Extra Order field values
+
+        Returns:
+            Created Order object
+
+        Raises:
+            InsufficientStockError: If a line exceeds stock not held by others
+        """
+        StockReservation = apps.get_model('store', 'StockReservation')
+        own_holds = {}
+        if session_key:
+            own_holds = dict(
+                StockReservation.objects.filter(session_key=session_key).values_list('product_id', 'quantity')
+            )
+        holds = ReservationService.get_active_holds(item['product'].id for item in cart_items)
+        for item in cart_items:
+            product = item['product']
+            held_by_others = max(holds.get(product.id, 0) - own_holds.get(product.id, 0), 0)
+            if item['quantity'] > product.stock_quantity - held_by_others:
+                raise InsufficientStockError(product.id, item['quantity'])
+
+        order = OrderService.place_order(user, cart_items, **order_fields)
+        if session_key:
+            ReservationService.release_holds(session_key)
+        return order
+
+    @staticmethod
+    def sweep_expired(now=None, batch_size: int = 500) -> int:
+        """
+        Release holds whose expiry has passed
+
+        Args:
+            now: Reference timestamp, defaults to the current time
+            batch_size: Maximum number of holds released per call
+
+        Returns:
+            Number of holds released
+        """
+        StockReservation = apps.get_model('store', 'StockReservation')
+        now = now or timezone.now()
+        released = 0
+        for reservation in StockReservation.objects.filter(expires_at__lte=now).order_by('expires_at')[:batch_size]:
+            released += ReservationService._release(reservation)
+        if released:
+            logger.info(f"Released {released} expired stock reservations")
+        return released
+
+    @staticmethod
+    def resync_counters() -> int:
+        """
+        Rebuild all hold counters from the reservation ledger
+
+        Returns:
+            Number of products whose counter was written
+        """
+        StockReservation = apps.get_model('store', 'StockReservation')
+        rows = StockReservation.objects.values('product_id').annotate(held=Sum('quantity'))
+        values = {ReservationService.get_counter_key(row['product_id']): row['held'] for row in rows}
+        # Zero out counters of products that no longer have holds
+        store = ReservationService.get_counter_store()
+        Product = apps.get_model('store', 'Product')
+        stale_keys = [ReservationService.get_counter_key(pk) for pk in Product.objects.values_list('pk', flat=True)]
+        for key, value in store.get_many(stale_keys).items():
+            if key not in values and value:
+                values[key] = 0
+        store.set_many(values)
+        return len(values)
+
+# Singleton instance
+reservation_service = ReservationService()
@@ -0,0 +1,426 @@
+"""
+Rollup Service Module
+Maintains hourly and daily analytics rollups incrementally and answers dashboard tiles from them
+"""
+
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDay, TruncHour
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+
+LINE_REVENUE = ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+class RollupService:
+    """Service class for pre-aggregated order, sales and event rollups"""
+
+    @staticmethod
+    def get_buckets(when: datetime) -> Dict[str, datetime]:
+        """
+        Get the hour and day buckets a moment falls in, in the store's time zone
+
+        Args:
+            when: Datetime; naive ones are read in the store's time zone, as the database does
+
+        Returns:
+            Dictionary mapping period to the start of its bucket
+        """
+        if timezone.is_naive(when):
+            when = timezone.make_aware(when)
+        local = timezone.localtime(when)
+        hour = local.replace(minute=0, second=0, microsecond=0)
+        return {'hour': hour, 'day': hour.replace(hour=0)}
+
+    @staticmethod
+    def add(model_name: str, lookups: Dict[str, Any], changes: Dict[str, Any], when: datetime) -> None:
+        """
+        Add ``changes`` to the hour and day rows of a rollup, creating them when missing
+
+        Args:
+            model_name: Rollup model
+            lookups: Dimension values of the rows
+            changes: Amounts to add to each counter
+            when: Moment the change belongs to
+        """
+        if not any(changes.values()):
+            return
+        model = apps.get_model('store', model_name)
+        updates = {field: F(field) + value for field, value in changes.items()}
+        for period, bucket in RollupService.get_buckets(when).items():
+            rows = model.objects.filter(period=period, bucket=bucket, **lookups)
+            if rows.update(**updates):
+                continue
+            try:
+                with transaction.atomic():
+                    model.objects.create(period=period, bucket=bucket, **lookups, **changes)
+            except IntegrityError:
+                # Created by a concurrent write since the UPDATE
+                rows.update(**updates)
+
+    @staticmethod
+    def get_order_state(order) -> Optional[Tuple[datetime, str, Decimal]]:
+        """Get what the order rollups count for an order: (created_at, status, total_amount)"""
+        if order is None or order.created_at is None:
+            return None
+        return order.created_at, order.status, order.total_amount or ZERO
+
+    @staticmethod
+    def get_item_lines(order_id: int) -> List[Dict[str, Any]]:
+        """Get the units and revenue of an order's items per category and seller"""
+        OrderItem = apps.get_model('store', 'OrderItem')
+        lines = (
+            OrderItem.objects.filter(order_id=order_id)
+            .values(line_category=F('product__category'), line_seller_id=F('product__seller_id'))
+            .annotate(line_quantity=Sum('quantity'), line_revenue=Sum(LINE_REVENUE))
+            .order_by()
+        )
+        return [
+            {'category': line['line_category'], 'seller_id': line['line_seller_id'],
+             'quantity': line['line_quantity'], 'revenue': line['line_revenue']}
+            for line in lines
+        ]
+
+    @staticmethod
+    def add_item_lines(created_at: datetime, status: str, lines: Iterable[Dict[str, Any]], sign: int = 1) -> None:
+        for line in lines:
+            RollupService.add(
+                'SalesRollup',
+                {'status': status, 'category': line['category'] or '', 'seller_id': line['seller_id']},
+                {'quantity': sign * (line['quantity'] or 0), 'revenue': sign * (line['revenue'] or ZERO)},
+                created_at,
+            )
+
+    @staticmethod
+    def apply_order_change(order_id: int, old_state: Optional[tuple], new_state: Optional[tuple]) -> None:
+        """
+        Move an order, and its items when its status changed, between rollup rows
+
+        Args:
+            order_id: Order ID
+            old_state: State counted so far, None for a new order
+            new_state: State to count now, None for a deleted order
+        """
+        if old_state == new_state:
+            return
+        if old_state is not None:
+            created_at, status, total = old_state
+            RollupService.add('OrderRollup', {'status': status}, {'orders': -1, 'revenue': -total}, created_at)
+        if new_state is not None:
+            created_at, status, total = new_state
+            RollupService.add('OrderRollup', {'status': status}, {'orders': 1, 'revenue': total}, created_at)
+
+        # Items of a new order are added as they are written, and removed one by one on delete
+        if old_state is not None and new_state is not None and old_state[1] != new_state[1]:
+            lines = RollupService.get_item_lines(order_id)
+            RollupService.add_item_lines(old_state[0], old_state[1], lines, sign=-1)
+            RollupService.add_item_lines(new_state[0], new_state[1], lines)
+
+    @staticmethod
+    def get_item_state(item) -> Optional[Tuple[datetime, str, str, Optional[int], int, Decimal]]:
+        """Get what the sales rollups count for an order item"""
+        order, product = item.order, item.product
+        if order.created_at is None:
+            return None
+        return (
+            order.created_at, order.status, product.category or '', product.seller_id,
+            item.quantity or 0, Decimal(item.quantity or 0) * (item.price or ZERO),
+        )
+
+    @staticmethod
+    def apply_item_change(old_state: Optional[tuple], new_state: Optional[tuple]) -> None:
+        """Move an order item between sales rollup rows"""
+        if old_state == new_state:
+            return
+        for state, sign in ((old_state, -1), (new_state, 1)):
+            if state is not None:
+                created_at, status, category, seller_id, quantity, revenue = state
+                RollupService.add_item_lines(created_at, status, [
+                    {'category': category, 'seller_id': seller_id, 'quantity': quantity, 'revenue': revenue}
+                ], sign=sign)
+
+    @staticmethod
+    def record_order_items(order, items: Iterable[Any]) -> None:
+        """
+        Add items written with bulk_create, which sends no signals
+
+        Args:
+            order: Order the items belong to
+            items: OrderItem objects with their products loaded
+        """
+        lines = defaultdict(lambda: {'quantity': 0, 'revenue': ZERO})
+        for item in items:
+            line = lines[(item.product.category or '', item.product.seller_id)]
+            line['quantity'] += item.quantity
+            line['revenue'] += Decimal(item.quantity) * item.price
+        RollupService.add_item_lines(order.created_at, order.status, [
+            {'category': category, 'seller_id': seller_id, **line}
+            for (category, seller_id), line in lines.items()
+        ])
+
+    @staticmethod
+    def get_event_weight(metadata: Any) -> float:
+        """
+        Get how many events one stored event stands for
+
+        Events kept by load-shedding carry the share that was kept as
+        ``sample_rate`` in their metadata and count 1 / sample_rate times.
+
+        Args:
+            metadata: Event metadata, as stored (JSON text) or decoded
+
+        Returns:
+            Weight of the event, 1.0 for unsampled events
+        """
+        if not metadata:
+            return 1.0
+        try:
+            if isinstance(metadata, str):
+                metadata = json.loads(metadata)
+            sample_rate = float(metadata.get('sample_rate', 1.0))
+        except (ValueError, TypeError, AttributeError):
+            return 1.0
+        return 1.0 / sample_rate if 0 < sample_rate < 1 else 1.0
+
+    @staticmethod
+    def record_events(events: Iterable[Any]) -> None:
+        """
+        Count analytics events in the rollups of the hour and day they happened
+
+        Late events land in their own past buckets, so batches written after
+        a delay or replayed from a spill file still count where they belong.
+        Sampled events are weighted by 1 / sample_rate.
+
+        Args:
+            events: AnalyticsIntegration objects
+        """
+        Product = apps.get_model('store', 'Product')
+        events = list(events)
+        product_ids = {event.product_id for event in events if event.product_id}
+        categories = dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'category')) if product_ids else {}
+
+        counts = defaultdict(float)
+        for event in events:
+            hour = RollupService.get_buckets(event.timestamp)['hour']
+            key = (hour, event.event_type, categories.get(event.product_id, ''))
+            counts[key] += RollupService.get_event_weight(event.metadata)
+        for (hour, event_type, category), count in counts.items():
+            RollupService.add(
+                'EventRollup', {'event_type': event_type, 'category': category}, {'events': round(count)}, hour
+            )
+
+    @staticmethod
+    def get_sampled_event_extras(queryset) -> Dict[Tuple, float]:
+        """
+        Get what sampled events add to their rollup rows beyond counting once
+
+        Returns:
+            Dictionary mapping (period, bucket, event_type, category) to the extra weight
+        """
+        extras = defaultdict(float)
+        sampled = queryset.filter(metadata__contains='"sample_rate"').values_list(
+            'timestamp', 'event_type', 'product__category', 'metadata'
+        )
+        for timestamp, event_type, category, metadata in sampled.iterator():
+            extra = RollupService.get_event_weight(metadata) - 1.0
+            for period, bucket in RollupService.get_buckets(timestamp).items():
+                extras[(period, bucket, event_type, category or '')] += extra
+        return extras
+
+    @staticmethod
+    def rebuild(since: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Recompute the rollups from the raw rows, for backfills and to correct
+        changes made without signals (queryset updates, raw SQL)
+
+        Args:
+            since: Only rebuild days from the one this falls in; None rebuilds everything
+
+        Returns:
+            Dictionary with the number of rows written per rollup
+        """
+        Order = apps.get_model('store', 'Order')
+        OrderItem = apps.get_model('store', 'OrderItem')
+        AnalyticsIntegration = apps.get_model('store', 'AnalyticsIntegration')
+        start = RollupService.get_buckets(since)['day'] if since is not None else None
+        tzinfo = timezone.get_current_timezone()
+
+        sources = {
+            'OrderRollup': (
+                Order.objects.all(), 'created_at',
+                {'status': F('status')},
+                {'orders': Count('pk'), 'revenue': Coalesce(Sum('total_amount'), ZERO)},
+            ),
+            'SalesRollup': (
+                OrderItem.objects.all(), 'order__created_at',
+                {'status': F('order__status'), 'category': F('product__category'), 'seller_id': F('product__seller_id')},
+                {'quantity': Coalesce(Sum('quantity'), 0), 'revenue': Coalesce(Sum(LINE_REVENUE), ZERO)},
+            ),
+            'EventRollup': (
+                AnalyticsIntegration.objects.all(), 'timestamp',
+                {'event_type': F('event_type'), 'category': Coalesce(F('product__category'), Value(''))},
+                {'events': Count('pk')},
+            ),
+        }
+        written = {}
+        with transaction.atomic():
+            for model_name, (queryset, time_field, dimensions, aggregates) in sources.items():
+                model = apps.get_model('store', model_name)
+                rollups = model.objects.all()
+                if start is not None:
+                    queryset = queryset.filter(**{f'{time_field}__gte': start})
+                    rollups = rollups.filter(bucket__gte=start)
+                rollups.delete()
+                rows = []
+                for period, trunc in (('hour', TruncHour), ('day', TruncDay)):
+                    grouped = queryset.annotate(
+                        rollup_bucket=trunc(time_field, tzinfo=tzinfo), **{f'rollup_{name}': value for name, value in dimensions.items()}
+                    ).values('rollup_bucket', *[f'rollup_{name}' for name in dimensions]).annotate(
+                        **{f'rollup_{name}': value for name, value in aggregates.items()}
+                    ).order_by()
+                    for group in grouped:
+                        rows.append(model(
+                            period=period, bucket=group['rollup_bucket'],
+                            **{name: group[f'rollup_{name}'] for name in list(dimensions) + list(aggregates)},
+                        ))
+                if model_name == 'EventRollup':
+                    extras = RollupService.get_sampled_event_extras(queryset)
+                    for row in rows:
+                        row.events = round(row.events + extras.get((row.period, row.bucket, row.event_type, row.category), 0))
+                model.objects.bulk_create(rows, batch_size=1000)
+                written[model_name] = len(rows)
+        return written
+
+    @staticmethod
+    def get_range_filter(start: Optional[datetime] = None, end: Optional[datetime] = None) -> Q:
+        """
+        Select rollup rows covering [start, end) with as few rows as possible
+
+        Whole days are read from day rows and the partial days at either end
+        from hour rows, so a 30-day range is at most 30 + 48 rows whatever the
+        traffic. Partial hours at the ends count in full.
+
+        Args:
+            start: Start of the range, None for the beginning
+            end: End of the range, None for now
+
+        Returns:
+            Q object for a rollup queryset
+        """
+        if start is None and end is None:
+            return Q(period='day')
+        first_day = last_day = None
+        if start is not None:
+            buckets = RollupService.get_buckets(start)
+            first_day = buckets['day'] if buckets['day'] == start else buckets['day'] + timedelta(days=1)
+            first_hour = buckets['hour']
+        if end is not None:
+            last_day = RollupService.get_buckets(end)['day']
+        if first_day is not None and last_day is not None and first_day >= last_day:
+            return Q(period='hour', bucket__gte=first_hour, bucket__lt=end)
+
+        days = Q(period='day')
+        if first_day is not None:
+            days &= Q(bucket__gte=first_day)
+        if last_day is not None:
+            days &= Q(bucket__lt=last_day)
+        selected = days
+        if start is not None:
+            selected |= Q(period='hour', bucket__gte=first_hour, bucket__lt=first_day)
+        if end is not None:
+            selected |= Q(period='hour', bucket__gte=last_day, bucket__lt=end)
+        return selected
+
+    @staticmethod
+    def get_order_totals(start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Get orders and revenue per status over a time range, in one query
+
+        Returns:
+            Dictionary mapping status to {'orders', 'revenue'}
+        """
+        OrderRollup = apps.get_model('store', 'OrderRollup')
+        rows = OrderRollup.objects.filter(RollupService.get_range_filter(start, end)).values('status').annotate(
+            total_orders=Sum('orders'), total_revenue=Sum('revenue')
+        ).order_by('status')
+        return {
+            row['status']: {'orders': row['total_orders'] or 0, 'revenue': row['total_revenue'] or ZERO}
+            for row in rows
+        }
+
+    @staticmethod
+    def get_event_counts(start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict[str, int]:
+        """Get the number of events of each type over a time range, in one query"""
+        EventRollup = apps.get_model('store', 'EventRollup')
+        rows = EventRollup.objects.filter(RollupService.get_range_filter(start, end)).values('event_type').annotate(
+            total=Sum('events')
+        ).order_by()
+        return {row['event_type']: row['total'] or 0 for row in rows}
+
+    @staticmethod
+    def get_category_sales(status: str = 'delivered', seller_id: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """Get units and revenue of items per product category, in one query"""
+        SalesRollup = apps.get_model('store', 'SalesRollup')
+        rows = SalesRollup.objects.filter(period='day', status=status)
+        if seller_id is not None:
+            rows = rows.filter(seller_id=seller_id)
+        rows = rows.values('category').annotate(total_quantity=Sum('quantity'), total_revenue=Sum('revenue')).order_by()
+        return {
+            row['category']: {'quantity': row['total_quantity'] or 0, 'amount': row['total_revenue'] or ZERO}
+            for row in rows
+        }
+
+    @staticmethod
+    def get_daily_revenue(start: datetime, status: str = 'delivered') -> Dict[datetime, Decimal]:
+        """Get revenue per day from the day ``start`` falls in, in one query"""
+        OrderRollup = apps.get_model('store', 'OrderRollup')
+        rows = OrderRollup.objects.filter(
+            period='day', status=status, bucket__gte=RollupService.get_buckets(start)['day']
+        ).values_list('bucket', 'revenue')
+        return {timezone.localtime(bucket): revenue for bucket, revenue in rows}
+
+    @staticmethod
+    def get_recent_totals(window: timedelta = timedelta(hours=1), now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Estimate orders, revenue and events over the last ``window`` from hour rows
+
+        The hours inside the window count in full; the hour the window starts
+        in counts in proportion to the part of it inside the window.
+
+        Returns:
+            Dictionary with 'orders' and 'revenue' per status, and 'events' per type
+        """
+        OrderRollup = apps.get_model('store', 'OrderRollup')
+        EventRollup = apps.get_model('store', 'EventRollup')
+        now = now or timezone.now()
+        start = now - window
+        first_hour = RollupService.get_buckets(start)['hour']
+        first_weight = 1 - (start - first_hour) / timedelta(hours=1)
+
+        def weight(bucket):
+            return first_weight if bucket == first_hour else 1
+
+        totals = {'orders': defaultdict(float), 'revenue': defaultdict(Decimal), 'events': defaultdict(float)}
+        for bucket, status, orders, revenue in OrderRollup.objects.filter(
+            period='hour', bucket__gte=first_hour
+        ).values_list('bucket', 'status', 'orders', 'revenue'):
+            totals['orders'][status] += orders * weight(bucket)
+            totals['revenue'][status] += revenue * Decimal(str(weight(bucket)))
+        for bucket, event_type, events in EventRollup.objects.filter(
+            period='hour', bucket__gte=first_hour
+        ).values_list('bucket', 'event_type', 'events'):
+            totals['events'][event_type] += events * weight(bucket)
+        return totals
+
+# Singleton instance
+rollup_service = RollupService()
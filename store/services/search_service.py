@@ -0,0 +1,379 @@
+"""
+Search Service Module
+Full-text product search with Arabic-aware normalization
+"""
+
+import logging
+import math
+import re
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from typing import List, Optional, Tuple
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import Avg, Count, TextField, Value
+from store.services.cache_service import CacheService
+
+logger = logging.getLogger(__name__)
+
+# Harakat, Quranic marks and tatweel carry no meaning for search
+ARABIC_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+
+ARABIC_FOLDING = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+
+# Light stemming: definite article and attached conjunctions/prepositions
+ARABIC_PREFIXES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Matches in the name count more than matches in the description
+FIELD_WEIGHTS = {
+    'name': 3,
+    'name_en': 3,
+    'seo_keywords': 2,
+    'description': 1,
+    'category': 1,
+}
+
+MAX_TERM_LENGTH = 100
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """
+    Normalize text for indexing and querying
+
+    Applies NFKC, lower-casing, Arabic diacritics stripping and
+    alef/ya/ta-marbuta folding.
+    """
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    text = ARABIC_DIACRITICS.sub('', text)
+    return text.translate(ARABIC_FOLDING)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into normalized, lightly stemmed search terms"""
+    terms = []
+    for token in TOKEN_RE.findall(normalize_text(text)):
+        for prefix in ARABIC_PREFIXES:
+            if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+                token = token[len(prefix):]
+                break
+        terms.append(token[:MAX_TERM_LENGTH])
+    return terms
+
+
+def analyze_product(product) -> Counter:
+    """Get the field-weighted term frequencies of a product"""
+    frequencies = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        for term in tokenize(getattr(product, field, '')):
+            frequencies[term] += weight
+    return frequencies
+
+
+class InvertedIndexBackend:
+    """
+    Search backend over the ProductSearchTerm posting table with BM25 ranking
+
+    Works on every database and is the backend used by the test suite. A query
+    reads only the posting lists of its terms, so its cost follows the number
+    of matching products instead of the catalog size.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    STATS_CACHE_KEY = 'search_corpus_stats'
+    STATS_TIMEOUT = 60 * 5
+
+    def index_product(self, product) -> None:
+        ProductSearchDocument = apps.get_model('store', 'ProductSearchDocument')
+        ProductSearchTerm = apps.get_model('store', 'ProductSearchTerm')
+        frequencies = analyze_product(product)
+        with transaction.atomic():
+            ProductSearchTerm.objects.filter(product_id=product.pk).delete()
+            ProductSearchTerm.objects.bulk_create([
+                ProductSearchTerm(term=term, product_id=product.pk, frequency=frequency)
+                for term, frequency in frequencies.items()
+            ])
+            ProductSearchDocument.objects.update_or_create(
+                product_id=product.pk, defaults={'length': sum(frequencies.values())}
+            )
+        self.invalidate_stats()
+
+    def remove_product(self, product_id: int) -> None:
+        # Postings and the document row are removed by the FK cascade
+        self.invalidate_stats()
+
+    def invalidate_stats(self) -> None:
+        try:
+            cache.delete(self.STATS_CACHE_KEY)
+        except Exception as e:
+            logger.warning(f"Error invalidating search corpus stats: {str(e)}")
+
+    def get_corpus_stats(self) -> Tuple[int, float]:
+        """Get the document count and average document length"""
+        try:
+            stats = CacheService.get(self.STATS_CACHE_KEY)
+        except Exception as e:
+            logger.warning(f"Error reading search corpus stats: {str(e)}")
+            stats = None
+        if stats is None:
+            started = time.monotonic()
+            ProductSearchDocument = apps.get_model('store', 'ProductSearchDocument')
+            aggregate = ProductSearchDocument.objects.aggregate(count=Count('pk'), avg_length=Avg('length'))
+            stats = (aggregate['count'], float(aggregate['avg_length'] or 0))
+            try:
+                CacheService.set(self.STATS_CACHE_KEY, stats, self.STATS_TIMEOUT, compute_time=time.monotonic() - started)
+            except Exception as e:
+                logger.warning(f"Error caching search corpus stats: {str(e)}")
+        return stats
+
+    def match(self, query: str):
+        terms = list(dict.fromkeys(tokenize(query)))
+        ProductSearchTerm = apps.get_model('store', 'ProductSearchTerm')
+        if not terms:
+            return ProductSearchTerm.objects.none().values('product_id')
+        # Postings are unique per (term, product), so every term matched
+        # when a product has one posting per term
+        return ProductSearchTerm.objects.filter(term__in=terms).values('product_id').annotate(
+            matched=Count('term')
+        ).filter(matched=len(terms)).values('product_id')
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        ProductSearchTerm = apps.get_model('store', 'ProductSearchTerm')
+        postings = ProductSearchTerm.objects.filter(term__in=terms).values_list(
+            'term', 'product_id', 'frequency', 'product__search_document__length'
+        )
+
+        by_term = defaultdict(list)
+        for term, product_id, frequency, length in postings:
+            by_term[term].append((product_id, frequency, length or 0))
+        # Every query term must match, as with a narrowing product filter
+        if len(by_term) < len(terms):
+            return []
+        matching = set.intersection(*[
+            {product_id for product_id, _, _ in term_postings} for term_postings in by_term.values()
+        ])
+        if not matching:
+            return []
+
+        document_count, avg_length = self.get_corpus_stats()
+        document_count = max(document_count, 1)
+        avg_length = avg_length or 1.0
+        scores = defaultdict(float)
+        for term, term_postings in by_term.items():
+            document_frequency = len(term_postings)
+            idf = math.log(1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+            for product_id, frequency, length in term_postings:
+                if product_id not in matching:
+                    continue
+                norm = self.K1 * (1 - self.B + self.B * length / avg_length)
+                scores[product_id] += idf * frequency * (self.K1 + 1) / (frequency + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+class PostgresSearchBackend:
+    """
+    Search backend over a weighted tsvector column with a GIN index
+
+    Text is normalized in Python before it reaches to_tsvector so queries and
+    documents share the Arabic folding rules. Ranking uses ts_rank_cd.
+    """
+
+    CONFIG = 'simple'
+    FIELD_LABELS = {'name': 'A', 'name_en': 'A', 'seo_keywords': 'B', 'description': 'C', 'category': 'C'}
+
+    def index_product(self, product) -> None:
+        ProductSearchDocument = apps.get_model('store', 'ProductSearchDocument')
+
+        vector = None
+        length = 0
+        for field, label in self.FIELD_LABELS.items():
+            terms = tokenize(getattr(product, field, ''))
+            length += len(terms) * FIELD_WEIGHTS[field]
+            field_vector = SearchVector(Value(' '.join(terms), output_field=TextField()), weight=label, config=self.CONFIG)
+            vector = field_vector if vector is None else vector + field_vector
+
+        ProductSearchDocument.objects.update_or_create(product_id=product.pk, defaults={'length': length})
+        ProductSearchDocument.objects.filter(product_id=product.pk).update(search_vector=vector)
+
+    def remove_product(self, product_id: int) -> None:
+        pass
+
+    def get_search_query(self, terms: List[str]) -> SearchQuery:
+        search_query = None
+        for term in terms:
+            term_query = SearchQuery(term, config=self.CONFIG, search_type='plain')
+            search_query = term_query if search_query is None else search_query & term_query
+        return search_query
+
+    def match(self, query: str):
+        terms = list(dict.fromkeys(tokenize(query)))
+        ProductSearchDocument = apps.get_model('store', 'ProductSearchDocument')
+        if not terms:
+            return ProductSearchDocument.objects.none().values('product_id')
+        return ProductSearchDocument.objects.filter(search_vector=self.get_search_query(terms)).values('product_id')
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        ProductSearchDocument = apps.get_model('store', 'ProductSearchDocument')
+        search_query = self.get_search_query(terms)
+        rows = ProductSearchDocument.objects.filter(search_vector=search_query).annotate(
+            rank=SearchRank('search_vector', search_query, cover_density=True)
+        ).order_by('-rank', 'product_id').values_list('product_id', 'rank')[:limit]
+        return list(rows)
+
+
+BACKENDS = {
+    'inverted_index': InvertedIndexBackend(),
+    'postgres': PostgresSearchBackend(),
+}
+
+
+class SearchService:
+    """Service class for full-text product search"""
+
+    @staticmethod
+    def get_backend():
+        """Get the backend named by STORE_SEARCH_BACKEND, picking one by database vendor by default"""
+        name = getattr(settings, 'STORE_SEARCH_BACKEND', 'auto')
+        if name == 'auto':
+            name = 'postgres' if connection.vendor == 'postgresql' else 'inverted_index'
+        return BACKENDS[name]
+
+    @staticmethod
+    def index_product(product) -> None:
+        """Add or refresh a product in the search index"""
+        try:
+            SearchService.get_backend().index_product(product)
+        except Exception as e:
+            logger.error(f"Error indexing product {product.pk}: {str(e)}")
+
+    @staticmethod
+    def remove_product(product_id: int) -> None:
+        """Drop a deleted product from the search index"""
+        try:
+            SearchService.get_backend().remove_product(product_id)
+        except Exception as e:
+            logger.error(f"Error removing product {product_id} from search index: {str(e)}")
+
+    @staticmethod
+    def rebuild_index(batch_size: int = 500) -> int:
+        """
+        Index every product
+
+        Args:
+            batch_size: Number of products loaded per query
+
+        Returns:
+            Number of products indexed
+        """
+        Product = apps.get_model('store', 'Product')
+        backend = SearchService.get_backend()
+        count = 0
+        for product in Product.objects.only(*FIELD_WEIGHTS).iterator(chunk_size=batch_size):
+            backend.index_product(product)
+            count += 1
+        return count
+
+    @staticmethod
+    def search_ids(query: str, limit: Optional[int] = None) -> List[int]:
+        """
+        Get product ids matching a query, best match first
+
+        Args:
+            query: Free-text query in Arabic or English
+            limit: Maximum number of ids, defaults to every match
+
+        Returns:
+            List of product ids ordered by relevance
+        """
+        return [product_id for product_id, _ in SearchService.get_backend().search(query, limit)]
+
+    @staticmethod
+    def filter_queryset(queryset, query: str):
+        """
+        Restrict a Product queryset to search matches
+
+        Matches are selected with a subquery on the index, so the SQL stays
+        the same size however many products match and every match is kept.
+
+        Args:
+            queryset: Product queryset to filter
+            query: Free-text query
+
+        Returns:
+            Filtered queryset
+        """
+        return queryset.filter(pk__in=SearchService.get_backend().match(query))
+
+    @staticmethod
+    def rank(queryset, query: str) -> 'RankedResults':
+        """
+        Order the products of a filtered queryset by relevance
+
+        Args:
+            queryset: Product queryset, usually restricted with filter_queryset
+            query: Free-text query
+
+        Returns:
+            RankedResults to paginate in place of the queryset
+        """
+        allowed = set(queryset.order_by().values_list('pk', flat=True))
+        return RankedResults(
+            queryset, [product_id for product_id in SearchService.search_ids(query) if product_id in allowed]
+        )
+
+
+class RankedResults:
+    """
+    Search matches in relevance order, loaded one slice at a time
+
+    Countable and sliceable like a queryset so Paginator accepts it. Only the
+    ids of a page are sent to the database, so a page costs the same however
+    many products match.
+    """
+
+    def __init__(self, queryset, ranked_ids: List[int]):
+        self.queryset = queryset
+        self.ranked_ids = ranked_ids
+
+    def count(self) -> int:
+        return len(self.ranked_ids)
+
+    def __len__(self) -> int:
+        return len(self.ranked_ids)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.load(self.ranked_ids[key])
+        return self.load([self.ranked_ids[key]])[0]
+
+    def __iter__(self):
+        return iter(self.load(self.ranked_ids))
+
+    def load(self, product_ids: List[int]) -> List:
+        """Get the products with the given ids, in the order given"""
+        products = self.queryset.in_bulk(product_ids)
+        return [products[product_id] for product_id in product_ids if product_id in products]
+
+# Singleton instance
+search_service = SearchService()
@@ -0,0 +1,283 @@
+"""
+Warmup Service Module
+Records the pages visitors hit most and replays them to refill caches after a restart
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from importlib import import_module
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage import default_storage
+from django.db import close_old_connections, connection
+from django.db.models import F, Sum
+from django.test import RequestFactory
+from django.urls import resolve
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupService:
+    """Service class for access-driven cache warmup"""
+
+    # Visits are counted in memory and written by a background thread once per interval
+    FLUSH_INTERVAL = 60
+
+    # Distinct pages counted per process between flushes; visits to further
+    # pages are dropped so a crawler cannot grow the buffer or the next flush
+    MAX_BUFFERED_TARGETS = 1000
+
+    # Only these query parameters select a different cached page; the rest
+    # (tracking tags, crawler noise) are left out of the recorded URL
+    QUERY_PARAMS = ('page', 'sort', 'cursor')
+
+    DEFAULT_LIMIT = 200
+    DEFAULT_WORKERS = 4
+
+    # Only pages visited this recently are replayed
+    DEFAULT_WINDOW_DAYS = 7
+
+    MAX_FIELD_LENGTH = 255
+
+    # Set on replayed requests so they are not counted as visits
+    REQUEST_ATTRIBUTE = 'is_cache_warmup'
+
+    _counts: Counter = Counter()
+    _lock = threading.Lock()
+    _flusher: Optional[threading.Thread] = None
+    _flusher_pid: Optional[int] = None
+
+    @staticmethod
+    def is_async() -> bool:
+        """Whether a background thread flushes, rather than only callers of ``flush``"""
+        return getattr(settings, 'STORE_CACHE_WARMUP_ASYNC_FLUSH', True)
+
+    @staticmethod
+    def get_target_key(request) -> Optional[Tuple[str, str, Optional[int]]]:
+        """Get the (path, query, user id) a request is recorded under, None if it cannot be replayed"""
+        params = getattr(settings, 'STORE_CACHE_WARMUP_QUERY_PARAMS', WarmupService.QUERY_PARAMS)
+        query = urlencode(sorted((name, value) for name, value in request.GET.items() if name in params))
+        if len(request.path) > WarmupService.MAX_FIELD_LENGTH or len(query) > WarmupService.MAX_FIELD_LENGTH:
+            return None
+        user = getattr(request, 'user', None)
+        user_id = user.pk if user is not None and user.is_authenticated else None
+        return request.path, query, user_id
+
+    @staticmethod
+    def record_access(request) -> None:
+        """
+        Count a visit to a page worth warming
+
+        Args:
+            request: GET request that was answered successfully
+        """
+        if request.method != 'GET' or getattr(request, WarmupService.REQUEST_ATTRIBUTE, False):
+            return
+        key = WarmupService.get_target_key(request)
+        if key is None:
+            return
+        limit = getattr(settings, 'STORE_CACHE_WARMUP_MAX_BUFFERED_TARGETS', WarmupService.MAX_BUFFERED_TARGETS)
+        with WarmupService._lock:
+            counts = WarmupService._counts
+            if key in counts or len(counts) < limit:
+                counts[key] += 1
+        WarmupService.ensure_flusher()
+
+    @staticmethod
+    def ensure_flusher() -> None:
+        """Start this process's flush thread, again after a fork, so visitors never wait on the writes"""
+        pid = os.getpid()
+        if WarmupService._flusher_pid == pid or not WarmupService.is_async():
+            return
+        with WarmupService._lock:
+            if WarmupService._flusher_pid == pid:
+                return
+            flusher = threading.Thread(target=WarmupService.run_flusher, name='cache-warmup', daemon=True)
+            WarmupService._flusher = flusher
+            WarmupService._flusher_pid = pid
+            flusher.start()
+
+    @staticmethod
+    def run_flusher() -> None:
+        """Flush every FLUSH_INTERVAL until the process exits"""
+        while True:
+            time.sleep(getattr(settings, 'STORE_CACHE_WARMUP_FLUSH_INTERVAL', WarmupService.FLUSH_INTERVAL))
+            close_old_connections()
+            try:
+                WarmupService.flush()
+            except Exception as e:
+                logger.error(f"Error in cache warmup flush thread: {str(e)}")
+
+    @staticmethod
+    def flush() -> int:
+        """
+        Write the visits counted in this process to the database
+
+        Returns:
+            Number of pages updated
+        """
+        with WarmupService._lock:
+            counts = WarmupService._counts
+            WarmupService._counts = Counter()
+        if not counts:
+            return 0
+
+        CacheWarmupTarget = apps.get_model('store', 'CacheWarmupTarget')
+        now = timezone.now()
+        try:
+            missing = []
+            for (path, query, user_id), hits in counts.items():
+                updated = CacheWarmupTarget.objects.filter(path=path, query=query, user_id=user_id).update(
+                    hits=F('hits') + hits, last_seen=now
+                )
+                if not updated:
+                    missing.append(CacheWarmupTarget(path=path, query=query, user_id=user_id, hits=hits, last_seen=now))
+            CacheWarmupTarget.objects.bulk_create(missing, ignore_conflicts=True)
+        except Exception as e:
+            logger.error(f"Error recording cache warmup targets: {str(e)}")
+            return 0
+        return len(counts)
+
+    @staticmethod
+    def reset() -> None:
+        """Drop the visits counted in this process without writing them"""
+        with WarmupService._lock:
+            WarmupService._counts = Counter()
+
+    @staticmethod
+    def get_window_start(window_days: Optional[int] = None):
+        window_days = window_days or getattr(settings, 'STORE_CACHE_WARMUP_WINDOW_DAYS', WarmupService.DEFAULT_WINDOW_DAYS)
+        return timezone.now() - timedelta(days=window_days)
+
+    @staticmethod
+    def get_recent_targets(window_days: Optional[int] = None):
+        CacheWarmupTarget = apps.get_model('store', 'CacheWarmupTarget')
+        return CacheWarmupTarget.objects.filter(last_seen__gte=WarmupService.get_window_start(window_days))
+
+    @staticmethod
+    def get_targets(limit: int = DEFAULT_LIMIT, window_days: Optional[int] = None) -> List[Any]:
+        """
+        Get the most visited recent pages
+
+        Args:
+            limit: Maximum number of pages
+            window_days: How far back visits count
+
+        Returns:
+            CacheWarmupTarget objects, busiest first
+        """
+        targets = WarmupService.get_recent_targets(window_days).select_related('user')
+        return list(targets.order_by('-hits', '-last_seen')[:limit])
+
+    @staticmethod
+    def get_host() -> str:
+        """Get the host replayed requests are addressed to"""
+        host = getattr(settings, 'STORE_CACHE_WARMUP_HOST', None)
+        if host:
+            return host
+        for allowed in settings.ALLOWED_HOSTS:
+            if allowed and allowed != '*' and not allowed.startswith('.'):
+                return allowed
+        return 'localhost'
+
+    @staticmethod
+    def build_request(target):
+        """Build the GET request a visitor of the target page would send"""
+        url = target.path + (f'?{target.query}' if target.query else '')
+        request = RequestFactory(SERVER_NAME=WarmupService.get_host()).get(url)
+        request.user = target.user if target.user_id else AnonymousUser()
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+        request._messages = default_storage(request)
+        setattr(request, WarmupService.REQUEST_ATTRIBUTE, True)
+        return request
+
+    @staticmethod
+    def warm_target(target) -> Optional[str]:
+        """
+        Replay one page through its view, filling every cache it reads through
+
+        Args:
+            target: CacheWarmupTarget object
+
+        Returns:
+            None on success, otherwise a description of the failure
+        """
+        try:
+            match = resolve(target.path)
+            response = match.func(WarmupService.build_request(target), *match.args, **match.kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            if response.status_code != 200:
+                return f"status {response.status_code}"
+            return None
+        except Exception as e:
+            return str(e) or type(e).__name__
+
+    @staticmethod
+    def replay(limit: int = DEFAULT_LIMIT, workers: Optional[int] = None,
+               window_days: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Warm the busiest recent pages with a bounded pool of workers
+
+        Args:
+            limit: Maximum number of pages to replay
+            workers: Concurrent replays; 1 replays in the calling thread
+            window_days: How far back visits count
+
+        Returns:
+            Dictionary with targets, warmed, failed, coverage (share of recent
+            visits the warmed pages received), elapsed seconds and failures
+        """
+        workers = workers or getattr(settings, 'STORE_CACHE_WARMUP_WORKERS', WarmupService.DEFAULT_WORKERS)
+        started = time.perf_counter()
+        targets = WarmupService.get_targets(limit, window_days)
+        total_hits = WarmupService.get_recent_targets(window_days).aggregate(total=Sum('hits'))['total'] or 0
+
+        def warm_in_worker(target):
+            try:
+                return WarmupService.warm_target(target)
+            finally:
+                connection.close()
+
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(warm_in_worker, targets))
+        else:
+            results = [WarmupService.warm_target(target) for target in targets]
+
+        failures = [(target.path, error) for target, error in zip(targets, results) if error is not None]
+        warmed_hits = sum(target.hits for target, error in zip(targets, results) if error is None)
+        for path, error in failures:
+            logger.warning(f"Cache warmup of {path} failed: {error}")
+        return {
+            'targets': len(targets),
+            'warmed': len(targets) - len(failures),
+            'failed': len(failures),
+            'coverage': warmed_hits / total_hits if total_hits else 0.0,
+            'elapsed': time.perf_counter() - started,
+            'failures': failures,
+        }
+
+    @staticmethod
+    def prune(window_days: Optional[int] = None) -> int:
+        """
+        Forget pages nobody visited within the window
+
+        Returns:
+            Number of pages removed
+        """
+        CacheWarmupTarget = apps.get_model('store', 'CacheWarmupTarget')
+        deleted, _ = CacheWarmupTarget.objects.filter(last_seen__lt=WarmupService.get_window_start(window_days)).delete()
+        return deleted
+
+# Singleton instance
+warmup_service = WarmupService()
@@ -1,16 +1,20 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete, pre_delete
 from django.dispatch import receiver
+from django.contrib.auth.signals import user_logged_in
 from django.apps import apps
 from decimal import Decimal
 
 # Store the original status before saving
 @receiver(pre_save, sender='store.Order')
 def store_original_status(sender, instance, **kwargs):
+    from store.services.rollup_service import RollupService
     Order = apps.get_model('store', 'Order')
+    instance._original_rollup_state = None
     if instance.pk:
         try:
             old_instance = Order.objects.get(pk=instance.pk)
             instance._original_status = old_instance.status
+            instance._original_rollup_state = RollupService.get_order_state(old_instance)
         except Order.DoesNotExist:
             instance._original_status = instance.status
     else:
@@ -73,30 +77,29 @@ def get_commission_rate(user_role, product_category=None):
     """
     Get commission rate based on user role and product category
     """
+    from store.services.cache_service import CacheService
     CommissionSettings = apps.get_model('store', 'CommissionSettings')
     
-    # Try to get specific category rate first
-    if product_category:
-        try:
-            settings = CommissionSettings.objects.get(
-                user_role=user_role,
-                product_category=product_category,
-                is_active=True
+    # The whole settings table is small and read on every delivery; keep it hot in-process
+    rates = CacheService.get_or_set(
+        'commission_settings_table',
+        lambda: {
+            (role, category): rate
+            for role, category, rate in CommissionSettings.objects.filter(is_active=True).values_list(
+                'user_role', 'product_category', 'commission_rate'
             )
-            return settings.commission_rate
-        except CommissionSettings.DoesNotExist:
-            pass
+        },
+        CacheService.VERY_LONG_TIMEOUT,
+        tags=['commissionsettings']
+    )
+    
+    # Try to get specific category rate first
+    if product_category and (user_role, product_category) in rates:
+        return rates[(user_role, product_category)]
     
     # Try to get general rate for the user role
-    try:
-        settings = CommissionSettings.objects.get(
-            user_role=user_role,
-            product_category=None,
-            is_active=True
-        )
-        return settings.commission_rate
-    except CommissionSettings.DoesNotExist:
-        pass
+    if (user_role, None) in rates:
+        return rates[(user_role, None)]
     
     # Return default rates if no settings found
     if user_role == 'seller':
@@ -285,4 +288,230 @@ def calculate_commission_on_delivery(sender, instance, created, **kwargs):
                 except Exception as e:
                     # Log error but don't disrupt order processing
                     print(f"Error calculating commission for order {instance.pk}: {str(e)}")
-                    pass
\ No newline at end of file
+                    pass
+
+
+@receiver(post_save, sender='store.Coupon')
+@receiver(post_delete, sender='store.Coupon')
+def invalidate_coupon_pricing(sender, instance, **kwargs):
+    """Drop the cached coupon snapshot used by the pricing service"""
+    from store.services.pricing_service import PricingService
+    PricingService.invalidate_coupon(instance.pk)
+
+
+@receiver(post_save, sender='store.LoyaltyProgram')
+@receiver(post_delete, sender='store.LoyaltyProgram')
+def invalidate_loyalty_pricing(sender, instance, **kwargs):
+    """Drop the cached loyalty level used by the pricing service"""
+    from store.services.pricing_service import PricingService
+    PricingService.invalidate_loyalty(instance.user_id)
+
+
+@receiver(user_logged_in)
+def merge_session_cart_on_login(sender, request, user, **kwargs):
+    """Move the anonymous session cart into the user's server-side cart"""
+    session = getattr(request, 'session', None)
+    if session is None:
+        return
+    from store.utils import Cart
+    try:
+        Cart.merge_session_cart(session, user)
+    except Exception as e:
+        print(f"Error merging session cart for user {user.pk}: {str(e)}")
+    # Drop a cart memoized on the request before login
+    if hasattr(request, Cart.REQUEST_ATTR):
+        delattr(request, Cart.REQUEST_ATTR)
+
+
+@receiver(user_logged_in)
+def transfer_stock_holds_on_login(sender, request, user, **kwargs):
+    """Keep checkout holds across the session key rotation done by login"""
+    session = getattr(request, 'session', None)
+    if session is None:
+        return
+    from store.services.reservation_service import ReservationService
+    try:
+        ReservationService.transfer_holds(session)
+    except Exception as e:
+        print(f"Error transferring stock holds for user {user.pk}: {str(e)}")
+
+
+@receiver(post_save, sender='store.Product')
+def index_product_for_search(sender, instance, update_fields=None, **kwargs):
+    """Keep the product search index in step with product text"""
+    from store.services.search_service import SearchService, FIELD_WEIGHTS
+    # Stock-only saves do not change the indexed text
+    if update_fields is not None and not set(update_fields) & set(FIELD_WEIGHTS):
+        return
+    SearchService.index_product(instance)
+
+
+@receiver(post_delete, sender='store.Product')
+def remove_product_from_search(sender, instance, **kwargs):
+    """Drop corpus statistics that still count a deleted product"""
+    from store.services.search_service import SearchService
+    SearchService.remove_product(instance.pk)
+
+
+@receiver(post_save, sender='store.Product')
+@receiver(post_delete, sender='store.Product')
+def bump_catalog_version(sender, instance, update_fields=None, **kwargs):
+    """Invalidate catalog-versioned caches such as search facets"""
+    from store.services.cache_service import CacheService
+    if update_fields is not None and not set(update_fields) & {'price', 'category'}:
+        return
+    CacheService.bump_catalog_version()
+
+
+@receiver(post_save, sender='store.Product')
+@receiver(post_delete, sender='store.Product')
+def update_autocomplete_index(sender, instance, update_fields=None, **kwargs):
+    """Keep search-box suggestions in step with product names and keywords"""
+    from store.services.autocomplete_service import AutocompleteService, INDEXED_FIELDS
+    if update_fields is not None and not set(update_fields) & set(INDEXED_FIELDS):
+        return
+    AutocompleteService.product_changed(instance.pk, deleted=kwargs['signal'] is post_delete)
+
+
+@receiver(post_save, sender='store.Order')
+def update_popularity_on_cancel(sender, instance, created, **kwargs):
+    """Take cancelled orders out of the products' sales counters"""
+    original_status = getattr(instance, '_original_status', instance.status)
+    if created or original_status == instance.status:
+        return
+    from store.services.popularity_service import PopularityService
+    try:
+        if instance.status == 'cancelled':
+            PopularityService.record_cancellation(instance)
+        elif original_status == 'cancelled':
+            # Reinstated by an admin; count the order again
+            quantities = PopularityService.get_order_quantities(instance)
+            PopularityService.record_sale(quantities, when=instance.created_at)
+    except Exception as e:
+        print(f"Error updating popularity for order {instance.pk}: {str(e)}")
+
+
+@receiver(post_save, sender='store.Order')
+@receiver(pre_delete, sender='store.Order')
+def update_order_rollups(sender, instance, **kwargs):
+    """Apply an order change to the hourly and daily order rollups"""
+    from store.services.rollup_service import RollupService
+    if kwargs['signal'] is pre_delete:
+        old_state, new_state = RollupService.get_order_state(instance), None
+    else:
+        old_state = getattr(instance, '_original_rollup_state', None)
+        new_state = RollupService.get_order_state(instance)
+    RollupService.apply_order_change(instance.pk, old_state, new_state)
+    instance._original_rollup_state = new_state
+
+
+@receiver(pre_save, sender='store.OrderItem')
+def store_original_item_state(sender, instance, **kwargs):
+    """Remember what the sales rollups counted before this save"""
+    from store.services.rollup_service import RollupService
+    instance._original_rollup_state = None
+    if instance.pk:
+        original = sender.objects.filter(pk=instance.pk).select_related('order', 'product').first()
+        if original is not None:
+            instance._original_rollup_state = RollupService.get_item_state(original)
+
+
+@receiver(post_save, sender='store.OrderItem')
+@receiver(pre_delete, sender='store.OrderItem')
+def update_sales_rollups(sender, instance, **kwargs):
+    """Apply an order item change to the hourly and daily sales rollups"""
+    from store.services.rollup_service import RollupService
+    if kwargs['signal'] is pre_delete:
+        old_state, new_state = RollupService.get_item_state(instance), None
+    else:
+        old_state = getattr(instance, '_original_rollup_state', None)
+        new_state = RollupService.get_item_state(instance)
+    RollupService.apply_item_change(old_state, new_state)
+    instance._original_rollup_state = new_state
+
+
+@receiver(post_save, sender='store.AnalyticsIntegration')
+def update_event_rollups(sender, instance, created, **kwargs):
+    """Count events saved one by one; buffered events are counted when their batch is written"""
+    from store.services.cardinality_service import CardinalityService
+    from store.services.rollup_service import RollupService
+    if created:
+        RollupService.record_events([instance])
+        CardinalityService.record_events([instance])
+
+
+@receiver(post_save, sender='store.Order')
+def update_realtime_order_metrics(sender, instance, created, **kwargs):
+    """Count placed orders and delivered revenue in the live dashboard counters"""
+    from store.services.realtime_metrics_service import RealtimeMetricsService
+    if created:
+        RealtimeMetricsService.record_order()
+    if instance.status == 'delivered' and (created or getattr(instance, '_original_status', None) != 'delivered'):
+        RealtimeMetricsService.record_revenue(instance.total_amount)
+
+
+@receiver(post_save, sender='store.AnalyticsIntegration')
+def update_realtime_event_metrics(sender, instance, created, **kwargs):
+    """Count events saved one by one; buffered events are counted when they are tracked"""
+    from store.services.realtime_metrics_service import RealtimeMetricsService
+    if created:
+        RealtimeMetricsService.record_event(
+            instance.event_type, instance.user_id, instance.session_key,
+            now=instance.timestamp.timestamp() if instance.timestamp else None
+        )
+
+
+@receiver(pre_save, sender='store.Review')
+@receiver(pre_save, sender='store.EnhancedReview')
+def store_original_rating(sender, instance, **kwargs):
+    """Remember what the rating summary counted before this save"""
+    from store.services.rating_service import RatingService
+    instance._original_rating_state = None
+    if instance.pk:
+        original = sender.objects.filter(pk=instance.pk).only('product', 'rating', 'is_verified_purchase').first()
+        if original is not None:
+            instance._original_rating_state = RatingService.get_review_state(original)
+
+
+@receiver(post_save, sender='store.Review')
+@receiver(post_save, sender='store.EnhancedReview')
+@receiver(post_delete, sender='store.Review')
+@receiver(post_delete, sender='store.EnhancedReview')
+def update_rating_summary(sender, instance, **kwargs):
+    """Apply a review change to its product's rating summary"""
+    from store.services.cache_service import CacheService
+    from store.services.rating_service import RatingService
+    if kwargs['signal'] is post_delete:
+        old_state, new_state = RatingService.get_review_state(instance), None
+    else:
+        old_state = getattr(instance, '_original_rating_state', None)
+        new_state = RatingService.get_review_state(instance)
+    if old_state == new_state:
+        return
+    RatingService.apply_change(old_state, new_state)
+    # Product pages and list cards cache their rating blocks
+    CacheService.invalidate_tags('productratingsummary', *{
+        f'product:{state[0]}' for state in (old_state, new_state) if state is not None
+    })
+
+
+@receiver(post_save, sender='store.Product')
+@receiver(post_delete, sender='store.Product')
+@receiver(post_save, sender='store.Order')
+@receiver(post_delete, sender='store.Order')
+@receiver(post_save, sender='store.EnhancedReview')
+@receiver(post_delete, sender='store.EnhancedReview')
+@receiver(post_save, sender='store.Coupon')
+@receiver(post_delete, sender='store.Coupon')
+@receiver(post_save, sender='store.CommissionSettings')
+@receiver(post_delete, sender='store.CommissionSettings')
+@receiver(post_save, sender='store.Page')
+@receiver(post_delete, sender='store.Page')
+@receiver(post_save, sender='store.Article')
+@receiver(post_delete, sender='store.Article')
+@receiver(post_save, sender='store.Comment')
+@receiver(post_delete, sender='store.Comment')
+def invalidate_tagged_caches(sender, instance, **kwargs):
+    """Expire cached pages and dashboards that depend on the changed object"""
+    from store.services.cache_service import CacheService
+    CacheService.invalidate_tags(*CacheService.get_instance_tags(instance))
@@ -0,0 +1,116 @@
+"""
+Unit tests for the bilingual autocomplete prefix index
+"""
+
+from django.test import TestCase, override_settings
+from django.apps import apps
+from django.core.cache import cache
+from django.urls import reverse
+from decimal import Decimal
+from rest_framework.test import APIClient
+from store.services.autocomplete_service import AutocompleteService, PrefixIndex
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AutocompleteServiceTestCase(TestCase):
+    """Test cases for AutocompleteService"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        AutocompleteService.reset()
+        Product = apps.get_model('store', 'Product')
+        self.Product = Product
+        self.phone = Product.objects.create(
+            name='هاتف ذكي', name_en='Smart Phone', seo_keywords='جوال موبايل', price=Decimal('100.00'), order_count=3
+        )
+        self.cover = Product.objects.create(
+            name='غطاء هاتف', name_en='Phone Cover', price=Decimal('10.00'), order_count=9
+        )
+        self.laptop = Product.objects.create(name='حاسوب محمول', name_en='Laptop', price=Decimal('900.00'))
+
+    def tearDown(self):
+        AutocompleteService.reset()
+
+    def names(self, query, limit=None):
+        return [suggestion['name'] for suggestion in AutocompleteService.suggest(query, limit)]
+
+    def test_bilingual_prefixes_with_arabic_normalization(self):
+        """Partial Arabic, English and keyword words all complete"""
+        self.assertEqual(self.names('lap'), ['حاسوب محمول'])
+        self.assertEqual(self.names('جو'), ['هاتف ذكي'])
+        # The definite article is stripped like in full-text search
+        self.assertEqual(self.names('الحاس'), ['حاسوب محمول'])
+        self.assertEqual(self.names('phone co'), ['غطاء هاتف'])
+        self.assertEqual(self.names(''), [])
+        self.assertEqual(self.names('xyz'), [])
+
+    def test_ranking_prefers_name_prefix_then_popularity(self):
+        """A name starting with the query beats a more popular product"""
+        self.assertEqual(self.names('هات'), ['هاتف ذكي', 'غطاء هاتف'])
+        self.assertEqual(self.names('phon'), ['غطاء هاتف', 'هاتف ذكي'])
+        self.assertEqual(self.names('phon', limit=1), ['غطاء هاتف'])
+
+    def test_product_changes_update_index_incrementally(self):
+        """Saves and deletes apply to the loaded index without a rebuild"""
+        index = AutocompleteService.get_index()
+        self.phone.name_en = 'Tablet'
+        self.phone.save()
+        tablet = self.Product.objects.create(name='قلم', name_en='Tablet Pen', price=Decimal('5.00'))
+        self.laptop.delete()
+
+        self.assertIs(AutocompleteService.get_index(), index)
+        self.assertEqual(index.version, AutocompleteService.get_version())
+        self.assertEqual(self.names('tab'), ['هاتف ذكي', 'قلم'])
+        self.assertEqual(self.names('smart'), [])
+        self.assertEqual(self.names('lap'), [])
+        self.assertNotIn(self.laptop.pk, {product_id for _, product_id in index.keys})
+        self.assertIn(tablet.pk, index.products)
+
+    @override_settings(STORE_AUTOCOMPLETE_REFRESH_SECONDS=0)
+    def test_changes_from_another_process_trigger_rebuild(self):
+        """A bumped shared version makes other processes reload"""
+        index = AutocompleteService.get_index()
+        cache.incr(AutocompleteService.VERSION_KEY)
+        self.assertIsNot(AutocompleteService.get_index(), index)
+
+    @override_settings(STORE_AUTOCOMPLETE_REFRESH_SECONDS=0)
+    def test_logged_changes_from_another_process_are_replayed(self):
+        """Other processes apply a logged product change without a rebuild"""
+        index = AutocompleteService.get_index()
+        self.Product.objects.filter(pk=self.laptop.pk).update(name_en='Notebook')
+        version = cache.incr(AutocompleteService.VERSION_KEY)
+        cache.set(AutocompleteService.get_change_key(version), self.laptop.pk)
+
+        self.assertIs(AutocompleteService.get_index(), index)
+        self.assertEqual(index.version, version)
+        self.assertEqual(self.names('note'), ['حاسوب محمول'])
+        self.assertEqual(self.names('lap'), [])
+
+    def test_suggestions_do_not_query_database(self):
+        """Warm lookups are served from memory"""
+        AutocompleteService.get_index()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.names('هات')), 2)
+
+    def test_prefix_index_slices(self):
+        """Prefix ranges stop at the first non-matching term"""
+        index = PrefixIndex()
+        index.load([
+            {'id': 1, 'name': 'abc', 'name_en': None, 'seo_keywords': '', 'order_count': 0},
+            {'id': 2, 'name': 'abd', 'name_en': None, 'seo_keywords': '', 'order_count': 0},
+            {'id': 3, 'name': 'b', 'name_en': None, 'seo_keywords': '', 'order_count': 0},
+        ])
+        self.assertEqual(index.match_prefix('ab'), {1, 2})
+        self.assertEqual(index.match_prefix('abc'), {1})
+        self.assertEqual(index.match_prefix('c'), set())
+
+    def test_autocomplete_endpoint(self):
+        """The REST endpoint returns suggestions for anonymous users"""
+        response = APIClient().get(reverse('store_api:product_autocomplete'), {'q': 'Smart', 'limit': 'x'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['suggestions'], [
+            {'id': self.phone.pk, 'name': 'هاتف ذكي', 'name_en': 'Smart Phone'}
+        ])
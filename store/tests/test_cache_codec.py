@@ -0,0 +1,119 @@
+"""
+Unit tests for compact DTO serialization of cached payloads
+"""
+
+from io import StringIO
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from decimal import Decimal
+from store.services.cache_service import CacheService
+from store.utils.cache_codec import CodecError, DTOCodec, dump_instances, load_instances, pack, unpack
+from store.views import PRODUCT_DETAIL_CODEC, PRODUCT_PAGE_CODEC
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class PackTestCase(TestCase):
+    """Test cases for the binary envelope"""
+
+    def test_round_trip_and_compression_threshold(self):
+        """Large payloads are compressed, small ones are not"""
+        data = {'rows': [(1, 'هاتف', '10.00', None)] * 200}
+        packed = pack(data, compress_threshold=100)
+        self.assertEqual(unpack(packed), data)
+        self.assertLess(len(packed), len(pack(data, compress_threshold=10 ** 9)))
+        self.assertEqual(pack('x', compress_threshold=100)[2], 0)
+
+    def test_foreign_payloads_are_rejected(self):
+        """Old pickles, other formats and other codecs raise CodecError"""
+        with self.assertRaises(CodecError):
+            unpack({'featured_products': []})
+        with self.assertRaises(CodecError):
+            unpack(b'\x09' + pack('x')[1:])
+        payload = DTOCodec('home_page', 1, list, list).encode([1])
+        with self.assertRaises(CodecError):
+            DTOCodec('home_page', 2, list, list).decode(payload)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ModelRowsTestCase(TestCase):
+    """Test cases for model instances stored as rows"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.Product = apps.get_model('store', 'Product')
+        self.product = self.Product.objects.create(
+            name='هاتف', price=Decimal('199.90'), stock_quantity=3, image='products/phone.jpg'
+        )
+        self.user = User.objects.create_user(username='reviewer', password='x')
+        apps.get_model('store', 'EnhancedReview').objects.create(
+            product=self.product, user=self.user, rating=4, title='t', comment='c'
+        )
+
+    def test_instances_round_trip_without_queries(self):
+        """Field types and select_related objects survive, with no queries"""
+        product = self.Product.objects.select_related('rating_summary').get(pk=self.product.pk)
+        dto = unpack(pack(dump_instances([product], ('rating_summary',))))
+        with self.assertNumQueries(0):
+            loaded, = load_instances(dto)
+            self.assertEqual(loaded.price, Decimal('199.90'))
+            self.assertEqual(loaded.created_at, product.created_at)
+            self.assertEqual(loaded.image.name, 'products/phone.jpg')
+            self.assertEqual(loaded.rating_summary.review_count, 1)
+            self.assertIs(loaded.rating_summary.product, loaded)
+        self.assertFalse(loaded._state.adding)
+
+    def test_changed_columns(self):
+        """Rows missing a new column defer it; unknown columns are rejected"""
+        dto = dump_instances([self.product])
+        index = dto['columns'].index('name_en')
+        dto['columns'] = dto['columns'][:index] + dto['columns'][index + 1:]
+        dto['rows'] = [row[:index] + row[index + 1:] for row in dto['rows']]
+        loaded, = load_instances(dto)
+        self.assertIn('name_en', loaded.get_deferred_fields())
+        self.assertEqual(loaded.name, 'هاتف')
+
+        dto['columns'] = dto['columns'][:-1] + ('removed_field',)
+        with self.assertRaises(CodecError):
+            load_instances(dto)
+        self.assertEqual(load_instances(unpack(pack(dump_instances([], ('rating_summary',))))), [])
+
+    def test_cached_pages_store_dtos(self):
+        """List and detail pages are cached as bytes and render from them"""
+        list_url = reverse('product_list')
+        detail_url = reverse('product_detail', args=[self.product.pk])
+        for _ in range(2):
+            self.assertContains(self.client.get(list_url), 'هاتف')
+            self.assertContains(self.client.get(detail_url), 'هاتف')
+
+        entry = cache.get('product_list_page_1')
+        self.assertIsInstance(entry['value'], bytes)
+        page = PRODUCT_PAGE_CODEC.decode(entry['value'])
+        self.assertEqual((page.number, page.paginator.count, len(page)), (1, 1, 1))
+        context = PRODUCT_DETAIL_CODEC.decode(cache.get(f'product_detail_{self.product.pk}')['value'])
+        self.assertEqual((context['product'].pk, context['review_count']), (self.product.pk, 1))
+
+    def test_undecodable_entry_is_recomputed(self):
+        """An entry written by an older schema is treated as a miss"""
+        CacheService.set_tagged('product_list_page_1', b'\x00old', tags=['product', 'productratingsummary'])
+        response = self.client.get(reverse('product_list'))
+        self.assertContains(response, 'هاتف')
+        self.assertIsInstance(PRODUCT_PAGE_CODEC.decode(cache.get('product_list_page_1')['value']).number, int)
+
+    def test_benchmark_command(self):
+        """The benchmark reports every payload"""
+        out = StringIO()
+        with mock.patch.object(self.Product.objects, 'filter', wraps=self.Product.objects.filter) as filter_products:
+            call_command('benchmark_cache_codec', products=15, iterations=2, stdout=out)
+        for name in ('home', 'product_list', 'product_detail'):
+            self.assertIn(name, out.getvalue())
+        self.assertIn('Catalog: 15 products', out.getvalue())
+        # The temporary products are rolled back, not deleted
+        filter_products.assert_not_called()
+        self.assertEqual(self.Product.objects.count(), 1)
@@ -0,0 +1,80 @@
+"""
+Unit tests for per-prefix cache metrics
+"""
+
+from io import StringIO
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from store.services.cache_metrics_service import CacheMetricsService
+from store.services.cache_service import CacheService
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORE_CACHE_METRICS_FLUSH_INTERVAL=3600)
+class CacheMetricsTestCase(TestCase):
+    """Test cases for CacheMetricsService"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        CacheMetricsService.reset()
+
+    def tearDown(self):
+        CacheMetricsService.reset()
+
+    def test_prefix_stops_at_identifiers(self):
+        """Keys are grouped by the parts naming the kind of entry"""
+        self.assertEqual(CacheMetricsService.get_prefix('product_detail_42'), 'product_detail')
+        self.assertEqual(CacheMetricsService.get_prefix('manager_dashboard_data_7'), 'manager_dashboard')
+        self.assertEqual(CacheMetricsService.get_prefix('product_list_v2_page_1'), 'product_list')
+        self.assertEqual(CacheMetricsService.get_prefix('product_42'), 'product')
+        self.assertEqual(CacheMetricsService.get_prefix('search:corpus_stats'), 'search:corpus_stats')
+
+    def test_get_or_set_counts_hits_misses_and_sizes(self):
+        """Cache reads through CacheService are counted per prefix"""
+        for _ in range(3):
+            CacheService.get_or_set('product_detail_1', lambda: 'x' * 2000, 60)
+        CacheService.get_or_set('product_detail_2', lambda: 'y', 60)
+        CacheService.get('plain_key_1')
+        CacheService.set('plain_key_1', 5, 60, compute_time=0.02)
+        self.assertEqual(CacheService.get('plain_key_1'), 5)
+
+        report = CacheMetricsService.get_process_metrics()
+        detail = report['product_detail']
+        self.assertEqual((detail['hits'], detail['misses'], detail['sets']), (2, 2, 2))
+        self.assertEqual(detail['hit_rate'], 0.5)
+        self.assertEqual(detail['compute_count'], 2)
+        self.assertEqual(detail['size_buckets'][1:3], [1, 1])
+        self.assertEqual(detail['p95_size'], 4096)
+        plain = report['plain_key']
+        self.assertEqual((plain['hits'], plain['misses'], plain['sets']), (1, 1, 1))
+        self.assertEqual(plain['p95_compute_ms'], 50)
+
+    def test_flush_adds_to_shared_totals_and_reports(self):
+        """Flushed counters add up across flushes and reach the command and endpoint"""
+        CacheService.get_or_set('home_page', lambda: 1, 60)
+        CacheMetricsService.flush()
+        CacheService.get_or_set('home_page', lambda: 1, 60)
+        CacheMetricsService.flush()
+        shared = CacheMetricsService.get_shared_metrics()['home_page']
+        self.assertEqual((shared['hits'], shared['misses'], shared['sets']), (1, 1, 1))
+
+        out = StringIO()
+        call_command('cache_metrics_report', stdout=out)
+        self.assertIn('home_page', out.getvalue())
+        self.assertIn('50.0%', out.getvalue())
+
+        response = self.client.get(reverse('store_api:cache_metrics'), REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(response.status_code, 403)
+        staff = User.objects.create_user(username='staff', password='x', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('store_api:cache_metrics'), REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['shared']['home_page']['hits'], 1)
+
+        call_command('cache_metrics_report', reset=True, stdout=StringIO())
+        self.assertEqual(CacheMetricsService.get_shared_metrics(), {})
@@ -0,0 +1,249 @@
+"""
+Unit tests for tag- and namespace-versioned cache invalidation
+"""
+
+import threading
+import time
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from decimal import Decimal
+from store.services.cache_service import CacheService, LocalCache
+from store.signals import get_commission_rate
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TaggedCacheTestCase(TestCase):
+    """Test cases for CacheService tagged entries"""
+
+    def setUp(self):
+        """Start from an empty cache"""
+        cache.clear()
+
+    def test_tag_invalidation(self):
+        """Bumping a tag expires only the entries that depend on it"""
+        CacheService.set_tagged('product_detail_1', 'one', tags=['product:1'])
+        CacheService.set_tagged('product_detail_2', 'two', tags=['product:2'])
+        self.assertEqual(CacheService.get_tagged('product_detail_1', ['product:1']), 'one')
+
+        CacheService.invalidate_tags('product:1')
+        self.assertIsNone(CacheService.get_tagged('product_detail_1', ['product:1']))
+        self.assertEqual(CacheService.get_tagged('product_detail_2', ['product:2']), 'two')
+
+    def test_invalidate_pattern_bumps_namespace(self):
+        """Patterns expire every key under their prefix"""
+        CacheService.set_tagged('product_list_page_1', 'page 1')
+        CacheService.set_tagged('product_list_page_2', 'page 2')
+        CacheService.set_tagged('home_page_data', 'home')
+
+        CacheService.invalidate_pattern('product_list_*')
+        self.assertIsNone(CacheService.get_tagged('product_list_page_1'))
+        self.assertIsNone(CacheService.get_tagged('product_list_page_2'))
+        self.assertEqual(CacheService.get_tagged('home_page_data'), 'home')
+
+        CacheService.invalidate_pattern('*')
+        self.assertIsNone(CacheService.get_tagged('home_page_data'))
+
+    def test_evicted_version_counter_expires_entry(self):
+        """Losing a tag counter cannot resurrect an old entry"""
+        CacheService.set_tagged('product_detail_1', 'one', tags=['product:1'])
+        cache.delete(f"{CacheService.TAG_VERSION_PREFIX}:product:1")
+        self.assertIsNone(CacheService.get_tagged('product_detail_1', ['product:1']))
+
+    def test_evicted_catalog_version_is_not_reused(self):
+        """A catalog version lost to eviction restarts past every version handed out"""
+        CacheService.bump_catalog_version()
+        before = CacheService.get_catalog_version()
+        cache.delete(CacheService.CATALOG_VERSION_KEY)
+        self.assertGreater(CacheService.get_catalog_version(), before)
+
+    def test_get_or_set_with_tags(self):
+        """get_or_set recomputes after an invalidation"""
+        calls = []
+        compute = lambda: calls.append(1) or len(calls)
+        self.assertEqual(CacheService.get_or_set('global_stats_x', compute, tags=['order']), 1)
+        self.assertEqual(CacheService.get_or_set('global_stats_x', compute, tags=['order']), 1)
+        CacheService.invalidate_tags('order')
+        self.assertEqual(CacheService.get_or_set('global_stats_x', compute, tags=['order']), 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ModelInvalidationTestCase(TestCase):
+    """Test cases for model signals expiring cached pages"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        Product = apps.get_model('store', 'Product')
+        self.product = Product.objects.create(name='Phone', price=Decimal('100.00'), stock_quantity=5)
+        self.user = User.objects.create_user(username='reviewer', password='x')
+
+    def test_product_save_refreshes_cached_pages(self):
+        """A price change shows up on cached list and detail pages"""
+        detail_url = reverse('product_detail', args=[self.product.pk])
+        self.assertContains(self.client.get(reverse('product_list')), '100,00')
+        self.assertContains(self.client.get(detail_url), 'Phone')
+
+        self.product.price = Decimal('80.00')
+        self.product.name = 'Phone Pro'
+        self.product.save()
+        self.assertContains(self.client.get(reverse('product_list')), '80,00')
+        self.assertContains(self.client.get(detail_url), 'Phone Pro')
+
+    def test_review_invalidates_its_product_only(self):
+        """A review expires its product's detail page and the list cards"""
+        other = apps.get_model('store', 'Product').objects.create(name='Case', price=Decimal('5.00'))
+        CacheService.set_tagged(f'product_detail_{other.pk}', 'cached', tags=[f'product:{other.pk}'])
+        CacheService.set_tagged(f'product_detail_{self.product.pk}', 'cached', tags=[f'product:{self.product.pk}'])
+        CacheService.set_tagged('product_list_page_1', 'cached', tags=['product', 'productratingsummary'])
+
+        apps.get_model('store', 'EnhancedReview').objects.create(
+            product=self.product, user=self.user, rating=5, title='t', comment='c'
+        )
+        self.assertIsNone(CacheService.get_tagged(f'product_detail_{self.product.pk}', [f'product:{self.product.pk}']))
+        self.assertIsNone(CacheService.get_tagged('product_list_page_1', ['product', 'productratingsummary']))
+        self.assertEqual(CacheService.get_tagged(f'product_detail_{other.pk}', [f'product:{other.pk}']), 'cached')
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORE_LOCAL_CACHE_ENABLED=True)
+class LocalTierTestCase(TestCase):
+    """Test cases for the in-process cache tier"""
+
+    def setUp(self):
+        """Start from empty tiers and counters"""
+        cache.clear()
+        CacheService.clear_local()
+        CacheService.reset_tier_stats()
+
+    def tearDown(self):
+        CacheService.clear_local()
+
+    def test_hot_entry_served_from_local_tier(self):
+        """A second read does not touch the shared cache"""
+        CacheService.set_tagged('home_page_data', 'home', tags=['product'])
+        cache.delete('home_page_data')
+        self.assertEqual(CacheService.get_tagged('home_page_data', ['product']), 'home')
+        stats = CacheService.get_tier_stats()
+        self.assertEqual((stats['local']['hits'], stats['remote']['hits']), (1, 0))
+
+        CacheService.clear_local()
+        self.assertIsNone(CacheService.get_tagged('home_page_data', ['product']))
+        self.assertEqual(CacheService.get_tier_stats()['local']['misses'], 1)
+        self.assertEqual(CacheService.get_tier_stats()['remote']['misses'], 1)
+
+    def test_remote_hit_fills_local_tier(self):
+        """Entries read from the shared cache are kept locally"""
+        CacheService.set_tagged('home_page_data', 'home', tags=['product'])
+        CacheService.clear_local()
+        self.assertEqual(CacheService.get_tagged('home_page_data', ['product']), 'home')
+        cache.delete('home_page_data')
+        self.assertEqual(CacheService.get_tagged('home_page_data', ['product']), 'home')
+        self.assertEqual(CacheService.get_tier_stats()['remote']['hits'], 1)
+
+    @override_settings(STORE_LOCAL_CACHE_VERSION_TIMEOUT=0)
+    def test_other_process_invalidation_expires_local_entry(self):
+        """A version bumped elsewhere is seen on the next read"""
+        CacheService.set_tagged('product_detail_1', 'one', tags=['product:1'])
+        cache.incr(f"{CacheService.TAG_VERSION_PREFIX}:product:1")
+        self.assertIsNone(CacheService.get_tagged('product_detail_1', ['product:1']))
+
+    def test_local_invalidation_is_immediate(self):
+        """Bumps in this process update the local version snapshot"""
+        CacheService.set_tagged('product_detail_1', 'one', tags=['product:1'])
+        CacheService.invalidate_tags('product:1')
+        self.assertIsNone(CacheService.get_tagged('product_detail_1', ['product:1']))
+
+    def test_lru_bound(self):
+        """The least recently used entry is evicted first"""
+        local = LocalCache()
+        local.set('a', 1, 60, 2)
+        local.set('b', 2, 60, 2)
+        local.get('a')
+        local.set('c', 3, 60, 2)
+        self.assertEqual((local.get('a'), local.get('b'), local.get('c')), (1, None, 3))
+
+    def test_commission_settings_table_follows_edits(self):
+        """The cached settings table is invalidated by saves"""
+        CommissionSettings = apps.get_model('store', 'CommissionSettings')
+        setting = CommissionSettings.objects.create(user_role='seller', commission_rate=Decimal('15.00'))
+        self.assertEqual(get_commission_rate('seller'), Decimal('15.00'))
+        with self.assertNumQueries(0):
+            get_commission_rate('seller', 'phones')
+        setting.commission_rate = Decimal('20.00')
+        setting.save()
+        self.assertEqual(get_commission_rate('seller'), Decimal('20.00'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORE_CACHE_EARLY_EXPIRY_BETA=0)
+class StampedeProtectionTestCase(TestCase):
+    """Test cases for single-flight get_or_set"""
+
+    def setUp(self):
+        """Start from an empty cache"""
+        cache.clear()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def compute(self, value='fresh', delay=0.2):
+        def compute_value():
+            with self.calls_lock:
+                self.calls += 1
+            time.sleep(delay)
+            return value
+        return compute_value
+
+    def test_concurrent_misses_compute_once(self):
+        """N simultaneous misses trigger one computation and all get its value"""
+        workers = 8
+        barrier = threading.Barrier(workers)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(CacheService.get_or_set('home_page_data', self.compute(), tags=['product']))
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['fresh'] * workers)
+
+    def test_stale_value_served_while_refreshing(self):
+        """Past its timeout an entry is refreshed once and served stale meanwhile"""
+        CacheService.set_tagged('home_page_data', 'old', timeout=60, tags=['product'])
+        with mock.patch('store.services.cache_service.time.time', return_value=time.time() + 61):
+            self.assertIsNone(CacheService.get_tagged('home_page_data', ['product']))
+            cache.add('home_page_data_lock', 1)
+            self.assertEqual(CacheService.get_or_set('home_page_data', self.compute(), tags=['product']), 'old')
+            self.assertEqual(self.calls, 0)
+            cache.delete('home_page_data_lock')
+            self.assertEqual(CacheService.get_or_set('home_page_data', self.compute(delay=0), tags=['product']), 'fresh')
+        self.assertEqual(self.calls, 1)
+
+    def test_invalidated_entry_is_never_served_stale(self):
+        """Waiting workers get the recomputed value after an invalidation"""
+        CacheService.set_tagged('product_detail_1', 'old price', timeout=60, tags=['product:1'])
+        CacheService.invalidate_tags('product:1')
+        cache.add('product_detail_1_lock', 1)
+        threading.Timer(0.1, lambda: CacheService.set_tagged('product_detail_1', 'new price', tags=['product:1'])).start()
+        self.assertEqual(CacheService.get_or_set('product_detail_1', self.compute(), tags=['product:1']), 'new price')
+        self.assertEqual(self.calls, 0)
+
+    @override_settings(STORE_CACHE_EARLY_EXPIRY_BETA=1.0)
+    def test_probabilistic_early_expiry(self):
+        """Slow entries are refreshed ahead of time, fast ones only at expiry"""
+        now = 1000.0
+        slow = {'value': 1, 'expires_at': now + 5, 'compute_time': 10}
+        fast = {'value': 1, 'expires_at': now + 5, 'compute_time': 0}
+        with mock.patch('store.services.cache_service.random.random', return_value=0.9):
+            self.assertTrue(CacheService.should_refresh(slow, now))
+            self.assertFalse(CacheService.should_refresh(fast, now))
+        self.assertTrue(CacheService.should_refresh(fast, now + 5))
+        self.assertFalse(CacheService.should_refresh({'value': 1}, now))
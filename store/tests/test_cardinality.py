@@ -0,0 +1,104 @@
+"""
+Unit tests for HyperLogLog unique counts
+"""
+
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.utils import timezone
+from decimal import Decimal
+from store.services.analytics_service import analytics_service
+from store.services.cardinality_service import CardinalityService
+from store.services.event_ingestion_service import EventIngestionService
+from store.utils.hyperloglog import HyperLogLog
+
+
+class HyperLogLogTestCase(TestCase):
+    """Test cases for HyperLogLog sketches"""
+
+    def test_estimates_merge_and_serialization(self):
+        """Estimates stay within a few percent and merging is a union"""
+        first = HyperLogLog().update(range(20000))
+        second = HyperLogLog().update(range(10000, 30000))
+        self.assertAlmostEqual(first.count(), 20000, delta=20000 * 0.05)
+        self.assertEqual(HyperLogLog().update([1, 2, 3, 3, 2, 1]).count(), 3)
+
+        union = HyperLogLog.from_bytes(first.to_bytes()).merge(second)
+        self.assertAlmostEqual(union.count(), 30000, delta=30000 * 0.05)
+        self.assertEqual(HyperLogLog.from_bytes(first.to_bytes()).registers, first.registers)
+
+        # A nearly empty sketch is stored in a few dozen bytes
+        self.assertLess(len(HyperLogLog().update(['a', 'b']).to_bytes()), 100)
+        with self.assertRaises(ValueError):
+            HyperLogLog(12).merge(HyperLogLog(10))
+
+
+class CardinalityServiceTestCase(TestCase):
+    """Test cases for CardinalityService"""
+
+    def setUp(self):
+        """Set up events over two days"""
+        self.AnalyticsIntegration = apps.get_model('store', 'AnalyticsIntegration')
+        self.UniqueCountSketch = apps.get_model('store', 'UniqueCountSketch')
+        self.product = apps.get_model('store', 'Product').objects.create(name='Phone', price=Decimal('100.00'))
+        self.users = [User.objects.create_user(username=f'user{index}', password='testpass123') for index in range(3)]
+        self.now = timezone.now()
+        self.yesterday = self.now - timedelta(days=1)
+        for user, session, when in [
+            (self.users[0], 's1', self.yesterday),
+            (self.users[0], 's2', self.now),
+            (self.users[1], 's3', self.now),
+            (None, 's4', self.now),
+            (None, 's4', self.now),
+        ]:
+            self.AnalyticsIntegration.objects.create(
+                event_type='product_view', user=user, session_key=session, product=self.product, timestamp=when
+            )
+        self.AnalyticsIntegration.objects.create(event_type='page_view', ip_address='10.0.0.1', timestamp=self.now)
+
+    def test_counts_merge_hours_and_days(self):
+        """Unique counts over a range merge its sketches without double counting"""
+        start = self.yesterday - timedelta(hours=1)
+        self.assertEqual(CardinalityService.count('users', start=start), 2)
+        self.assertEqual(CardinalityService.count('sessions', start=start), 4)
+        # Two users, the anonymous session and the anonymous IP
+        self.assertEqual(CardinalityService.count('visitors', start=start), 4)
+        self.assertEqual(CardinalityService.count('visitors'), 4)
+        self.assertEqual(
+            CardinalityService.count_by_key('product_viewers', [self.product.pk], start=start),
+            {str(self.product.pk): 3}
+        )
+
+        daily = CardinalityService.get_daily_counts('users', self.yesterday)
+        self.assertEqual(list(daily.values())[-1], 2)
+        self.assertEqual(sum(daily.values()), 3)
+
+    def test_rebuild_matches_incremental_sketches(self):
+        """Sketches rebuilt from raw events equal the ones kept on write"""
+        def snapshot():
+            return {
+                (row.period, row.bucket, row.metric, row.key): HyperLogLog.from_bytes(row.sketch).registers
+                for row in self.UniqueCountSketch.objects.all()
+            }
+        incremental = snapshot()
+        CardinalityService.rebuild()
+        self.assertEqual(snapshot(), incremental)
+
+    @override_settings(STORE_ANALYTICS_ASYNC_FLUSH=False)
+    def test_buffered_events_and_analytics(self):
+        """Batched events reach the sketches and analytics read them instead of COUNT(DISTINCT)"""
+        EventIngestionService.reset()
+        self.addCleanup(EventIngestionService.reset)
+        EventIngestionService.track('page_view', user_id=self.users[2].pk, session_key='s5')
+        EventIngestionService.flush()
+        self.assertEqual(CardinalityService.count('users', start=self.now - timedelta(hours=1)), 3)
+
+        data = analytics_service.get_basic_analytics()['data']
+        self.assertEqual(data['active_users'], 3)
+        self.assertEqual(data['unique_visitors'], 5)
+        self.assertEqual(data['top_products'][0]['unique_viewers'], 3)
+
+        unique_visitors = analytics_service.get_user_analytics()['data']['unique_visitors']
+        self.assertEqual(unique_visitors['last_30_days'], 5)
+        self.assertEqual(unique_visitors['daily'][-1]['visitors'], 5)
@@ -0,0 +1,119 @@
+"""
+Unit tests for the session cart
+"""
+
+from django.test import TestCase, RequestFactory
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in
+from decimal import Decimal
+from store.utils import Cart
+from store.context_processors import cart_processor
+
+
+class DummySession(dict):
+    """Minimal stand-in for a Django session"""
+    modified = False
+
+
+class CartTestCase(TestCase):
+    """Test cases for Cart resolution and pricing"""
+
+    def setUp(self):
+        """Set up test data"""
+        Product = apps.get_model('store', 'Product')
+        self.products = [
+            Product.objects.create(
+                name=f'Product {i}',
+                price=Decimal('10.00') * (i + 1),
+                stock_quantity=10
+            )
+            for i in range(5)
+        ]
+        self.session = DummySession()
+        self.cart = Cart(self.session)
+        for product in self.products:
+            self.cart.add(product.id, 2)
+
+    def test_items_resolved_with_single_query(self):
+        """All cart lines are loaded with one query regardless of cart size"""
+        with self.assertNumQueries(1):
+            items = self.cart.get_items()
+            total = self.cart.get_total_price()
+        self.assertEqual(len(items), 5)
+        self.assertEqual(total, Decimal('300.00'))
+
+    def test_priced_cart_is_memoized_until_mutation(self):
+        """The priced cart is reused until the cart changes"""
+        priced = self.cart.priced()
+        with self.assertNumQueries(0):
+            self.assertIs(self.cart.priced(), priced)
+        self.cart.update(self.products[0].id, 5)
+        priced = self.cart.priced()
+        self.assertEqual(priced.get_item(self.products[0].id)['quantity'], 5)
+        self.assertEqual(priced.get_item_total(self.products[0].id), Decimal('50.00'))
+        self.assertEqual(priced.total_quantity, 13)
+
+    def test_invalid_lines_are_dropped(self):
+        """Missing or malformed product ids are removed from the session"""
+        self.session['cart']['999999'] = 1
+        self.session['cart']['not-a-number'] = 1
+        items = self.cart.get_items()
+        self.assertEqual(len(items), 5)
+        self.assertNotIn('999999', self.session['cart'])
+        self.assertNotIn('not-a-number', self.session['cart'])
+
+    def test_cart_shared_across_request(self):
+        """Views and context processors reuse the request's cart"""
+        request = RequestFactory().get('/')
+        request.session = self.session
+        cart = Cart.for_request(request)
+        self.assertIs(Cart.for_request(request), cart)
+        cart.priced()
+        with self.assertNumQueries(0):
+            self.assertEqual(cart_processor(request), {'cart_count': 10})
+
+
+class UserCartTestCase(TestCase):
+    """Test cases for the server-side cart of logged-in users"""
+
+    def setUp(self):
+        """Set up test data"""
+        Product = apps.get_model('store', 'Product')
+        self.products = [
+            Product.objects.create(name=f'Product {i}', price=Decimal('10.00'), stock_quantity=10)
+            for i in range(3)
+        ]
+        self.user = User.objects.create_user(username='shopper', password='testpass123')
+        self.session = DummySession()
+
+    def test_lines_are_stored_outside_the_session(self):
+        """Mutations write single CartLine rows and leave the session untouched"""
+        cart = Cart(self.session, self.user)
+        cart.add(self.products[0].id, 2)
+        cart.add(self.products[1].id)
+        cart.update(self.products[0].id, 4)
+        cart.remove(self.products[1].id)
+        self.assertNotIn('cart', self.session)
+
+        reloaded = Cart(DummySession(), self.user)
+        self.assertEqual(reloaded.get_total_quantity(), 4)
+        self.assertEqual(reloaded.get_total_price(), Decimal('40.00'))
+        reloaded.clear()
+        self.assertFalse(self.user.cart_lines.exists())
+
+    def test_session_cart_merged_at_login(self):
+        """Logging in merges the anonymous cart into the user's cart"""
+        Cart(DummySession(), self.user).add(self.products[0].id, 1)
+        anonymous = Cart(self.session)
+        anonymous.add(self.products[0].id, 2)
+        anonymous.add(self.products[2].id, 3)
+
+        request = RequestFactory().get('/')
+        request.session = self.session
+        user_logged_in.send(sender=User, request=request, user=self.user)
+
+        self.assertNotIn('cart', self.session)
+        request.user = self.user
+        cart = Cart.for_request(request)
+        self.assertEqual(cart.cart, {str(self.products[0].id): 3, str(self.products[2].id): 3})
@@ -0,0 +1,113 @@
+"""
+Unit tests for currency conversion
+"""
+
+import json
+import os
+import tempfile
+from django.test import TestCase, override_settings
+from django.apps import apps
+from django.core.cache import cache
+from django.urls import reverse
+from decimal import Decimal
+from rest_framework.test import APIClient
+from store.services.currency_service import CurrencyService, RateTable
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+RATES = {
+    'version': 'test-1',
+    'base': 'USD',
+    'rates': {'EUR': '0.5', 'SAR': '3.75', 'KWD': '0.3'},
+    'decimals': {'KWD': 3},
+}
+
+
+class RateTableTestCase(TestCase):
+    """Test cases for RateTable"""
+
+    def test_cross_rates_and_rounding_units(self):
+        """Pairs convert through the base currency"""
+        table = RateTable.from_dict(RATES)
+        self.assertEqual(table.get_rate('USD', 'SAR'), Decimal('3.75'))
+        self.assertEqual(table.get_rate('EUR', 'SAR'), Decimal('7.5'))
+        self.assertEqual(table.get_rate('SAR', 'SAR'), Decimal('1'))
+        self.assertIsNone(table.get_rate('XYZ', 'SAR'))
+        self.assertEqual(table.get_quantum('KWD'), Decimal('0.001'))
+        with self.assertRaises(ValueError):
+            RateTable.from_dict(dict(RATES, rates={'EUR': '0'}))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CurrencyServiceTestCase(TestCase):
+    """Test cases for CurrencyService"""
+
+    def setUp(self):
+        """Write a rate file and create products priced in several currencies"""
+        cache.clear()
+        handle, self.rates_path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(handle, 'w') as rates_file:
+            json.dump(RATES, rates_file)
+        self.settings_override = override_settings(
+            STORE_EXCHANGE_RATES_FILE=self.rates_path, STORE_EXCHANGE_RATES_REFRESH_SECONDS=0
+        )
+        self.settings_override.enable()
+        CurrencyService.reset()
+
+        Product = apps.get_model('store', 'Product')
+        self.usd = Product.objects.create(name='USD item', price=Decimal('10.00'), currency='USD')
+        self.eur = Product.objects.create(name='EUR item', price=Decimal('10.00'), currency='EUR')
+        self.odd = Product.objects.create(name='Other item', price=Decimal('10.00'), currency='XCD')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        CurrencyService.reset()
+        os.remove(self.rates_path)
+
+    def test_annotate_prices_converts_page_in_one_pass(self):
+        """Known currencies convert and unknown ones keep their own price"""
+        products = [self.usd, self.eur, self.odd]
+        with self.assertNumQueries(0):
+            CurrencyService.annotate_prices(products, 'SAR')
+        self.assertEqual([p.display_price for p in products], [Decimal('37.50'), Decimal('75.00'), Decimal('10.00')])
+        self.assertEqual([p.display_currency for p in products], ['SAR', 'SAR', 'XCD'])
+
+        CurrencyService.annotate_prices(products, None)
+        self.assertEqual(self.eur.display_price, Decimal('10.00'))
+        self.assertEqual(self.eur.display_currency, 'EUR')
+        self.assertEqual(CurrencyService.convert(Decimal('1'), 'USD', 'KWD'), Decimal('0.300'))
+
+    def test_rate_file_reload_keeps_last_good_table(self):
+        """A new file version is picked up and a broken file is ignored"""
+        self.assertEqual(CurrencyService.get_rate_table().version, 'test-1')
+        with open(self.rates_path, 'w') as rates_file:
+            json.dump(dict(RATES, version='test-2'), rates_file)
+        os.utime(self.rates_path, ns=(0, 10 ** 18))
+        self.assertEqual(CurrencyService.get_rate_table().version, 'test-2')
+
+        with open(self.rates_path, 'w') as rates_file:
+            rates_file.write('{broken')
+        os.utime(self.rates_path, ns=(0, 2 * 10 ** 18))
+        self.assertEqual(CurrencyService.get_rate_table().version, 'test-2')
+
+    def test_listing_endpoints_use_display_currency(self):
+        """The storefront remembers the choice and the mobile API converts"""
+        response = self.client.get(reverse('product_list'), {'currency': 'sar'})
+        self.assertEqual(response.status_code, 200)
+        # Rendered with the Arabic locale's decimal separator
+        self.assertContains(response, '37,50 SAR')
+        self.assertEqual(self.client.session[CurrencyService.SESSION_KEY], 'SAR')
+        self.assertContains(self.client.get(reverse('product_list')), '75,00 SAR')
+
+        response = APIClient().get(reverse('mobile_api:product_list'), {'currency': 'EUR', 'sort_by': 'name'})
+        prices = {item['name']: (item['display_price'], item['display_currency']) for item in response.data['products']}
+        self.assertEqual(prices['USD item'], ('5.00', 'EUR'))
+        self.assertEqual(prices['Other item'], ('10.00', 'XCD'))
+
+    def test_bundled_rate_file_loads(self):
+        """The default table covers the store's main currencies"""
+        table = CurrencyService.load_rates(os.path.join(
+            os.path.dirname(os.path.dirname(__file__)), 'data', 'exchange_rates.json'
+        ))
+        self.assertEqual(table.base, 'USD')
+        self.assertEqual(table.get_rate('USD', 'SAR'), Decimal('3.75'))
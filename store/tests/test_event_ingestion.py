@@ -0,0 +1,137 @@
+"""
+Unit tests for buffered analytics event ingestion
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.apps import apps
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.urls import reverse
+from decimal import Decimal
+from store.services.event_ingestion_service import EventIngestionService
+
+
+@override_settings(STORE_ANALYTICS_ASYNC_FLUSH=False, STORE_ANALYTICS_BATCH_SIZE=2)
+class EventIngestionTestCase(TestCase):
+    """Test cases for EventIngestionService"""
+
+    def setUp(self):
+        """Set up test data"""
+        EventIngestionService.reset()
+        self.spill_dir = tempfile.mkdtemp()
+        settings_override = override_settings(STORE_ANALYTICS_SPILL_DIR=self.spill_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.AnalyticsIntegration = apps.get_model('store', 'AnalyticsIntegration')
+        self.product = apps.get_model('store', 'Product').objects.create(
+            name='Phone', price=Decimal('100.00'), stock_quantity=5
+        )
+
+    def tearDown(self):
+        EventIngestionService.reset()
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def test_events_are_buffered_and_written_in_batches(self):
+        """Tracking never queries; a flush inserts once per batch"""
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                self.assertTrue(EventIngestionService.track('product_view', product_id=self.product.pk))
+        with mock.patch('store.services.event_ingestion_service.time.time', return_value=1700000000.0):
+            EventIngestionService.track('page_view', url='https://example.com/', metadata={'a': 1})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(EventIngestionService.flush(), {'written': 4, 'spilled': 0})
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "store_analyticsintegration"')]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(self.AnalyticsIntegration.objects.filter(product=self.product).count(), 3)
+        page_view = self.AnalyticsIntegration.objects.get(event_type='page_view')
+        self.assertEqual(page_view.timestamp.timestamp(), 1700000000.0)
+        self.assertEqual(json.loads(page_view.metadata), {'a': 1})
+
+    def test_overload_samples_then_drops_events(self):
+        """Past the threshold droppable events are sampled; a full buffer drops everything"""
+        self.assertEqual(EventIngestionService.get_sample_rate(0.5), 1.0)
+        self.assertAlmostEqual(EventIngestionService.get_sample_rate(0.75), 0.5)
+        self.assertEqual(EventIngestionService.get_sample_rate(1.0), 0.0)
+
+        with override_settings(STORE_ANALYTICS_MAX_BUFFER=4), \
+                mock.patch('store.services.event_ingestion_service.random.random', side_effect=[0.6, 0.4]):
+            results = [EventIngestionService.track('page_view') for _ in range(5)]
+            results.append(EventIngestionService.track('purchase'))
+        self.assertEqual(results, [True, True, True, False, True, False])
+        stats = EventIngestionService.get_stats()
+        self.assertEqual((stats['accepted'], stats['sampled_out'], stats['dropped']), (4, 1, 1))
+
+        EventIngestionService.flush()
+        sampled = self.AnalyticsIntegration.objects.filter(event_type='page_view').exclude(metadata=None)
+        self.assertEqual([json.loads(event.metadata) for event in sampled], [{'sample_rate': 0.5}])
+
+    def test_failed_writes_spill_and_are_replayed(self):
+        """Events spilled while the database fails are written once it recovers"""
+        EventIngestionService.track('product_view', product_id=self.product.pk)
+        EventIngestionService.track('search', product_id=self.product.pk + 100)
+        EventIngestionService.track('purchase')
+        with mock.patch.object(self.AnalyticsIntegration.objects, 'bulk_create', side_effect=OperationalError):
+            self.assertEqual(EventIngestionService.flush(), {'written': 0, 'spilled': 3})
+        self.assertTrue(EventIngestionService.get_stats()['degraded'])
+        self.assertEqual(len(EventIngestionService.get_spill_files()), 1)
+
+        EventIngestionService._degraded_until = 0.0
+        out = StringIO()
+        call_command('flush_analytics_events', stdout=out)
+        self.assertIn('Wrote 3 spilled analytics events from 1 files', out.getvalue())
+        self.assertEqual(os.listdir(self.spill_dir), [])
+        # The event about a product that does not exist is kept without it
+        self.assertIsNone(self.AnalyticsIntegration.objects.get(event_type='search').product_id)
+        self.assertEqual(self.AnalyticsIntegration.objects.count(), 3)
+
+    def test_rejected_event_is_quarantined_without_its_batch(self):
+        """An event the database refuses is set aside and the rest of its batch written"""
+        EventIngestionService.track('product_view', product_id=self.product.pk)
+        EventIngestionService.track('search', product_id=10 ** 30)
+        EventIngestionService.flush()
+        self.assertEqual(self.AnalyticsIntegration.objects.count(), 1)
+        stats = EventIngestionService.get_stats()
+        self.assertEqual((stats['written'], stats['quarantined']), (1, 1))
+        self.assertFalse(stats['degraded'])
+        self.assertEqual(EventIngestionService.get_spill_files(), [])
+        self.assertEqual(os.listdir(self.spill_dir), [f'events-{os.getpid()}.rejected'])
+
+    def test_replay_failure_keeps_live_writes_going(self):
+        """A failed replay keeps the spill file without marking the database degraded"""
+        EventIngestionService.spill([('purchase', None, None, None, None, None, None, None, None, 1700000000.0, None)])
+        with mock.patch.object(self.AnalyticsIntegration.objects, 'bulk_create', side_effect=OperationalError):
+            self.assertEqual(EventIngestionService.replay_spill(), 0)
+        self.assertFalse(EventIngestionService.get_stats()['degraded'])
+        self.assertEqual(len(EventIngestionService.get_spill_files()), 1)
+
+        # A replay that died halfway leaves its renamed file for the next one
+        path = EventIngestionService.get_spill_files()[0]
+        os.rename(path, f"{path}.999999999.replaying")
+        self.assertEqual(EventIngestionService.replay_spill(), 1)
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+    def test_tracking_endpoint_buffers_valid_events(self):
+        """Visitors post events that are buffered, not written"""
+        url = reverse('track_behavior')
+        response = self.client.post(
+            url, json.dumps({'event_type': 'product_view', 'product_id': self.product.pk}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.AnalyticsIntegration.objects.count(), 0)
+        self.assertEqual(EventIngestionService.get_stats()['buffered'], 1)
+
+        self.assertEqual(self.client.post(url, {'event_type': 'unknown'}).status_code, 400)
+        for product_id in (0, -1, 2 ** 63, 10 ** 30):
+            response = self.client.post(url, {'event_type': 'product_view', 'product_id': product_id})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(EventIngestionService.get_stats()['buffered'], 1)
+        self.assertEqual(self.client.get(url).status_code, 405)
@@ -0,0 +1,66 @@
+"""
+Unit tests for faceted search aggregation
+"""
+
+from django.test import TestCase, RequestFactory, override_settings
+from django.apps import apps
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from decimal import Decimal
+from store.services.facet_service import FacetService
+from store.views import advanced_search
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FacetServiceTestCase(TestCase):
+    """Test cases for FacetService"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        Product = apps.get_model('store', 'Product')
+        self.Product = Product
+        for name, category, price in [
+            ('Phone A', 'phones', '80.00'),
+            ('Phone B', 'phones', '300.00'),
+            ('Laptop', 'computers', '1200.00'),
+            ('Cable', 'accessories', '10.00'),
+        ]:
+            Product.objects.create(name=name, category=category, price=Decimal(price))
+
+    def test_all_facets_in_one_query(self):
+        """Counts, price range and histogram come from a single grouped query"""
+        with self.assertNumQueries(1):
+            facets = FacetService.get_facets(self.Product.objects.all(), category='phones')
+        self.assertEqual(facets['total'], 2)
+        self.assertEqual(
+            facets['categories'],
+            [{'category': 'accessories', 'count': 1}, {'category': 'computers', 'count': 1}, {'category': 'phones', 'count': 2}]
+        )
+        self.assertEqual(facets['price_range'], {'min_price': Decimal('80.00'), 'max_price': Decimal('300.00')})
+        counts = {bucket['min_price']: bucket['count'] for bucket in facets['price_histogram']}
+        self.assertEqual(counts[Decimal('50')], 1)
+        self.assertEqual(counts[Decimal('250')], 1)
+        self.assertEqual(sum(counts.values()), 2)
+
+    def test_catalog_facets_cached_per_version(self):
+        """Catalog facets are reused across categories until a product changes"""
+        FacetService.get_facets(self.Product.objects.all(), cacheable=True)
+        with self.assertNumQueries(0):
+            facets = FacetService.get_facets(self.Product.objects.all(), category='computers', cacheable=True)
+        self.assertEqual(facets['total'], 1)
+
+        self.Product.objects.create(name='Desktop', category='computers', price=Decimal('900.00'))
+        facets = FacetService.get_facets(self.Product.objects.all(), category='computers', cacheable=True)
+        self.assertEqual(facets['total'], 2)
+
+    def test_advanced_search_query_count(self):
+        """A cached category page needs only the page query"""
+        request = RequestFactory().get('/search/', {'category': 'phones', 'sort_by': 'price_asc'})
+        request.user = AnonymousUser()
+        advanced_search(request)
+        with self.assertNumQueries(1):
+            response = advanced_search(request)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,123 @@
+"""
+Unit tests for idempotency keys
+"""
+
+from django.test import TestCase, override_settings
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from decimal import Decimal
+from unittest.mock import patch
+from store.services.idempotency_service import IdempotencyService, IdempotencyConflictError
+from store.services.order_service import OrderService
+from store.utils import Cart
+import threading
+import time
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class IdempotencyServiceTestCase(TestCase):
+    """Test cases for IdempotencyService"""
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def _operation(self):
+        self.calls += 1
+        return self.calls
+
+    def test_result_is_replayed(self):
+        """A retried key returns the first result without re-running the operation"""
+        self.assertEqual(IdempotencyService.execute('test', 'key-1', self._operation), 1)
+        self.assertEqual(IdempotencyService.execute('test', 'key-1', self._operation), 1)
+        self.assertEqual(IdempotencyService.execute('test', 'key-2', self._operation), 2)
+        self.assertEqual(self.calls, 2)
+
+    def test_keys_are_scoped_to_owner(self):
+        """The same key from different owners runs separately"""
+        IdempotencyService.execute('test', 'key-1', self._operation, owner='user_1')
+        IdempotencyService.execute('test', 'key-1', self._operation, owner='user_2')
+        self.assertEqual(self.calls, 2)
+
+    def test_failures_are_not_stored(self):
+        """An operation that raised can be retried with the same key"""
+        def failing():
+            raise ValueError('payment provider down')
+        with self.assertRaises(ValueError):
+            IdempotencyService.execute('test', 'key-1', failing)
+        self.assertEqual(IdempotencyService.execute('test', 'key-1', self._operation), 1)
+
+    def test_concurrent_duplicates_are_collapsed(self):
+        """Duplicates arriving while the first request runs wait for its result"""
+        def slow_operation():
+            time.sleep(0.2)
+            return self._operation()
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(IdempotencyService.execute('test', 'key-1', slow_operation)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [1, 1, 1, 1])
+        self.assertEqual(self.calls, 1)
+
+    def test_conflict_when_first_request_is_stuck(self):
+        """A duplicate gives up once the lock wait is exceeded"""
+        lock_key = IdempotencyService.get_record_key('test', 'key-1') + '_lock'
+        cache.add(lock_key, 1, 30)
+        with patch.object(IdempotencyService, 'LOCK_WAIT', 0.1), self.assertRaises(IdempotencyConflictError):
+            IdempotencyService.execute('test', 'key-1', self._operation)
+        self.assertEqual(self.calls, 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class IdempotentOrderTestCase(TestCase):
+    """Test cases for idempotent order creation"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', password='testpass123')
+        Product = apps.get_model('store', 'Product')
+        self.product = Product.objects.create(name='Phone', price=Decimal('100.00'), stock_quantity=5)
+
+    def test_retried_create_order_places_one_order(self):
+        """Retrying OrderService.create_order with the same key does not duplicate the order"""
+        cart_items = [{'product': self.product, 'quantity': 2, 'total_price': Decimal('200.00')}]
+        address = {'address': 'Street 1', 'city': 'Riyadh', 'phone': '0500000000'}
+        first = OrderService.create_order(self.user, cart_items, address, idempotency_key='order-1')
+        retry = OrderService.create_order(self.user, cart_items, address, idempotency_key='order-1')
+
+        self.assertEqual(first.pk, retry.pk)
+        self.assertEqual(apps.get_model('store', 'Order').objects.filter(user=self.user).count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 3)
+
+    def test_checkout_retry_after_stock_failure_places_order(self):
+        """A checkout that failed is not replayed to a retry with the same key"""
+        Order = apps.get_model('store', 'Order')
+        self.client.force_login(self.user)
+        Cart(self.client.session, self.user).add(self.product.pk, 8)
+        form = {
+            'full_name': 'Buyer', 'phone': '0500000000', 'address': 'Street 1', 'city': 'Riyadh',
+            'idempotency_key': 'checkout-1',
+        }
+
+        response = self.client.post(reverse('create_order'), form)
+        self.assertRedirects(response, reverse('view_cart'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.filter(user=self.user).exists())
+
+        self.product.stock_quantity = 10
+        self.product.save()
+        response = self.client.post(reverse('create_order'), form)
+        order = Order.objects.get(user=self.user)
+        self.assertRedirects(
+            response, reverse('order_detail', args=[order.id]), fetch_redirect_response=False
+        )
@@ -8,6 +8,7 @@ import os
 from django.test import TestCase
 from django.contrib.auth.models import User
 from django.apps import apps
+from django.utils import timezone
 from decimal import Decimal
 from unittest.mock import patch
 
@@ -194,7 +195,7 @@ class IntegrationPerformanceTestCase(TestCase):
                 user=self.buyer,
                 event_type='page_view',
                 url=f'https://test-store.com/product/{i}/',
-                timestamp=time.time()
+                timestamp=timezone.now()
             )
         
         # Test basic analytics retrieval
@@ -0,0 +1,85 @@
+"""
+Unit tests for the anonymous full-page cache
+"""
+
+import re
+from django.test import Client, TestCase, override_settings
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from decimal import Decimal
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+CSRF_TOKEN = re.compile(r'name="csrfmiddlewaretoken" value="([A-Za-z0-9]+)"')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PageCacheTestCase(TestCase):
+    """Test cases for PageCacheService"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.product = apps.get_model('store', 'Product').objects.create(
+            name='Phone', price=Decimal('100.00'), stock_quantity=5
+        )
+        self.list_url = reverse('product_list')
+
+    def test_second_anonymous_hit_is_served_from_cache(self):
+        """Pages are rendered once and revalidated with ETags"""
+        first = self.client.get(self.list_url)
+        second = self.client.get(self.list_url)
+        self.assertEqual((first['X-Page-Cache'], second['X-Page-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertIn('Last-Modified', second)
+        self.assertContains(second, 'Phone')
+
+        not_modified = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=second['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_cached_page_carries_each_visitors_csrf_token(self):
+        """A page rendered for one visitor posts fine for another"""
+        Client().get(self.list_url)
+        visitor = Client(enforce_csrf_checks=True)
+        response = visitor.get(self.list_url)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        token = CSRF_TOKEN.search(response.content.decode()).group(1)
+        self.assertNotIn(b'__page_cache_csrf_token__', response.content)
+
+        posted = visitor.post(reverse('add_to_cart', args=[self.product.pk]), {'csrfmiddlewaretoken': token})
+        self.assertNotEqual(posted.status_code, 403)
+
+    def test_catalog_changes_and_variants_miss(self):
+        """Product saves, currencies and logged-in users get fresh pages"""
+        self.client.get(self.list_url)
+        self.product.price = Decimal('80.00')
+        self.product.save()
+        response = self.client.get(self.list_url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, '80,00')
+        self.assertEqual(self.client.get(self.list_url, {'page': 2})['X-Page-Cache'], 'MISS')
+
+        user = User.objects.create_user(username='shopper', password='x')
+        self.client.force_login(user)
+        self.assertNotIn('X-Page-Cache', self.client.get(self.list_url))
+
+    def test_article_views_counted_on_cache_hits(self):
+        """Serving an article from the cache still counts the visit"""
+        author = User.objects.create_user(username='author', password='x')
+        Article = apps.get_model('store', 'Article')
+        article = Article.objects.create(
+            title='News', slug='news', content='Body', author=author, status='published'
+        )
+        url = reverse('article_detail', args=['news'])
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'HIT')
+        article.refresh_from_db()
+        self.assertEqual(article.views, 2)
+
+        article.title = 'Updated news'
+        article.save()
+        self.assertContains(self.client.get(url), 'Updated news')
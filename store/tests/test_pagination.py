@@ -0,0 +1,174 @@
+"""
+Unit tests for keyset (cursor) pagination
+"""
+
+from django.test import TestCase, override_settings
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from decimal import Decimal
+from unittest import mock
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from store.api.pagination import StorePagination
+from store.services.cache_service import cache_service
+from store.utils.pagination import (
+    InvalidCursor, KeysetPaginator, decode_cursor, encode_cursor, get_keyset_ordering
+)
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class KeysetPaginatorTestCase(TestCase):
+    """Test cases for KeysetPaginator"""
+
+    def setUp(self):
+        """Set up test data with duplicate prices"""
+        Product = apps.get_model('store', 'Product')
+        self.Product = Product
+        for index in range(7):
+            Product.objects.create(name=f'Product {index}', price=Decimal('10.00') * (index // 2 + 1))
+
+    def walk(self, paginator):
+        ids = []
+        cursor = None
+        while True:
+            page = paginator.page(cursor)
+            ids.extend(product.id for product in page)
+            if not page.has_next():
+                return ids, page
+            cursor = page.next_cursor
+
+    def test_walks_every_row_once_despite_ties(self):
+        """The id tie-breaker keeps pages stable when sort values repeat"""
+        queryset = self.Product.objects.order_by('-price')
+        ids, _ = self.walk(KeysetPaginator(queryset, 3))
+        expected = list(self.Product.objects.order_by('-price', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        """A backwards cursor yields the preceding rows in forward order"""
+        paginator = KeysetPaginator(self.Product.objects.order_by('price'), 3)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        back = paginator.page(second.previous_cursor)
+        self.assertFalse(first.has_previous())
+        self.assertEqual([p.id for p in back], [p.id for p in first])
+        self.assertFalse(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_deep_page_is_a_single_query(self):
+        """Any page costs one query and no COUNT"""
+        paginator = KeysetPaginator(self.Product.objects.order_by('price'), 2)
+        cursor = paginator.page(paginator.page().next_cursor).next_cursor
+        with self.assertNumQueries(1):
+            page = paginator.page(cursor)
+        self.assertEqual(len(page), 2)
+
+    def test_ordering_and_cursor_validation(self):
+        """Orderings get an id tie-breaker and bad cursors are rejected"""
+        self.assertEqual(get_keyset_ordering(self.Product.objects.order_by('-price')), ['-price', '-pk'])
+        self.assertIsNone(get_keyset_ordering(self.Product.objects.order_by('seller__username')))
+        self.assertEqual(decode_cursor(encode_cursor([Decimal('9.50'), 4], reverse=True)), (['9.50', 4], True))
+
+        paginator = KeysetPaginator(self.Product.objects.order_by('price'), 2)
+        with self.assertRaises(InvalidCursor):
+            paginator.page('not-a-cursor')
+        with self.assertRaises(InvalidCursor):
+            paginator.page(encode_cursor(['abc', 1]))
+        with self.assertRaises(InvalidCursor):
+            paginator.page(encode_cursor([1]))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CursorEndpointsTestCase(TestCase):
+    """Test cases for the views that opt into cursor pagination"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        Product = apps.get_model('store', 'Product')
+        for index in range(25):
+            Product.objects.create(name=f'Product {index:02d}', price=Decimal('5.00') + index)
+        self.client = APIClient()
+
+    def test_api_pagination_cursor_mode(self):
+        """The REST pagination follows next links and omits the count"""
+        Product = apps.get_model('store', 'Product')
+        queryset = Product.objects.order_by('-price')
+        pagination = StorePagination()
+        request = Request(APIRequestFactory().get('/api/products/', {'cursor': ''}))
+        results = pagination.paginate_queryset(queryset, request)
+        response = pagination.get_paginated_response([product.name for product in results])
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        self.assertEqual(len(response.data['results']), 20)
+
+        request = Request(APIRequestFactory().get(response.data['next']))
+        results = pagination.paginate_queryset(queryset, request)
+        response = pagination.get_paginated_response([product.name for product in results])
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(response.data['results'][-1], 'Product 00')
+
+        request = Request(APIRequestFactory().get('/api/products/', {'cursor': 'bogus'}))
+        with self.assertRaises(NotFound):
+            pagination.paginate_queryset(queryset, request)
+
+    def test_api_page_numbers_still_default(self):
+        """Without a cursor the REST pagination keeps page-number responses"""
+        Product = apps.get_model('store', 'Product')
+        pagination = StorePagination()
+        request = Request(APIRequestFactory().get('/api/products/'))
+        pagination.paginate_queryset(Product.objects.order_by('name'), request)
+        self.assertEqual(pagination.get_paginated_response([]).data['count'], 25)
+
+    def test_api_order_list_cursor_mode(self):
+        """Order history pages by (created_at, id)"""
+        Order = apps.get_model('store', 'Order')
+        user = User.objects.create_user(username='buyer', password='testpass123')
+        for _ in range(3):
+            Order.objects.create(user=user, total_amount=Decimal('10.00'), shipping_address='Riyadh')
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse('store_api:order_list'), {'cursor': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertNotIn('count', response.data)
+
+    def test_mobile_product_list_cursor_mode(self):
+        """Mobile infinite scroll returns cursors instead of page numbers"""
+        url = reverse('mobile_api:product_list')
+        response = self.client.get(url, {'cursor': '', 'sort_by': 'price_asc'})
+        self.assertEqual(len(response.data['products']), 20)
+        self.assertTrue(response.data['has_next'])
+        self.assertNotIn('total_pages', response.data)
+
+        response = self.client.get(url, {'cursor': response.data['next_cursor'], 'sort_by': 'price_asc'})
+        self.assertEqual(len(response.data['products']), 5)
+        self.assertFalse(response.data['has_next'])
+        self.assertTrue(response.data['has_previous'])
+
+        response = self.client.get(url, {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_web_product_list_cursor_mode(self):
+        """The storefront list renders cursor links"""
+        response = self.client.get(reverse('product_list'), {'cursor': '', 'sort': 'price_low'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['products']), 12)
+        self.assertIsNotNone(response.context['next_cursor'])
+        self.assertIsNone(response.context['previous_cursor'])
+
+    def test_web_product_list_caches_first_page_only(self):
+        """Client cursors never become cache keys"""
+        url = reverse('product_list')
+        with mock.patch('store.views.cache_service.get_or_set', wraps=cache_service.get_or_set) as get_or_set:
+            response = self.client.get(url, {'cursor': '', 'sort': 'price_low'})
+            response = self.client.get(url, {'cursor': response.context['next_cursor'], 'sort': 'price_low'})
+            self.assertEqual(len(response.context['products']), 12)
+            forged = encode_cursor([Decimal('7.00'), 3])
+            self.assertEqual(self.client.get(url, {'cursor': forged, 'sort': 'price_low'}).status_code, 200)
+            self.assertEqual(self.client.get(url, {'cursor': 'bogus', 'sort': 'price_low'}).status_code, 404)
+        self.assertEqual(get_or_set.call_count, 1)
@@ -0,0 +1,109 @@
+"""
+Unit tests for denormalized product popularity counters
+"""
+
+from django.test import TestCase, override_settings
+from django.apps import apps
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from decimal import Decimal
+from store.services.order_service import OrderService
+from store.services.product_service import ProductService
+from store.services.popularity_service import PopularityService
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PopularityServiceTestCase(TestCase):
+    """Test cases for PopularityService"""
+
+    def setUp(self):
+        """Set up test data"""
+        Product = apps.get_model('store', 'Product')
+        self.Product = Product
+        self.phone = Product.objects.create(name='Phone', price=Decimal('100.00'), stock_quantity=50)
+        self.case = Product.objects.create(name='Case', price=Decimal('10.00'), stock_quantity=50)
+
+    def _place(self, *lines):
+        return OrderService.place_order(
+            None,
+            [{'product': product, 'quantity': quantity} for product, quantity in lines],
+            total_amount=Decimal('100.00'),
+            shipping_address='Riyadh'
+        )
+
+    def test_placing_orders_updates_counters(self):
+        """Each order adds its units and one order per product"""
+        self._place((self.phone, 2), (self.case, 1))
+        self._place((self.phone, 1))
+        self.phone.refresh_from_db()
+        self.case.refresh_from_db()
+        self.assertEqual((self.phone.units_sold, self.phone.order_count), (3, 2))
+        self.assertEqual((self.case.units_sold, self.case.order_count), (1, 1))
+        self.assertAlmostEqual(PopularityService.get_trending_score(self.phone), 3.0, places=3)
+
+    def test_cancelling_order_reverts_counters(self):
+        """Cancelling an order removes it and reinstating adds it back"""
+        order = self._place((self.phone, 2))
+        order.status = 'cancelled'
+        order.save()
+        self.phone.refresh_from_db()
+        self.assertEqual((self.phone.units_sold, self.phone.order_count), (0, 0))
+        self.assertAlmostEqual(self.phone.trending_score, 0.0)
+
+        order.status = 'pending'
+        order.save()
+        self.phone.refresh_from_db()
+        self.assertEqual((self.phone.units_sold, self.phone.order_count), (2, 1))
+
+    def test_trending_score_decays(self):
+        """Recent sales outrank larger but older sales"""
+        now = timezone.now()
+        PopularityService.record_sale({self.phone.id: 8}, when=now - PopularityService.get_half_life() * 4)
+        PopularityService.record_sale({self.case.id: 1}, when=now)
+        ranked = list(self.Product.objects.order_by('-trending_score').values_list('id', flat=True))
+        self.assertEqual(ranked, [self.case.id, self.phone.id])
+        self.phone.refresh_from_db()
+        self.assertAlmostEqual(PopularityService.get_trending_score(self.phone, now), 0.5, places=3)
+
+    @override_settings(STORE_TRENDING_HALF_LIFE_HOURS=1)
+    def test_trending_score_stays_finite_far_from_epoch(self):
+        """Short half-lives decades after the epoch neither overflow nor lose ranking"""
+        now = timezone.now().replace(year=2080)
+        PopularityService.record_sale({self.phone.id: 4}, when=now - PopularityService.get_half_life())
+        PopularityService.record_sale({self.phone.id: 1}, when=now)
+        PopularityService.record_sale({self.case.id: 2}, when=now)
+        ranked = list(self.Product.objects.order_by('-trending_score').values_list('id', flat=True))
+        self.assertEqual(ranked, [self.phone.id, self.case.id])
+        self.phone.refresh_from_db()
+        self.assertAlmostEqual(PopularityService.get_trending_score(self.phone, now), 3.0, places=3)
+
+        PopularityService.record_sale({self.phone.id: 1}, when=now, sign=-1)
+        self.phone.refresh_from_db()
+        self.assertAlmostEqual(PopularityService.get_trending_score(self.phone, now), 2.0, places=3)
+
+    def test_rebuild_matches_incremental_counters(self):
+        """The rebuild recomputes the same counters from order history"""
+        self._place((self.phone, 2), (self.case, 1))
+        cancelled = self._place((self.case, 5))
+        self._place((self.phone, 1))
+        Order = apps.get_model('store', 'Order')
+        Order.objects.filter(pk=cancelled.pk).update(status='cancelled')
+        self.Product.objects.update(units_sold=99, order_count=99, trending_score=0)
+
+        self.assertEqual(PopularityService.rebuild(), 2)
+        self.phone.refresh_from_db()
+        self.case.refresh_from_db()
+        self.assertEqual((self.phone.units_sold, self.phone.order_count), (3, 2))
+        self.assertEqual((self.case.units_sold, self.case.order_count), (1, 1))
+        self.assertAlmostEqual(PopularityService.get_trending_score(self.phone), 3.0, places=3)
+
+    def test_popularity_sort_skips_order_history(self):
+        """Sorting by popularity reads only the product table"""
+        self._place((self.case, 1))
+        with CaptureQueriesContext(connection) as queries:
+            products = list(ProductService.search_products(sort_by='popularity'))
+        self.assertEqual(products[0], self.case)
+        self.assertNotIn('orderitem', queries.captured_queries[-1]['sql'].lower())
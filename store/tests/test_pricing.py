@@ -0,0 +1,125 @@
+"""
+Unit tests for the pricing pipeline
+"""
+
+from django.test import TestCase, RequestFactory, override_settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.apps import apps
+from django.core.cache import cache
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from store.services.pricing_service import calculate_pricing, PricingService
+from store.utils import PricedCart
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class CalculatePricingTestCase(TestCase):
+    """Test cases for the pure pricing function"""
+
+    def setUp(self):
+        now = timezone.now()
+        self.coupon = {
+            'id': 1,
+            'code': 'SAVE10',
+            'discount_type': 'percentage',
+            'discount_value': Decimal('10.00'),
+            'minimum_amount': Decimal('50.00'),
+            'usage_limit': None,
+            'times_used': 0,
+            'valid_from': now - timedelta(days=1),
+            'valid_to': now + timedelta(days=1),
+        }
+
+    def test_full_breakdown(self):
+        """Coupon, loyalty, tax and shipping are combined in one pass"""
+        pricing = calculate_pricing(
+            Decimal('100.00'),
+            coupon=self.coupon,
+            loyalty_level='gold',
+            tax_rate=Decimal('15'),
+            shipping_cost=Decimal('20.00'),
+        )
+        self.assertEqual(pricing['coupon_discount'], Decimal('10.00'))
+        self.assertEqual(pricing['loyalty_discount'], Decimal('10.00'))
+        self.assertEqual(pricing['total_discount'], Decimal('20.00'))
+        self.assertEqual(pricing['tax_amount'], Decimal('12.00'))
+        self.assertEqual(pricing['shipping_cost'], Decimal('20.00'))
+        self.assertEqual(pricing['total'], Decimal('112.00'))
+
+    def test_minimum_amount_not_met(self):
+        """A valid coupon below its minimum amount gives no discount"""
+        pricing = calculate_pricing(Decimal('40.00'), coupon=self.coupon)
+        self.assertIsNotNone(pricing['coupon'])
+        self.assertEqual(pricing['coupon_discount'], Decimal('0.00'))
+
+    def test_expired_or_exhausted_coupon(self):
+        """Expired or fully used coupons are reported as invalid"""
+        expired = dict(self.coupon, valid_to=timezone.now() - timedelta(hours=1))
+        self.assertIsNone(calculate_pricing(Decimal('100.00'), coupon=expired)['coupon'])
+        exhausted = dict(self.coupon, usage_limit=5, times_used=5)
+        self.assertIsNone(calculate_pricing(Decimal('100.00'), coupon=exhausted)['coupon'])
+
+    def test_discount_never_exceeds_subtotal(self):
+        """Stacked discounts are capped at the subtotal"""
+        fixed = dict(self.coupon, discount_type='fixed', discount_value=Decimal('500.00'), minimum_amount=Decimal('0'))
+        pricing = calculate_pricing(Decimal('60.00'), coupon=fixed, loyalty_level='platinum')
+        self.assertEqual(pricing['total_discount'], Decimal('60.00'))
+        self.assertEqual(pricing['total'], Decimal('0.00'))
+
+    def test_free_shipping_threshold(self):
+        """Shipping is waived above the free shipping threshold"""
+        pricing = calculate_pricing(
+            Decimal('200.00'), shipping_cost=Decimal('20.00'), free_shipping_threshold=Decimal('150.00')
+        )
+        self.assertEqual(pricing['shipping_cost'], Decimal('0.00'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PricingServiceTestCase(TestCase):
+    """Test cases for PricingService snapshot caching"""
+
+    def setUp(self):
+        cache.clear()
+        Coupon = apps.get_model('store', 'Coupon')
+        now = timezone.now()
+        self.coupon = Coupon.objects.create(
+            code='SAVE10',
+            discount_type='percentage',
+            discount_value=Decimal('10.00'),
+            valid_from=now - timedelta(days=1),
+            valid_to=now + timedelta(days=1),
+        )
+        self.priced_cart = PricedCart([])
+        self.priced_cart.subtotal = Decimal('100.00')
+
+    def _request(self, user=None):
+        request = RequestFactory().get('/')
+        request.session = {'coupon_id': self.coupon.id}
+        request.user = user or AnonymousUser()
+        return request
+
+    def test_coupon_snapshot_is_cached(self):
+        """Repeated cart requests do not re-fetch the coupon"""
+        PricingService.price_request(self._request(), self.priced_cart)
+        with self.assertNumQueries(0):
+            pricing = PricingService.price_request(self._request(), self.priced_cart)
+        self.assertEqual(pricing['coupon_discount'], Decimal('10.00'))
+
+    def test_coupon_update_invalidates_snapshot(self):
+        """Saving a coupon drops its cached snapshot"""
+        PricingService.price_request(self._request(), self.priced_cart)
+        self.coupon.discount_value = Decimal('20.00')
+        self.coupon.save()
+        pricing = PricingService.price_request(self._request(), self.priced_cart)
+        self.assertEqual(pricing['coupon_discount'], Decimal('20.00'))
+
+    def test_loyalty_level_applied(self):
+        """Authenticated shoppers get their loyalty discount"""
+        user = User.objects.create_user(username='loyal', password='testpass123')
+        LoyaltyProgram = apps.get_model('store', 'LoyaltyProgram')
+        LoyaltyProgram.objects.create(user=user, level='silver')
+        pricing = PricingService.price_request(self._request(user), self.priced_cart)
+        self.assertEqual(pricing['loyalty_discount'], Decimal('5.00'))
+        self.assertEqual(pricing['total'], Decimal('85.00'))
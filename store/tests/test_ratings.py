@@ -0,0 +1,93 @@
+"""
+Unit tests for materialized product rating summaries
+"""
+
+from django.test import TestCase, RequestFactory, override_settings
+from django.apps import apps
+from django.contrib.auth.models import User, AnonymousUser
+from django.core.cache import cache
+from decimal import Decimal
+from mobile.serializers import MobileProductSerializer
+from store.services.rating_service import RatingService
+from store.views import product_detail
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RatingSummaryTestCase(TestCase):
+    """Test cases for RatingService"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        Product = apps.get_model('store', 'Product')
+        self.Review = apps.get_model('store', 'Review')
+        self.EnhancedReview = apps.get_model('store', 'EnhancedReview')
+        self.product = Product.objects.create(name='Phone', price=Decimal('100.00'))
+        self.users = [User.objects.create_user(username=f'reviewer{index}', password='x') for index in range(3)]
+
+    def _summary(self):
+        self.product.refresh_from_db()
+        return RatingService.get_summary(
+            apps.get_model('store', 'Product').objects.select_related('rating_summary').get(pk=self.product.pk)
+        )
+
+    def test_summary_follows_review_writes(self):
+        """Create, update and delete adjust the summary of both review models"""
+        review = self.Review.objects.create(
+            product=self.product, user=self.users[0], rating=5, comment='ok', is_verified_purchase=True
+        )
+        self.EnhancedReview.objects.create(
+            product=self.product, user=self.users[1], rating='2', title='meh', comment='meh'
+        )
+        summary = self._summary()
+        self.assertEqual(summary['review_count'], 2)
+        self.assertAlmostEqual(summary['average_rating'], 3.5)
+        self.assertEqual(summary['verified_count'], 1)
+        self.assertEqual(summary['rating_distribution'], {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+
+        review.rating = 4
+        review.is_verified_purchase = False
+        review.save()
+        summary = self._summary()
+        self.assertEqual(summary['rating_distribution'], {1: 0, 2: 1, 3: 0, 4: 1, 5: 0})
+        self.assertEqual(summary['verified_count'], 0)
+
+        review.delete()
+        summary = self._summary()
+        self.assertEqual(summary['review_count'], 1)
+        self.assertAlmostEqual(summary['average_rating'], 2.0)
+
+    def test_rebuild_matches_incremental_summary(self):
+        """The backfill recomputes the same summary from the review tables"""
+        for user, rating in zip(self.users, (5, 3, 1)):
+            self.EnhancedReview.objects.create(
+                product=self.product, user=user, rating=rating, title='t', comment='c', is_verified_purchase=True
+            )
+        expected = self._summary()
+        apps.get_model('store', 'ProductRatingSummary').objects.all().delete()
+        self.assertEqual(RatingService.rebuild(), 1)
+        self.assertEqual(self._summary(), expected)
+        self.assertEqual(expected['verified_count'], 3)
+
+    def test_reads_do_not_aggregate_reviews(self):
+        """Detail pages and mobile cards read the summary row only"""
+        self.EnhancedReview.objects.create(
+            product=self.product, user=self.users[0], rating=4, title='t', comment='c'
+        )
+        request = RequestFactory().get(f'/products/{self.product.pk}/')
+        request.user = AnonymousUser()
+        response = product_detail(request, self.product.pk)
+        self.assertEqual(response.status_code, 200)
+
+        product = apps.get_model('store', 'Product').objects.select_related('seller', 'rating_summary').get(pk=self.product.pk)
+        with self.assertNumQueries(0):
+            data = MobileProductSerializer(product).data
+        self.assertEqual((data['rating'], data['review_count']), (4.0, 1))
+
+    def test_deleting_product_with_reviews(self):
+        """Cascading review deletes do not recreate the summary"""
+        self.Review.objects.create(product=self.product, user=self.users[0], rating=3, comment='ok')
+        self.product.delete()
+        self.assertFalse(apps.get_model('store', 'ProductRatingSummary').objects.exists())
@@ -0,0 +1,158 @@
+"""
+Unit tests for ring-buffer realtime metrics
+"""
+
+import os
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from decimal import Decimal
+from rest_framework.test import APIClient
+from store.services.analytics_service import analytics_service
+from store.services.event_ingestion_service import EventIngestionService
+from store.services.realtime_metrics_service import RealtimeMetricsService, RingBuffer
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+NOW = 1700000000.0
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORE_ANALYTICS_ASYNC_FLUSH=False, STORE_REALTIME_METRICS_ASYNC_FLUSH=False)
+class RealtimeMetricsTestCase(TestCase):
+    """Test cases for RealtimeMetricsService"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        RealtimeMetricsService.reset()
+        EventIngestionService.reset()
+
+    def tearDown(self):
+        RealtimeMetricsService.reset()
+        EventIngestionService.reset()
+
+    def test_ring_buffer_reuses_expired_buckets(self):
+        """A bucket from an earlier lap of the ring is reset, not added to"""
+        ring = RingBuffer(60, 3)
+        ring.add(2, NOW)
+        ring.add(1, NOW + 60)
+        self.assertEqual(sum(ring.get(epoch) for epoch in ring.get_epochs(180, NOW + 60)), 3)
+        ring.add(5, NOW + 180)
+        self.assertEqual(ring.get(int(NOW // 60)), 0)
+        self.assertEqual([ring.get(epoch) for epoch in ring.get_epochs(180, NOW + 180)], [1, 0, 5])
+
+    def test_sliding_windows(self):
+        """Counters are summed over the buckets of each window"""
+        RealtimeMetricsService.record('orders', 1, NOW - 2 * 3600)
+        RealtimeMetricsService.record('orders', 1, NOW - 1800)
+        RealtimeMetricsService.record('orders', 2, NOW - 600)
+        RealtimeMetricsService.record('orders', 1, NOW - 30)
+        RealtimeMetricsService.record_revenue(Decimal('12.34'), NOW - 5)
+        for member, offset in [(1, 1800), (2, 60), (2, 10)]:
+            RealtimeMetricsService.record_member('users', member, NOW - offset)
+
+        totals = RealtimeMetricsService.get_totals(['orders', 'revenue'], now=NOW)
+        self.assertEqual(totals['orders'], {'1min': 1, '15min': 3, '1hr': 4})
+        self.assertEqual(totals['revenue']['1min'], 1234)
+        active = RealtimeMetricsService.get_distinct_counts(['users'], now=NOW)
+        self.assertEqual(active['users'], {'1min': 1, '15min': 1, '1hr': 2})
+
+    def test_other_processes_counts_are_read_from_the_shared_cache(self):
+        """Flushed buckets survive the process that recorded them"""
+        RealtimeMetricsService.record('events:page_view', 3, NOW - 10)
+        RealtimeMetricsService.record_member('sessions', 'abc', NOW - 10)
+        RealtimeMetricsService.flush()
+        RealtimeMetricsService.reset()
+
+        RealtimeMetricsService.record('events:page_view', 1, NOW - 5)
+        RealtimeMetricsService.record_member('sessions', 'def', NOW - 5)
+        totals = RealtimeMetricsService.get_totals(['events:page_view'], now=NOW)
+        self.assertEqual(totals['events:page_view'], {'1min': 4, '15min': 4, '1hr': 4})
+        active = RealtimeMetricsService.get_distinct_counts(['sessions'], now=NOW)
+        self.assertEqual(active['sessions']['15min'], 2)
+
+    def test_recording_leaves_the_shared_flush_to_a_thread(self):
+        """Recording only touches memory; the cache is written from a background thread"""
+        self.addCleanup(setattr, RealtimeMetricsService, '_flusher_pid', RealtimeMetricsService._flusher_pid)
+        RealtimeMetricsService._flusher_pid = None
+        with override_settings(STORE_REALTIME_METRICS_ASYNC_FLUSH=True), \
+                mock.patch.object(RealtimeMetricsService, 'flush') as flush, \
+                mock.patch('store.services.realtime_metrics_service.threading.Thread') as thread:
+            RealtimeMetricsService.record('orders', 1, NOW)
+            RealtimeMetricsService.record_member('users', 1, NOW)
+        flush.assert_not_called()
+        thread.return_value.start.assert_called_once_with()
+        self.assertEqual(RealtimeMetricsService._flusher_pid, os.getpid())
+
+    def test_processes_write_members_to_their_own_keys(self):
+        """Concurrent flushes never overwrite each other's members"""
+        RealtimeMetricsService.record_member('users', 1, NOW - 10)
+        RealtimeMetricsService.flush()
+        first_process_slots = dict(RealtimeMetricsService._member_slots)
+        RealtimeMetricsService.reset()
+        RealtimeMetricsService.record_member('users', 2, NOW - 10)
+        RealtimeMetricsService.flush()
+        self.assertNotEqual(RealtimeMetricsService._member_slots, first_process_slots)
+
+        # The first process flushes again after the second one without reading its members
+        RealtimeMetricsService.reset()
+        RealtimeMetricsService._member_slots = first_process_slots
+        RealtimeMetricsService.record_member('users', 1, NOW - 5)
+        RealtimeMetricsService.record_member('users', 3, NOW - 5)
+        with mock.patch.object(cache, 'get', side_effect=AssertionError('read during flush')):
+            RealtimeMetricsService.flush()
+        RealtimeMetricsService.reset()
+        active = RealtimeMetricsService.get_distinct_counts(['users'], now=NOW)
+        self.assertEqual(active['users']['1min'], 3)
+
+    def test_active_members_are_kept_as_fixed_size_sketches(self):
+        """A busy minute is flushed and read as a small sketch, not a member set"""
+        for member in range(5000):
+            RealtimeMetricsService.record_member('sessions', f'session-{member}', NOW - 10)
+        RealtimeMetricsService.flush()
+        key = RealtimeMetricsService._get_member_key('sessions', int((NOW - 10) // 60))
+        RealtimeMetricsService.reset()
+        self.assertLessEqual(len(cache.get(key)), 2 ** RealtimeMetricsService.MEMBER_PRECISION + 16)
+
+        active = RealtimeMetricsService.get_distinct_counts(['sessions'], now=NOW)['sessions']
+        self.assertAlmostEqual(active['1min'], 5000, delta=500)
+        self.assertEqual(active['1hr'], active['1min'])
+
+    def test_dashboard_is_updated_on_write_and_read_without_queries(self):
+        """Orders, deliveries and tracked events reach the live dashboard"""
+        Order = apps.get_model('store', 'Order')
+        user = User.objects.create_user(username='buyer', password='testpass123')
+        order = Order.objects.create(
+            user=user, total_amount=Decimal('99.50'), shipping_address='Riyadh', phone_number='0500000000'
+        )
+        order.status = 'delivered'
+        order.save()
+        order.save()
+        EventIngestionService.track('page_view', user_id=user.pk, session_key='abc')
+        EventIngestionService.track('purchase', user_id=user.pk, session_key='abc')
+
+        # Top products are counted once, then every poll is served from memory and cache
+        analytics_service.get_advanced_real_time_data()
+        with self.assertNumQueries(0):
+            result = analytics_service.get_advanced_real_time_data()
+        self.assertTrue(result['success'])
+        data = result['data']
+        self.assertEqual(data['order_metrics']['orders_15min'], 1)
+        self.assertEqual(data['sales_data']['sales_1hr'], 99.5)
+        self.assertEqual(data['page_views']['views_15min'], 1)
+        self.assertEqual(data['conversions']['conversion_rate_15min'], 100.0)
+        self.assertEqual(data['user_activity']['active_users_1hr'], 1)
+        self.assertEqual(data['live']['active_sessions_15min'], 1)
+
+        client = APIClient()
+        url = reverse('store_api:realtime_dashboard')
+        client.force_authenticate(user)
+        self.assertEqual(client.get(url).status_code, 403)
+        user.is_staff = True
+        user.save()
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['live']['orders_1min'], 1)
@@ -0,0 +1,122 @@
+"""
+Unit tests for checkout stock reservations
+"""
+
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from store.services.order_service import InsufficientStockError
+from store.services.reservation_service import ReservationService, COUNTER_STORES
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(STORE_RESERVATION_COUNTER_STORE='local')
+class ReservationServiceTestCase(TestCase):
+    """Test cases for ReservationService"""
+
+    def setUp(self):
+        """Set up test data"""
+        COUNTER_STORES['local'].clear()
+        Product = apps.get_model('store', 'Product')
+        self.product = Product.objects.create(
+            name='Flash Sale Phone',
+            price=Decimal('100.00'),
+            stock_quantity=5
+        )
+
+    def _line(self, quantity):
+        return [{'product': self.product, 'quantity': quantity}]
+
+    def test_holds_reduce_availability(self):
+        """Held units are not reported as available"""
+        self.assertEqual(ReservationService.place_holds('session-a', self._line(3)), [])
+        available = ReservationService.get_available_quantities([self.product])
+        self.assertEqual(available[self.product.id], 2)
+
+    def test_holds_cannot_exceed_stock(self):
+        """A hold that would oversubscribe stock is rejected"""
+        ReservationService.place_holds('session-a', self._line(4))
+        self.assertEqual(ReservationService.place_holds('session-b', self._line(2)), [self.product.id])
+        self.assertEqual(ReservationService.get_active_holds([self.product.id]), {self.product.id: 4})
+
+    def test_refreshing_holds_adjusts_counter(self):
+        """Re-entering checkout updates the hold instead of adding to it"""
+        ReservationService.place_holds('session-a', self._line(3))
+        ReservationService.place_holds('session-a', self._line(1))
+        self.assertEqual(ReservationService.get_active_holds([self.product.id]), {self.product.id: 1})
+        ReservationService.place_holds('session-a', [])
+        self.assertEqual(ReservationService.get_active_holds([self.product.id]), {self.product.id: 0})
+
+    def test_convert_holds_places_order(self):
+        """Converting holds decrements stock permanently and releases the holds"""
+        ReservationService.place_holds('session-a', self._line(2))
+        order = ReservationService.convert_holds(
+            'session-a', None, self._line(2),
+            total_amount=Decimal('200.00'), shipping_address='Riyadh', phone_number='0500000000'
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(order.items.count(), 1)
+        self.assertEqual(self.product.stock_quantity, 3)
+        self.assertEqual(ReservationService.get_active_holds([self.product.id]), {self.product.id: 0})
+
+    def test_convert_respects_holds_of_others(self):
+        """Units held by another shopper cannot be bought"""
+        ReservationService.place_holds('session-a', self._line(4))
+        with self.assertRaises(InsufficientStockError):
+            ReservationService.convert_holds(
+                'session-b', None, self._line(2),
+                total_amount=Decimal('200.00'), shipping_address='Riyadh', phone_number='0500000000'
+            )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 5)
+
+    def test_sweeper_releases_expired_holds(self):
+        """Expired holds are released by the sweeper"""
+        ReservationService.place_holds('session-a', self._line(5))
+        self.assertEqual(ReservationService.sweep_expired(), 0)
+        released = ReservationService.sweep_expired(now=timezone.now() + timedelta(hours=1))
+        self.assertEqual(released, 1)
+        available = ReservationService.get_available_quantities([self.product])
+        self.assertEqual(available[self.product.id], 5)
+
+    def test_resync_rebuilds_counters(self):
+        """Counters lost from the store are rebuilt from the ledger"""
+        ReservationService.place_holds('session-a', self._line(2))
+        COUNTER_STORES['local'].clear()
+        ReservationService.resync_counters()
+        self.assertEqual(ReservationService.get_active_holds([self.product.id]), {self.product.id: 2})
+
+    def test_holds_use_ledger_when_counter_store_fails(self):
+        """Without the counter store, holds are still checked against other sessions"""
+        ReservationService.place_holds('session-a', self._line(4))
+        with mock.patch.object(COUNTER_STORES['local'], 'incr', side_effect=ConnectionError):
+            self.assertEqual(ReservationService.place_holds('session-b', self._line(2)), [self.product.id])
+            self.assertEqual(ReservationService.place_holds('session-b', self._line(1)), [])
+            # A session's own holds do not count against it
+            self.assertEqual(ReservationService.place_holds('session-a', self._line(4)), [])
+        StockReservation = apps.get_model('store', 'StockReservation')
+        self.assertEqual(
+            dict(StockReservation.objects.values_list('session_key', 'quantity')), {'session-a': 4, 'session-b': 1}
+        )
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_login_keeps_holds(self):
+        """Holds follow the session across the key rotation at login"""
+        User.objects.create_user(username='buyer', password='testpass123')
+        session = self.client.session
+        session.save()
+        ReservationService.place_holds(session.session_key, self._line(2))
+        ReservationService.remember_session(session)
+        session.save()
+        anonymous_key = session.session_key
+
+        self.client.login(username='buyer', password='testpass123')
+        session_key = self.client.session.session_key
+        self.assertNotEqual(session_key, anonymous_key)
+        StockReservation = apps.get_model('store', 'StockReservation')
+        self.assertEqual(list(StockReservation.objects.values_list('session_key', flat=True)), [session_key])
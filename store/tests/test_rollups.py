@@ -0,0 +1,131 @@
+"""
+Unit tests for incremental analytics rollups
+"""
+
+from datetime import timedelta
+from io import StringIO
+from django.test import TestCase, override_settings
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from decimal import Decimal
+from store.services.order_service import OrderService
+from store.services.rollup_service import RollupService
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RollupServiceTestCase(TestCase):
+    """Test cases for RollupService"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.Order = apps.get_model('store', 'Order')
+        self.OrderItem = apps.get_model('store', 'OrderItem')
+        self.AnalyticsIntegration = apps.get_model('store', 'AnalyticsIntegration')
+        Product = apps.get_model('store', 'Product')
+        self.seller = User.objects.create_user(username='seller', password='x')
+        self.buyer = User.objects.create_user(username='buyer', password='x')
+        self.phone = Product.objects.create(
+            name='Phone', price=Decimal('100.00'), stock_quantity=10, category='phones', seller=self.seller
+        )
+        self.case = Product.objects.create(
+            name='Case', price=Decimal('20.00'), stock_quantity=10, category='accessories'
+        )
+
+    def snapshot(self):
+        """Every rollup row's counters, keyed by its dimensions"""
+        rows = {}
+        for model_name, fields in (
+            ('OrderRollup', ('orders', 'revenue')),
+            ('SalesRollup', ('quantity', 'revenue')),
+            ('EventRollup', ('events',)),
+        ):
+            for row in apps.get_model('store', model_name).objects.all():
+                key = (model_name, row.period, row.bucket) + tuple(
+                    getattr(row, name) for name in ('status', 'category', 'seller_id', 'event_type') if hasattr(row, name)
+                )
+                values = tuple(getattr(row, name) for name in fields)
+                if any(values):
+                    rows[key] = rows.get(key, (0,) * len(values))
+                    rows[key] = tuple(a + b for a, b in zip(rows[key], values))
+        return rows
+
+    def place_order(self):
+        return OrderService.place_order(
+            self.buyer,
+            [{'product': self.phone, 'quantity': 2}, {'product': self.case, 'quantity': 1}],
+            total_amount=Decimal('220.00'), shipping_address='Riyadh', phone_number='0500000000'
+        )
+
+    def test_incremental_rollups_match_a_rebuild(self):
+        """Orders, item and status changes, deletes and events keep the rollups exact"""
+        order = self.place_order()
+        second = self.Order.objects.create(
+            user=self.buyer, total_amount=Decimal('20.00'), shipping_address='Jeddah', phone_number='1'
+        )
+        item = self.OrderItem.objects.create(order=second, product=self.case, quantity=1, price=Decimal('20.00'))
+        order.status = 'delivered'
+        order.save()
+        item.quantity = 3
+        item.save()
+        self.AnalyticsIntegration.objects.create(event_type='product_view', product=self.phone)
+        self.AnalyticsIntegration.objects.create(
+            event_type='page_view', timestamp=timezone.now() - timedelta(days=3)
+        )
+        incremental = self.snapshot()
+
+        RollupService.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+        second.delete()
+        incremental = self.snapshot()
+        call_command('rebuild_analytics_rollups', days=7, stdout=StringIO())
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_sampled_events_are_weighted(self):
+        """An event kept at a sample rate counts for the events it stands for"""
+        for metadata in ('{"sample_rate": 0.25}', '{"sample_rate": 0.25}', None):
+            self.AnalyticsIntegration.objects.create(event_type='page_view', metadata=metadata)
+        EventRollup = apps.get_model('store', 'EventRollup')
+        self.assertEqual(EventRollup.objects.get(period='day', event_type='page_view').events, 9)
+        incremental = self.snapshot()
+
+        RollupService.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+        self.assertEqual(RollupService.get_event_weight({'sample_rate': 0}), 1.0)
+
+    def test_dashboard_reads(self):
+        """Tiles read totals, categories and date ranges from the rollups"""
+        order = self.place_order()
+        order.status = 'delivered'
+        order.save()
+        old = self.Order.objects.create(
+            user=self.buyer, total_amount=Decimal('50.00'), shipping_address='Riyadh', phone_number='1', status='delivered'
+        )
+        self.Order.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=40))
+        RollupService.rebuild()
+
+        self.assertEqual(RollupService.get_order_totals()['delivered'], {'orders': 2, 'revenue': Decimal('270.00')})
+        recent = RollupService.get_order_totals(start=timezone.now() - timedelta(days=30))
+        self.assertEqual(recent['delivered'], {'orders': 1, 'revenue': Decimal('220.00')})
+        self.assertEqual(RollupService.get_category_sales()['phones'], {'quantity': 2, 'amount': Decimal('200.00')})
+        self.assertEqual(RollupService.get_category_sales(seller_id=self.seller.pk), {
+            'phones': {'quantity': 2, 'amount': Decimal('200.00')}
+        })
+
+        with self.assertNumQueries(2):
+            recent = RollupService.get_recent_totals(timedelta(hours=1))
+        self.assertAlmostEqual(recent['orders']['delivered'], 1)
+
+    def test_recent_totals_prorate_the_first_hour(self):
+        """The hour the window starts in counts for the share of it inside the window"""
+        hour = RollupService.get_buckets(timezone.now())['hour']
+        for when, event_type in ((hour - timedelta(minutes=30), 'page_view'), (hour + timedelta(minutes=5), 'page_view')):
+            self.AnalyticsIntegration.objects.create(event_type=event_type, timestamp=when)
+        recent = RollupService.get_recent_totals(timedelta(hours=1), now=hour + timedelta(minutes=15))
+        self.assertAlmostEqual(recent['events']['page_view'], 1.75)
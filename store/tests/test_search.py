@@ -0,0 +1,126 @@
+"""
+Unit tests for the full-text product search index
+"""
+
+from django.test import TestCase, override_settings
+from django.apps import apps
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from decimal import Decimal
+from store.services.search_service import normalize_text, tokenize, SearchService
+from store.services.product_service import ProductService
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class NormalizationTestCase(TestCase):
+    """Test cases for Arabic-aware normalization"""
+
+    def test_diacritics_and_letter_folding(self):
+        """Diacritics are stripped and alef/ya/ta-marbuta variants folded"""
+        self.assertEqual(normalize_text('مُسْتَشْفَى'), 'مستشفي')
+        self.assertEqual(normalize_text('أحذية إبرة آلة'), 'احذيه ابره اله')
+        self.assertEqual(normalize_text('ســاعة'), 'ساعه')
+
+    def test_definite_article_is_stripped(self):
+        """The definite article and attached prefixes are removed from terms"""
+        self.assertEqual(tokenize('الهاتف والكتب بالذهب'), ['هاتف', 'كتب', 'ذهب'])
+        self.assertEqual(tokenize('iPhone-15 ١٢٨'), ['iphone', '15', '128'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORE_SEARCH_BACKEND='inverted_index')
+class SearchIndexTestCase(TestCase):
+    """Test cases for the inverted index backend"""
+
+    def setUp(self):
+        """Set up test data"""
+        Product = apps.get_model('store', 'Product')
+        self.phone = Product.objects.create(
+            name='هاتف ذكي', name_en='Smart Phone', description='شاشة كبيرة وبطارية قوية', price=Decimal('500.00')
+        )
+        self.case = Product.objects.create(
+            name='جراب', name_en='Case', description='جراب حماية مناسب لكل هاتف', price=Decimal('20.00')
+        )
+        self.shoes = Product.objects.create(
+            name='أحذية رياضية', name_en='Running Shoes', description='خفيفة ومريحة', price=Decimal('150.00')
+        )
+
+    def test_name_match_ranks_first(self):
+        """A term in the name outranks the same term in the description"""
+        self.assertEqual(SearchService.search_ids('الهاتف'), [self.phone.id, self.case.id])
+
+    def test_normalized_query_matches(self):
+        """Queries without hamza or ta-marbuta still match"""
+        self.assertEqual(SearchService.search_ids('احذيه'), [self.shoes.id])
+        self.assertEqual(SearchService.search_ids('running SHOES'), [self.shoes.id])
+
+    def test_index_follows_product_saves(self):
+        """Saving or deleting a product updates the index"""
+        self.shoes.name_en = 'Trail Boots'
+        self.shoes.save()
+        self.assertEqual(SearchService.search_ids('shoes'), [])
+        self.assertEqual(SearchService.search_ids('boots'), [self.shoes.id])
+        self.shoes.delete()
+        self.assertEqual(SearchService.search_ids('boots'), [])
+
+    def test_category_matches(self):
+        """The category is searchable as it was with the chained filters"""
+        self.assertCountEqual(SearchService.search_ids('phones'), [self.phone.id, self.case.id, self.shoes.id])
+        self.case.category = 'accessories'
+        self.case.save(update_fields=['category'])
+        self.assertEqual(SearchService.search_ids('accessories'), [self.case.id])
+
+    def test_every_match_is_kept(self):
+        """Large result sets are paginated in full rather than cut off"""
+        Product = apps.get_model('store', 'Product')
+        ProductSearchTerm = apps.get_model('store', 'ProductSearchTerm')
+        products = Product.objects.bulk_create([
+            Product(name=f'كابل {number}', price=Decimal('5.00')) for number in range(600)
+        ])
+        ProductSearchTerm.objects.bulk_create([
+            ProductSearchTerm(term='كابل', product=product, frequency=3) for product in products
+        ])
+        queryset = SearchService.filter_queryset(Product.objects.all(), 'كابل')
+        self.assertEqual(queryset.count(), 600)
+        self.assertEqual(SearchService.rank(queryset, 'كابل').count(), 600)
+
+    def test_page_query_size_independent_of_match_count(self):
+        """A relevance page sends the same SQL for 12 matches as for 1000"""
+        Product = apps.get_model('store', 'Product')
+        ProductSearchTerm = apps.get_model('store', 'ProductSearchTerm')
+
+        def add_cables(count):
+            products = Product.objects.bulk_create([
+                Product(name=f'كابل {number}', price=Decimal('5.00')) for number in range(count)
+            ])
+            ProductSearchTerm.objects.bulk_create([
+                ProductSearchTerm(term='كابل', product=product, frequency=3) for product in products
+            ])
+
+        def first_page_queries():
+            SearchService.search_ids('كابل')
+            with CaptureQueriesContext(connection) as queries:
+                page = Paginator(ProductService.search_products(query='كابل'), 12).page(1)
+                ids = [product.id for product in page]
+            return ids, [query['sql'] for query in queries.captured_queries]
+
+        add_cables(12)
+        small_ids, small_queries = first_page_queries()
+        add_cables(988)
+        large_ids, large_queries = first_page_queries()
+        self.assertEqual(large_ids, small_ids)
+        self.assertEqual(large_queries, small_queries)
+
+    def test_query_cost_independent_of_catalog_size(self):
+        """A search reads posting lists only, with a fixed number of queries"""
+        SearchService.search_ids('هاتف')
+        with self.assertNumQueries(1):
+            SearchService.search_ids('هاتف')
+
+    def test_product_service_orders_by_relevance(self):
+        """search_products returns matches ordered by relevance by default"""
+        products = ProductService.search_products(query='هاتف')
+        self.assertEqual([product.id for product in products], [self.phone.id, self.case.id])
+        products = ProductService.search_products(query='هاتف', sort_by='price_asc')
+        self.assertEqual([product.id for product in products], [self.case.id, self.phone.id])
@@ -5,7 +5,9 @@ Unit tests for service layer
 from django.test import TestCase
 from django.contrib.auth.models import User
 from django.apps import apps
-from store.services.order_service import OrderService
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from store.services.order_service import OrderService, InsufficientStockError
 from decimal import Decimal
 from unittest.mock import patch, MagicMock
 
@@ -153,6 +155,56 @@ class OrderServiceTestCase(TestCase):
         stats = OrderService.get_order_statistics()
         self.assertEqual(stats['delivered_orders'], 1)
         self.assertEqual(stats['total_revenue'], Decimal('39.98'))
+    
+    def test_create_order_oversell_rolls_back(self):
+        """Test that an oversell fails fast without writing anything"""
+        Order = apps.get_model('store', 'Order')
+        Product = apps.get_model('store', 'Product')
+        other_product = Product.objects.create(
+            name='Scarce Product',
+            price=Decimal('5.00'),
+            stock_quantity=1
+        )
+        cart_items = self.cart_items + [
+            {'product': other_product, 'quantity': 2, 'total_price': Decimal('10.00')}
+        ]
+        
+        with self.assertRaises(InsufficientStockError) as context:
+            OrderService.create_order(
+                user=self.user,
+                cart_items=cart_items,
+                shipping_address=self.shipping_address
+            )
+        
+        # Verify nothing was written
+        self.assertEqual(context.exception.product_id, other_product.id)
+        self.assertEqual(Order.objects.count(), 0)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 10)
+    
+    def test_place_order_merges_lines_and_bulk_creates_items(self):
+        """Test that duplicate lines share one conditional stock update"""
+        cart_items = [
+            {'product': self.product, 'quantity': 6, 'total_price': Decimal('119.94')},
+            {'product': self.product, 'quantity': 4, 'total_price': Decimal('79.96')},
+        ]
+        
+        with CaptureQueriesContext(connection) as queries:
+            order = OrderService.place_order(
+                self.user,
+                cart_items,
+                total_amount=Decimal('199.90'),
+                shipping_address='123 Test St',
+                phone_number='123-456-7890'
+            )
+        
+        # One stock update and one item insert regardless of line count
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(len([sql for sql in statements if sql.startswith('UPDATE "store_product"')]), 1)
+        self.assertEqual(len([sql for sql in statements if sql.startswith('INSERT INTO "store_orderitem"')]), 1)
+        self.assertEqual(order.items.count(), 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
 
 class RecommendationServiceTestCase(TestCase):
     """Test cases for RecommendationService"""
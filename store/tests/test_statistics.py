@@ -0,0 +1,110 @@
+"""
+Unit tests for declarative dashboard statistics
+"""
+
+from django.test import TestCase
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db.models import Q, Sum
+from django.urls import reverse
+from decimal import Decimal
+from rest_framework.test import APIClient
+from store.services.order_service import OrderService
+from store.services.product_service import ProductService
+from store.utils import statistics
+
+
+class StatisticsTestCase(TestCase):
+    """Test cases for conditional aggregation statistics"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.Order = apps.get_model('store', 'Order')
+        self.Product = apps.get_model('store', 'Product')
+        self.UserProfile = apps.get_model('store', 'UserProfile')
+        self.buyer = User.objects.create_user(username='buyer', password='testpass123')
+        self.seller = User.objects.create_user(username='seller', password='testpass123')
+        self.UserProfile.objects.update_or_create(user=self.buyer, defaults={'role': 'buyer'})
+        self.UserProfile.objects.update_or_create(
+            user=self.seller, defaults={'role': 'seller', 'verification_status': 'rejected'}
+        )
+        self.Product.objects.create(name='Phone', price=Decimal('100.00'), seller=self.seller)
+        self.Product.objects.create(name='Case', price=Decimal('10.00'))
+        for status, amount in [('pending', '10.00'), ('pending', '20.00'), ('delivered', '30.00'),
+                               ('delivered', '40.00'), ('cancelled', '50.00')]:
+            self.Order.objects.create(
+                user=self.buyer, status=status, total_amount=Decimal(amount),
+                shipping_address='Riyadh', phone_number='0500000000'
+            )
+
+    def test_metrics_on_one_table_share_one_query(self):
+        """Counts and sums with different filters are answered by one SELECT"""
+        stats = statistics.Statistics({
+            'orders': statistics.count('store.Order'),
+            'pending': statistics.count('store.Order', Q(status='pending')),
+            'revenue': statistics.total('store.Order', 'total_amount', Q(status='delivered')),
+            'returned_revenue': statistics.total(
+                'store.Order', 'total_amount', Q(status='returned'), default=Decimal('0.00')
+            ),
+            'average': statistics.average('store.Order', 'total_amount'),
+        })
+        with self.assertNumQueries(1):
+            values = stats.evaluate()
+        self.assertEqual(values['orders'], 5)
+        self.assertEqual(values['pending'], 2)
+        self.assertEqual(values['revenue'], Decimal('70.00'))
+        self.assertEqual(values['returned_revenue'], Decimal('0.00'))
+        self.assertEqual(values['average'], Decimal('30.00'))
+
+        # A narrower queryset replaces the table's rows
+        with self.assertNumQueries(1):
+            values = stats.evaluate({'store.Order': self.Order.objects.filter(total_amount__gt=25)})
+        self.assertEqual((values['orders'], values['pending']), (3, 0))
+
+        with self.assertRaises(ValueError):
+            statistics.Metric('store.Order', 'median')
+
+    def test_order_statistics(self):
+        """Order statistics take one query and match per-status counts"""
+        with self.assertNumQueries(1):
+            stats = OrderService.get_order_statistics()
+        for status in ['pending', 'processing', 'shipped', 'delivered', 'cancelled', 'returned']:
+            self.assertEqual(stats[f'{status}_orders'], self.Order.objects.filter(status=status).count())
+        self.assertEqual(stats['total_orders'], 5)
+        self.assertEqual(stats['total_revenue'], Decimal('70.00'))
+
+    def test_dashboard_statistics(self):
+        """Dashboard counts take one query per table"""
+        Commission = apps.get_model('store', 'Commission')
+        expected_profits = Commission.objects.aggregate(total=Sum('amount'))['total'] or 0
+
+        # Products, orders, profiles and commissions, then recent orders and top products
+        with self.assertNumQueries(7):
+            result = ProductService.get_dashboard_statistics()
+        self.assertTrue(result['success'])
+        data = result['data']
+        self.assertEqual((data['total_products'], data['pending_products'], data['rejected_products']), (2, 0, 1))
+        self.assertEqual((data['total_orders'], data['pending_orders']), (5, 2))
+        self.assertEqual(data['total_sellers'], 1)
+        self.assertEqual(data['total_profits'], expected_profits)
+
+    def test_dashboard_statistics_endpoint(self):
+        """Staff see store-wide statistics and other users see their own orders"""
+        client = APIClient()
+        url = reverse('store_api:dashboard_statistics')
+
+        client.force_authenticate(self.buyer)
+        with self.assertNumQueries(1):
+            response = client.get(url)
+        self.assertEqual(response.data, {'total_orders': 5, 'pending_orders': 2})
+
+        client.force_authenticate(self.seller)
+        self.assertEqual(client.get(url).data, {'total_orders': 0, 'pending_orders': 0})
+
+        staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        client.force_authenticate(staff)
+        with self.assertNumQueries(4):
+            response = client.get(url)
+        self.assertEqual(response.data['total_orders'], 5)
+        self.assertEqual(response.data['total_sellers'], 1)
+        self.assertEqual(response.data['recent_orders_count'], 5)
@@ -0,0 +1,114 @@
+"""
+Unit tests for access-driven cache warmup
+"""
+
+from io import StringIO
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from decimal import Decimal
+from store.services.warmup_service import WarmupService
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORE_CACHE_WARMUP_ASYNC_FLUSH=False)
+class WarmupServiceTestCase(TestCase):
+    """Test cases for WarmupService"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        WarmupService.reset()
+        self.CacheWarmupTarget = apps.get_model('store', 'CacheWarmupTarget')
+        self.product = apps.get_model('store', 'Product').objects.create(
+            name='Phone', price=Decimal('100.00'), stock_quantity=5
+        )
+        self.detail_url = reverse('product_detail', args=[self.product.pk])
+        self.buyer = User.objects.create_user(username='buyer', password='x')
+        profile = apps.get_model('store', 'UserProfile').objects.get(user=self.buyer)
+        profile.role = 'buyer'
+        profile.save()
+
+    def tearDown(self):
+        WarmupService.reset()
+
+    def visit(self):
+        """Browse the store anonymously and as a buyer, then write the counts"""
+        for _ in range(3):
+            self.client.get(self.detail_url)
+        self.client.get(reverse('product_list'), {'page': '1'})
+        self.client.get(reverse('product_detail', args=[self.product.pk + 100]))
+        self.client.force_login(self.buyer)
+        self.client.get(reverse('buyer_dashboard'))
+        self.client.logout()
+        return WarmupService.flush()
+
+    def test_visits_are_counted_per_page_and_user(self):
+        """Successful GETs are buffered and flushed as one row per page"""
+        self.assertEqual(self.visit(), 3)
+        self.assertEqual(self.visit(), 3)
+        targets = {(t.path, t.query, t.user_id): t.hits for t in self.CacheWarmupTarget.objects.all()}
+        self.assertEqual(targets, {
+            (self.detail_url, '', None): 6,
+            (reverse('product_list'), 'page=1', None): 2,
+            (reverse('buyer_dashboard'), '', self.buyer.pk): 2,
+        })
+
+    @override_settings(STORE_CACHE_WARMUP_MAX_BUFFERED_TARGETS=2)
+    def test_recorded_queries_are_whitelisted_and_buffer_is_capped(self):
+        """Unknown query parameters are dropped and pages past the cap are not counted"""
+        self.client.get(reverse('product_list'), {'page': '2', 'utm_source': 'mail', 'sort': 'price'})
+        self.client.get(reverse('product_list'), {'page': '2', 'sort': 'price', 'ref': 'bot'})
+        self.client.get(self.detail_url)
+        self.client.get(reverse('product_list'), {'page': '3'})
+        self.client.get(self.detail_url, {'page': '9'})
+        self.assertEqual(WarmupService.flush(), 2)
+        targets = {(t.path, t.query): t.hits for t in self.CacheWarmupTarget.objects.all()}
+        self.assertEqual(targets, {
+            (reverse('product_list'), 'page=2&sort=price'): 2,
+            (self.detail_url, ''): 1,
+        })
+
+    @override_settings(STORE_CACHE_WARMUP_ASYNC_FLUSH=True)
+    def test_visits_are_flushed_off_the_request_path(self):
+        """Recording a visit starts the flush thread instead of writing in the request"""
+        previous_pid = WarmupService._flusher_pid
+        WarmupService._flusher_pid = None
+        try:
+            with mock.patch.object(WarmupService, 'run_flusher') as run_flusher:
+                self.client.get(self.detail_url)
+                WarmupService._flusher.join()
+            run_flusher.assert_called_once_with()
+        finally:
+            WarmupService._flusher_pid = previous_pid
+        self.assertFalse(self.CacheWarmupTarget.objects.exists())
+        self.assertEqual(WarmupService.flush(), 1)
+
+    def test_replay_refills_caches_and_reports_coverage(self):
+        """Replayed pages are served from the cache and not counted again"""
+        self.visit()
+        cache.clear()
+        report = WarmupService.replay(limit=2, workers=1)
+        self.assertEqual((report['targets'], report['warmed'], report['failed']), (2, 2, 0))
+        self.assertAlmostEqual(report['coverage'], 4 / 5)
+        self.assertEqual(WarmupService.flush(), 0)
+        self.assertEqual(self.client.get(self.detail_url)['X-Page-Cache'], 'HIT')
+
+        self.product.delete()
+        report = WarmupService.replay(workers=1)
+        self.assertEqual([path for path, error in report['failures']], [self.detail_url])
+
+    def test_warmup_command_prunes_and_reports(self):
+        """The command replays pages and prints its coverage"""
+        self.visit()
+        self.CacheWarmupTarget.objects.filter(user=self.buyer).update(last_seen='2000-01-01T00:00:00Z')
+        out = StringIO()
+        call_command('warmup_cache', workers=1, prune=True, stdout=out)
+        self.assertIn('Forgot 1 pages', out.getvalue())
+        self.assertIn('Warmed 2 of 2 pages', out.getvalue())
+        self.assertIn('covering 100.0% of recent visits', out.getvalue())
@@ -1,178 +0,0 @@
-from PIL import Image
-import os
-from django.conf import settings
-from django.apps import apps
-
-
-class CartItem:
-    def __init__(self, product, quantity=1):
-        self.product = product
-        self.quantity = quantity
-    
-    @property
-    def total_price(self):
-        return self.product.price * self.quantity
-
-
-class Cart:
-    def __init__(self, session):
-        self.session = session
-        self.cart = session.get('cart', {})
-    
-    def add(self, product_id, quantity=1):
-        """Add a product to the cart"""
-        product_id = str(product_id)
-        quantity = int(quantity)
-        if product_id in self.cart:
-            self.cart[product_id] += quantity
-        else:
-            self.cart[product_id] = quantity
-        self.save()
-    
-    def remove(self, product_id):
-        """Remove a product from the cart"""
-        product_id = str(product_id)
-        if product_id in self.cart:
-            del self.cart[product_id]
-            self.save()
-    
-    def update(self, product_id, quantity):
-        """Update the quantity of a product in the cart"""
-        product_id = str(product_id)
-        quantity = int(quantity)
-        if quantity > 0:
-            self.cart[product_id] = quantity
-        elif product_id in self.cart:
-            del self.cart[product_id]
-        self.save()
-    
-    def save(self):
-        """Save the cart to the session"""
-        self.session['cart'] = self.cart
-        self.session.modified = True
-    
-    def clear(self):
-        """Remove all items from the cart"""
-        self.cart = {}
-        self.save()
-    
-    def get_items(self):
-        """Get cart items with product details"""
-        Product = apps.get_model('store', 'Product')
-        items = []
-        # Create a copy of the cart items to avoid modification during iteration
-        cart_items = list(self.cart.items())
-        for product_id, quantity in cart_items:
-            try:
-                product = Product.objects.get(pk=product_id)
-                items.append({
-                    'product': product,
-                    'quantity': int(quantity),
-                    'total_price': product.price * int(quantity),
-                    'id': product_id
-                })
-            except (Product.DoesNotExist, ValueError, TypeError):
-                # Remove invalid product from cart
-                self.remove(product_id)
-        return items
-    
-    def get_total_price(self):
-        """Calculate the total price of all items in the cart"""
-        total = 0
-        for item in self.get_items():
-            total += item['total_price']
-        return total
-    
-    def get_total_quantity(self):
-        """Calculate the total quantity of all items in the cart"""
-        try:
-            return sum(int(quantity) for quantity in self.cart.values())
-        except (ValueError, TypeError):
-            # If there are any invalid quantities, return 0
-            return 0
-
-def optimize_image(image_path, max_width=800, max_height=600, quality=85):
-    """
-    Optimize an image by resizing and compressing it. Also creates WebP version.
-    Uses advanced compression techniques for better optimization.
-    """
-    if not os.path.exists(image_path):
-        return
-    
-    try:
-        # Open the image
-        with Image.open(image_path) as img:
-            # Convert to RGB if necessary (for PNG with transparency)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
-            
-            # Calculate new dimensions maintaining aspect ratio
-            img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-            
-            # Apply advanced compression techniques
-            # For JPEG, use progressive encoding and optimize
-            if image_path.lower().endswith(('.jpg', '.jpeg')):
-                img.save(image_path, 'JPEG', quality=quality, optimize=True, progressive=True)
-            else:
-                # For other formats, use standard optimization
-                img.save(image_path, 'JPEG', quality=quality, optimize=True)
-            
-            # Create WebP version for better compression
-            webp_path = os.path.splitext(image_path)[0] + '.webp'
-            # Use lossless compression for images with fewer colors, otherwise use lossy
-            if img.mode in ('1', 'L', 'P'):  # Black/white, grayscale, or palette
-                img.save(webp_path, 'WEBP', lossless=True, quality=quality, method=6)
-            else:
-                img.save(webp_path, 'WEBP', quality=quality, method=6, alpha_quality=quality)
-                
-            # Create additional responsive image sizes
-            create_responsive_sizes(img, image_path, quality)
-    except Exception as e:
-        print(f"Error optimizing image {image_path}: {e}")
-
-def create_responsive_sizes(img, original_path, quality=85):
-    """
-    Create multiple responsive image sizes for better performance on different devices.
-    """
-    # Define responsive sizes
-    sizes = [
-        (320, 240),   # Small thumbnail
-        (640, 480),   # Medium size
-        (1200, 900),  # Large size
-    ]
-    
-    base_name = os.path.splitext(original_path)[0]
-    extension = os.path.splitext(original_path)[1].lower()
-    
-    for width, height in sizes:
-        # Skip if the original image is smaller than the target size
-        if img.width <= width and img.height <= height:
-            continue
-            
-        # Create a copy and resize
-        resized_img = img.copy()
-        resized_img.thumbnail((width, height), Image.Resampling.LANCZOS)
-        
-        # Save in original format
-        if extension in ('.jpg', '.jpeg'):
-            resized_img.save(f"{base_name}_{width}w{extension}", 'JPEG', quality=quality, optimize=True)
-        else:
-            resized_img.save(f"{base_name}_{width}w.jpg", 'JPEG', quality=quality, optimize=True)
-        
-        # Save in WebP format
-        resized_img.save(f"{base_name}_{width}w.webp", 'WEBP', quality=quality, method=6)
-
-def optimize_product_images():
-    """
-    Optimize all product images in the media directory.
-    """
-    media_root = settings.MEDIA_ROOT
-    products_dir = os.path.join(media_root, 'products')
-    
-    if not os.path.exists(products_dir):
-        return
-    
-    for filename in os.listdir(products_dir):
-        if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-            image_path = os.path.join(products_dir, filename)
-            optimize_image(image_path)
\ No newline at end of file
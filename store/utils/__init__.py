@@ -0,0 +1,326 @@
+from PIL import Image
+import os
+from decimal import Decimal
+from django.conf import settings
+from django.apps import apps
+from django.db import transaction
+
+
+class CartItem:
+    def __init__(self, product, quantity=1):
+        self.product = product
+        self.quantity = quantity
+    
+    @property
+    def total_price(self):
+        return self.product.price * self.quantity
+
+
+class PricedCart:
+    """
+    Snapshot of a cart resolved against current product prices.
+
+    Built once per request by ``Cart.priced()`` so views and context
+    processors share the same lines and totals instead of re-querying.
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.subtotal = sum((item['total_price'] for item in items), Decimal('0.00'))
+        self.total_quantity = sum(item['quantity'] for item in items)
+        self._by_id = {str(item['id']): item for item in items}
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def get_item(self, product_id):
+        """Return the line for a product, or None if it is not in the cart"""
+        return self._by_id.get(str(product_id))
+
+    def get_item_total(self, product_id):
+        """Return the line total for a product, or 0 if it is not in the cart"""
+        item = self.get_item(product_id)
+        return item['total_price'] if item else Decimal('0.00')
+
+
+class Cart:
+    # Attribute used to share one Cart instance across a request
+    REQUEST_ATTR = '_store_cart'
+
+    def __init__(self, session, user=None):
+        self.session = session
+        # Logged-in shoppers keep their cart in CartLine rows, one row per line
+        self.user = user if user is not None and user.is_authenticated else None
+        self.cart = self._load()
+        self._priced = None
+
+    @classmethod
+    def for_request(cls, request):
+        """Return the Cart bound to this request, creating it on first use"""
+        cart = getattr(request, cls.REQUEST_ATTR, None)
+        if cart is None:
+            cart = cls(request.session, getattr(request, 'user', None))
+            setattr(request, cls.REQUEST_ATTR, cart)
+        return cart
+
+    @staticmethod
+    def merge_session_cart(session, user):
+        """
+        Merge an anonymous session cart into the user's server-side cart
+
+        Quantities of products present in both carts are added together.
+
+        Args:
+            session: Session holding the anonymous cart
+            user: User who just logged in
+        """
+        session_cart = session.get('cart')
+        if not session_cart:
+            return
+        CartLine = apps.get_model('store', 'CartLine')
+        quantities = {}
+        for product_id, quantity in session_cart.items():
+            try:
+                quantities[int(product_id)] = quantities.get(int(product_id), 0) + int(quantity)
+            except (ValueError, TypeError):
+                continue
+
+        Product = apps.get_model('store', 'Product')
+        existing_ids = set(Product.objects.filter(id__in=list(quantities)).values_list('id', flat=True))
+        with transaction.atomic():
+            lines = CartLine.objects.select_for_update().filter(user=user, product_id__in=existing_ids)
+            for line in lines:
+                CartLine.objects.filter(pk=line.pk).update(quantity=line.quantity + quantities[line.product_id])
+                existing_ids.discard(line.product_id)
+            CartLine.objects.bulk_create([
+                CartLine(user=user, product_id=product_id, quantity=quantities[product_id])
+                for product_id in existing_ids
+                if quantities[product_id] > 0
+            ])
+
+        del session['cart']
+        session.modified = True
+
+    def _load(self):
+        """Load the ``{product_id: quantity}`` map from the session or CartLine rows"""
+        if self.user is None:
+            return self.session.get('cart', {})
+        CartLine = apps.get_model('store', 'CartLine')
+        return {
+            str(product_id): quantity
+            for product_id, quantity in CartLine.objects.filter(user=self.user).values_list('product_id', 'quantity')
+        }
+    
+    def add(self, product_id, quantity=1):
+        """Add a product to the cart"""
+        product_id = str(product_id)
+        quantity = int(quantity)
+        if product_id in self.cart:
+            self.cart[product_id] += quantity
+        else:
+            self.cart[product_id] = quantity
+        self._save_line(product_id)
+    
+    def remove(self, product_id):
+        """Remove a product from the cart"""
+        product_id = str(product_id)
+        if product_id in self.cart:
+            del self.cart[product_id]
+            self._save_line(product_id)
+    
+    def update(self, product_id, quantity):
+        """Update the quantity of a product in the cart"""
+        product_id = str(product_id)
+        quantity = int(quantity)
+        if quantity > 0:
+            self.cart[product_id] = quantity
+        elif product_id in self.cart:
+            del self.cart[product_id]
+        self._save_line(product_id)
+
+    def _save_line(self, product_id):
+        """Persist one cart line: a single row write for user carts, the session otherwise"""
+        if self.user is not None:
+            CartLine = apps.get_model('store', 'CartLine')
+            quantity = self.cart.get(product_id)
+            if quantity:
+                CartLine.objects.update_or_create(
+                    user=self.user, product_id=int(product_id), defaults={'quantity': quantity}
+                )
+            else:
+                CartLine.objects.filter(user=self.user, product_id=int(product_id)).delete()
+        self.save()
+    
+    def save(self):
+        """Save the cart to the session (user carts are written line by line)"""
+        if self.user is None:
+            self.session['cart'] = self.cart
+            self.session.modified = True
+        # Any mutation invalidates the memoized pricing
+        self._priced = None
+    
+    def clear(self):
+        """Remove all items from the cart"""
+        self.cart = {}
+        if self.user is not None:
+            CartLine = apps.get_model('store', 'CartLine')
+            CartLine.objects.filter(user=self.user).delete()
+        self.save()
+
+    def _resolve_items(self):
+        """Resolve every cart line with a single ``id__in`` query"""
+        Product = apps.get_model('store', 'Product')
+        quantities = {}
+        invalid = []
+        for product_id, quantity in list(self.cart.items()):
+            try:
+                quantities[int(product_id)] = int(quantity)
+            except (ValueError, TypeError):
+                invalid.append(product_id)
+
+        products = {}
+        if quantities:
+            products = Product.objects.select_related('seller').in_bulk(list(quantities))
+
+        items = []
+        for product_id, quantity in list(self.cart.items()):
+            if product_id in invalid:
+                continue
+            product = products.get(int(product_id))
+            if product is None:
+                invalid.append(product_id)
+                continue
+            items.append({
+                'product': product,
+                'quantity': quantities[int(product_id)],
+                'total_price': product.price * quantities[int(product_id)],
+                'id': product_id
+            })
+
+        if invalid:
+            # Remove invalid products from cart in one session write
+            for product_id in invalid:
+                self.cart.pop(product_id, None)
+            if self.user is not None:
+                CartLine = apps.get_model('store', 'CartLine')
+                CartLine.objects.filter(
+                    user=self.user, product_id__in=[int(pid) for pid in invalid if str(pid).isdigit()]
+                ).delete()
+            self.save()
+        return items
+
+    def priced(self):
+        """Get the memoized priced cart, resolving it on first use"""
+        if self._priced is None:
+            self._priced = PricedCart(self._resolve_items())
+        return self._priced
+    
+    def get_items(self):
+        """Get cart items with product details"""
+        return self.priced().items
+    
+    def get_total_price(self):
+        """Calculate the total price of all items in the cart"""
+        return self.priced().subtotal
+    
+    def get_total_quantity(self):
+        """Calculate the total quantity of all items in the cart"""
+        if self._priced is not None:
+            return self._priced.total_quantity
+        try:
+            return sum(int(quantity) for quantity in self.cart.values())
+        except (ValueError, TypeError):
+            # If there are any invalid quantities, return 0
+            return 0
+
+def optimize_image(image_path, max_width=800, max_height=600, quality=85):
+    """
+    Optimize an image by resizing and compressing it. Also creates WebP version.
+    Uses advanced compression techniques for better optimization.
+    """
+    if not os.path.exists(image_path):
+        return
+    
+    try:
+        # Open the image
+        with Image.open(image_path) as img:
+            # Convert to RGB if necessary (for PNG with transparency)
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img = img.convert('RGB')
+            
+            # Calculate new dimensions maintaining aspect ratio
+            img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+            
+            # Apply advanced compression techniques
+            # For JPEG, use progressive encoding and optimize
+            if image_path.lower().endswith(('.jpg', '.jpeg')):
+                img.save(image_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+            else:
+                # For other formats, use standard optimization
+                img.save(image_path, 'JPEG', quality=quality, optimize=True)
+            
+            # Create WebP version for better compression
+            webp_path = os.path.splitext(image_path)[0] + '.webp'
+            # Use lossless compression for images with fewer colors, otherwise use lossy
+            if img.mode in ('1', 'L', 'P'):  # Black/white, grayscale, or palette
+                img.save(webp_path, 'WEBP', lossless=True, quality=quality, method=6)
+            else:
+                img.save(webp_path, 'WEBP', quality=quality, method=6, alpha_quality=quality)
+                
+            # Create additional responsive image sizes
+            create_responsive_sizes(img, image_path, quality)
+    except Exception as e:
+        print(f"Error optimizing image {image_path}: {e}")
+
+def create_responsive_sizes(img, original_path, quality=85):
+    """
+    Create multiple responsive image sizes for better performance on different devices.
+    """
+    # Define responsive sizes
+    sizes = [
+        (320, 240),   # Small thumbnail
+        (640, 480),   # Medium size
+        (1200, 900),  # Large size
+    ]
+    
+    base_name = os.path.splitext(original_path)[0]
+    extension = os.path.splitext(original_path)[1].lower()
+    
+    for width, height in sizes:
+        # Skip if the original image is smaller than the target size
+        if img.width <= width and img.height <= height:
+            continue
+            
+        # Create a copy and resize
+        resized_img = img.copy()
+        resized_img.thumbnail((width, height), Image.Resampling.LANCZOS)
+        
+        # Save in original format
+        if extension in ('.jpg', '.jpeg'):
+            resized_img.save(f"{base_name}_{width}w{extension}", 'JPEG', quality=quality, optimize=True)
+        else:
+            resized_img.save(f"{base_name}_{width}w.jpg", 'JPEG', quality=quality, optimize=True)
+        
+        # Save in WebP format
+        resized_img.save(f"{base_name}_{width}w.webp", 'WEBP', quality=quality, method=6)
+
+def optimize_product_images():
+    """
+    Optimize all product images in the media directory.
+    """
+    media_root = settings.MEDIA_ROOT
+    products_dir = os.path.join(media_root, 'products')
+    
+    if not os.path.exists(products_dir):
+        return
+    
+    for filename in os.listdir(products_dir):
+        if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
+            image_path = os.path.join(products_dir, filename)
+            optimize_image(image_path)
\ No newline at end of file
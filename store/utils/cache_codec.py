@@ -0,0 +1,320 @@
+"""
+Compact serialization of cached payloads
+
+Cached pages used to hold pickled querysets, Page objects and model
+instances: large, slow to unpickle and tied to the class layout of the
+code that wrote them. Payloads are now flat DTOs (dicts, lists and tuples
+of plain values) packed with marshal, the interpreter's own binary
+format, and compressed with zlib above a size threshold. Model rows carry
+their column names, so rows written before a field was added still load
+(the new field is fetched on first access) and rows naming a field that
+no longer exists are rejected as a miss.
+"""
+
+import marshal
+from functools import lru_cache
+import uuid
+import zlib
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Page, Paginator
+from django.db import models
+from django.db.models.fields.files import FieldFile
+from django.db.models.base import ModelState
+from django.utils.dateparse import parse_duration
+from django.utils.duration import duration_string
+
+# Layout of the packed header; bump when it changes
+FORMAT_VERSION = 1
+
+FLAG_COMPRESSED = 1
+
+# Payloads at least this large are compressed
+DEFAULT_COMPRESS_THRESHOLD = 1024
+
+# Cached pages are decoded far more often than encoded; level 1 keeps most
+# of the size win at a fraction of the cost
+COMPRESS_LEVEL = 1
+
+# Parsers of the values dumped as strings, by field class (most specific first)
+CONVERTERS = (
+    (models.DecimalField, Decimal),
+    (models.DateTimeField, datetime.fromisoformat),
+    (models.DateField, date.fromisoformat),
+    (models.TimeField, time.fromisoformat),
+    (models.UUIDField, uuid.UUID),
+    (models.DurationField, parse_duration),
+)
+
+
+class CodecError(ValueError):
+    """Raised when a payload cannot be decoded by the running code"""
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return duration_string(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, FieldFile):
+        return value.name
+    return value
+
+
+def pack(data: Any, compress_threshold: Optional[int] = None) -> bytes:
+    """
+    Pack a DTO into bytes
+
+    Args:
+        data: Plain values only: None, bool, int, float, str, bytes, list, tuple, dict, set
+        compress_threshold: Minimum size to compress, defaults to STORE_CACHE_COMPRESS_THRESHOLD
+
+    Returns:
+        Header followed by the (possibly compressed) marshal payload
+
+    Raises:
+        ValueError: If the DTO contains a value marshal cannot store
+    """
+    if compress_threshold is None:
+        compress_threshold = getattr(settings, 'STORE_CACHE_COMPRESS_THRESHOLD', DEFAULT_COMPRESS_THRESHOLD)
+    body = marshal.dumps(data)
+    flags = 0
+    if compress_threshold is not None and len(body) >= compress_threshold:
+        body = zlib.compress(body, COMPRESS_LEVEL)
+        flags |= FLAG_COMPRESSED
+    return bytes((FORMAT_VERSION, marshal.version, flags)) + body
+
+
+def unpack(payload: bytes) -> Any:
+    """
+    Unpack bytes produced by ``pack``
+
+    Raises:
+        CodecError: If the payload is corrupt or was written by an incompatible interpreter
+    """
+    if not isinstance(payload, bytes) or len(payload) < 3:
+        raise CodecError("Not a packed payload")
+    if payload[0] != FORMAT_VERSION or payload[1] != marshal.version:
+        raise CodecError(f"Unsupported payload format {payload[0]}/{payload[1]}")
+    body = payload[3:]
+    try:
+        if payload[2] & FLAG_COMPRESSED:
+            body = zlib.decompress(body)
+        return marshal.loads(body)
+    except (ValueError, EOFError, TypeError, zlib.error) as e:
+        raise CodecError(f"Corrupt payload: {str(e)}")
+
+
+def get_columns(model) -> tuple:
+    """Get the column names rows of a model are dumped with"""
+    return tuple(field.attname for field in model._meta.concrete_fields)
+
+
+def dump_instances(instances: Iterable[models.Model], related: Sequence[str] = ()) -> Dict[str, Any]:
+    """
+    Dump model instances as one row tuple each
+
+    Args:
+        instances: Instances of one model
+        related: Names of one-to-one or foreign key relations loaded with
+            select_related whose rows are kept alongside
+
+    Returns:
+        DTO with the model label, column names, rows and related rows
+    """
+    instances = list(instances)
+    if not instances:
+        return {'model': '', 'columns': (), 'rows': [], 'related': {}}
+    model = type(instances[0])
+    dto = {
+        'model': model._meta.label_lower,
+        'columns': get_columns(model),
+        'rows': [],
+        'related': {},
+    }
+    fields = model._meta.concrete_fields
+    for instance in instances:
+        dto['rows'].append(tuple(_dump_value(field.value_from_object(instance)) for field in fields))
+
+    for name in related:
+        relation = model._meta.get_field(name)
+        related_model = relation.related_model
+        related_fields = related_model._meta.concrete_fields
+        rows = []
+        for instance in instances:
+            related_instance = relation.get_cached_value(instance, None)
+            rows.append(None if related_instance is None else tuple(
+                _dump_value(field.value_from_object(related_instance)) for field in related_fields
+            ))
+        dto['related'][name] = {
+            'model': related_model._meta.label_lower,
+            'columns': get_columns(related_model),
+            'rows': rows,
+        }
+    return dto
+
+
+def _get_converter(field) -> Optional[Callable[[Any], Any]]:
+    for field_class, converter in CONVERTERS:
+        if isinstance(field, field_class):
+            return converter
+    return None
+
+
+@lru_cache(maxsize=256)
+def _row_loader(model, columns: Tuple[str, ...]) -> Callable[[Sequence[Any]], models.Model]:
+    """
+    Build a function turning rows with ``columns`` into instances of ``model``
+
+    Instances are restored the way unpickling restores them, filling
+    ``__dict__`` without running ``__init__`` or the init signals, which
+    is most of the cost of building model objects. Loaders are memoized
+    per column layout.
+    """
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    if len(set(columns)) != len(columns) or not set(columns) <= fields.keys():
+        raise CodecError(f"Columns of {model._meta.label_lower} changed")
+    # Columns added after the row was dumped stay deferred and load on first access
+    plan = [(column, position, _get_converter(fields[column])) for position, column in enumerate(columns)]
+
+    def load_row(row):
+        instance = model.__new__(model)
+        values = instance.__dict__
+        for column, position, convert in plan:
+            value = row[position]
+            values[column] = value if convert is None or value is None else convert(value)
+        state = values['_state'] = ModelState()
+        state.adding = False
+        return instance
+
+    return load_row
+
+
+def load_instances(dto: Dict[str, Any]) -> List[models.Model]:
+    """
+    Rebuild the instances dumped with ``dump_instances``
+
+    Instances are marked as loaded from the database, with their related
+    objects cached as if fetched by select_related, and are new objects on
+    every call, so callers may annotate them freely.
+
+    Raises:
+        CodecError: If the model or one of its columns no longer exists
+    """
+    if not dto['rows']:
+        return []
+    try:
+        model = apps.get_model(dto['model'])
+    except (LookupError, ValueError):
+        raise CodecError(f"Unknown model {dto['model']}")
+    instances = list(map(_row_loader(model, tuple(dto['columns'])), dto['rows']))
+
+    for name, related in dto['related'].items():
+        relation = model._meta.get_field(name)
+        load_related = _row_loader(relation.related_model, tuple(related['columns']))
+        remote_field = relation.remote_field if relation.one_to_one else None
+        for instance, row in zip(instances, related['rows']):
+            related_instance = None if row is None else load_related(row)
+            relation.set_cached_value(instance, related_instance)
+            if related_instance is not None and remote_field is not None:
+                remote_field.set_cached_value(related_instance, instance)
+    return instances
+
+
+class DTOCodec:
+    """
+    Converts one kind of cached value to a versioned DTO and back
+
+    Args:
+        name: Name stored with every payload
+        version: Bumped whenever the DTO layout changes, so older payloads become misses
+        dump: Function from the value to a DTO
+        load: Function from a DTO back to the value
+    """
+
+    def __init__(self, name: str, version: int, dump: Callable[[Any], Any], load: Callable[[Any], Any]):
+        self.name = name
+        self.version = version
+        self.dump = dump
+        self.load = load
+
+    def encode(self, value: Any) -> bytes:
+        return pack((self.name, self.version, self.dump(value)))
+
+    def decode(self, payload: bytes) -> Any:
+        try:
+            name, version, data = unpack(payload)
+        except (TypeError, ValueError):
+            raise CodecError("Not a DTO payload")
+        if (name, version) != (self.name, self.version):
+            raise CodecError(f"Payload is {name} v{version}, expected {self.name} v{self.version}")
+        try:
+            return self.load(data)
+        except (KeyError, IndexError, TypeError, ValueError, LookupError, FieldDoesNotExist) as e:
+            raise CodecError(f"Cannot load {self.name} payload: {str(e)}")
+
+
+def context_codec(name: str, version: int, instances: Dict[str, Sequence[str]]) -> DTOCodec:
+    """
+    Build a codec for a template context holding model instances
+
+    Args:
+        name: Codec name
+        version: Codec version
+        instances: Maps each context key holding an instance or a list of
+            instances to the relations dumped with them
+
+    Returns:
+        DTOCodec; other context values must already be plain
+    """
+    def dump(context):
+        data = {}
+        for key, value in context.items():
+            if key in instances:
+                many = isinstance(value, (list, tuple))
+                value = (many, dump_instances(value if many else [value], instances[key]))
+            data[key] = value
+        return data
+
+    def load(data):
+        context = dict(data)
+        for key in instances:
+            if key in context:
+                many, dto = context[key]
+                loaded = load_instances(dto)
+                context[key] = loaded if many else loaded[0]
+        return context
+
+    return DTOCodec(name, version, dump, load)
+
+
+def page_codec(name: str, version: int, related: Sequence[str] = ()) -> DTOCodec:
+    """
+    Build a codec for a Paginator page of model instances
+
+    Only the page's rows, number and the paginator's count and page size
+    are stored; the loaded page never queries for its count again.
+    """
+    def dump(page):
+        return {
+            'number': page.number,
+            'count': page.paginator.count,
+            'per_page': page.paginator.per_page,
+            'orphans': page.paginator.orphans,
+            'rows': dump_instances(page.object_list, related),
+        }
+
+    def load(data):
+        paginator = Paginator([], data['per_page'], orphans=data['orphans'])
+        paginator.count = data['count']
+        return Page(load_instances(data['rows']), data['number'], paginator)
+
+    return DTOCodec(name, version, dump, load)
@@ -5,6 +5,13 @@ from decimal import Decimal
 from django.apps import apps
 from django.utils import timezone
 
+# Loyalty discount percentage granted at each loyalty level
+LOYALTY_DISCOUNT_PERCENTAGES = {
+    'silver': 5,
+    'gold': 10,
+    'platinum': 15,
+}
+
 
 def apply_coupon_to_order(order, coupon_code, user=None):
     """
@@ -75,13 +82,7 @@ def calculate_loyalty_discount(order, user):
         
         # Calculate discount based on loyalty level
         # This is a simplified implementation - in a real system, you might have more complex rules
-        discount_percentage = 0
-        if loyalty_program.level == 'silver':
-            discount_percentage = 5
-        elif loyalty_program.level == 'gold':
-            discount_percentage = 10
-        elif loyalty_program.level == 'platinum':
-            discount_percentage = 15
+        discount_percentage = LOYALTY_DISCOUNT_PERCENTAGES.get(loyalty_program.level, 0)
             
         if discount_percentage > 0:
             discount_amount = (order.total_amount * discount_percentage / 100).quantize(Decimal('0.01'))
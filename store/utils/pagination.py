@@ -0,0 +1,197 @@
+"""
+Keyset (cursor) pagination shared by the web views, the REST API and the mobile API
+
+Instead of OFFSET + COUNT(*), each page continues from the sort key of the
+last row of the previous page, so page 200 costs the same index seek as
+page 1. Cursors are opaque URL-safe strings; clients pass them back verbatim.
+"""
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence, Tuple
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor is malformed or does not match the ordering"""
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(values: Sequence[Any], reverse: bool = False) -> str:
+    """
+    Encode sort key values into an opaque cursor
+
+    Args:
+        values: Sort key values of the boundary row, in ordering order
+        reverse: True for a cursor that pages backwards
+
+    Returns:
+        URL-safe cursor string
+    """
+    payload = {'v': [_dump_value(value) for value in values]}
+    if reverse:
+        payload['r'] = 1
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[List[Any], bool]:
+    """
+    Decode a cursor produced by ``encode_cursor``
+
+    Args:
+        cursor: Cursor string from the client
+
+    Returns:
+        Tuple of (sort key values, reverse flag)
+
+    Raises:
+        InvalidCursor: If the cursor cannot be decoded
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = payload['v']
+    except (ValueError, TypeError, KeyError, UnicodeError, binascii.Error) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+    if not isinstance(values, list):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return values, bool(payload.get('r'))
+
+
+def get_keyset_ordering(queryset) -> Optional[List[str]]:
+    """
+    Derive a unique keyset ordering from a queryset's ORDER BY
+
+    The primary key is appended as a tie-breaker, in the direction of the
+    last sort key so a composite (key, id) index can serve the query.
+
+    Args:
+        queryset: Ordered queryset
+
+    Returns:
+        List of field names with optional '-' prefix, or None when the
+        ordering uses expressions or related fields that cannot be keyed
+        (e.g. search relevance)
+    """
+    if not isinstance(queryset, QuerySet):
+        # Ranked search results are ordered in Python
+        return None
+    ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+    for field in ordering:
+        if not isinstance(field, str) or '__' in field or field in ('?', '-?'):
+            return None
+    names = [field.lstrip('-') for field in ordering]
+    if 'pk' not in names and 'id' not in names:
+        direction = '-' if ordering and ordering[-1].startswith('-') else ''
+        ordering.append(f'{direction}pk')
+    return ordering
+
+
+class KeysetPage:
+    """One page of keyset pagination results"""
+
+    def __init__(self, object_list: list, next_cursor: Optional[str], previous_cursor: Optional[str]):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """Paginate a queryset by seeking past the sort key of the previous page"""
+
+    def __init__(self, queryset, per_page: int, ordering: Optional[Sequence[str]] = None):
+        """
+        Args:
+            queryset: Queryset to paginate; sort key fields must be non-null
+            per_page: Number of rows per page
+            ordering: Explicit ordering; derived from the queryset when omitted
+        """
+        if ordering is None:
+            ordering = get_keyset_ordering(queryset)
+            if ordering is None:
+                raise ValueError("Queryset ordering cannot be used for keyset pagination")
+        self.ordering = list(ordering)
+        self.queryset = queryset.order_by(*self.ordering)
+        self.per_page = per_page
+
+    def _get_values(self, obj) -> List[Any]:
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    def _seek(self, values: List[Any], reverse: bool) -> Q:
+        # (a, b, c) > (x, y, z) expanded as a > x OR (a = x AND (b > y OR ...))
+        condition = None
+        for index in reversed(range(len(self.ordering))):
+            field = self.ordering[index]
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            step = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[index]})
+            if condition is not None:
+                step |= Q(**{name: values[index]}) & condition
+            condition = step
+        return condition
+
+    def page(self, cursor: Optional[str] = None) -> KeysetPage:
+        """
+        Fetch the page that follows (or precedes) a cursor
+
+        Args:
+            cursor: Cursor from a previous page, or None for the first page
+
+        Returns:
+            KeysetPage with the rows and the cursors of the adjacent pages
+
+        Raises:
+            InvalidCursor: If the cursor is malformed or does not fit the ordering
+        """
+        queryset = self.queryset
+        reverse = False
+        if cursor:
+            values, reverse = decode_cursor(cursor)
+            if len(values) != len(self.ordering):
+                raise InvalidCursor(f"Cursor does not match ordering: {cursor}")
+            try:
+                queryset = queryset.filter(self._seek(values, reverse))
+            except (ValidationError, ValueError, TypeError) as e:
+                raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+        if reverse:
+            queryset = queryset.reverse()
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = bool(cursor), has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(self._get_values(rows[-1]))
+        if rows and has_previous:
+            previous_cursor = encode_cursor(self._get_values(rows[0]), reverse=True)
+        return KeysetPage(rows, next_cursor, previous_cursor)
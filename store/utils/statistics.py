@@ -0,0 +1,118 @@
+"""
+Declarative dashboard statistics compiled into one aggregate query per table
+
+Dashboards used to issue one COUNT or SUM per tile, each a full pass over
+the same table with a different WHERE clause. Each tile is now declared as
+a Metric (table, filter, aggregate), and all metrics over the same table
+are answered by a single SELECT using conditional aggregation
+(``COUNT(*) FILTER (WHERE ...)`` on PostgreSQL, ``CASE WHEN`` elsewhere).
+"""
+
+from typing import Any, Dict, Iterable, Mapping, Optional
+from django.apps import apps
+from django.db.models import Avg, Count, Max, Min, Q, QuerySet, Sum
+
+AGGREGATES = {
+    'count': Count,
+    'sum': Sum,
+    'avg': Avg,
+    'max': Max,
+    'min': Min,
+}
+
+
+class Metric:
+    """One dashboard figure: an aggregate of a field over the rows of a model matching a filter"""
+
+    __slots__ = ('model', 'aggregate', 'field', 'filter', 'default', 'distinct')
+
+    def __init__(self, model: str, aggregate: str = 'count', field: str = 'pk',
+                 filter: Optional[Q] = None, default: Any = 0, distinct: bool = False):
+        """
+        Args:
+            model: Model label (e.g. 'store.Order')
+            aggregate: One of 'count', 'sum', 'avg', 'max', 'min'
+            field: Field aggregated; counts default to rows
+            filter: Rows the metric covers, None for all of them
+            default: Value when no row matches (SUM, AVG, MAX and MIN give NULL)
+            distinct: Aggregate distinct values only
+        """
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate: {aggregate}")
+        self.model = model
+        self.aggregate = aggregate
+        self.field = field
+        self.filter = filter
+        self.default = default
+        self.distinct = distinct
+
+    def as_expression(self):
+        options = {'filter': self.filter} if self.filter is not None else {}
+        if self.distinct:
+            options['distinct'] = True
+        return AGGREGATES[self.aggregate](self.field, **options)
+
+
+def count(model: str, filter: Optional[Q] = None, **options) -> Metric:
+    return Metric(model, 'count', filter=filter, **options)
+
+
+def total(model: str, field: str, filter: Optional[Q] = None, **options) -> Metric:
+    return Metric(model, 'sum', field, filter=filter, **options)
+
+
+def average(model: str, field: str, filter: Optional[Q] = None, **options) -> Metric:
+    return Metric(model, 'avg', field, filter=filter, **options)
+
+
+class Statistics:
+    """A named set of metrics, evaluated with one query per model"""
+
+    def __init__(self, metrics: Mapping[str, Metric]):
+        """
+        Args:
+            metrics: Metrics by the name their value is returned under
+        """
+        self.metrics = dict(metrics)
+
+    def get_models(self) -> Iterable[str]:
+        return dict.fromkeys(metric.model for metric in self.metrics.values())
+
+    def compile(self, querysets: Optional[Mapping[str, QuerySet]] = None) -> Dict[str, QuerySet]:
+        """
+        Get the queryset each model's metrics are aggregated over
+
+        Args:
+            querysets: Querysets to use instead of all rows, by model label
+                (e.g. only the current user's orders)
+
+        Returns:
+            Dictionary mapping model label to its queryset
+        """
+        querysets = querysets or {}
+        return {
+            label: querysets[label] if label in querysets else apps.get_model(label)._default_manager.all()
+            for label in self.get_models()
+        }
+
+    def evaluate(self, querysets: Optional[Mapping[str, QuerySet]] = None) -> Dict[str, Any]:
+        """
+        Compute every metric
+
+        Args:
+            querysets: Querysets to use instead of all rows, by model label
+
+        Returns:
+            Dictionary mapping metric name to its value
+        """
+        values = {}
+        for label, queryset in self.compile(querysets).items():
+            expressions = {
+                name: metric.as_expression()
+                for name, metric in self.metrics.items() if metric.model == label
+            }
+            values.update(queryset.order_by().aggregate(**expressions))
+        return {
+            name: metric.default if values[name] is None else values[name]
+            for name, metric in self.metrics.items()
+        }
@@ -3,59 +3,89 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, Http404
 from django.apps import apps
 from django.db.models import Sum, Count, Avg
 import logging
 import json
+import uuid
 from .utils import Cart
+from .utils.pagination import InvalidCursor, KeysetPaginator
+from .utils.cache_codec import context_codec, page_codec
+from .decorators import cache_anonymous_page, record_cache_warmup
+from .utils.coupon_utils import calculate_earned_points, update_user_loyalty_points, get_user_rewards
+from .services.pricing_service import pricing_service
+from .services.order_service import InsufficientStockError
+from .services.reservation_service import reservation_service
+from .services.idempotency_service import idempotency_service, IdempotencyConflictError
+from .services.search_service import search_service
+from .services.facet_service import facet_service
+from .services.product_service import DASHBOARD_STATISTICS
+from .services.rating_service import rating_service
+from .services.currency_service import currency_service
+from .services.event_ingestion_service import event_ingestion_service
 from datetime import datetime
 import os
 
 logger = logging.getLogger(__name__)
 
+# Cached pages are stored as compact DTOs; bump a version when its context changes
+HOME_CODEC = context_codec('home_page', 1, {'featured_products': ()})
+PRODUCT_PAGE_CODEC = page_codec('product_list_page', 1, related=('rating_summary',))
+PRODUCT_CURSOR_CODEC = context_codec('product_list_cursor', 1, {'products': ('rating_summary',)})
+PRODUCT_DETAIL_CODEC = context_codec('product_detail', 1, {'product': ('rating_summary',), 'top_reviews': ()})
+
+@record_cache_warmup
+@cache_anonymous_page(tags=['product'])
 def home(request):
     """Home page view with caching"""
-    # Try to get home page data from cache first
-    cache_key = 'home_page_data'
-    home_data = cache.get(cache_key)
-    
-    if home_data is None:
+    def build_home_data():
         # If not in cache, prepare the data
         from django.apps import apps
         Product = apps.get_model('store', 'Product')
         
         # Get featured products (first 4 products as examples)
         try:
-            featured_products = Product.objects.select_related('seller').all()[:4]
+            featured_products = list(Product.objects.all()[:4])
         except Exception as e:
             # If there's an error, create empty list
             featured_products = []
         
-        home_data = {
+        return {
             'featured_products': featured_products
         }
-        
-        # Cache for 10 minutes
-        cache.set(cache_key, home_data, 60 * 10)
+    
+    # Product saves invalidate the entry, so it can live long; concurrent
+    # misses share one computation
+    home_data = cache_service.get_or_set(
+        'home_page_data', build_home_data, cache_service.LONG_TIMEOUT, tags=['product'], codec=HOME_CODEC
+    )
     
     return render(request, 'store/home.html', home_data)
 
 from django.core.cache import cache
 from store.services.cache_service import cache_service
 
+# Keyset orderings for the product list; the trailing id keeps each key unique
+PRODUCT_LIST_KEYSET_ORDERINGS = {
+    'newest': ('-created_at', '-id'),
+    'price_low': ('price', 'id'),
+    'price_high': ('-price', '-id'),
+}
+
+@record_cache_warmup
+@cache_anonymous_page(tags=['product', 'productratingsummary'])
 def product_list(request):
     """Product list view with caching and pagination"""
+    if 'cursor' in request.GET:
+        return _product_list_by_cursor(request)
+    
     # Get page number from request
     page = request.GET.get('page', 1)
     
-    # Try to get products from cache first
-    cache_key = f'product_list_page_{page}'
-    products = cache.get(cache_key)
-    
-    if products is None:
+    def build_page():
         Product = apps.get_model('store', 'Product')
-        products_list = Product.objects.all().select_related('seller')
+        products_list = Product.objects.all().select_related('rating_summary')
         
         # Implement pagination
         from django.core.paginator import Paginator
@@ -64,64 +94,101 @@ def product_list(request):
             products = paginator.page(page)
         except:
             products = paginator.page(1)
-        
-        # Cache for 15 minutes
-        cache.set(cache_key, products, 60 * 15)
+        products.object_list = list(products.object_list)
+        return products
+    
+    # Product and rating changes invalidate the page, so it can live long
+    products = cache_service.get_or_set(
+        f'product_list_page_{page}', build_page, cache_service.LONG_TIMEOUT,
+        tags=['product', 'productratingsummary'], codec=PRODUCT_PAGE_CODEC
+    )
+    
+    # Prices are converted after the cache so one cached page serves every
+    # currency; each hit decodes its own product objects to annotate
+    display_currency = currency_service.get_display_currency(request)
+    currency_service.annotate_prices(products, display_currency)
     
-    return render(request, 'store/product_list.html', {'products': products})
+    return render(request, 'store/product_list.html', {'products': products, 'display_currency': display_currency})
 
+def _product_list_by_cursor(request):
+    """Product list page continuing from an opaque cursor instead of an offset"""
+    sort = request.GET.get('sort', 'newest')
+    if sort not in PRODUCT_LIST_KEYSET_ORDERINGS:
+        sort = 'newest'
+    cursor = request.GET.get('cursor', '')
+    
+    def build_context():
+        Product = apps.get_model('store', 'Product')
+        paginator = KeysetPaginator(
+            Product.objects.select_related('rating_summary'), 12, PRODUCT_LIST_KEYSET_ORDERINGS[sort]
+        )
+        try:
+            page = paginator.page(cursor or None)
+        except InvalidCursor:
+            raise Http404("Invalid cursor")
+        
+        return {
+            'products': page.object_list,
+            'next_cursor': page.next_cursor,
+            'previous_cursor': page.previous_cursor,
+            'sort': sort,
+        }
+    
+    if cursor:
+        # Clients can forge any number of cursors, so only the first page of
+        # each sort is cached; later pages are a single index seek anyway
+        context = build_context()
+    else:
+        # Product and rating changes invalidate the page, so it can live long
+        context = cache_service.get_or_set(
+            cache_service.get_cache_key('product_list_cursor', sort), build_context,
+            cache_service.LONG_TIMEOUT, tags=['product', 'productratingsummary'], codec=PRODUCT_CURSOR_CODEC
+        )
+    
+    context['display_currency'] = currency_service.get_display_currency(request)
+    currency_service.annotate_prices(context['products'], context['display_currency'])
+    
+    return render(request, 'store/product_list.html', context)
+
+# Shows live availability, so anonymous copies are kept only briefly
+@record_cache_warmup
+@cache_anonymous_page(tags=['product:{pk}'], timeout=60)
 def product_detail(request, pk):
     """Product detail view with caching and enhanced reviews system"""
-    # Try to get product from cache first
-    cache_key = f'product_detail_{pk}'
-    cached_data = cache.get(cache_key)
-    
-    if cached_data is None:
+    def build_context():
         Product = apps.get_model('store', 'Product')
-        product = get_object_or_404(Product, pk=pk)
-        
-        # Get product reviews
-        from .models import EnhancedReview
-        reviews = EnhancedReview.objects.filter(product=product, is_verified_purchase=True)
-        
-        # Calculate average rating
-        if reviews.exists():
-            average_rating = reviews.aggregate(Avg('rating'))['rating__avg']
-            review_count = reviews.count()
-            
-            # Calculate rating distribution
-            rating_distribution = {}
-            for i in range(1, 6):
-                rating_distribution[i] = reviews.filter(rating=i).count()
-        else:
-            average_rating = 0
-            review_count = 0
-            rating_distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
+        product = get_object_or_404(Product.objects.select_related('rating_summary'), pk=pk)
         
         # Get top reviews (featured)
-        top_reviews = reviews.filter(is_featured=True)[:3]
+        from .models import EnhancedReview
+        top_reviews = list(EnhancedReview.objects.filter(
+            product=product, is_verified_purchase=True, is_featured=True
+        )[:3])
         
-        # Prepare context
+        # Prepare context; ratings come from the maintained summary row
         context = {
             'product': product,
-            'average_rating': average_rating,
-            'review_count': review_count,
-            'rating_distribution': rating_distribution,
             'top_reviews': top_reviews
         }
-        
-        # Cache for 30 minutes
-        cache.set(cache_key, context, 60 * 30)
-    else:
-        context = cached_data
+        context.update(rating_service.get_summary(product))
+        return context
+    
+    # Saving the product or one of its reviews invalidates the entry
+    context = cache_service.get_or_set(
+        f'product_detail_{pk}', build_context, cache_service.LONG_TIMEOUT, tags=[f'product:{pk}'],
+        codec=PRODUCT_DETAIL_CODEC
+    )
+    
+    # Availability changes with every checkout, so it is never cached with the page
+    context['available_quantity'] = reservation_service.get_available_quantities([context['product']])[context['product'].id]
     
     return render(request, 'store/product_detail.html', context)
 
 def view_cart(request):
     """View cart with optimized queries"""
-    cart = Cart(request.session)
-    cart_items = cart.get_items()
-    total_price = cart.get_total_price()
+    priced_cart = Cart.for_request(request).priced()
+    cart_items = priced_cart.items
+    total_price = priced_cart.subtotal
     
     # Store cart total in session for coupon calculations
     request.session['cart_total'] = str(total_price)
@@ -133,12 +200,34 @@ def view_cart(request):
     
     return render(request, 'store/cart_with_coupons.html', context)
 
+def _apply_coupon_pricing(request, pricing, response_data):
+    """Sync the session coupon summary with the computed cart pricing"""
+    if 'coupon_id' not in request.session:
+        return
+    
+    if pricing['coupon'] is None:
+        # If coupon is invalid, remove it from session
+        for key in ('coupon_id', 'discount_amount', 'cart_total_with_discount'):
+            request.session.pop(key, None)
+        return
+    
+    discount_amount = pricing['coupon_discount']
+    new_total = pricing['subtotal'] - discount_amount
+    
+    # Update session with discount info
+    request.session['discount_amount'] = str(discount_amount)
+    request.session['cart_total_with_discount'] = str(new_total)
+    
+    # Add discount information to response
+    response_data['discount_amount'] = str(discount_amount)
+    response_data['cart_total_with_discount'] = str(new_total)
+
 def get_cart_data(request):
     """API endpoint to get current cart data for live updates"""
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        cart = Cart(request.session)
-        cart_items = cart.get_items()
-        cart_total = cart.get_total_price()
+        priced_cart = Cart.for_request(request).priced()
+        cart_items = priced_cart.items
+        cart_total = priced_cart.subtotal
         
         # Prepare cart items data
         items_data = []
@@ -159,10 +248,7 @@ def get_cart_data(request):
         }
         
         # Add discount information if applicable
-        if 'discount_amount' in request.session:
-            response_data['discount_amount'] = request.session['discount_amount']
-            if 'cart_total_with_discount' in request.session:
-                response_data['cart_total_with_discount'] = request.session['cart_total_with_discount']
+        _apply_coupon_pricing(request, pricing_service.price_request(request, priced_cart), response_data)
         
         return JsonResponse(response_data)
     
@@ -175,14 +261,14 @@ def add_to_cart(request, product_id):
         quantity = int(request.POST.get('quantity', 1))
         
         # Use Cart class to add product
-        cart = Cart(request.session)
+        cart = Cart.for_request(request)
         cart.add(product_id, quantity)
         
         # Return JSON response for AJAX requests
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             # Calculate updated cart totals
-            cart_items = cart.get_items()
-            cart_total = cart.get_total_price()
+            priced_cart = cart.priced()
+            cart_total = priced_cart.subtotal
             
             # Update session cart total
             request.session['cart_total'] = str(cart_total)
@@ -196,45 +282,7 @@ def add_to_cart(request, product_id):
             }
             
             # Apply coupon discount if applicable
-            if 'coupon_id' in request.session:
-                try:
-                    from django.apps import apps
-                    from decimal import Decimal
-                    from django.utils import timezone
-                    
-                    Coupon = apps.get_model('store', 'Coupon')
-                    coupon = Coupon.objects.get(
-                        id=request.session['coupon_id'],
-                        active=True,
-                        valid_from__lte=timezone.now(),
-                        valid_to__gte=timezone.now()
-                    )
-                    
-                    # Calculate discount
-                    discount_amount = Decimal('0.00')
-                    if coupon.discount_type == 'percentage':
-                        discount_amount = (cart_total * coupon.discount_value / 100).quantize(Decimal('0.01'))
-                    else:  # fixed amount
-                        discount_amount = min(coupon.discount_value, cart_total)
-                    
-                    # Calculate new total
-                    new_total = cart_total - discount_amount
-                    
-                    # Update session with discount info
-                    request.session['discount_amount'] = str(discount_amount)
-                    request.session['cart_total_with_discount'] = str(new_total)
-                    
-                    # Add discount information to response
-                    response_data['discount_amount'] = str(discount_amount)
-                    response_data['cart_total_with_discount'] = str(new_total)
-                except Exception:
-                    # If coupon is invalid, remove it from session
-                    if 'coupon_id' in request.session:
-                        del request.session['coupon_id']
-                    if 'discount_amount' in request.session:
-                        del request.session['discount_amount']
-                    if 'cart_total_with_discount' in request.session:
-                        del request.session['cart_total_with_discount']
+            _apply_coupon_pricing(request, pricing_service.price_request(request, priced_cart), response_data)
             
             return JsonResponse(response_data)
     
@@ -244,14 +292,14 @@ def remove_from_cart(request, product_id):
     """Remove product from cart"""
     if request.method == 'POST':
         # Use Cart class to remove product
-        cart = Cart(request.session)
+        cart = Cart.for_request(request)
         cart.remove(product_id)
         
         # Return JSON response for AJAX requests
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             # Calculate updated cart totals
-            cart_items = cart.get_items()
-            cart_total = cart.get_total_price()
+            priced_cart = cart.priced()
+            cart_total = priced_cart.subtotal
             
             # Update session cart total
             request.session['cart_total'] = str(cart_total)
@@ -265,10 +313,7 @@ def remove_from_cart(request, product_id):
             }
             
             # Add discount information if applicable
-            if 'discount_amount' in request.session:
-                response_data['discount_amount'] = request.session['discount_amount']
-                if 'cart_total_with_discount' in request.session:
-                    response_data['cart_total_with_discount'] = request.session['cart_total_with_discount']
+            _apply_coupon_pricing(request, pricing_service.price_request(request, priced_cart), response_data)
             
             return JsonResponse(response_data)
     
@@ -290,24 +335,20 @@ def update_cart(request, product_id):
             quantity = int(request.POST.get('quantity', 1))
         
         # Use Cart class to update product quantity
-        cart = Cart(request.session)
+        cart = Cart.for_request(request)
         cart.update(product_id, quantity)
         
         # Return appropriate response based on request type
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             # Calculate updated cart totals
-            cart_items = cart.get_items()
-            cart_total = cart.get_total_price()
+            priced_cart = cart.priced()
+            cart_total = priced_cart.subtotal
             
             # Update session cart total
             request.session['cart_total'] = str(cart_total)
             
             # Find the updated item to get its new total
-            item_total = 0
-            for item in cart_items:
-                if str(item['product'].id) == str(product_id):
-                    item_total = item['total_price']
-                    break
+            item_total = priced_cart.get_item_total(product_id)
             
             # Prepare response data
             response_data = {
@@ -319,45 +360,7 @@ def update_cart(request, product_id):
             }
             
             # Apply coupon discount if applicable
-            if 'coupon_id' in request.session:
-                try:
-                    from django.apps import apps
-                    from decimal import Decimal
-                    from django.utils import timezone
-                    
-                    Coupon = apps.get_model('store', 'Coupon')
-                    coupon = Coupon.objects.get(
-                        id=request.session['coupon_id'],
-                        active=True,
-                        valid_from__lte=timezone.now(),
-                        valid_to__gte=timezone.now()
-                    )
-                    
-                    # Calculate discount
-                    discount_amount = Decimal('0.00')
-                    if coupon.discount_type == 'percentage':
-                        discount_amount = (cart_total * coupon.discount_value / 100).quantize(Decimal('0.01'))
-                    else:  # fixed amount
-                        discount_amount = min(coupon.discount_value, cart_total)
-                    
-                    # Calculate new total
-                    new_total = cart_total - discount_amount
-                    
-                    # Update session with discount info
-                    request.session['discount_amount'] = str(discount_amount)
-                    request.session['cart_total_with_discount'] = str(new_total)
-                    
-                    # Add discount information to response
-                    response_data['discount_amount'] = str(discount_amount)
-                    response_data['cart_total_with_discount'] = str(new_total)
-                except Exception:
-                    # If coupon is invalid, remove it from session
-                    if 'coupon_id' in request.session:
-                        del request.session['coupon_id']
-                    if 'discount_amount' in request.session:
-                        del request.session['discount_amount']
-                    if 'cart_total_with_discount' in request.session:
-                        del request.session['cart_total_with_discount']
+            _apply_coupon_pricing(request, pricing_service.price_request(request, priced_cart), response_data)
             
             return JsonResponse(response_data)
         else:
@@ -367,25 +370,47 @@ def update_cart(request, product_id):
     
     return redirect('view_cart')
 
+class OrderNotCreated(Exception):
+    """Raised by _create_order with the response for a checkout that placed no order"""
+    
+    def __init__(self, response):
+        self.response = response
+        super().__init__(response.url)
+
 def create_order(request):
-    """Create order with coupon and loyalty support"""
+    """Create order, replaying the first response for retries with the same idempotency key"""
+    if request.method != 'POST':
+        return redirect('checkout')
+    
+    if request.user.is_authenticated:
+        owner = f"user_{request.user.id}"
+    else:
+        owner = f"session_{request.session.session_key}"
+    try:
+        return idempotency_service.execute(
+            'create_order',
+            idempotency_service.get_key_from_request(request),
+            lambda: _create_order(request),
+            owner=owner
+        )
+    except OrderNotCreated as e:
+        # Failures are not stored, so a retry with the same key tries again
+        return e.response
+    except IdempotencyConflictError:
+        messages.warning(request, 'جاري معالجة طلبك بالفعل، يرجى الانتظار')
+        return redirect('checkout')
+
+def _create_order(request):
+    """
+    Create order with coupon and loyalty support
+    
+    Raises:
+        OrderNotCreated: With the redirect to show when no order was placed
+    """
     if request.method == 'POST':
         try:
-            from decimal import Decimal
             from django.apps import apps
-            from django.utils import timezone
-            
-            # Import coupon utilities with error handling
-            try:
-                from .utils.coupon_utils import (
-                    apply_coupon_to_order, 
-                    calculate_earned_points, 
-                    update_user_loyalty_points
-                )
-                coupon_utils_available = True
-            except ImportError:
-                coupon_utils_available = False
-                logger.warning("Coupon utilities not available in create_order")
+            from django.db.models import F
             
             # Get form data
             full_name = request.POST.get('full_name', '')
@@ -399,96 +424,52 @@ def create_order(request):
             # Validate required fields
             if not all([full_name, phone, address, city]):
                 messages.error(request, 'يرجى ملء جميع الحقول المطلوبة')
-                return redirect('checkout')
+                raise OrderNotCreated(redirect('checkout'))
             
             # Get cart data
-            cart = Cart(request.session)
-            cart_items = cart.get_items()
+            cart = Cart.for_request(request)
+            priced_cart = cart.priced()
+            cart_items = priced_cart.items
             
             if not cart_items:
                 messages.error(request, 'السلة فارغة')
-                return redirect('product_list')
-            
-            # Calculate order total
-            subtotal = cart.get_total_price()
-            
-            # Apply discounts
-            coupon_discount = Decimal('0.00')
-            loyalty_discount = Decimal('0.00')
-            rewards_discount = Decimal('0.00')
-            
-            # Apply coupon if present and utilities are available
-            if 'coupon_id' in request.session and coupon_utils_available:
-                try:
-                    Coupon = apps.get_model('store', 'Coupon')
-                    coupon = Coupon.objects.get(id=request.session['coupon_id'])
-                    # Create temporary order for discount calculation
-                    Order = apps.get_model('store', 'Order')
-                    temp_order = Order(total_amount=subtotal)
-                    coupon_discount = apply_coupon_to_order(temp_order, coupon.code)
-                except Exception as e:
-                    logger.warning(f"Error applying coupon in create_order: {str(e)}")
-                    pass  # Invalid coupon
-            
-            # Calculate final total
-            total_discount = coupon_discount + loyalty_discount + rewards_discount
-            final_total = max(subtotal - total_discount, Decimal('0.00'))
-            
-            # Create order
-            Order = apps.get_model('store', 'Order')
-            order = Order.objects.create(
-                user=request.user if request.user.is_authenticated else None,
-                total_amount=final_total,
-                shipping_address=f"{address}, {city}, {state}, {zip_code}",
-                phone_number=phone,
-                status='pending'
-            )
+                raise OrderNotCreated(redirect('product_list'))
             
-            # Create order items
-            OrderItem = apps.get_model('store', 'OrderItem')
-            Product = apps.get_model('store', 'Product')
-            
-            # Track if we have any valid items
-            has_valid_items = False
+            # Calculate order total with coupon, loyalty, tax and shipping in one pass
+            pricing = pricing_service.price_request(request, priced_cart)
+            final_total = pricing['total']
             
-            for item in cart_items:
-                try:
-                    OrderItem.objects.create(
-                        order=order,
-                        product=item['product'],
-                        quantity=item['quantity'],
-                        price=item['product'].price
-                    )
-                    
-                    # Update product stock
-                    product = item['product']
-                    product.stock_quantity -= item['quantity']
-                    product.save()
-                    has_valid_items = True
-                except Exception as e:
-                    logger.error(f"Error creating order item: {str(e)}")
-                    # Continue with other items even if one fails
-                    pass
-            
-            # If no valid items were created, delete the order and show error
-            if not has_valid_items:
-                order.delete()
-                messages.error(request, 'حدث خطأ أثناء إنشاء عناصر الطلب')
-                return redirect('checkout')
-            
-            # Apply coupon usage if utilities are available
-            if 'coupon_id' in request.session and coupon_utils_available:
+            # Convert the checkout holds into an order with permanent stock decrements
+            try:
+                order = reservation_service.convert_holds(
+                    request.session.session_key,
+                    request.user if request.user.is_authenticated else None,
+                    cart_items,
+                    total_amount=final_total,
+                    shipping_address=f"{address}, {city}, {state}, {zip_code}",
+                    phone_number=phone,
+                    status='pending',
+                    tax_amount=pricing['tax_amount'],
+                    shipping_cost=pricing['shipping_cost']
+                )
+            except InsufficientStockError as e:
+                line = priced_cart.get_item(e.product_id)
+                product_name = line['product'].name if line else e.product_id
+                messages.error(request, f'الكمية المطلوبة من "{product_name}" غير متوفرة في المخزون')
+                raise OrderNotCreated(redirect('view_cart'))
+            
+            # Record coupon usage if a valid coupon was applied
+            if pricing['coupon'] is not None:
                 try:
                     Coupon = apps.get_model('store', 'Coupon')
-                    coupon = Coupon.objects.get(id=request.session['coupon_id'])
-                    coupon.times_used += 1
-                    coupon.save()
+                    Coupon.objects.filter(id=pricing['coupon']['id']).update(times_used=F('times_used') + 1)
+                    pricing_service.invalidate_coupon(pricing['coupon']['id'])
                 except Exception as e:
                     logger.warning(f"Error updating coupon usage: {str(e)}")
                     pass  # Invalid coupon
             
-            # Calculate and award loyalty points if user is authenticated and utilities are available
-            if request.user.is_authenticated and coupon_utils_available:
+            # Calculate and award loyalty points if user is authenticated
+            if request.user.is_authenticated:
                 try:
                     points_earned = calculate_earned_points(order, request.user)
                     update_user_loyalty_points(request.user, points_earned)
@@ -525,85 +506,41 @@ def create_order(request):
             messages.success(request, f'تم إنشاء الطلب بنجاح! رقم الطلب: {order.id}')
             return redirect('order_detail', order_id=order.id)
             
+        except OrderNotCreated:
+            raise
         except Exception as e:
             logger.error(f"Error creating order: {str(e)}", exc_info=True)
             messages.error(request, 'حدث خطأ أثناء إنشاء الطلب. يرجى المحاولة مرة أخرى.')
-            return redirect('checkout')
+            raise OrderNotCreated(redirect('checkout'))
     
-    return redirect('checkout')
+    raise OrderNotCreated(redirect('checkout'))
 
 def checkout(request):
     """Checkout view with coupon and loyalty support"""
     try:
-        from decimal import Decimal
-        from django.apps import apps
-        
-        # Import coupon utilities
-        try:
-            from .utils.coupon_utils import (
-                apply_coupon_to_order, 
-                calculate_loyalty_discount, 
-                get_user_rewards,
-                calculate_earned_points,
-                update_user_loyalty_points
-            )
-            coupon_utils_available = True
-        except ImportError:
-            coupon_utils_available = False
-            logger.warning("Coupon utilities not available")
-        
         # Get cart data
-        cart = Cart(request.session)
-        cart_items = cart.get_items()
-        subtotal = cart.get_total_price()
-        
-        # Initialize discount values
-        coupon_discount = Decimal('0.00')
-        loyalty_discount = Decimal('0.00')
-        rewards_discount = Decimal('0.00')
-        
-        # Apply coupon if present in session and utilities are available
-        if 'coupon_id' in request.session and coupon_utils_available:
-            try:
-                Coupon = apps.get_model('store', 'Coupon')
-                coupon = Coupon.objects.get(id=request.session['coupon_id'])
-                # Create a temporary order object for discount calculation
-                Order = apps.get_model('store', 'Order')
-                temp_order = Order(total_amount=subtotal)
-                coupon_discount = apply_coupon_to_order(temp_order, coupon.code)
-            except Exception as e:
-                logger.warning(f"Error applying coupon in checkout: {str(e)}")
-                pass  # Invalid coupon, ignore
+        priced_cart = Cart.for_request(request).priced()
+        cart_items = priced_cart.items
         
-        # Apply loyalty discount if user is authenticated and utilities are available
-        if request.user.is_authenticated and coupon_utils_available:
-            try:
-                # Create a temporary order object for discount calculation
-                Order = apps.get_model('store', 'Order')
-                temp_order = Order(total_amount=subtotal)
-                loyalty_discount = calculate_loyalty_discount(temp_order, request.user)
-            except Exception as e:
-                logger.warning(f"Error calculating loyalty discount: {str(e)}")
-                pass  # Error calculating loyalty discount
+        # Compute subtotal, discounts, tax and shipping in one pass
+        pricing = pricing_service.price_request(request, priced_cart)
         
-        # Apply rewards discount if any rewards were selected and utilities are available
-        if 'rewards' in request.session and coupon_utils_available:
+        # Hold the cart quantities while the shopper completes checkout
+        if cart_items:
             try:
-                for reward_data in request.session['rewards']:
-                    if reward_data.get('type') == 'discount' and reward_data.get('discount_percentage'):
-                        reward_discount = (subtotal * Decimal(reward_data['discount_percentage']) / 100).quantize(Decimal('0.01'))
-                        rewards_discount += reward_discount
+                if not request.session.session_key:
+                    request.session.save()
+                shortfall = reservation_service.place_holds(request.session.session_key, cart_items)
+                reservation_service.remember_session(request.session)
+                for product_id in shortfall:
+                    product_name = priced_cart.get_item(product_id)['product'].name
+                    messages.warning(request, f'الكمية المطلوبة من "{product_name}" محجوزة حالياً من قبل عملاء آخرين')
             except Exception as e:
-                logger.warning(f"Error applying rewards discount: {str(e)}")
-                pass  # Error applying rewards discount
-        
-        # Calculate final total
-        total_discount = coupon_discount + loyalty_discount + rewards_discount
-        final_total = max(subtotal - total_discount, Decimal('0.00'))
+                logger.warning(f"Error placing stock reservations: {str(e)}")
         
-        # Get available rewards if user is authenticated and utilities are available
+        # Get available rewards if user is authenticated
         available_rewards = []
-        if request.user.is_authenticated and coupon_utils_available:
+        if request.user.is_authenticated:
             try:
                 available_rewards = get_user_rewards(request.user)
             except Exception as e:
@@ -612,13 +549,17 @@ def checkout(request):
         
         context = {
             'cart_items': cart_items,
-            'subtotal': subtotal,
-            'coupon_discount': coupon_discount,
-            'loyalty_discount': loyalty_discount,
-            'rewards_discount': rewards_discount,
-            'total_discount': total_discount,
-            'final_total': final_total,
-            'available_rewards': available_rewards
+            'subtotal': pricing['subtotal'],
+            'coupon_discount': pricing['coupon_discount'],
+            'loyalty_discount': pricing['loyalty_discount'],
+            'rewards_discount': pricing['rewards_discount'],
+            'total_discount': pricing['total_discount'],
+            'tax_amount': pricing['tax_amount'],
+            'shipping_cost': pricing['shipping_cost'],
+            'final_total': pricing['total'],
+            'available_rewards': available_rewards,
+            # A fresh key per checkout render collapses double-submits of this form
+            'idempotency_key': uuid.uuid4().hex
         }
         
         return render(request, 'store/checkout_with_discounts.html', context)
@@ -1033,7 +974,7 @@ def manager_dashboard(request):
     
     # Try to get manager dashboard data from cache first
     cache_key = f'manager_dashboard_data_{request.user.id}'
-    dashboard_data = cache.get(cache_key)
+    dashboard_data = cache_service.get(cache_key)
     
     if dashboard_data is None:
         # Import models
@@ -1067,7 +1008,7 @@ def manager_dashboard(request):
         }
         
         # Cache for 5 minutes (since this data changes frequently)
-        cache.set(cache_key, dashboard_data, 60 * 5)
+        cache_service.set(cache_key, dashboard_data, 60 * 5)
     
     return render(request, 'store/manager_dashboard.html', dashboard_data)
 
@@ -1169,6 +1110,7 @@ def signup(request):
     """Signup view"""
     return render(request, 'store/signup.html')
 
+@record_cache_warmup
 @login_required
 def manager_dashboard(request):
     """Manager dashboard view with caching and integration data"""
@@ -1179,40 +1121,20 @@ def manager_dashboard(request):
     
     # Try to get manager dashboard data from cache first
     cache_key = cache_service.get_dashboard_statistics_cache_key(request.user.id)
-    dashboard_data = cache_service.get_or_set(
-        cache_key,
-        lambda: None,  # Will be computed below if None
-        cache_service.MEDIUM_TIMEOUT
-    )
     
-    if dashboard_data is None:
+    def build_dashboard_data():
         # Import models
         from django.apps import apps
-        from django.db.models import Sum, Count, Q, Prefetch
-        Product = apps.get_model('store', 'Product')
+        from django.db.models import Prefetch
         Order = apps.get_model('store', 'Order')
-        UserProfile = apps.get_model('store', 'UserProfile')
-        Commission = apps.get_model('store', 'Commission')
         SocialMediaIntegration = apps.get_model('store', 'SocialMediaIntegration')
         ShippingIntegration = apps.get_model('store', 'ShippingIntegration')
         ExternalInventory = apps.get_model('store', 'ExternalInventory')
         AnalyticsIntegration = apps.get_model('store', 'AnalyticsIntegration')
         OrderItem = apps.get_model('store', 'OrderItem')
         
-        # Get enhanced statistics with optimized queries
-        total_products = Product.objects.count()
-        total_orders = Order.objects.count()
-        pending_orders = Order.objects.filter(status='pending').count()
-        
-        # New requested statistics
-        total_sellers = UserProfile.objects.filter(role='seller').count()
-        
-        # Calculate total profits from commissions
-        total_profits = Commission.objects.aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Get pending/rejected products
-        pending_products = Product.objects.filter(verification_status='pending').count()
-        rejected_products = Product.objects.filter(verification_status='rejected').count()
+        # Product, order, seller and profit tiles, one query per table
+        dashboard_data = DASHBOARD_STATISTICS.evaluate()
         
         # Get integration data with optimized queries
         social_media_integrations = SocialMediaIntegration.objects.select_related(
@@ -1247,23 +1169,21 @@ def manager_dashboard(request):
             )
         ).order_by('-created_at')[:10]
         
-        dashboard_data = {
-            'total_products': total_products,
-            'total_orders': total_orders,
-            'pending_orders': pending_orders,
-            'total_sellers': total_sellers,
-            'total_profits': total_profits,
-            'pending_products': pending_products,
-            'rejected_products': rejected_products,
+        dashboard_data.update({
             'social_media_integrations': social_media_integrations,
             'shipping_integrations': shipping_integrations,
             'external_inventories': external_inventories,
             'analytics_events': analytics_events,
             'recent_orders': recent_orders,
-        }
+        })
         
-        # Cache for 5 minutes (since this data changes frequently)
-        cache.set(cache_key, dashboard_data, cache_service.SHORT_TIMEOUT)
+        return dashboard_data
+    
+    # Cache for 5 minutes (since this data changes frequently); saves of the
+    # summarised models expire it sooner
+    dashboard_data = cache_service.get_or_set(
+        cache_key, build_dashboard_data, cache_service.SHORT_TIMEOUT, tags=['product', 'order', 'coupon']
+    )
     
     return render(request, 'store/manager_dashboard.html', dashboard_data)
 
@@ -1415,13 +1335,8 @@ def buyer_dashboard(request):
     
     # Try to get buyer dashboard data from cache first
     cache_key = cache_service.get_dashboard_statistics_cache_key(request.user.id)
-    dashboard_data = cache_service.get_or_set(
-        cache_key,
-        lambda: None,  # Will be computed below if None
-        cache_service.MEDIUM_TIMEOUT
-    )
     
-    if dashboard_data is None:
+    def build_dashboard_data():
         # Import models
         from django.db.models import Prefetch
         Order = apps.get_model('store', 'Order')
@@ -1449,11 +1364,17 @@ def buyer_dashboard(request):
             'recent_orders': recent_orders,
         }
         
-        # Cache for 5 minutes (since this data changes frequently)
-        cache.set(cache_key, dashboard_data, cache_service.SHORT_TIMEOUT)
+        return dashboard_data
+    
+    # Cache for 5 minutes (since this data changes frequently); saves of the
+    # summarised models expire it sooner
+    dashboard_data = cache_service.get_or_set(
+        cache_key, build_dashboard_data, cache_service.SHORT_TIMEOUT, tags=['order']
+    )
     
     return render(request, 'store/buyer_dashboard.html', dashboard_data)
 
+@record_cache_warmup
 @login_required
 def seller_dashboard(request):
     """Seller dashboard view with caching and optimized queries"""
@@ -1469,13 +1390,8 @@ def seller_dashboard(request):
     
     # Try to get seller dashboard data from cache first
     cache_key = cache_service.get_dashboard_statistics_cache_key(request.user.id)
-    dashboard_data = cache_service.get_or_set(
-        cache_key,
-        lambda: None,  # Will be computed below if None
-        cache_service.MEDIUM_TIMEOUT
-    )
     
-    if dashboard_data is None:
+    def build_dashboard_data():
         # Import models
         from django.db.models import Prefetch
         Product = apps.get_model('store', 'Product')
@@ -1588,12 +1504,18 @@ def seller_dashboard(request):
             'seller_rating': seller_rating,
         }
         
-        # Cache for 5 minutes (since this data changes frequently)
-        cache.set(cache_key, dashboard_data, cache_service.SHORT_TIMEOUT)
+        return dashboard_data
+    
+    # Cache for 5 minutes (since this data changes frequently); saves of the
+    # summarised models expire it sooner
+    dashboard_data = cache_service.get_or_set(
+        cache_key, build_dashboard_data, cache_service.SHORT_TIMEOUT, tags=['product', 'order', 'enhancedreview']
+    )
     
     # Render the luxury dashboard template
     return render(request, 'store/seller_dashboard_luxury.html', dashboard_data)
 
+@record_cache_warmup
 @login_required
 def buyer_dashboard(request):
     """Buyer dashboard view with caching and optimized queries"""
@@ -1609,13 +1531,8 @@ def buyer_dashboard(request):
     
     # Try to get buyer dashboard data from cache first
     cache_key = cache_service.get_dashboard_statistics_cache_key(request.user.id)
-    dashboard_data = cache_service.get_or_set(
-        cache_key,
-        lambda: None,  # Will be computed below if None
-        cache_service.MEDIUM_TIMEOUT
-    )
     
-    if dashboard_data is None:
+    def build_dashboard_data():
         # Import models
         from django.db.models import Prefetch
         Order = apps.get_model('store', 'Order')
@@ -1643,8 +1560,13 @@ def buyer_dashboard(request):
             'recent_orders': recent_orders,
         }
         
-        # Cache for 5 minutes (since this data changes frequently)
-        cache.set(cache_key, dashboard_data, cache_service.SHORT_TIMEOUT)
+        return dashboard_data
+    
+    # Cache for 5 minutes (since this data changes frequently); saves of the
+    # summarised models expire it sooner
+    dashboard_data = cache_service.get_or_set(
+        cache_key, build_dashboard_data, cache_service.SHORT_TIMEOUT, tags=['order']
+    )
     
     return render(request, 'store/buyer_dashboard.html', dashboard_data)
 
@@ -2008,61 +1930,72 @@ def ai_analytics_dashboard(request):
     from django.apps import apps
     from django.db.models import Count, Sum, Avg, Q
     from django.db.models.functions import TruncDay, TruncMonth
+    from django.utils import timezone
     from decimal import Decimal
     from datetime import datetime, timedelta
+    from store.services.rollup_service import RollupService
+    from store.utils import statistics
     
     # Get all required models
     Product = apps.get_model('store', 'Product')
-    Order = apps.get_model('store', 'Order')
     OrderItem = apps.get_model('store', 'OrderItem')
-    User = apps.get_model('auth', 'User')
-    Commission = apps.get_model('store', 'Commission')
-    AnalyticsIntegration = apps.get_model('store', 'AnalyticsIntegration')
+    
+    # Order and event tiles are read from the hourly and daily rollups
+    no_orders = {'orders': 0, 'revenue': Decimal('0.00')}
+    order_totals = RollupService.get_order_totals()
+    delivered = order_totals.get('delivered', no_orders)
+    event_counts = RollupService.get_event_counts()
+    
+    # Product, user and commission tiles, one conditional aggregate query per table
+    thirty_days_ago = timezone.now() - timedelta(days=30)
+    counts = statistics.Statistics({
+        'total_products': statistics.count('store.Product'),
+        'total_users': statistics.count('auth.User', distinct=True),
+        'new_customers': statistics.count('auth.User', Q(date_joined__gte=thirty_days_ago), distinct=True),
+        'returning_customers': statistics.count('auth.User', Q(order__created_at__lt=thirty_days_ago), distinct=True),
+        'sellers_count': statistics.count('auth.User', Q(userprofile__role='seller'), distinct=True),
+        'buyers_count': statistics.count('auth.User', Q(userprofile__role='buyer'), distinct=True),
+        'managers_count': statistics.count('auth.User', Q(userprofile__role='manager'), distinct=True),
+        'total_commission_amount': statistics.total('store.Commission', 'amount', default=Decimal('0.00')),
+        'paid_commissions': statistics.total('store.Commission', 'amount', Q(is_paid=True), default=Decimal('0.00')),
+        'pending_commissions': statistics.total('store.Commission', 'amount', Q(is_paid=False), default=Decimal('0.00')),
+    }).evaluate()
     
     # Basic statistics
-    total_products = Product.objects.count()
-    total_orders = Order.objects.count()
-    total_users = User.objects.count()
+    total_products = counts['total_products']
+    total_orders = sum(totals['orders'] for totals in order_totals.values())
+    total_users = counts['total_users']
     
     # Revenue calculations
-    total_revenue = Order.objects.filter(status='delivered').aggregate(
-        total=Sum('total_amount')
-    )['total'] or Decimal('0.00')
+    total_revenue = delivered['revenue']
     
     # Revenue in the last 30 days
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    revenue_30_days = Order.objects.filter(
-        status='delivered',
-        created_at__gte=thirty_days_ago
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
+    revenue_30_days = RollupService.get_order_totals(start=thirty_days_ago).get('delivered', no_orders)['revenue']
     
     # Revenue in the last 7 days
-    seven_days_ago = datetime.now() - timedelta(days=7)
-    revenue_7_days = Order.objects.filter(
-        status='delivered',
-        created_at__gte=seven_days_ago
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
+    seven_days_ago = timezone.now() - timedelta(days=7)
+    revenue_7_days = RollupService.get_order_totals(start=seven_days_ago).get('delivered', no_orders)['revenue']
     
     # Average order value
-    avg_order_value = Order.objects.filter(status='delivered').aggregate(
-        avg=Avg('total_amount')
-    )['avg'] or Decimal('0.00')
+    avg_order_value = (
+        (delivered['revenue'] / delivered['orders']).quantize(Decimal('0.01')) if delivered['orders'] else Decimal('0.00')
+    )
     
     # Customer lifetime value (simplified)
     customer_lifetime_value = avg_order_value * Decimal('5')  # Assuming 5 purchases per customer
     
     # Conversion rates
-    total_visitors = AnalyticsIntegration.objects.filter(event_type='page_view').count()
-    total_purchases = Order.objects.count()
+    total_visitors = event_counts.get('page_view', 0)
+    total_purchases = total_orders
     conversion_rate = (total_purchases / total_visitors * 100) if total_visitors > 0 else 0
     
     # Cart to checkout conversion
-    cart_additions = AnalyticsIntegration.objects.filter(event_type='add_to_cart').count()
-    checkouts = AnalyticsIntegration.objects.filter(event_type='checkout').count()
+    cart_additions = event_counts.get('add_to_cart', 0)
+    checkouts = event_counts.get('checkout', 0)
     cart_conversion_rate = (checkouts / cart_additions * 100) if cart_additions > 0 else 0
     
     # Checkout to purchase conversion
-    purchases = AnalyticsIntegration.objects.filter(event_type='purchase').count()
+    purchases = event_counts.get('purchase', 0)
     checkout_conversion_rate = (purchases / checkouts * 100) if checkouts > 0 else 0
     
     # AI Predictions (simplified)
@@ -2070,49 +2003,30 @@ def ai_analytics_dashboard(request):
     predicted_revenue_next_7_days = total_revenue * Decimal('1.20')  # 20% revenue growth prediction
     
     # User behavior analytics
-    new_customers = User.objects.filter(
-        date_joined__gte=thirty_days_ago
-    ).count()
+    new_customers = counts['new_customers']
+    returning_customers = counts['returning_customers']
     
-    returning_customers = User.objects.filter(
-        order__created_at__lt=thirty_days_ago
-    ).distinct().count()
-    
-    page_views = AnalyticsIntegration.objects.filter(event_type='page_view').count()
-    product_views = AnalyticsIntegration.objects.filter(event_type='product_view').count()
-    cart_additions = AnalyticsIntegration.objects.filter(event_type='add_to_cart').count()
-    checkouts = AnalyticsIntegration.objects.filter(event_type='checkout').count()
-    purchases = AnalyticsIntegration.objects.filter(event_type='purchase').count()
-    searches = AnalyticsIntegration.objects.filter(event_type='search').count()
+    page_views = total_visitors
+    product_views = event_counts.get('product_view', 0)
+    searches = event_counts.get('search', 0)
     
     # User statistics
-    sellers_count = User.objects.filter(userprofile__role='seller').count()
-    buyers_count = User.objects.filter(userprofile__role='buyer').count()
-    managers_count = User.objects.filter(userprofile__role='manager').count()
+    sellers_count = counts['sellers_count']
+    buyers_count = counts['buyers_count']
+    managers_count = counts['managers_count']
     
     # Commission summary
-    total_commission_amount = Commission.objects.aggregate(
-        total=Sum('amount')
-    )['total'] or Decimal('0.00')
-    
-    paid_commissions = Commission.objects.filter(is_paid=True).aggregate(
-        total=Sum('amount')
-    )['total'] or Decimal('0.00')
-    
-    pending_commissions = Commission.objects.filter(is_paid=False).aggregate(
-        total=Sum('amount')
-    )['total'] or Decimal('0.00')
+    total_commission_amount = counts['total_commission_amount']
+    paid_commissions = counts['paid_commissions']
+    pending_commissions = counts['pending_commissions']
     
     # Sales by category
+    rollup_sales = RollupService.get_category_sales(status='delivered')
     category_sales = {}
     for category, _ in Product.CATEGORY_CHOICES:
-        category_orders = OrderItem.objects.filter(
-            product__category=category,
-            order__status='delivered'
-        )
-        
-        quantity = category_orders.aggregate(total=Sum('quantity'))['total'] or 0
-        amount = category_orders.aggregate(total=Sum('price'))['total'] or Decimal('0.00')
+        sales = rollup_sales.get(category, {})
+        quantity = sales.get('quantity', 0)
+        amount = sales.get('amount', Decimal('0.00'))
         
         # Calculate percentage
         category_percentage = (float(amount) / float(total_revenue) * 100) if total_revenue > 0 else 0
@@ -2433,7 +2347,7 @@ def remove_from_comparison(request, product_id):
 def advanced_search(request):
     """Advanced search view with faceted filtering and AI enhancements"""
     from django.apps import apps
-    from django.db.models import Q, Min, Max, Avg, Count
+    from django.db.models import Count
     from decimal import Decimal
     from django.core.paginator import Paginator
     
@@ -2444,34 +2358,34 @@ def advanced_search(request):
     category = request.GET.get('category', '')
     min_price = request.GET.get('min_price', '')
     max_price = request.GET.get('max_price', '')
-    sort_by = request.GET.get('sort_by', 'name')
+    sort_by = request.GET.get('sort_by') or ('relevance' if query else 'name')
     brand = request.GET.get('brand', '')
     rating = request.GET.get('rating', '')
     
     # Start with all products
     products = Product.objects.all()
     
-    # Apply search query
+    # Apply search query through the full-text index
     if query:
-        products = products.filter(
-            Q(name__icontains=query) | 
-            Q(description__icontains=query) |
-            Q(seo_keywords__icontains=query)
-        )
-    
-    # Apply category filter
-    if category:
-        products = products.filter(category=category)
-    
-    # Apply brand filter
-    if brand:
-        products = products.filter(brand__icontains=brand)
+        products = search_service.filter_queryset(products, query)
     
     # Apply price filters
     if min_price:
         products = products.filter(price__gte=Decimal(min_price))
     if max_price:
-        products = products.filter(price__gte=Decimal(max_price))
+        products = products.filter(price__lte=Decimal(max_price))
+    
+    # Facet counts, price range and histogram in one grouped query; the
+    # unfiltered catalog's facets are cached until the catalog changes
+    facets = facet_service.get_facets(
+        products,
+        category=category,
+        cacheable=not (query or min_price or max_price)
+    )
+    
+    # Apply category filter
+    if category:
+        products = products.filter(category=category)
     
     # Apply rating filter
     if rating:
@@ -2486,32 +2400,17 @@ def advanced_search(request):
     elif sort_by == 'name':
         products = products.order_by('name')
     elif sort_by == 'popularity':
-        # Sort by sales count or views
-        products = products.annotate(
-            order_count=Count('orderitem')
-        ).order_by('-order_count')
+        # Sort by the maintained sales counter
+        products = products.order_by('-order_count')
     elif sort_by == 'rating':
         # Sort by average rating (would require review model)
         pass
+    elif sort_by == 'relevance' and query:
+        products = search_service.rank(products, query)
     
-    # Get price range for filter UI
-    price_range = Product.objects.aggregate(
-        min_price=Min('price'),
-        max_price=Max('price')
-    )
-    
-    # Get categories for filter UI
-    categories = Product.objects.values('category').annotate(
-        count=Count('id')
-    ).order_by('category')
-    
-    # Get brands for filter UI
-    brands = Product.objects.values('brand').annotate(
-        count=Count('id')
-    ).order_by('brand')
-    
-    # Implement pagination
+    # Implement pagination; the facet total replaces the paginator's COUNT query
     paginator = Paginator(products, 12)  # 12 products per page
+    paginator.count = facets['total']
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
@@ -2524,9 +2423,11 @@ def advanced_search(request):
         'sort_by': sort_by,
         'brand': brand,
         'rating': rating,
-        'price_range': price_range,
-        'categories': categories,
-        'brands': brands,
+        'price_range': facets['price_range'],
+        'price_histogram': facets['price_histogram'],
+        'categories': facets['categories'],
+        # Product has no brand field, so there is no brand facet
+        'brands': [],
         'is_paginated': page_obj.has_other_pages(),
         'page_obj': page_obj,
     }
@@ -2605,7 +2506,7 @@ def move_wishlist_to_cart(request):
     
     if wishlist_items.exists():
         # Add each item to cart
-        cart = Cart(request.session)
+        cart = Cart.for_request(request)
         added_count = 0
         
         for item in wishlist_items:
@@ -3228,9 +3129,43 @@ def get_recommendations(request):
     """Get recommendations"""
     return render(request, 'store/recommendations.html')
 
+def _track_event(request, allow_order=False):
+    """Buffer the analytics event posted as JSON or form data"""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'طلب غير صالح'}, status=405)
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except (json.JSONDecodeError, ValueError):
+            data = None
+    else:
+        data = request.POST
+    if not isinstance(data, dict):
+        return JsonResponse({'status': 'error', 'message': 'طلب غير صالح'}, status=400)
+    
+    event_type = data.get('event_type')
+    if event_type not in event_ingestion_service.get_event_types():
+        return JsonResponse({'status': 'error', 'message': 'نوع الحدث غير معروف'}, status=400)
+    try:
+        product_id = int(data['product_id']) if data.get('product_id') else None
+        order_id = int(data['order_id']) if allow_order and data.get('order_id') else None
+    except (TypeError, ValueError):
+        return JsonResponse({'status': 'error', 'message': 'طلب غير صالح'}, status=400)
+    if not (event_ingestion_service.is_valid_id(product_id) and event_ingestion_service.is_valid_id(order_id)):
+        return JsonResponse({'status': 'error', 'message': 'طلب غير صالح'}, status=400)
+    metadata = data.get('metadata')
+    
+    accepted = event_ingestion_service.track_request(
+        request, event_type, product_id=product_id, order_id=order_id,
+        url=data.get('url') or request.META.get('HTTP_REFERER') or None,
+        metadata=metadata if isinstance(metadata, dict) else None,
+    )
+    # Dropped under overload; the client has nothing to retry
+    return JsonResponse({'status': 'success', 'accepted': accepted}, status=202)
+
 def track_user_behavior(request):
     """Track user behavior"""
-    return JsonResponse({'status': 'success'})
+    return _track_event(request)
 
 
 def health_check(request):
@@ -3577,7 +3512,7 @@ def track_analytics_event(request):
     # Check if user is staff/admin
     if not request.user.is_staff:
         return JsonResponse({'status': 'error', 'message': 'ليس لديك صلاحية تتبع الأحداث التحليلية'})
-    return JsonResponse({'status': 'success'})
+    return _track_event(request, allow_order=True)
 
 @login_required
 def export_analytics_report(request, format):
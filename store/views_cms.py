@@ -4,17 +4,19 @@ from django.contrib import messages
 from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.contrib.auth.models import User
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import F, Q
 from django.utils import timezone
 from django.utils.text import slugify
 from .models import Page, Article, LandingPage, Comment
-from .decorators import manager_required
+from .decorators import manager_required, cache_anonymous_page, record_cache_warmup
 
 def is_manager(user):
     """Check if user is a manager"""
     return user.userprofile.role == 'manager'
 
 # Page Views
+@record_cache_warmup
+@cache_anonymous_page(tags=['page', 'comment'])
 def page_detail(request: HttpRequest, slug: str) -> HttpResponse:
     """Display a page"""
     page = get_object_or_404(Page, slug=slug, status='published')
@@ -210,14 +212,19 @@ def article_list(request: HttpRequest) -> HttpResponse:
     }
     return render(request, 'store/article_list.html', context)
 
+@record_cache_warmup
 def article_detail(request: HttpRequest, slug: str) -> HttpResponse:
     """Display an article"""
+    # Count every visit, including those answered from the page cache; update()
+    # skips the save signals, so counting does not expire cached copies
+    Article.objects.filter(slug=slug, status='published').update(views=F('views') + 1)
+    return _render_article_detail(request, slug)
+
+@cache_anonymous_page(tags=['article', 'comment'])
+def _render_article_detail(request: HttpRequest, slug: str) -> HttpResponse:
+    """Render an article page"""
     article = get_object_or_404(Article, slug=slug, status='published')
     
-    # Increment view count
-    article.views += 1
-    article.save(update_fields=['views'])
-    
     # Get approved comments for this article
     comments = Comment.objects.filter(article=article, status='approved').order_by('-created_at')
     